@@ -340,6 +340,41 @@ def create_app():
             app.logger.error(f"Error al configurar instance_path: {e}", exc_info=True)
             raise
 
+    # Cache: backend según CACHE_BACKEND (memory por proceso / sqlite compartido entre workers)
+    try:
+        from .infrastructure.cache import configure_cache
+        from .helpers.cache_utils import start_cache_cleaner
+        cache_backend = os.environ.get('CACHE_BACKEND', 'memory').lower()
+        cache_path = os.environ.get('CACHE_SQLITE_PATH')
+        if cache_backend == 'sqlite' and not cache_path:
+            cache_path = os.path.join(os.path.abspath(app.instance_path), 'cache.sqlite3')
+        cache_manager = configure_cache(cache_backend, cache_path)
+        start_cache_cleaner()
+        app.logger.info(f"✅ Cache inicializado (backend: {cache_manager.backend_name})")
+    except Exception as e:
+        app.logger.warning(f"⚠️ No se pudo inicializar el cache: {e}")
+
+    # Rate limiting: backend según RATE_LIMIT_BACKEND (por defecto el del cache);
+    # con sqlite los límites se cuentan una sola vez entre todos los workers
+    try:
+        from .infrastructure.rate_limiter import configure_rate_limit_storage
+        rate_limit_backend = (os.environ.get('RATE_LIMIT_BACKEND')
+                              or os.environ.get('CACHE_BACKEND', 'memory')).lower()
+        rate_limit_path = os.environ.get('RATE_LIMIT_SQLITE_PATH')
+        if rate_limit_backend == 'sqlite' and not rate_limit_path:
+            rate_limit_path = os.path.join(os.path.abspath(app.instance_path), 'rate_limits.sqlite3')
+        rate_limit_storage = configure_rate_limit_storage(rate_limit_backend, rate_limit_path)
+        app.logger.info(f"✅ Rate limiting inicializado (backend: {rate_limit_storage.backend_name})")
+    except Exception as e:
+        app.logger.warning(f"⚠️ No se pudo inicializar el rate limiting: {e}")
+
+    # Métricas de requests: latencia por endpoint/estado y consultas SQL por request
+    try:
+        from .helpers.monitoring import init_request_metrics
+        init_request_metrics(app)
+    except Exception as e:
+        app.logger.warning(f"⚠️ No se pudieron inicializar las métricas de requests: {e}")
+
     # Configuración de base de datos para BIMBA System
     # Migrado a MySQL - soporta MySQL, PostgreSQL (legacy) y SQLite (desarrollo)
     is_production = os.environ.get('FLASK_ENV', '').lower() == 'production'
@@ -719,6 +754,14 @@ def create_app():
     except Exception as e:
         app.logger.warning(f"No se pudo registrar api_bp: {e}")
     
+    # Registrar blueprint de monitoreo (estadísticas y exportación Prometheus)
+    try:
+        from .routes.monitoring_routes import monitoring_bp
+        app.register_blueprint(monitoring_bp)
+        app.logger.info("✅ Blueprint de monitoreo registrado")
+    except Exception as e:
+        app.logger.warning(f"No se pudo registrar monitoring_bp: {e}")
+    
     # Registrar blueprint de API BIMBA
     try:
         from .routes.api_bimba import bp as api_bimba_bp
@@ -820,6 +863,10 @@ def create_app():
     # Configuración Kiosko
     app.config['KIOSK_ENABLED'] = os.environ.get('KIOSK_ENABLED', 'true').lower() == 'true'
     
+    # Inventario: por defecto se descuenta al entregar; si está activo se descuenta al vender
+    # (pipeline post-commit en lote, ver app/helpers/sale_inventory_pipeline.py)
+    app.config['INVENTORY_APPLY_ON_SALE'] = os.environ.get('INVENTORY_APPLY_ON_SALE', 'false').lower() == 'true'
+    
     # Registrar blueprint de Kiosko
     # Crear tablas de la base de datos si no existen (siempre, no solo para kiosko)
     with app.app_context():
@@ -1249,11 +1296,8 @@ def create_app():
                     # Obtener estadísticas del turno
                     try:
                         shift_date = shift_status_dict.get('shift_date', fecha_hoy)
-                        delivery_stats = stats_service.get_delivery_stats(
-                            start_date=shift_date,
-                            end_date=shift_date
-                        )
-                        shift_metrics['total_entregas'] = delivery_stats.get('total_deliveries', 0)
+                        # Solo se necesita el conteo: consulta agregada en vez de cargar las entregas
+                        shift_metrics['total_entregas'] = stats_service.delivery_repository.count_by_shift_date(shift_date)
                     except Exception as stats_error:
                         try:
                             current_app.logger.warning(f"Error al obtener estadísticas en context processor: {stats_error}")
@@ -1360,6 +1404,46 @@ def create_app():
         except Exception as e:
             app.logger.debug(f"No se pudo leer configuración n8n desde SystemConfig: {e}")
 
+    # Worker de inventario por venta: procesa trabajos pendientes (incluidos los de antes de un reinicio)
+    if app.config.get('INVENTORY_APPLY_ON_SALE'):
+        try:
+            from app.helpers.sale_inventory_pipeline import get_sale_inventory_worker
+            get_sale_inventory_worker().start(app)
+        except Exception as e:
+            app.logger.warning(f"⚠️ No se pudo iniciar el worker de inventario por venta: {e}")
+
+    # Pregeneración de QR al crear TicketEntrega / Entrada (registra los eventos ORM)
+    try:
+        from app.helpers import qr_ticket_helper  # noqa: F401
+    except Exception as e:
+        app.logger.warning(f"⚠️ No se pudo registrar la pregeneración de QR de tickets: {e}")
+
+    # Índice de tickets QR pendientes para el escaneo en barra (registra los eventos ORM)
+    try:
+        from app.helpers import ticket_scan_index  # noqa: F401
+    except Exception as e:
+        app.logger.warning(f"⚠️ No se pudo registrar el índice de escaneo de tickets: {e}")
+
+    # Mapa de ocupación de clusters de guardarropía (registra los eventos ORM)
+    try:
+        from app.helpers import guardarropia_cluster_map  # noqa: F401
+    except Exception as e:
+        app.logger.warning(f"⚠️ No se pudo registrar el mapa de clusters de guardarropía: {e}")
+
+    # Contexto de venta por caja (registra los eventos ORM de invalidación)
+    try:
+        from app.helpers import register_sale_context  # noqa: F401
+    except Exception as e:
+        app.logger.warning(f"⚠️ No se pudo registrar el contexto de venta de cajas: {e}")
+
+    # Dispatcher del outbox de n8n: drena eventos pendientes (incluidos los de antes de un reinicio)
+    if not app.config.get('LOCAL_ONLY', True):
+        try:
+            from app.helpers.webhook_outbox import start_webhook_dispatcher
+            start_webhook_dispatcher(app)
+        except Exception as e:
+            app.logger.warning(f"⚠️ No se pudo iniciar el dispatcher de webhooks n8n: {e}")
+
     # Registrar filtros personalizados de Jinja2
     @app.template_filter('to_datetime')
     def to_datetime_filter(value):
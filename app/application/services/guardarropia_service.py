@@ -14,6 +14,7 @@ from app.application.dto.guardarropia_dto import (
     GuardarropiaStats
 )
 from app.models.guardarropia_models import GuardarropiaItem
+from app.helpers.guardarropia_cluster_map import get_cluster_map, parse_cluster_numbers
 from app.infrastructure.repositories.sql_guardarropia_repository import SqlGuardarropiaRepository
 from app.infrastructure.repositories.shift_repository import JsonShiftRepository
 
@@ -150,22 +151,22 @@ class GuardarropiaService:
                     # IMPORTANTE: Continuar guardando el item aunque falle la venta POS
                     # El item se guardará sin sale_id asociado
             
-            # Asignar clusters si no se proporcionaron
-            if not request.cluster_numbers:
-                # Obtener clusters disponibles automáticamente
-                available_clusters = self.get_available_clusters(count=request.clusters)
-                if len(available_clusters) < request.clusters:
-                    return False, f"No hay suficientes clusters disponibles. Disponibles: {len(available_clusters)}, Solicitados: {request.clusters}", None
-                request.cluster_numbers = ','.join(map(str, available_clusters[:request.clusters]))
-            
-            # Validar que los clusters no estén ocupados
-            occupied_clusters = self.get_occupied_cluster_numbers(shift_date=shift_date)
-            requested_clusters = [int(c.strip()) for c in request.cluster_numbers.split(',') if c.strip().isdigit()]
-            conflicting_clusters = [c for c in requested_clusters if c in occupied_clusters]
+            # Asignar (o validar) clusters: quedan reservados hasta confirmar el depósito
+            cluster_map = get_cluster_map()
+            requested = parse_cluster_numbers(request.cluster_numbers) if request.cluster_numbers else None
+            reserved_clusters, conflicting_clusters = cluster_map.reserve(
+                shift_date, count=request.clusters, requested=requested
+            )
             
             if conflicting_clusters:
                 return False, f"Los clusters {', '.join(map(str, conflicting_clusters))} ya están ocupados. Por favor, selecciona otros clusters.", None
             
+            if not requested:
+                if len(reserved_clusters) < request.clusters:
+                    return False, f"No hay suficientes clusters disponibles. Disponibles: {len(reserved_clusters)}, Solicitados: {request.clusters}", None
+                request.cluster_numbers = ','.join(map(str, reserved_clusters))
+            requested_clusters = reserved_clusters
+            
             # Generar código de ticket automáticamente
             # Formato: IDDIAMESCLUSTER (ejemplo: 110125)
             # ID: contador del día, DIA-MES: fecha, CLUSTER: primer cluster asignado
@@ -219,7 +220,17 @@ class GuardarropiaService:
             )
             
             # Guardar en BD - CRÍTICO: Asegurar que se guarde
-            if not self.repository.save(item):
+            # El mapa es por worker: los clusters se revalidan contra la BD en la misma transacción
+            saved, db_conflicts = self.repository.save_deposit(item, shift_date if requested else None)
+            if db_conflicts:
+                cluster_map.release(reserved_clusters)
+                cluster_map.mark_stale()
+                current_app.logger.warning(
+                    f"⚠️  Clusters {db_conflicts} ocupados por otro depósito concurrente - Ticket: {ticket_code}"
+                )
+                return False, f"Los clusters {', '.join(map(str, db_conflicts))} ya están ocupados. Por favor, selecciona otros clusters.", None
+            if not saved:
+                cluster_map.release(reserved_clusters)
                 current_app.logger.error(
                     f"❌ Error crítico: No se pudo guardar item en BD - "
                     f"Ticket: {ticket_code}, Cliente: {request.customer_name}"
@@ -521,25 +532,13 @@ class GuardarropiaService:
     
     def get_occupied_clusters(self) -> List[int]:
         """
-        Obtiene la lista de números de clusters ocupados.
+        Obtiene la lista de números de clusters ocupados (todos los turnos).
         
         Returns:
             Lista de números de clusters ocupados (ej: [1, 5, 10])
         """
         try:
-            from app.models import db
-            
-            # Obtener todos los items depositados (no retirados ni perdidos)
-            items = GuardarropiaItem.query.filter_by(status='deposited').all()
-            
-            occupied = set()
-            for item in items:
-                if item.cluster_numbers:
-                    # Parsear números de clusters (formato: "1,2,3" o "1, 2, 3")
-                    cluster_nums = [int(c.strip()) for c in item.cluster_numbers.split(',') if c.strip().isdigit()]
-                    occupied.update(cluster_nums)
-            
-            return sorted(list(occupied))
+            return get_cluster_map().occupied()
         except Exception as e:
             current_app.logger.error(f"Error al obtener clusters ocupados: {e}", exc_info=True)
             return []
@@ -556,30 +555,7 @@ class GuardarropiaService:
             Lista de números de clusters ocupados (ej: [1, 5, 10])
         """
         try:
-            from app.models import db
-            from sqlalchemy import or_
-            
-            # Obtener items depositados (no retirados ni perdidos) y NO eliminados
-            query = GuardarropiaItem.query.filter_by(status='deposited')
-            if shift_date:
-                query = query.filter_by(shift_date=shift_date)
-            # Excluir items eliminados (tienen [ELIMINADO] en notas)
-            query = query.filter(
-                or_(
-                    GuardarropiaItem.notes.is_(None),
-                    ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-                )
-            )
-            items = query.all()
-            
-            occupied = set()
-            for item in items:
-                if item.cluster_numbers:
-                    # Parsear números de clusters (formato: "1,2,3" o "1, 2, 3")
-                    cluster_nums = [int(c.strip()) for c in item.cluster_numbers.split(',') if c.strip().isdigit()]
-                    occupied.update(cluster_nums)
-            
-            return sorted(list(occupied))
+            return get_cluster_map().occupied(shift_date=shift_date)
         except Exception as e:
             current_app.logger.error(f"Error al obtener clusters ocupados: {e}", exc_info=True)
             return []
@@ -596,40 +572,7 @@ class GuardarropiaService:
             Dict con información: {cluster_num: [{'ticket_code': ..., 'customer_name': ..., ...}, ...]}
         """
         try:
-            from app.models import db
-            from sqlalchemy import or_
-            
-            # Obtener todos los items depositados y NO eliminados
-            query = GuardarropiaItem.query.filter_by(status='deposited')
-            if shift_date:
-                query = query.filter_by(shift_date=shift_date)
-            # Excluir items eliminados (tienen [ELIMINADO] en notas)
-            query = query.filter(
-                or_(
-                    GuardarropiaItem.notes.is_(None),
-                    ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-                )
-            )
-            items = query.all()
-            
-            cluster_info = {}
-            for item in items:
-                if item.cluster_numbers:
-                    # Parsear números de clusters
-                    cluster_nums = [int(c.strip()) for c in item.cluster_numbers.split(',') if c.strip().isdigit()]
-                    for cluster_num in cluster_nums:
-                        if cluster_num not in cluster_info:
-                            cluster_info[cluster_num] = []
-                        cluster_info[cluster_num].append({
-                            'ticket_code': item.ticket_code,
-                            'customer_name': item.customer_name or 'Sin nombre',
-                            'customer_phone': item.customer_phone or '-',
-                            'description': item.description or '-',
-                            'price': float(item.price) if item.price else 0,
-                            'deposited_at': item.deposited_at.isoformat() if item.deposited_at else None
-                        })
-            
-            return cluster_info
+            return get_cluster_map().cluster_info(shift_date=shift_date)
         except Exception as e:
             current_app.logger.error(f"Error al obtener información de clusters: {e}", exc_info=True)
             return {}
@@ -644,11 +587,7 @@ class GuardarropiaService:
         Returns:
             Lista de números de clusters disponibles
         """
-        occupied = set(self.get_occupied_clusters())
-        all_clusters = set(range(1, 91))  # Clusters del 1 al 90
-        available = sorted(list(all_clusters - occupied))
-        
-        return available[:count] if count > 0 else available
+        return get_cluster_map().available(count=count)
     
     def get_stats(
         self,
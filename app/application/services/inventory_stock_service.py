@@ -7,7 +7,7 @@ Maneja toda la lógica de negocio para el inventario de ingredientes:
 - Control de ubicaciones (barras, bodega)
 
 MEJORAS IMPLEMENTADAS:
-- Cache de recetas para mejorar rendimiento
+- Recetas compiladas en un grafo en memoria (recipe_graph)
 - Optimización de queries (batch loading)
 - Mapeo dinámico de ubicaciones desde PosRegister
 - Validación previa de stock
@@ -36,59 +36,23 @@ class InventoryStockService:
     Encapsula toda la lógica de negocio relacionada con ingredientes, recetas y movimientos.
     
     MEJORAS:
-    - Cache de recetas (TTL: 5 minutos)
+    - Recetas desde el grafo compilado (recipe_graph)
     - Batch loading de productos e ingredientes
     - Mapeo dinámico de ubicaciones
     - Validación previa de stock
     """
     
-    # Cache de recetas (se invalida cada 5 minutos)
-    _recipe_cache: Dict[int, Tuple[Recipe, datetime]] = {}
-    _cache_ttl = timedelta(minutes=5)
-    
     def __init__(self):
         """Inicializa el servicio"""
         pass
     
-    def _get_recipe_cached(self, product_id: int) -> Optional[Recipe]:
-        """
-        Obtiene receta con cache para mejorar rendimiento.
-        Cache se invalida automáticamente cada 5 minutos.
-        """
-        now = datetime.utcnow()
-        
-        # Verificar cache
-        if product_id in self._recipe_cache:
-            recipe, cached_time = self._recipe_cache[product_id]
-            if now - cached_time < self._cache_ttl:
-                return recipe
-            else:
-                # Cache expirado, eliminar
-                del self._recipe_cache[product_id]
-        
-        # Obtener de BD
-        recipe = Recipe.query.filter_by(
-            product_id=product_id,
-            is_active=True
-        ).options(
-            joinedload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient)
-        ).first()
-        
-        # Guardar en cache
-        if recipe:
-            self._recipe_cache[product_id] = (recipe, now)
-        
-        return recipe
-    
     def _invalidate_recipe_cache(self, product_id: Optional[int] = None):
         """
-        Invalida el cache de recetas.
-        Si product_id es None, invalida todo el cache.
+        Invalida las recetas compiladas (grafo de recetas).
+        El grafo también se invalida solo al confirmar cambios en recetas.
         """
-        if product_id:
-            self._recipe_cache.pop(product_id, None)
-        else:
-            self._recipe_cache.clear()
+        from app.application.services.recipe_graph import invalidate_recipe_graph
+        invalidate_recipe_graph()
     
     # ==========================================
     # GESTIÓN DE INGREDIENTES
@@ -262,10 +226,10 @@ class InventoryStockService:
         Este es el método principal que se llama cuando se confirma una venta.
         
         MEJORAS IMPLEMENTADAS:
-        - Cache de recetas para mejorar rendimiento
-        - Batch loading de productos e ingredientes (evita N+1 queries)
+        - Grafo compilado producto -> ingredientes (sin queries de recetas por venta)
+        - Consumo de toda la venta calculado en una pasada
+        - Un UPDATE de stock por ubicación y un INSERT masivo de movimientos
         - Mapeo dinámico de ubicaciones desde PosRegister
-        - Transacciones atómicas mejoradas
         
         Args:
             sale: Objeto PosSale con sus items
@@ -290,179 +254,302 @@ class InventoryStockService:
             if not location:
                 return False, "No se pudo determinar la ubicación para descontar inventario", []
             
-            # MEJORA: Batch loading de productos (evita N+1 queries)
-            product_ids = []
-            product_names = []
-            for sale_item in sale.items:
-                try:
-                    product_id_int = int(sale_item.product_id)
-                    product_ids.append(product_id_int)
-                except (ValueError, TypeError):
-                    product_names.append(sale_item.product_name)
-            
-            # Cargar todos los productos de una vez
-            products_dict = {}
-            if product_ids:
-                products = Product.query.filter(Product.id.in_(product_ids)).all()
-                products_dict.update({p.id: p for p in products})
-            
-            if product_names:
-                products_by_name = Product.query.filter(Product.name.in_(product_names)).all()
-                products_dict.update({p.name: p for p in products_by_name})
-            
-            # MEJORA: Pre-cargar todas las recetas necesarias
-            recipe_ids_to_load = set()
-            for sale_item in sale.items:
-                try:
-                    product_id_int = int(sale_item.product_id)
-                    product = products_dict.get(product_id_int)
-                except (ValueError, TypeError):
-                    product = products_dict.get(sale_item.product_name)
-                
-                if product and product.is_kit:
-                    recipe = self._get_recipe_cached(product.id)
-                    if recipe:
-                        recipe_ids_to_load.add(recipe.id)
-            
-            # Batch loading de ingredientes de recetas
-            recipe_ingredients_dict = {}
-            if recipe_ids_to_load:
-                recipe_ingredients = RecipeIngredient.query.filter(
-                    RecipeIngredient.recipe_id.in_(recipe_ids_to_load)
-                ).options(
-                    joinedload(RecipeIngredient.ingredient)
-                ).all()
-                
-                for ri in recipe_ingredients:
-                    if ri.recipe_id not in recipe_ingredients_dict:
-                        recipe_ingredients_dict[ri.recipe_id] = []
-                    recipe_ingredients_dict[ri.recipe_id].append(ri)
-            
-            consumos_aplicados = []
+            lines, consumos_aplicados = self._plan_sale_consumption(sale, location)
             
             # MEJORA: Usar transacción atómica con savepoint para rollback granular
             savepoint = db.session.begin_nested()
             
             try:
-                # Procesar cada item de la venta
-                for sale_item in sale.items:
-                    product_id = sale_item.product_id
-                    quantity_sold = sale_item.quantity
-                    
-                    # Obtener producto del dict pre-cargado
-                    try:
-                        product_id_int = int(product_id)
-                        product = products_dict.get(product_id_int)
-                    except (ValueError, TypeError):
-                        product = products_dict.get(sale_item.product_name)
-                    
-                    if not product:
-                        current_app.logger.warning(
-                            f"⚠️ Producto {product_id} ({sale_item.product_name}) no encontrado - saltando inventario"
-                        )
-                        continue
-                    
-                    # Verificar si el producto está marcado como kit
-                    from app.helpers.product_validation_helper import validate_product_has_recipe
-                    tiene_receta, mensaje_error, recipe_data = validate_product_has_recipe(product)
-                    
-                    if not product.is_kit:
-                        # Producto no usa receta (ej: entradas) - no afecta inventario
-                        continue
-                    
-                    if not tiene_receta:
-                        # Producto marcado como kit pero sin receta configurada
-                        current_app.logger.warning(
-                            f"⚠️ {mensaje_error or f'Producto {product.name} (ID: {product.id}) marcado como kit pero sin receta configurada'}"
-                        )
-                        continue
-                    
-                    # MEJORA: Obtener receta del cache
-                    recipe = self._get_recipe_cached(product.id)
-                    
-                    if not recipe:
-                        if recipe_data.get('system') == 'legacy':
-                            current_app.logger.warning(
-                                f"⚠️ Producto {product.name} tiene receta en sistema legacy pero no en sistema nuevo. "
-                                f"Por favor, migre la receta usando la interfaz de gestión."
-                            )
-                        continue
-                    
-                    # MEJORA: Obtener ingredientes del dict pre-cargado
-                    recipe_ingredients = recipe_ingredients_dict.get(recipe.id, [])
-                    
-                    if not recipe_ingredients:
-                        current_app.logger.warning(
-                            f"⚠️ Receta {recipe.id} no tiene ingredientes configurados"
-                        )
-                        continue
-                    
-                    # Procesar cada ingrediente de la receta
-                    for recipe_ingredient in recipe_ingredients:
-                        ingredient_id = recipe_ingredient.ingredient_id
-                        quantity_per_portion = recipe_ingredient.quantity_per_portion
-                        
-                        # Calcular consumo total: cantidad por porción * cantidad vendida
-                        total_consumption = float(quantity_per_portion) * quantity_sold
-                        
-                        # Descontar del stock
-                        success, message = self._consume_ingredient(
-                            ingredient_id=ingredient_id,
-                            location=location,
-                            quantity=total_consumption,
-                            reference_type='sale',
-                            reference_id=str(sale.id),
-                            user_id=sale.employee_id,
-                            user_name=sale.employee_name,
-                            reason=f"Venta #{sale.id}: {quantity_sold}x {product.name}"
-                        )
-                        
-                        if success:
-                            ingredient = recipe_ingredient.ingredient
-                            consumos_aplicados.append({
-                                'ingredient_id': ingredient_id,
-                                'ingredient_name': ingredient.name if ingredient else '?',
-                                'quantity_consumed': total_consumption,
-                                'unit': ingredient.base_unit if ingredient else 'ml',
-                                'product_name': product.name,
-                                'quantity_sold': quantity_sold
-                            })
-                        else:
-                            current_app.logger.warning(
-                                f"⚠️ No se pudo descontar {total_consumption} de ingrediente {ingredient_id}: {message}"
-                            )
-                
-                # Si hay consumos aplicados, confirmar savepoint
-                if consumos_aplicados:
-                    savepoint.commit()
-                    
-                    # Marcar venta como procesada
-                    sale.inventory_applied = True
-                    sale.inventory_applied_at = datetime.utcnow()
-                    db.session.commit()
-                    
-                    current_app.logger.info(
-                        f"✅ Inventario aplicado para venta #{sale.id}: {len(consumos_aplicados)} consumos"
-                    )
-                    return True, f"Inventario aplicado: {len(consumos_aplicados)} ingredientes consumidos", consumos_aplicados
-                else:
-                    # Aunque no haya consumos, marcar como procesado para evitar reintentos
-                    savepoint.commit()
-                    sale.inventory_applied = True
-                    sale.inventory_applied_at = datetime.utcnow()
-                    db.session.commit()
-                    return True, "Venta procesada (producto sin receta o sin ingredientes)", []
-                    
-            except Exception as e:
+                if lines:
+                    self._apply_consumption_lines(lines)
+                savepoint.commit()
+            except Exception:
                 # Rollback del savepoint en caso de error
                 savepoint.rollback()
                 raise
             
+            # Marcar venta como procesada (aunque no haya consumos, para evitar reintentos)
+            sale.inventory_applied = True
+            sale.inventory_applied_at = datetime.utcnow()
+            db.session.commit()
+            
+            if consumos_aplicados:
+                current_app.logger.info(
+                    f"✅ Inventario aplicado para venta #{sale.id}: {len(consumos_aplicados)} consumos"
+                )
+                return True, f"Inventario aplicado: {len(consumos_aplicados)} ingredientes consumidos", consumos_aplicados
+            return True, "Venta procesada (producto sin receta o sin ingredientes)", []
+            
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Error al aplicar inventario para venta: {e}", exc_info=True)
             return False, f"Error al aplicar inventario: {str(e)}", []
     
+    def apply_inventory_for_sales(
+        self,
+        sales: List[PosSale],
+        locations: Optional[Dict[int, Optional[str]]] = None
+    ) -> Tuple[List[int], Dict[int, str]]:
+        """
+        Aplica el consumo de inventario de varias ventas en una sola transacción.
+        
+        El stock de todo el lote se descuenta con un UPDATE por ubicación. Las
+        ventas se bloquean (SELECT ... FOR UPDATE) y solo se procesan las que aún
+        no tienen inventory_applied, así que nunca se descuenta dos veces.
+        
+        Una venta cuyo consumo no se puede calcular queda con error sin afectar
+        al resto; si falla la transacción del lote, se reintenta venta por venta
+        para que una venta mala no arrastre a las demás.
+        
+        Args:
+            sales: Ventas a procesar (con sus items)
+            locations: Ubicación forzada por ID de venta (opcional)
+        
+        Returns:
+            Tuple[List[int], Dict[int, str]]: (IDs aplicados, errores por ID de venta)
+        """
+        from sqlalchemy import select, update
+        
+        locations = locations or {}
+        errors: Dict[int, str] = {}
+        if not sales:
+            return [], errors
+        
+        try:
+            pending_ids = set(db.session.execute(
+                select(PosSale.id)
+                .where(and_(PosSale.id.in_([sale.id for sale in sales]), PosSale.inventory_applied == False))
+                .with_for_update()
+            ).scalars())
+            
+            register_locations: Dict[str, Optional[str]] = {}
+            lines: List[Dict[str, Any]] = []
+            applied_ids: List[int] = []
+            for sale in sales:
+                if sale.id not in pending_ids:
+                    continue
+                location = locations.get(sale.id)
+                if not location:
+                    if sale.register_id not in register_locations:
+                        register_locations[sale.register_id] = self._get_location_from_register(sale.register_id)
+                    location = register_locations[sale.register_id]
+                if not location:
+                    errors[sale.id] = "No se pudo determinar la ubicación para descontar inventario"
+                    continue
+                try:
+                    sale_lines, _ = self._plan_sale_consumption(sale, location)
+                except Exception as e:
+                    current_app.logger.error(f"Error al calcular consumo de venta #{sale.id}: {e}", exc_info=True)
+                    errors[sale.id] = f"Error al calcular consumo: {str(e)}"
+                    continue
+                lines.extend(sale_lines)
+                applied_ids.append(sale.id)
+            
+            if lines:
+                self._apply_consumption_lines(lines)
+            if applied_ids:
+                db.session.execute(
+                    update(PosSale.__table__)
+                    .where(PosSale.__table__.c.id.in_(applied_ids))
+                    .values(inventory_applied=True, inventory_applied_at=datetime.utcnow())
+                )
+            db.session.commit()
+            
+            if applied_ids:
+                current_app.logger.info(
+                    f"✅ Inventario aplicado en lote: {len(applied_ids)} ventas, {len(lines)} consumos"
+                )
+            return applied_ids, errors
+            
+        except Exception as e:
+            db.session.rollback()
+            if len(sales) > 1:
+                current_app.logger.warning(f"Error al aplicar inventario en lote, reintentando venta por venta: {e}")
+                applied_ids, errors = [], {}
+                for sale in sales:
+                    sale_applied, sale_errors = self.apply_inventory_for_sales([sale], locations)
+                    applied_ids.extend(sale_applied)
+                    errors.update(sale_errors)
+                return applied_ids, errors
+            current_app.logger.error(f"Error al aplicar inventario de la venta #{sales[0].id}: {e}", exc_info=True)
+            return [], {sales[0].id: f"Error al aplicar inventario: {str(e)}"}
+    
+    def _plan_sale_consumption(
+        self,
+        sale: PosSale,
+        location: str
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Calcula en memoria (grafo de recetas compilado) todo el consumo de una venta.
+        
+        Returns:
+            Tuple[List[Dict], List[Dict]]: (líneas de consumo para _apply_consumption_lines,
+                                            consumos aplicados en el formato de apply_inventory_for_sale)
+        """
+        from app.application.services.recipe_graph import (
+            get_recipe_graph, STATUS_OK, STATUS_NOT_KIT, STATUS_LEGACY, STATUS_EMPTY
+        )
+        
+        graph = get_recipe_graph()
+        turno_id = self._get_turno_id(sale.employee_id, location)
+        lines = []
+        consumos_aplicados = []
+        
+        for sale_item in sale.items:
+            quantity_sold = sale_item.quantity
+            product = graph.resolve(sale_item.product_id, sale_item.product_name)
+            
+            if not product:
+                current_app.logger.warning(
+                    f"⚠️ Producto {sale_item.product_id} ({sale_item.product_name}) no encontrado - saltando inventario"
+                )
+                continue
+            
+            if product.status == STATUS_NOT_KIT:
+                # Producto no usa receta (ej: entradas) - no afecta inventario
+                continue
+            
+            if product.status != STATUS_OK:
+                if product.status == STATUS_LEGACY:
+                    current_app.logger.warning(
+                        f"⚠️ Producto {product.name} tiene receta en sistema legacy pero no en sistema nuevo. "
+                        f"Por favor, migre la receta usando la interfaz de gestión."
+                    )
+                elif product.status == STATUS_EMPTY:
+                    current_app.logger.warning(
+                        f"⚠️ Receta {product.recipe_id} no tiene ingredientes configurados"
+                    )
+                else:
+                    current_app.logger.warning(
+                        f"⚠️ Producto {product.name} (ID: {product.product_id}) marcado como kit pero sin receta configurada"
+                    )
+                continue
+            
+            for component in product.components:
+                # Consumo total: cantidad por porción * cantidad vendida
+                total_consumption = component.quantity_per_portion * Decimal(str(quantity_sold))
+                if total_consumption <= 0:
+                    continue
+                lines.append({
+                    'ingredient_id': component.ingredient_id,
+                    'location': location,
+                    'quantity': total_consumption,
+                    'reference_type': 'sale',
+                    'reference_id': str(sale.id),
+                    'turno_id': turno_id,
+                    'user_id': sale.employee_id,
+                    'user_name': sale.employee_name,
+                    'reason': f"Venta #{sale.id}: {quantity_sold}x {product.name}"
+                })
+                consumos_aplicados.append({
+                    'ingredient_id': component.ingredient_id,
+                    'ingredient_name': component.ingredient_name,
+                    'quantity_consumed': float(total_consumption),
+                    'unit': component.unit,
+                    'product_name': product.name,
+                    'quantity_sold': quantity_sold
+                })
+        
+        return lines, consumos_aplicados
+    
+    def _get_turno_id(self, user_id: Optional[str], location: str) -> Optional[int]:
+        """Turno de bartender abierto para el usuario en la ubicación (para asociar movimientos)"""
+        if not user_id:
+            return None
+        try:
+            from app.helpers.turnos_bartender import get_turnos_bartender_helper
+            turnos_helper = get_turnos_bartender_helper()
+            # Mapear location a formato de ubicación del turno
+            ubicacion_turno = location.lower().replace('barra ', 'barra_')
+            turno_abierto = turnos_helper.get_turno_abierto(user_id, ubicacion_turno)
+            return turno_abierto.id if turno_abierto else None
+        except Exception as e:
+            current_app.logger.warning(f"Error al obtener turno_id para movimiento: {e}")
+            return None
+    
+    def _apply_consumption_lines(self, lines: List[Dict[str, Any]]) -> None:
+        """
+        Aplica líneas de consumo en bloque (sin commit).
+        
+        Por cada ubicación: un SELECT ... FOR UPDATE de las filas de stock
+        involucradas y un único UPDATE quantity = quantity - x (CASE por fila).
+        Todos los InventoryMovement se insertan en un solo INSERT masivo.
+        Se permite stock negativo (control de fugas), con advertencia en el motivo.
+        """
+        from sqlalchemy import select, update, insert, case
+        
+        stock_table = IngredientStock.__table__
+        totals: Dict[str, Dict[int, Decimal]] = {}
+        for line in lines:
+            per_location = totals.setdefault(line['location'], {})
+            per_location[line['ingredient_id']] = per_location.get(line['ingredient_id'], Decimal('0')) + line['quantity']
+        
+        shortages: Dict[Tuple[str, int], Decimal] = {}
+        for location, per_ingredient in totals.items():
+            ingredient_ids = list(per_ingredient)
+            rows = db.session.execute(
+                select(stock_table.c.id, stock_table.c.ingredient_id, stock_table.c.quantity)
+                .where(and_(stock_table.c.location == location, stock_table.c.ingredient_id.in_(ingredient_ids)))
+                .order_by(stock_table.c.id)
+                .with_for_update()
+            ).all()
+            stock_rows: Dict[int, Tuple[int, Decimal]] = {}
+            for stock_id, ingredient_id, quantity in rows:
+                stock_rows.setdefault(ingredient_id, (stock_id, Decimal(str(quantity or 0))))
+            
+            for ingredient_id in ingredient_ids:
+                if ingredient_id in stock_rows:
+                    continue
+                # Si no hay stock registrado, crear con cantidad 0 y permitir negativo
+                # (esto permite registrar ventas aunque no haya stock inicial)
+                stock = IngredientStock(ingredient_id=ingredient_id, location=location, quantity=Decimal('0.0'))
+                db.session.add(stock)
+                db.session.flush()
+                stock_rows[ingredient_id] = (stock.id, Decimal('0.0'))
+                current_app.logger.warning(
+                    f"⚠️ Stock no existía para ingrediente {ingredient_id} @ {location}, creado con 0"
+                )
+            
+            for ingredient_id, required in per_ingredient.items():
+                available = stock_rows[ingredient_id][1]
+                if available < required:
+                    shortages[(location, ingredient_id)] = available
+                    current_app.logger.warning(
+                        f"⚠️ STOCK INSUFICIENTE: ingrediente {ingredient_id} @ {location} - "
+                        f"Disponible: {available:.3f}, Requerido: {required:.3f}, "
+                        f"Déficit: {required - available:.3f}"
+                    )
+            
+            # Descontar (permitir negativo para control de fugas)
+            decrements = {stock_rows[ingredient_id][0]: quantity for ingredient_id, quantity in per_ingredient.items()}
+            db.session.execute(
+                update(stock_table)
+                .where(stock_table.c.id.in_(list(decrements)))
+                .values(quantity=stock_table.c.quantity - case(decrements, value=stock_table.c.id, else_=0))
+            )
+        
+        movements = []
+        for line in lines:
+            reason = line.get('reason') or "Consumo por venta"
+            available = shortages.get((line['location'], line['ingredient_id']))
+            if available is not None:
+                reason = f"{reason} [⚠️ STOCK INSUFICIENTE: {available:.3f} disponible]"
+            movements.append({
+                'ingredient_id': line['ingredient_id'],
+                'location': line['location'],
+                'movement_type': InventoryMovement.TYPE_SALE,
+                'quantity': -line['quantity'],  # Negativo = salida
+                'reference_type': line.get('reference_type'),
+                'reference_id': line.get('reference_id'),
+                'turno_id': line.get('turno_id'),
+                'user_id': line.get('user_id'),
+                'user_name': line.get('user_name'),
+                'reason': reason,
+                'created_at': datetime.utcnow()
+            })
+        if movements:
+            db.session.execute(insert(InventoryMovement.__table__), movements)
+    
     def validate_stock_availability(
         self,
         cart: List[Dict[str, Any]],
@@ -487,69 +574,20 @@ class InventoryStockService:
         if not location:
             return False, [{'error': 'No se pudo determinar la ubicación'}]
         
-        # Obtener todos los productos de una vez
-        product_ids = []
-        for item in cart:
-            try:
-                product_ids.append(int(item.get('product_id')))
-            except (ValueError, TypeError):
-                pass
+        # Todo el carrito en lote: catálogo + grafo de recetas + una consulta agregada de stock
+        from app.helpers.cart_validator import validate_cart
         
-        if not product_ids:
+        cart_lines = [item for item in cart if str(item.get('product_id') or '').isdigit()]
+        if not cart_lines:
             return True, []  # No hay productos con ID válido
         
-        products = Product.query.filter(Product.id.in_(product_ids)).all()
-        products_dict = {p.id: p for p in products}
-        
-        issues = []
-        
-        for item in cart:
-            try:
-                product_id = int(item.get('product_id'))
-                product = products_dict.get(product_id)
-                
-                if not product or not product.is_kit:
-                    continue
-                
-                quantity_sold = float(item.get('quantity', 1))
-                
-                # Obtener receta
-                recipe = self._get_recipe_cached(product.id)
-                if not recipe:
-                    continue
-                
-                # Obtener ingredientes de la receta
-                recipe_ingredients = RecipeIngredient.query.filter_by(
-                    recipe_id=recipe.id
-                ).options(
-                    joinedload(RecipeIngredient.ingredient)
-                ).all()
-                
-                for recipe_ingredient in recipe_ingredients:
-                    ingredient_id = recipe_ingredient.ingredient_id
-                    quantity_per_portion = float(recipe_ingredient.quantity_per_portion)
-                    required = quantity_per_portion * quantity_sold
-                    
-                    # Obtener stock actual
-                    stock = self.get_stock(ingredient_id, location)
-                    available = float(stock.quantity) if stock else 0.0
-                    
-                    if available < required:
-                        ingredient = recipe_ingredient.ingredient
-                        issues.append({
-                            'product_id': product_id,
-                            'product_name': product.name,
-                            'ingredient_id': ingredient_id,
-                            'ingredient_name': ingredient.name if ingredient else '?',
-                            'required': required,
-                            'available': available,
-                            'deficit': required - available,
-                            'unit': ingredient.base_unit if ingredient else 'ml'
-                        })
-            except Exception as e:
-                current_app.logger.warning(f"Error al validar stock para item: {e}")
-                continue
+        try:
+            verdict = validate_cart(cart_lines, location=location, check_prices=False)
+        except Exception as e:
+            current_app.logger.warning(f"Error al validar stock del carrito: {e}")
+            return True, []
         
+        issues = verdict.stock_issues
         return len(issues) == 0, issues
     
     def _consume_ingredient(
@@ -585,6 +585,10 @@ class JornadaService:
             current_app.logger.info(f"📋 Planilla encontrada: {len(PlanillaTrabajador.query.filter_by(jornada_id=jornada_id).all())} trabajadores para jornada {jornada_id} - Turnos se crearán al cerrar la jornada")
             db.session.commit()
             
+            # El monitor de cajas reconstruye sus agregados para la nueva jornada
+            from app.helpers.register_sales_aggregator import invalidate_register_sales_scope
+            invalidate_register_sales_scope()
+            
             # Verificar que los EmployeeShift se guardaron correctamente
             from app.models.employee_shift_models import EmployeeShift
             shifts_guardados = EmployeeShift.query.filter_by(jornada_id=jornada_id).all()
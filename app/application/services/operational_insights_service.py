@@ -6,6 +6,7 @@ import os
 import requests
 from typing import Optional, Dict, Any
 from flask import current_app
+from app.infrastructure.external.http_client import get_http_client
 
 
 class OperationalInsightsService:
@@ -59,7 +60,7 @@ class OperationalInsightsService:
             }
             
             # Timeout más corto (2 segundos) - si es lento, mejor no usar esos datos
-            response = requests.get(url, headers=headers, timeout=2)
+            response = get_http_client().get(url, headers=headers, timeout=2, retries=0)
             
             if response.status_code != 200:
                 return None
@@ -0,0 +1,369 @@
+"""
+Catálogo indexado de productos (nombre -> categoría)
+
+Índice compartido por proceso, construido desde la tabla Product (y desde la
+API POS si está habilitada), con búsquedas O(1):
+- nombre exacto
+- nombre normalizado (minúsculas, sin tildes ni puntuación, espacios colapsados)
+- prefijo de tokens (ej: "mojito" -> "Mojito Frutilla", "mojito doble" -> "Mojito")
+
+Se actualiza incrementalmente: los cambios ORM de productos se aplican al
+índice local al hacer commit, y los de otros workers se recogen con una
+consulta delta por updated_at.
+"""
+from typing import Dict, Optional, Tuple, Any, List, Set, Callable, FrozenSet
+from dataclasses import dataclass, replace
+from datetime import datetime
+import re
+import threading
+import time
+import unicodedata
+import logging
+
+from app.infrastructure.cache import get_cache_manager
+from app.infrastructure.session_changes import watch, KIND_DELETED
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = 'product_catalog'
+GENERATION_KEY = 'generation'
+
+get_cache_manager().register_namespace(CACHE_NAMESPACE, 7 * 24 * 3600, max_entries=4)
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """'  Piña Colada (500cc) ' -> 'pina colada 500cc'"""
+    if not name:
+        return ''
+    text = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def clean_category(categoria_raw: Optional[str]) -> Optional[str]:
+    """Limpia la categoría: "Barra > Cervezas" -> "Cervezas", "Puerta" -> "Entradas", "Ninguno" -> "Otros" """
+    if not categoria_raw:
+        return None
+    if ' > ' in categoria_raw:
+        categoria = categoria_raw.split(' > ')[-1].strip()
+    elif categoria_raw == 'Puerta':
+        categoria = 'Entradas'
+    elif categoria_raw == 'Ninguno':
+        categoria = 'Otros'
+    else:
+        categoria = categoria_raw.strip()
+    if not categoria or categoria == 'Ninguno':
+        categoria = 'Otros'
+    return categoria
+
+
+class ProductCatalogIndex:
+    """
+    Índice nombre -> categoría.
+
+    Las entradas se identifican por clave ('local', id) o ('pos', nombre); los
+    productos locales tienen prioridad sobre los de la API POS con el mismo nombre.
+    """
+
+    FULL_REBUILD_INTERVAL = 1800  # Reconstrucción completa (recoge borrados hechos fuera del ORM)
+    DELTA_INTERVAL = 60           # Consulta delta de productos modificados por otros workers
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: Dict[Tuple[str, Any], Tuple[str, Optional[str]]] = {}  # clave -> (nombre, categoría)
+        self._exact: Dict[str, Set[Tuple[str, Any]]] = {}
+        self._normalized: Dict[str, Set[Tuple[str, Any]]] = {}
+        self._prefixes: Dict[str, Set[Tuple[str, Any]]] = {}
+        self._lookup_memo: Dict[str, Optional[str]] = {}
+        self._built_at = 0.0
+        self._last_delta = 0.0
+        self._high_water: Optional[datetime] = None
+        self._generation: Optional[int] = None
+        self._stats = {'full_builds': 0, 'delta_refreshes': 0, 'incremental_updates': 0, 'lookups': 0, 'memo_hits': 0}
+
+    # ------------------------------------------------------------------
+    # Índices
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _prefixes_of(normalized: str) -> List[str]:
+        tokens = normalized.split()
+        return [' '.join(tokens[:i]) for i in range(1, len(tokens) + 1)]
+
+    def _index(self, key, name: str, category: Optional[str]) -> None:
+        self._unindex(key)
+        self._entries[key] = (name, category)
+        normalized = normalize_name(name)
+        self._exact.setdefault(name, set()).add(key)
+        if normalized:
+            self._normalized.setdefault(normalized, set()).add(key)
+            for prefix in self._prefixes_of(normalized):
+                self._prefixes.setdefault(prefix, set()).add(key)
+
+    def _unindex(self, key) -> None:
+        previous = self._entries.pop(key, None)
+        if not previous:
+            return
+        name = previous[0]
+        normalized = normalize_name(name)
+        buckets = [(self._exact, name), (self._normalized, normalized)]
+        buckets += [(self._prefixes, prefix) for prefix in self._prefixes_of(normalized)]
+        for index, bucket_key in buckets:
+            keys = index.get(bucket_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[bucket_key]
+
+    def _pick(self, keys: Set[Tuple[str, Any]]) -> Optional[str]:
+        """Elige de forma determinista: productos locales primero, luego el nombre más corto"""
+        if not keys:
+            return None
+        best = min(keys, key=lambda k: (k[0] != 'local', len(self._entries[k][0]), str(k[1])))
+        return self._entries[best][1]
+
+    # ------------------------------------------------------------------
+    # Construcción y actualización
+    # ------------------------------------------------------------------
+    def _load_pos_items(self) -> List[Dict[str, Any]]:
+        """Items de la API POS (solo si está configurada)"""
+        from flask import current_app
+        api_key = current_app.config.get('API_KEY')
+        if not api_key:
+            return []
+        base_url = current_app.config.get('BASE_API_URL', 'https://clubbb.phppointofsale.com/index.php/api/v1')
+        try:
+            from app.infrastructure.external.http_client import get_http_client
+            response = get_http_client().get(
+                f"{base_url}/items",
+                headers={"x-api-key": api_key, "accept": "application/json"},
+                params={"limit": 1000},
+                timeout=10
+            )
+            if response.status_code == 200:
+                return response.json() or []
+        except Exception as e:
+            logger.warning(f"Error al obtener items desde API: {e}")
+        return []
+
+    def rebuild(self) -> None:
+        """Reconstrucción completa desde Product (+ API POS)"""
+        from app.models import db
+        from app.models.product_models import Product
+
+        rows = db.session.query(Product.id, Product.name, Product.category, Product.updated_at).all()
+        pos_items = self._load_pos_items()
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._normalized.clear()
+            self._prefixes.clear()
+            self._lookup_memo.clear()
+            for item in pos_items:
+                name = (item.get('name') or '').strip()
+                if name:
+                    self._index(('pos', name), name, clean_category(item.get('category') or item.get('category_name')))
+            high_water = None
+            for product_id, name, category, updated_at in rows:
+                if name:
+                    self._index(('local', product_id), name, clean_category(category))
+                if updated_at and (high_water is None or updated_at > high_water):
+                    high_water = updated_at
+            self._high_water = high_water
+            self._built_at = self._last_delta = time.time()
+            self._generation = get_cache_manager().get(CACHE_NAMESPACE, GENERATION_KEY, 0)
+            self._stats['full_builds'] += 1
+        logger.info(f"Catálogo de productos indexado: {len(rows)} locales, {len(pos_items)} de API POS")
+
+    def _refresh_delta(self) -> None:
+        """Aplica los productos modificados desde el último high-water mark"""
+        from app.models import db
+        from app.models.product_models import Product
+
+        query = db.session.query(Product.id, Product.name, Product.category, Product.updated_at)
+        if self._high_water is not None:
+            query = query.filter(Product.updated_at > self._high_water)
+        rows = query.all()
+        with self._lock:
+            for product_id, name, category, updated_at in rows:
+                self.apply_change(product_id, name, category)
+                if updated_at and (self._high_water is None or updated_at > self._high_water):
+                    self._high_water = updated_at
+            self._last_delta = time.time()
+            self._generation = get_cache_manager().get(CACHE_NAMESPACE, GENERATION_KEY, 0)
+            self._stats['delta_refreshes'] += 1
+
+    def apply_change(self, product_id: int, name: Optional[str], category: Optional[str], deleted: bool = False) -> None:
+        """Actualización incremental de un producto local"""
+        with self._lock:
+            key = ('local', product_id)
+            if deleted or not name:
+                if key not in self._entries:
+                    return
+                self._unindex(key)
+            else:
+                category = clean_category(category)
+                if self._entries.get(key) == (name, category):
+                    return  # Sin cambios visibles (ej: solo cambió el stock): conservar el memo
+                self._index(key, name, category)
+            self._lookup_memo.clear()
+            self._stats['incremental_updates'] += 1
+
+    def _ensure_fresh(self) -> None:
+        now = time.time()
+        if self._built_at == 0.0 or now - self._built_at >= self.FULL_REBUILD_INTERVAL:
+            self.rebuild()
+            return
+        generation = get_cache_manager().get(CACHE_NAMESPACE, GENERATION_KEY, 0)
+        if generation != self._generation or now - self._last_delta >= self.DELTA_INTERVAL:
+            self._refresh_delta()
+
+    # ------------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------------
+    def _resolve(self, item_name: str) -> Optional[str]:
+        keys = self._exact.get(item_name)
+        if keys:
+            return self._pick(keys)
+        normalized = normalize_name(item_name)
+        if not normalized:
+            return None
+        keys = self._normalized.get(normalized)
+        if keys:
+            return self._pick(keys)
+        # El nombre buscado es prefijo de productos del catálogo ("mojito" -> "mojito frutilla")
+        keys = self._prefixes.get(normalized)
+        if keys:
+            return self._pick(keys)
+        # Un producto del catálogo es prefijo del nombre buscado ("mojito doble" -> "mojito")
+        for prefix in reversed(self._prefixes_of(normalized)[:-1]):
+            keys = self._normalized.get(prefix)
+            if keys:
+                return self._pick(keys)
+        return None
+
+    def get_category(self, item_name: str) -> Optional[str]:
+        """Categoría (limpia) de un producto por nombre, o None si no está en el catálogo"""
+        if not item_name:
+            return None
+        self._ensure_fresh()
+        with self._lock:
+            self._stats['lookups'] += 1
+            if item_name in self._lookup_memo:
+                self._stats['memo_hits'] += 1
+                return self._lookup_memo[item_name]
+            category = self._resolve(item_name)
+            self._lookup_memo[item_name] = category
+            return category
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'memoized': len(self._lookup_memo),
+                'age_seconds': round(time.time() - self._built_at, 1) if self._built_at else None
+            }
+
+
+_catalog = ProductCatalogIndex()
+
+
+def get_product_catalog() -> ProductCatalogIndex:
+    """Catálogo de productos indexado (uno por proceso, compartido por todos los StatsService)"""
+    return _catalog
+
+
+# ----------------------------------------------------------------------
+# Actualización incremental: feed único de cambios ORM de productos
+# ----------------------------------------------------------------------
+# Atributos que usa el índice (stock_quantity cambia en cada venta y no debe invalidar)
+_WATCHED_ATTRS = ('name', 'category', 'is_active')
+
+
+@dataclass(frozen=True)
+class ProductChange:
+    """Cambio confirmado de un Product"""
+    product_id: int
+    name: Optional[str]
+    category: Optional[str]
+    deleted: bool
+    changed: FrozenSet[str]  # Atributos modificados (vacío en altas y bajas)
+
+    def touches(self, attrs: Optional[FrozenSet[str]]) -> bool:
+        return attrs is None or not self.changed or bool(self.changed & attrs)
+
+
+# (atributos, callback) de otros caches que dependen de Product (catálogo POS, grafo de recetas)
+_product_listeners: List[Tuple[Optional[FrozenSet[str]], Callable[[List[ProductChange]], None]]] = []
+
+
+def _collect_product_change(obj, kind: str, changed: FrozenSet[str]) -> Optional[ProductChange]:
+    if obj.id is None:
+        return None
+    return ProductChange(obj.id, obj.name, obj.category, kind == KIND_DELETED, changed)
+
+
+def _merge_product_changes(changes: List[ProductChange]) -> List[ProductChange]:
+    """Un cambio por producto (varios flush en la misma transacción)"""
+    merged: Dict[int, ProductChange] = {}
+    for change in changes:
+        previous = merged.get(change.product_id)
+        if previous is not None and previous.changed and change.changed:
+            change = replace(change, changed=previous.changed | change.changed)
+        elif previous is not None:
+            change = replace(change, changed=frozenset())
+        merged[change.product_id] = change
+    return list(merged.values())
+
+
+def _apply_product_changes(changes: List[ProductChange]) -> None:
+    changes = _merge_product_changes(changes)
+    own = [change for change in changes if change.touches(frozenset(_WATCHED_ATTRS))]
+    if own:
+        try:
+            # Solo tocar el índice si ya fue construido (si no, se construye completo al usarlo)
+            if _catalog.get_stats()['age_seconds'] is not None:
+                for change in own:
+                    _catalog.apply_change(change.product_id, change.name, change.category, change.deleted)
+            manager = get_cache_manager()
+            manager.set(CACHE_NAMESPACE, GENERATION_KEY, manager.get(CACHE_NAMESPACE, GENERATION_KEY, 0) + 1)
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar el catálogo de productos: {e}")
+    for attrs, callback in _product_listeners:
+        relevant = [change for change in changes if change.touches(attrs)]
+        if not relevant:
+            continue
+        try:
+            callback(relevant)
+        except Exception as e:
+            logger.warning(f"Error en listener de cambios de productos {getattr(callback, '__name__', callback)}: {e}")
+
+
+def _product_models():
+    from app.models.product_models import Product
+    return (Product,)
+
+
+_product_feed = watch(
+    'products',
+    models=_product_models,
+    apply=_apply_product_changes,
+    collect=_collect_product_change,
+    attrs=_WATCHED_ATTRS
+)
+
+
+def on_product_changes(callback: Callable[[List[ProductChange]], None],
+                       attrs: Optional[Tuple[str, ...]] = None) -> Callable[[List[ProductChange]], None]:
+    """
+    Suscribe callback a los cambios confirmados de Product (altas, bajas y
+    modificaciones de `attrs`; None = cualquier atributo).
+    """
+    watched = frozenset(attrs) if attrs is not None else None
+    _product_listeners.append((watched, callback))
+    if watched is None or _product_feed.attrs is None:
+        _product_feed.attrs = None
+    else:
+        _product_feed.attrs = _product_feed.attrs | watched
+    return callback
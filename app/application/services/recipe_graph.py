@@ -0,0 +1,220 @@
+"""
+Grafo compilado producto -> consumo de ingredientes
+
+Reemplaza, en el camino de cada venta, la validación de receta, la búsqueda
+de la receta y el join de RecipeIngredient por un diccionario en memoria.
+Se recompila solo cuando cambian productos o recetas (eventos del ORM que
+incrementan una generación compartida) o, como respaldo, cada MAX_AGE.
+"""
+from typing import Dict, Optional, Tuple, Any, List
+from dataclasses import dataclass
+from decimal import Decimal
+import threading
+import time
+import logging
+
+from app.infrastructure.cache import get_cache_manager
+from app.infrastructure.session_changes import watch, KIND_DIRTY
+from app.application.services.product_catalog import on_product_changes
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = 'recipe_graph'
+GENERATION_KEY = 'generation'
+
+get_cache_manager().register_namespace(CACHE_NAMESPACE, 7 * 24 * 3600, max_entries=4)
+
+# Estados de un producto compilado
+STATUS_OK = 'ok'                  # Kit con receta e ingredientes
+STATUS_NOT_KIT = 'not_kit'        # No usa receta (ej: entradas), no afecta inventario
+STATUS_NO_RECIPE = 'no_recipe'    # Kit sin receta en el sistema nuevo
+STATUS_LEGACY = 'legacy'          # Kit con receta solo en el sistema legacy
+STATUS_EMPTY = 'empty'            # Receta sin ingredientes
+
+
+@dataclass(frozen=True)
+class RecipeComponent:
+    """Ingrediente de una receta con su consumo por porción"""
+    ingredient_id: int
+    quantity_per_portion: Decimal
+    ingredient_name: str
+    unit: str
+
+
+@dataclass(frozen=True)
+class CompiledProduct:
+    """Producto compilado: estado de su receta y consumo por unidad vendida"""
+    product_id: int
+    name: str
+    status: str
+    recipe_id: Optional[int] = None
+    components: Tuple[RecipeComponent, ...] = ()
+
+
+class RecipeGraph:
+    """Mapa inmutable producto -> consumo, indexado por id y por nombre"""
+
+    def __init__(self, products: Dict[int, CompiledProduct], generation: int):
+        self.by_id = products
+        self.by_name = {product.name: product for product in products.values()}
+        self.generation = generation
+        self.built_at = time.time()
+
+    def resolve(self, product_id: Any, product_name: Optional[str] = None) -> Optional[CompiledProduct]:
+        """Busca un producto por id (si es numérico) o por nombre, igual que el flujo de ventas"""
+        try:
+            return self.by_id.get(int(product_id))
+        except (ValueError, TypeError):
+            return self.by_name.get(product_name)
+
+    @classmethod
+    def compile(cls, generation: int) -> 'RecipeGraph':
+        """Compila el grafo completo con 4 queries (productos, recetas, ingredientes y legacy)"""
+        from app.models import db
+        from app.models.product_models import Product
+        from app.models.inventory_stock_models import Recipe, RecipeIngredient, Ingredient
+        from app.models.recipe_models import ProductRecipe
+
+        products = db.session.query(Product.id, Product.name, Product.is_kit).all()
+        # Una receta activa por producto (recipes.product_id es único). Si una BD
+        # antigua tiene duplicados, gana la de menor id, como el .first() anterior
+        recipes: Dict[int, int] = {}
+        for product_id, recipe_id in db.session.query(Recipe.product_id, Recipe.id).filter(
+            Recipe.is_active == True
+        ).order_by(Recipe.id).all():
+            recipes.setdefault(product_id, recipe_id)
+        components: Dict[int, List[RecipeComponent]] = {}
+        rows = db.session.query(
+            RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id,
+            RecipeIngredient.quantity_per_portion, Ingredient.id, Ingredient.name, Ingredient.base_unit
+        ).outerjoin(
+            Ingredient, Ingredient.id == RecipeIngredient.ingredient_id
+        ).filter(
+            RecipeIngredient.recipe_id.in_(list(recipes.values()) or [-1])
+        ).order_by(RecipeIngredient.recipe_id, RecipeIngredient.id).all()
+        for recipe_id, ingredient_id, quantity, found_id, ingredient_name, unit in rows:
+            if found_id is None:
+                # Ingrediente eliminado: se omite (insertar su movimiento fallaría por FK)
+                logger.warning(f"Receta {recipe_id}: ingrediente {ingredient_id} no encontrado, se omite")
+                continue
+            components.setdefault(recipe_id, []).append(RecipeComponent(
+                ingredient_id=ingredient_id,
+                quantity_per_portion=Decimal(str(quantity)),
+                ingredient_name=ingredient_name or '?',
+                unit=unit or 'ml'
+            ))
+        legacy_ids = {
+            product_id for (product_id,) in db.session.query(ProductRecipe.product_id).distinct().all()
+        }
+
+        compiled = {}
+        for product_id, name, is_kit in products:
+            recipe_id = recipes.get(product_id)
+            if not is_kit:
+                status = STATUS_NOT_KIT
+            elif recipe_id is None:
+                status = STATUS_LEGACY if product_id in legacy_ids else STATUS_NO_RECIPE
+            elif not components.get(recipe_id):
+                status = STATUS_EMPTY
+            else:
+                status = STATUS_OK
+            compiled[product_id] = CompiledProduct(
+                product_id=product_id,
+                name=name,
+                status=status,
+                recipe_id=recipe_id,
+                components=tuple(components.get(recipe_id, ())) if status == STATUS_OK else ()
+            )
+
+        logger.info(f"Grafo de recetas compilado: {len(compiled)} productos, {len(recipes)} recetas")
+        return cls(compiled, generation)
+
+
+class RecipeGraphProvider:
+    """Entrega el grafo vigente y lo recompila cuando cambia la generación"""
+
+    MAX_AGE = 300  # Respaldo ante cambios que no pasan por el ORM (ej: SQL directo)
+
+    def __init__(self):
+        self._graph: Optional[RecipeGraph] = None
+        self._lock = threading.Lock()
+        self._stats = {'builds': 0, 'hits': 0}
+
+    @staticmethod
+    def _current_generation() -> int:
+        return get_cache_manager().get(CACHE_NAMESPACE, GENERATION_KEY, 0)
+
+    def get(self) -> RecipeGraph:
+        generation = self._current_generation()
+        graph = self._graph
+        if graph is not None and graph.generation == generation and time.time() - graph.built_at < self.MAX_AGE:
+            self._stats['hits'] += 1
+            return graph
+        with self._lock:
+            graph = self._graph
+            if graph is None or graph.generation != generation or time.time() - graph.built_at >= self.MAX_AGE:
+                graph = RecipeGraph.compile(generation)
+                self._graph = graph
+                self._stats['builds'] += 1
+            return graph
+
+    def invalidate(self) -> None:
+        """Fuerza la recompilación en todos los workers (incrementa la generación compartida)"""
+        manager = get_cache_manager()
+        manager.set(CACHE_NAMESPACE, GENERATION_KEY, manager.get(CACHE_NAMESPACE, GENERATION_KEY, 0) + 1)
+        self._graph = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        graph = self._graph
+        return {
+            **self._stats,
+            'generation': graph.generation if graph else None,
+            'products': len(graph.by_id) if graph else 0,
+            'age_seconds': round(time.time() - graph.built_at, 1) if graph else None
+        }
+
+
+_provider = RecipeGraphProvider()
+
+
+def get_recipe_graph() -> RecipeGraph:
+    """Grafo de recetas vigente (uno por proceso)"""
+    return _provider.get()
+
+
+def invalidate_recipe_graph() -> None:
+    """Invalida el grafo de recetas (todos los workers lo recompilan en su próxima venta)"""
+    _provider.invalidate()
+
+
+def get_recipe_graph_stats() -> Dict[str, Any]:
+    return _provider.get_stats()
+
+
+# ----------------------------------------------------------------------
+# Invalidación automática: cambios ORM en productos o recetas
+# ----------------------------------------------------------------------
+# Atributos que afectan al grafo (ej: Product.stock_quantity cambia en cada venta y no debe recompilar)
+_PRODUCT_ATTRS = ('name', 'is_kit')
+_INGREDIENT_ATTRS = frozenset(('name', 'base_unit'))
+
+
+def _invalidate_on_changes(changes) -> None:
+    invalidate_recipe_graph()
+
+
+def _recipe_models():
+    from app.models.inventory_stock_models import Recipe, RecipeIngredient, Ingredient
+    from app.models.recipe_models import ProductRecipe
+    return (Recipe, RecipeIngredient, Ingredient, ProductRecipe)
+
+
+def _affects_graph(obj, kind: str, changed) -> Optional[bool]:
+    from app.models.inventory_stock_models import Ingredient
+    if kind == KIND_DIRTY and isinstance(obj, Ingredient) and not changed & _INGREDIENT_ATTRS:
+        return None
+    return True
+
+
+on_product_changes(_invalidate_on_changes, attrs=_PRODUCT_ATTRS)
+watch('recipe_graph', models=_recipe_models, apply=_invalidate_on_changes, collect=_affects_graph)
@@ -3,16 +3,21 @@ Servicio de Aplicación: Estadísticas (Stats)
 Contiene la lógica de cálculo de estadísticas.
 Solo lectura, sin lógica de escritura.
 """
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, Iterable, List, Tuple, Optional
 from datetime import datetime, timedelta
 from collections import Counter, defaultdict
+import logging
 from flask import current_app
+from sqlalchemy import inspect
 
+from app.infrastructure.session_changes import watch
 from app.infrastructure.repositories.delivery_repository import DeliveryRepository, CsvDeliveryRepository
 from app.infrastructure.repositories.shift_repository import ShiftRepository, JsonShiftRepository
 from app.infrastructure.repositories.survey_repository import SurveyRepository, CsvSurveyRepository
 from app.infrastructure.external.pos_api_client import PosApiClient, PhpPosApiClient
 
+logger = logging.getLogger(__name__)
+
 
 class StatsService:
     """
@@ -40,15 +45,11 @@ class StatsService:
         self.shift_repository = shift_repository or JsonShiftRepository()
         self.survey_repository = survey_repository or CsvSurveyRepository()
         self.pos_client = pos_client or PhpPosApiClient()
-        
-        # Cache para categorías de items
-        self._item_categorias_cache = {}
-        self._all_items_cache = None
     
     def _get_item_category(self, item_name: str) -> Optional[str]:
         """
         Obtiene la categoría de un producto por su nombre.
-        Usa cache para evitar múltiples consultas.
+        Usa el catálogo indexado de productos (compartido por proceso).
         Mapea "Puerta" a "Entradas" y detecta entradas por nombre.
         
         Args:
@@ -57,92 +58,18 @@ class StatsService:
         Returns:
             str: Categoría del producto (limpia) o None
         """
-        # Si ya tenemos la categoría en cache, retornarla
-        if item_name in self._item_categorias_cache:
-            return self._item_categorias_cache[item_name]
-        
-        # Verificar si es una entrada por nombre (antes de consultar API)
-        item_name_lower = item_name.lower().strip()
-        if 'entrada' in item_name_lower:
-            self._item_categorias_cache[item_name] = 'Entradas'
+        if not item_name:
+            return None
+        
+        # Verificar si es una entrada por nombre (antes de consultar el catálogo)
+        if 'entrada' in item_name.lower():
             return 'Entradas'
         
         try:
-            # Obtener todos los items desde la API POS (con cache)
-            if self._all_items_cache is None:
-                # Intentar obtener items desde la API
-                api_key = current_app.config.get('API_KEY')
-                base_url = current_app.config.get('BASE_API_URL', 'https://clubbb.phppointofsale.com/index.php/api/v1')
-                
-                if api_key:
-                    import requests
-                    url = f"{base_url}/items"
-                    headers = {
-                        "x-api-key": api_key,
-                        "accept": "application/json"
-                    }
-                    try:
-                        response = requests.get(url, headers=headers, params={"limit": 1000}, timeout=10)
-                        if response.status_code == 200:
-                            self._all_items_cache = response.json()
-                        else:
-                            self._all_items_cache = []
-                    except Exception as e:
-                        current_app.logger.warning(f"Error al obtener items desde API: {e}")
-                        self._all_items_cache = []
-                else:
-                    self._all_items_cache = []
-            
-            if not self._all_items_cache:
-                self._item_categorias_cache[item_name] = None
-                return None
-            
-            # Buscar el item por nombre
-            for item in self._all_items_cache:
-                item_api_name = item.get('name', '')
-                if item_api_name:
-                    item_api_name_lower = item_api_name.lower().strip()
-                    # Buscar coincidencia (exacta o parcial)
-                    if item_name_lower == item_api_name_lower or item_name_lower in item_api_name_lower or item_api_name_lower in item_name_lower:
-                        categoria_raw = item.get('category') or item.get('category_name') or None
-                        
-                        if categoria_raw:
-                            # Limpiar categoría: "Barra > Cervezas" -> "Cervezas"
-                            if ' > ' in categoria_raw:
-                                categoria = categoria_raw.split(' > ')[-1].strip()
-                            elif categoria_raw == 'Puerta':
-                                categoria = 'Entradas'  # Mapear "Puerta" a "Entradas"
-                            elif categoria_raw == 'Ninguno':
-                                categoria = 'Otros'
-                            else:
-                                categoria = categoria_raw.strip()
-                            
-                            if not categoria or categoria == 'Ninguno':
-                                categoria = 'Otros'
-                            
-                            # También verificar si el nombre del item contiene "entrada"
-                            if 'entrada' in item_name_lower and categoria == 'Otros':
-                                categoria = 'Entradas'
-                            
-                            # Guardar en cache
-                            self._item_categorias_cache[item_name] = categoria
-                            return categoria
-            
-            # Si no se encontró, verificar si el nombre contiene "entrada"
-            if 'entrada' in item_name_lower:
-                self._item_categorias_cache[item_name] = 'Entradas'
-                return 'Entradas'
-            
-            # Si no se encontró, guardar None en cache
-            self._item_categorias_cache[item_name] = None
-            return None
+            from app.application.services.product_catalog import get_product_catalog
+            return get_product_catalog().get_category(item_name)
         except Exception as e:
             current_app.logger.warning(f"Error al obtener categoría para {item_name}: {e}")
-            # Si hay error pero el nombre contiene "entrada", retornar "Entradas"
-            if 'entrada' in item_name_lower:
-                self._item_categorias_cache[item_name] = 'Entradas'
-                return 'Entradas'
-            self._item_categorias_cache[item_name] = None
             return None
     
     def get_delivery_stats_for_shift(self, shift) -> Dict[str, Any]:
@@ -287,7 +214,17 @@ class StatsService:
         Returns:
             dict: Estadísticas de entregas
         """
-        all_deliveries = self.delivery_repository.find_all()
+        # Con rango de fechas, filtrar en la base de datos (consulta acotada)
+        if start_date and end_date and hasattr(self.delivery_repository, 'find_by_date_range'):
+            try:
+                all_deliveries = self.delivery_repository.find_by_date_range(
+                    datetime.strptime(start_date, '%Y-%m-%d').date(),
+                    datetime.strptime(end_date, '%Y-%m-%d').date()
+                )
+            except ValueError:
+                all_deliveries = []
+        else:
+            all_deliveries = self.delivery_repository.find_all()
         
         # Filtrar por fechas si se proporcionan
         if start_date or end_date:
@@ -534,6 +471,8 @@ class StatsService:
     def get_shifts_history_stats(self, limit: int = 30) -> List[Dict[str, Any]]:
         """
         Obtiene estadísticas de turnos cerrados.
+        Lee los resúmenes materializados (ShiftStatsSummary) y calcula los que
+        faltan en una sola pasada agrupada por fecha de turno.
         
         Args:
             limit: Número máximo de turnos a retornar
@@ -542,6 +481,8 @@ class StatsService:
             List[dict]: Lista de estadísticas por turno
         """
         shift_history = self.shift_repository.get_shift_history(limit=limit)
+        shift_dates = [shift.get('shift_date') for shift in shift_history if shift.get('shift_date')]
+        stats_by_date = self._get_shift_summaries(shift_dates)
         shifts_stats = []
         
         for shift in shift_history:
@@ -549,19 +490,8 @@ class StatsService:
             if not shift_date:
                 continue
             
-            # Obtener estadísticas del turno (puede ser None si no hay entregas)
-            stats = self.get_shift_stats(shift_date)
-            
             # Si no hay estadísticas, crear estructura básica
-            if not stats:
-                stats = {
-                    'shift_date': shift_date,
-                    'total_entregas': 0,
-                    'total_cantidad': 0,
-                    'top_items': [],
-                    'top_bartenders': [],
-                    'top_barras': []
-                }
+            stats = dict(stats_by_date.get(shift_date) or self._empty_shift_stats(shift_date))
             
             # Agregar información del turno (siempre presente)
             stats['opened_at'] = shift.get('opened_at', '')
@@ -573,14 +503,209 @@ class StatsService:
             stats['barras_disponibles'] = shift.get('barras_disponibles', [])
             stats['bartenders'] = shift.get('bartenders', [])
             
-            # Obtener estadísticas de encuestas para este turno
-            survey_stats = self._get_survey_stats_for_shift(shift_date)
-            stats['survey_stats'] = survey_stats
-            
             shifts_stats.append(stats)
         
         return shifts_stats
     
+    @staticmethod
+    def _empty_shift_stats(shift_date: str) -> Dict[str, Any]:
+        return {
+            'shift_date': shift_date,
+            'total_entregas': 0,
+            'total_cantidad': 0,
+            'top_items': [],
+            'top_bartenders': [],
+            'top_barras': [],
+            'top_categorias': [],
+            'survey_stats': {
+                'total_respuestas': 0,
+                'promedio_rating': 0.0,
+                'ratings_count': {},
+                'by_barra': {},
+                'has_data': False
+            }
+        }
+    
+    def _supports_batched_history(self) -> bool:
+        """El cálculo agrupado requiere entregas y encuestas en SQL"""
+        from app.infrastructure.repositories.sql_delivery_repository import SqlDeliveryRepository
+        from app.infrastructure.repositories.sql_survey_repository import SqlSurveyRepository
+        return (isinstance(self.delivery_repository, SqlDeliveryRepository)
+                and isinstance(self.survey_repository, SqlSurveyRepository))
+    
+    def _get_open_shift_date(self) -> Optional[str]:
+        """Fecha del turno abierto (sus estadísticas se calculan en vivo, nunca se materializan)"""
+        try:
+            status = self.shift_repository.get_current_shift_status()
+            return status.shift_date if status and status.is_open else None
+        except Exception as e:
+            current_app.logger.warning(f"No se pudo obtener el turno abierto: {e}")
+            return None
+    
+    def _get_shift_summaries(self, shift_dates: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Estadísticas por fecha de turno: resúmenes materializados + cálculo
+        agrupado de los faltantes (que se guardan si el turno está cerrado).
+        """
+        if not shift_dates:
+            return {}
+        
+        if not self._supports_batched_history():
+            # Repositorios CSV/JSON: cálculo por turno
+            result = {}
+            for shift_date in shift_dates:
+                stats = self.get_shift_stats(shift_date) or self._empty_shift_stats(shift_date)
+                stats['survey_stats'] = self._get_survey_stats_for_shift(shift_date)
+                result[shift_date] = stats
+            return result
+        
+        from app.models.shift_stats_summary_models import ShiftStatsSummary
+        
+        live_date = self._get_open_shift_date()
+        result = {}
+        try:
+            rows = ShiftStatsSummary.query.filter(ShiftStatsSummary.shift_date.in_(shift_dates)).all()
+            result = {row.shift_date: row.to_stats() for row in rows if row.shift_date != live_date}
+        except Exception as e:
+            current_app.logger.warning(f"No se pudieron leer los resúmenes de turnos: {e}")
+        
+        missing = [shift_date for shift_date in shift_dates if shift_date not in result]
+        if missing:
+            computed = self._compute_shift_stats_batch(missing)
+            result.update(computed)
+            self._store_shift_summaries({
+                shift_date: stats for shift_date, stats in computed.items() if shift_date != live_date
+            })
+        return result
+    
+    def _compute_shift_stats_batch(self, shift_dates: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Calcula estadísticas de entregas y encuestas de varios turnos con dos
+        consultas agrupadas por fecha (en vez de dos agregaciones por turno).
+        """
+        from sqlalchemy import func
+        from app.models import db
+        from app.models.delivery_models import Delivery
+        from app.models.survey_models import SurveyResponse
+        
+        dates = {}
+        for shift_date in shift_dates:
+            try:
+                dates[shift_date] = datetime.strptime(shift_date, '%Y-%m-%d').date()
+            except (ValueError, TypeError):
+                continue
+        if not dates:
+            return {}
+        
+        start = datetime.combine(min(dates.values()), datetime.min.time())
+        end = datetime.combine(max(dates.values()), datetime.min.time()) + timedelta(days=1)
+        
+        counters = defaultdict(lambda: {
+            'entregas': 0, 'cantidad': 0,
+            'items': Counter(), 'bartenders': Counter(), 'barras': Counter(), 'categorias': Counter()
+        })
+        item_categorias_cache = {}
+        
+        day = func.date(Delivery.timestamp)
+        rows = db.session.query(
+            day, Delivery.item_name, Delivery.bartender, Delivery.barra,
+            func.count(Delivery.id), func.sum(Delivery.qty)
+        ).filter(
+            Delivery.timestamp >= start,
+            Delivery.timestamp < end
+        ).group_by(day, Delivery.item_name, Delivery.bartender, Delivery.barra).all()
+        
+        for row_day, item_name, bartender, barra, count, qty in rows:
+            shift_date = row_day.isoformat() if hasattr(row_day, 'isoformat') else str(row_day)
+            if shift_date not in dates:
+                continue
+            qty = int(qty or 0)
+            data = counters[shift_date]
+            data['entregas'] += count
+            data['cantidad'] += qty
+            data['items'][item_name] += qty
+            data['bartenders'][bartender] += qty
+            data['barras'][barra] += qty
+            if item_name not in item_categorias_cache:
+                item_categorias_cache[item_name] = self._get_item_category(item_name)
+            if item_categorias_cache[item_name]:
+                data['categorias'][item_categorias_cache[item_name]] += qty
+        
+        survey_rows = db.session.query(
+            SurveyResponse.fecha_sesion, SurveyResponse.barra, SurveyResponse.rating, func.count(SurveyResponse.id)
+        ).filter(
+            SurveyResponse.fecha_sesion.in_(list(dates.values()))
+        ).group_by(SurveyResponse.fecha_sesion, SurveyResponse.barra, SurveyResponse.rating).all()
+        
+        surveys = defaultdict(lambda: {'total': 0, 'ratings': Counter(), 'by_barra': Counter()})
+        for fecha_sesion, barra, rating, count in survey_rows:
+            survey = surveys[fecha_sesion.isoformat() if hasattr(fecha_sesion, 'isoformat') else str(fecha_sesion)]
+            survey['total'] += count
+            if rating:
+                survey['ratings'][rating] += count
+            if barra:
+                survey['by_barra'][barra] += count
+        
+        result = {}
+        for shift_date in dates:
+            stats = self._empty_shift_stats(shift_date)
+            data = counters.get(shift_date)
+            if data:
+                stats.update({
+                    'total_entregas': data['entregas'],
+                    'total_cantidad': data['cantidad'],
+                    'top_items': data['items'].most_common(5),
+                    'top_bartenders': data['bartenders'].most_common(3),
+                    'top_barras': data['barras'].most_common(3),
+                    'top_categorias': data['categorias'].most_common(10)
+                })
+            survey = surveys.get(shift_date)
+            if survey and survey['total']:
+                ratings_total = sum(survey['ratings'].values())
+                ratings_sum = sum(rating * count for rating, count in survey['ratings'].items())
+                stats['survey_stats'] = {
+                    'total_respuestas': survey['total'],
+                    'promedio_rating': round(ratings_sum / ratings_total, 2) if ratings_total else 0.0,
+                    'ratings_count': dict(survey['ratings']),
+                    'by_barra': dict(survey['by_barra']),
+                    'has_data': True
+                }
+            result[shift_date] = stats
+        return result
+    
+    def _store_shift_summaries(self, stats_by_date: Dict[str, Dict[str, Any]]) -> None:
+        """Materializa estadísticas de turnos cerrados (idempotente)"""
+        if not stats_by_date:
+            return
+        import json
+        from app.models import db
+        from app.models.shift_stats_summary_models import ShiftStatsSummary
+        
+        try:
+            ShiftStatsSummary.query.filter(
+                ShiftStatsSummary.shift_date.in_(list(stats_by_date.keys()))
+            ).delete(synchronize_session=False)
+            for shift_date, stats in stats_by_date.items():
+                db.session.add(ShiftStatsSummary(
+                    shift_date=shift_date,
+                    total_entregas=stats['total_entregas'],
+                    total_cantidad=stats['total_cantidad'],
+                    top_items=json.dumps(stats['top_items']),
+                    top_bartenders=json.dumps(stats['top_bartenders']),
+                    top_barras=json.dumps(stats['top_barras']),
+                    top_categorias=json.dumps(stats['top_categorias']),
+                    survey_stats=json.dumps(stats['survey_stats'])
+                ))
+            db.session.commit()
+        except Exception as e:
+            # Otro worker pudo materializar las mismas fechas; se recalcula en la próxima lectura
+            db.session.rollback()
+            current_app.logger.warning(f"No se pudieron guardar los resúmenes de turnos: {e}")
+    
+    def invalidate_shift_summaries(self, *shift_dates: str) -> None:
+        """Elimina resúmenes materializados (ej: tras corregir entregas de un turno cerrado)"""
+        invalidate_shift_summaries(shift_dates or None)
+    
     def _get_survey_stats_for_shift(self, shift_date: str) -> Dict[str, Any]:
         """
         Obtiene estadísticas de encuestas para un turno específico.
@@ -1741,3 +1866,65 @@ class StatsService:
             'total_sales_cashiers': sum(cashier_counts_week.values()),
             'total_sales_registers': sum(register_counts_week.values())
         }
+
+
+def invalidate_shift_summaries(shift_dates: Optional[Iterable[str]] = None) -> None:
+    """
+    Elimina resúmenes materializados de turnos (todos si shift_dates es None).
+
+    Usa su propia conexión: se puede llamar desde after_commit sin tocar la
+    sesión que acaba de confirmar.
+    """
+    from sqlalchemy import select, delete
+    from app.models import db
+    from app.models.shift_stats_summary_models import ShiftStatsSummary
+
+    table = ShiftStatsSummary.__table__
+    try:
+        with db.engine.begin() as conn:
+            if shift_dates is None:
+                conn.execute(delete(table))
+                return
+            # Solo escribir si hay algo materializado (el turno abierto nunca lo está)
+            existing = conn.execute(
+                select(table.c.shift_date).where(table.c.shift_date.in_(list(shift_dates)))
+            ).scalars().all()
+            if existing:
+                conn.execute(delete(table).where(table.c.shift_date.in_(existing)))
+    except Exception as e:
+        logger.warning(f"No se pudieron invalidar los resúmenes de turnos: {e}")
+
+
+# ----------------------------------------------------------------------
+# Invalidación automática: cambios ORM en entregas y encuestas
+# ----------------------------------------------------------------------
+def _summary_dates(obj) -> List[str]:
+    """Fechas de turno (valores actuales y anteriores) que afecta un cambio de `obj`"""
+    from app.models.delivery_models import Delivery
+
+    attr = 'timestamp' if isinstance(obj, Delivery) else 'fecha_sesion'
+    dates = []
+    for value in inspect(obj).attrs[attr].history.sum():
+        if hasattr(value, 'strftime'):
+            dates.append(value.strftime('%Y-%m-%d'))
+        elif value:
+            dates.append(str(value)[:10])
+    return dates
+
+
+def _summary_models():
+    from app.models.delivery_models import Delivery
+    from app.models.survey_models import SurveyResponse
+    return (Delivery, SurveyResponse)
+
+
+def _invalidate_changed_dates(changes: List[List[str]]) -> None:
+    invalidate_shift_summaries({date for dates in changes for date in dates})
+
+
+watch(
+    'shift_summaries',
+    models=_summary_models,
+    apply=_invalidate_changed_dates,
+    collect=lambda obj, kind, changed: _summary_dates(obj) or None
+)
@@ -11,6 +11,7 @@ from app.application.dto.survey_dto import SurveyResponseRequest
 from app.infrastructure.repositories.survey_repository import SurveyRepository, CsvSurveyRepository
 from app.infrastructure.repositories.shift_repository import ShiftRepository, JsonShiftRepository
 from app.application.services.shift_service import ShiftService
+from app.helpers.survey_aggregates import get_survey_aggregates
 
 
 class SurveyService:
@@ -144,6 +145,11 @@ class SurveyService:
         except ValueError as e:
             return False, f"Respuesta inválida: {str(e)}"
         
+        # Agregados de la sesión al día antes de guardar (se actualizan en O(1) después)
+        aggregates = get_survey_aggregates()
+        loader = lambda: self.survey_repository.find_responses_by_session_date(session_date)
+        aggregates.prepare(session_date, loader)
+
         # Guardar respuesta
         if not self.survey_repository.save_response(response):
             return False, "Error al guardar la respuesta"
@@ -166,16 +172,12 @@ class SurveyService:
                 # Si está cerrada, no actualizar
                 pass
         
-        # Actualizar estadísticas de sesión
-        all_responses = self.survey_repository.find_responses_by_session_date(session_date)
-        session.total_respuestas = len(all_responses)
-        
-        if all_responses:
-            total_rating = sum(r.rating for r in all_responses)
-            session.promedio_rating = round(total_rating / len(all_responses), 2)
-        else:
-            session.promedio_rating = 0.0
-        
+        # Agregados en memoria: solo para la vista en vivo (son por proceso)
+        aggregates.apply(session_date, response, loader)
+
+        # Totales persistidos: COUNT/AVG sobre las respuestas guardadas
+        session.total_respuestas, session.promedio_rating = self.survey_repository.get_session_totals(session_date)
+
         self.survey_repository.save_session(session)
         
         # Emitir eventos
@@ -190,7 +192,13 @@ class SurveyService:
                 'timestamp': response.timestamp
             }
             self.event_publisher.emit_survey_response_created(response_dict)
-        
+
+            # Empujar las estadísticas a las pantallas en vivo (el polling de 30s queda de respaldo)
+            try:
+                self.event_publisher.emit_survey_stats_update(self.get_survey_results())
+            except Exception as e:
+                current_app.logger.warning(f"Error emitiendo evento de estadísticas: {e}")
+
         current_app.logger.info(
             f"Respuesta de encuesta guardada: Barra {response.barra}, Rating {response.rating}"
         )
@@ -226,7 +234,7 @@ class SurveyService:
     
     def close_session(self, session_date: str) -> Tuple[bool, str]:
         """
-        Cierra una sesión de encuestas.
+        Cierra una sesión de encuestas y congela su resumen (SurveySessionSummary).
         
         Args:
             session_date: Fecha de sesión (YYYY-MM-DD)
@@ -245,41 +253,60 @@ class SurveyService:
         # Cerrar sesión
         session.close()
         
-        # Recalcular estadísticas finales
+        # Recalcular estadísticas finales (reconstrucción completa desde el repositorio)
         responses = self.survey_repository.find_responses_by_session_date(session_date)
-        session.total_respuestas = len(responses)
-        
-        if responses:
-            total_rating = sum(r.rating for r in responses)
-            session.promedio_rating = round(total_rating / len(responses), 2)
-        else:
-            session.promedio_rating = 0.0
+        aggregates = get_survey_aggregates()
+        summary = aggregates.session_summary(session_date, lambda: responses)
+        session.total_respuestas = summary['total']
+        session.promedio_rating = round(summary['average_rating'], 2) if summary['total'] else 0.0
         
         # Guardar sesión cerrada
         if not self.survey_repository.save_session(session):
             return False, "Error al guardar la sesión cerrada"
         
+        self._freeze_session_summary(session_date, summary, self._barra_stats(responses))
+        aggregates.evict(session_date)
+        
         current_app.logger.info(f"Sesión de encuestas cerrada: {session_date}")
         
         return True, f"Sesión del {session_date} cerrada correctamente"
     
-    def get_session_summary(self, session_date: str) -> Optional[Dict[str, Any]]:
-        """
-        Obtiene un resumen de una sesión.
+    def _freeze_session_summary(self, session_date: str, summary: Dict[str, Any],
+                                barra_stats: Dict[str, Any]) -> None:
+        """Guarda (o reemplaza) el resumen congelado de una sesión cerrada"""
+        import json
+        from app.models import db
+        from app.models.survey_summary_models import SurveySessionSummary
         
-        Args:
-            session_date: Fecha de sesión (YYYY-MM-DD)
-            
-        Returns:
-            dict: Resumen de la sesión o None
-        """
-        session = self.survey_repository.find_session_by_date(session_date)
-        if not session:
+        try:
+            row = SurveySessionSummary.query.filter_by(fecha_sesion=session_date).first()
+            if not row:
+                row = SurveySessionSummary(fecha_sesion=session_date)
+                db.session.add(row)
+            row.total = summary['total']
+            row.average_rating = round(summary['average_rating'], 2) if summary['total'] else 0.0
+            row.ratings_count = json.dumps(summary['ratings_count'])
+            row.by_barra = json.dumps(summary['by_barra'])
+            row.by_hour = json.dumps(summary['by_hour'])
+            row.barra_stats = json.dumps(barra_stats)
+            row.closed_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(f"No se pudo congelar el resumen de la sesión {session_date}: {e}")
+    
+    def _get_frozen_summary(self, session_date: str):
+        """Resumen congelado de una sesión cerrada (o None)"""
+        try:
+            from app.models.survey_summary_models import SurveySessionSummary
+            return SurveySessionSummary.query.filter_by(fecha_sesion=session_date).first()
+        except Exception as e:
+            current_app.logger.warning(f"No se pudo leer el resumen congelado de la sesión {session_date}: {e}")
             return None
-        
-        responses = self.survey_repository.find_responses_by_session_date(session_date)
-        
-        # Calcular estadísticas por barra
+    
+    @staticmethod
+    def _barra_stats(responses: List[SurveyResponse]) -> Dict[str, Any]:
+        """Estadísticas por barra (total, suma, ratings y promedio)"""
         barra_stats = {}
         for response in responses:
             barra = response.barra
@@ -299,6 +326,35 @@ class SurveyService:
             stats = barra_stats[barra]
             stats['promedio'] = round(stats['sum_rating'] / stats['total'], 2) if stats['total'] > 0 else 0.0
         
+        return barra_stats
+    
+    def get_session_summary(self, session_date: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene un resumen de una sesión.
+        Las sesiones cerradas se leen desde su resumen congelado.
+        
+        Args:
+            session_date: Fecha de sesión (YYYY-MM-DD)
+            
+        Returns:
+            dict: Resumen de la sesión o None
+        """
+        session = self.survey_repository.find_session_by_date(session_date)
+        if not session:
+            return None
+        
+        frozen = self._get_frozen_summary(session_date) if session.estado == 'cerrada' else None
+        if frozen:
+            stats = frozen.to_stats()
+            total_respuestas = stats['total']
+            barra_stats = stats['barra_stats']
+            extra = {'ratings_count': stats['ratings_count'], 'by_hour': stats['by_hour']}
+        else:
+            responses = self.survey_repository.find_responses_by_session_date(session_date)
+            total_respuestas = len(responses)
+            barra_stats = self._barra_stats(responses)
+            extra = {}
+        
         return {
             'fecha_sesion': session.fecha_sesion,
             'fiesta_nombre': session.fiesta_nombre,
@@ -307,14 +363,38 @@ class SurveyService:
             'hora_inicio': session.hora_inicio,
             'hora_fin': session.hora_fin,
             'estado': session.estado,
-            'total_respuestas': len(responses),
+            'total_respuestas': total_respuestas,
             'promedio_rating': session.promedio_rating,
-            'barra_stats': barra_stats
+            'barra_stats': barra_stats,
+            **extra
         }
     
+    def _session_start(self, session_date: str, hora_inicio_str: str) -> Optional[datetime]:
+        """Inicio de la sesión activa (fecha + hora de inicio del turno); None si no se puede interpretar"""
+        hora_inicio_str = hora_inicio_str or '00:00:00'
+        
+        # Ensure hora_inicio_str is just the time part if it's an ISO datetime
+        if 'T' in hora_inicio_str and len(hora_inicio_str) > 10:
+            hora_inicio_str = hora_inicio_str[11:19]  # Extract HH:MM:SS
+        elif len(hora_inicio_str) > 8:  # If it's a full datetime string without 'T'
+            hora_inicio_str = hora_inicio_str[11:19]
+        
+        # Ensure hora_inicio_str is in HH:MM:SS format
+        if len(hora_inicio_str) == 5:  # HH:MM
+            hora_inicio_str = hora_inicio_str + ':00'  # Convert to HH:MM:SS
+        elif len(hora_inicio_str) < 5:
+            hora_inicio_str = '00:00:00'
+        
+        try:
+            return datetime.strptime(f"{session_date} {hora_inicio_str}", '%Y-%m-%d %H:%M:%S')
+        except ValueError as e:
+            current_app.logger.error(f"Error parsing session start time for survey results: {e} with date {session_date} and time {hora_inicio_str}")
+            return None
+    
     def get_survey_results(self, barra: Optional[str] = None) -> Dict[str, Any]:
         """
         Obtiene resultados de encuestas para la sesión activa actual.
+        Lee los agregados incrementales de la sesión (no relee las respuestas).
         
         Args:
             barra: Opcional, filtrar por barra ('1' o '2')
@@ -322,110 +402,53 @@ class SurveyService:
         Returns:
             Dict[str, Any]: Estadísticas de encuestas para la sesión activa
         """
-        from collections import Counter, defaultdict
+        empty = {
+            'total': 0,
+            'average_rating': 0.0,
+            'ratings_count': {},
+            'by_barra': {},
+            'by_hour': {},
+            'recent_responses': [],
+            'session_info': None,
+            'session_date': None
+        }
         
         # Verificar si hay turno abierto
         shift_status = self.shift_service.get_current_shift_status()
         if not shift_status.is_open:
             # Si no hay turno abierto, retornar datos vacíos
-            return {
-                'total': 0,
-                'average_rating': 0.0,
-                'ratings_count': {},
-                'by_barra': {},
-                'by_hour': {},
-                'recent_responses': [],
-                'session_info': None,
-                'session_date': None
-            }
+            return empty
         
         # Obtener información de la sesión activa
         session_info = self.get_active_session_info()
         if not session_info:
-            return {
-                'total': 0,
-                'average_rating': 0.0,
-                'ratings_count': {},
-                'by_barra': {},
-                'by_hour': {},
-                'recent_responses': [],
-                'session_info': None,
-                'session_date': None
-            }
+            return empty
         
         session_date = session_info.get('fecha_sesion') or self._get_current_session_date()
-        hora_inicio_str = session_info.get('hora_inicio', '00:00:00')
-        
-        # Ensure hora_inicio_str is just the time part if it's an ISO datetime
-        if 'T' in hora_inicio_str and len(hora_inicio_str) > 10:
-            hora_inicio_str = hora_inicio_str[11:19]  # Extract HH:MM:SS
-        elif len(hora_inicio_str) > 8:  # If it's a full datetime string without 'T'
-            hora_inicio_str = hora_inicio_str[11:19]
-        
-        # Filter responses by session date
-        all_responses = self.survey_repository.find_responses_by_session_date(session_date)
-        
-        # If barra filter is applied, filter here
-        if barra:
-            all_responses = [r for r in all_responses if r.barra == str(barra)]
         
-        # Filter only responses created AFTER session start
-        responses = []
-        try:
-            # Ensure hora_inicio_str is in HH:MM:SS format
-            if len(hora_inicio_str) == 5:  # HH:MM
-                hora_inicio_str = hora_inicio_str + ':00'  # Convert to HH:MM:SS
-            elif len(hora_inicio_str) < 5:
-                hora_inicio_str = '00:00:00'
-            
-            session_start_datetime = datetime.strptime(
-                f"{session_date} {hora_inicio_str}",
-                '%Y-%m-%d %H:%M:%S'
-            )
-            
-            for r in all_responses:
-                try:
-                    response_datetime = datetime.strptime(r.timestamp, '%Y-%m-%d %H:%M:%S')
-                    if response_datetime >= session_start_datetime:
-                        responses.append(r)
-                except ValueError:
-                    current_app.logger.warning(f"Could not parse timestamp for survey response: {r.timestamp}")
-                    pass
-        except ValueError as e:
-            current_app.logger.error(f"Error parsing session start time for survey results: {e} with date {session_date} and time {hora_inicio_str}")
-            responses = []  # Fallback to no responses if session start time is invalid
-        
-        total = len(responses)
-        ratings = [r.rating for r in responses]
+        # Solo cuentan las respuestas creadas DESPUÉS del inicio de la sesión
+        session_start = self._session_start(session_date, session_info.get('hora_inicio', '00:00:00'))
+        if session_start is None:
+            # Fallback to no responses if session start time is invalid
+            return {**empty, 'session_info': session_info, 'session_date': session_date}
+        
+        results = get_survey_aggregates().results(
+            session_date,
+            session_start,
+            lambda: self.survey_repository.find_responses_by_session_date(session_date),
+            barra=barra
+        )
         
-        # Calcular estadísticas por hora
-        hour_counts = Counter()
-        for r in responses:
-            try:
-                response_hour = datetime.strptime(r.timestamp, '%Y-%m-%d %H:%M:%S').hour
-                hour_counts[response_hour] += 1
-            except (ValueError, AttributeError):
-                pass  # Skip invalid timestamps
-        
-        stats = {
-            'total': total,
-            'average_rating': sum(ratings) / len(ratings) if ratings else 0.0,
-            'ratings_count': dict(Counter(ratings)),
-            'by_barra': dict(Counter([r.barra for r in responses])),
-            'by_hour': dict(hour_counts),
-            'recent_responses': [self._response_to_dict(r) for r in responses[-50:]] if responses else [],
+        return {
+            'total': results['total'],
+            'average_rating': results['average_rating'],
+            'ratings_count': results['ratings_count'],
+            'by_barra': results['by_barra'],
+            'by_hour': results['by_hour'],
+            'recent_responses': [self._response_to_dict(r) for r in results['recent']],
             'session_info': session_info,
             'session_date': session_date
         }
-        
-        # Emit event for real-time updates (if publisher supports it)
-        if self.event_publisher and hasattr(self.event_publisher, 'emit_survey_stats_update'):
-            try:
-                self.event_publisher.emit_survey_stats_update(stats)
-            except Exception as e:
-                current_app.logger.warning(f"Error emitiendo evento de estadísticas: {e}")
-        
-        return stats
     
     def _response_to_dict(self, response: SurveyResponse) -> Dict[str, Any]:
         """Convierte una SurveyResponse a diccionario para JSON"""
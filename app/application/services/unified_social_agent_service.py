@@ -266,7 +266,7 @@ INSTRUCCIONES:
     def _send_instagram_message(self, recipient_id: str, message: str) -> Dict:
         """Envía mensaje a Instagram usando Graph API"""
         try:
-            import requests
+            from app.infrastructure.external.http_client import get_http_client
             
             page_access_token = current_app.config.get('INSTAGRAM_PAGE_ACCESS_TOKEN')
             instagram_account_id = current_app.config.get('INSTAGRAM_BUSINESS_ACCOUNT_ID')
@@ -285,7 +285,7 @@ INSTRUCCIONES:
             
             params = {'access_token': page_access_token}
             
-            response = requests.post(url, json=payload, params=params, timeout=10)
+            response = get_http_client().post(url, json=payload, params=params, timeout=10)
             response.raise_for_status()
             
             result = response.json()
@@ -304,7 +304,7 @@ INSTRUCCIONES:
     def _send_facebook_message(self, recipient_id: str, message: str) -> Dict:
         """Envía mensaje a Facebook usando Graph API"""
         try:
-            import requests
+            from app.infrastructure.external.http_client import get_http_client
             
             page_access_token = current_app.config.get('FACEBOOK_PAGE_ACCESS_TOKEN')
             page_id = current_app.config.get('FACEBOOK_PAGE_ID')
@@ -323,7 +323,7 @@ INSTRUCCIONES:
             
             params = {'access_token': page_access_token}
             
-            response = requests.post(url, json=payload, params=params, timeout=10)
+            response = get_http_client().post(url, json=payload, params=params, timeout=10)
             response.raise_for_status()
             
             result = response.json()
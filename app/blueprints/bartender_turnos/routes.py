@@ -192,12 +192,13 @@ def cerrar_turno(turno_id):
     # Obtener stock inicial para mostrar
     stock_inicial = {s.insumo_id: s for s in turno.stock_inicial}
     
-    # Obtener insumos con sus nombres
+    # Obtener insumos con sus nombres (una consulta)
     insumos = {}
-    for stock in turno.stock_inicial:
-        insumo = Ingredient.query.get(stock.insumo_id)
-        if insumo:
-            insumos[stock.insumo_id] = insumo
+    if stock_inicial:
+        insumos = {
+            insumo.id: insumo
+            for insumo in Ingredient.query.filter(Ingredient.id.in_(list(stock_inicial.keys()))).all()
+        }
     
     return render_template(
         'bartender_turnos/cerrar_turno.html',
@@ -4,7 +4,6 @@ Rutas para la gestión de Equipo
 from flask import render_template, request, redirect, session, url_for, flash, jsonify
 from flask import current_app
 from datetime import datetime, timedelta
-from collections import defaultdict
 import pytz
 import uuid
 from app.models import db
@@ -13,17 +12,17 @@ from app.models.employee_shift_models import EmployeeShift, EmployeeSalaryConfig
 from app.models.employee_advance_models import EmployeeAdvance
 from app.models.cargo_salary_models import CargoSalaryConfig
 from app.models.cargo_models import Cargo
-from app.models.delivery_models import Delivery
-from app.models.survey_models import SurveyResponse
-from app.models.inventory_models import InventoryItem
-from app.models.jornada_models import PlanillaTrabajador, Jornada
+from app.models.jornada_models import PlanillaTrabajador
 from app.helpers.timezone_utils import format_date_spanish
 from app.helpers.timezone_utils import CHILE_TZ
-from sqlalchemy import func, and_, or_
+from app.helpers.employee_profile_stats import get_shift_summary, get_employee_activity, summarize_activity
 
 # El blueprint se importa desde __init__.py
 from . import equipo_bp
 
+# Turnos pagados que muestra la ficha (los pendientes de pago se muestran todos)
+TURNOS_RECIENTES = 50
+
 def require_admin():
     """Verifica que el usuario esté autenticado como administrador"""
     if not session.get('admin_logged_in'):
@@ -189,38 +188,31 @@ def ficha_personal(employee_id):
         salary_config = EmployeeSalaryConfig.query.filter_by(employee_id=employee_id).first()
         sueldo_por_turno = float(salary_config.sueldo_por_turno) if salary_config else 0.0
         
-        # Obtener turnos del empleado (todos, no limitar)
+        # Totales y turnos por mes (últimos 6 meses) agregados en SQL
         # Convertir employee_id a string para asegurar compatibilidad
         employee_id_str = str(employee_id)
-        shifts = EmployeeShift.query.filter_by(employee_id=employee_id_str).order_by(
-            EmployeeShift.fecha_turno.desc(), 
-            EmployeeShift.hora_inicio.desc()
-        ).all()
-        
-        # Log para debugging
-        current_app.logger.info(
-            f"📋 Consultando turnos para employee_id={employee_id_str} (tipo: {type(employee_id_str).__name__}), "
-            f"encontrados: {len(shifts)} turnos"
-        )
+        fecha_limite = datetime.now(CHILE_TZ) - timedelta(days=180)  # 6 meses
+        desde = (fecha_limite + timedelta(days=1)).strftime('%Y-%m-%d')
+        shift_summary = get_shift_summary(employee_id_str, desde)
         
         # Calcular estadísticas básicas
-        total_turnos = len(shifts)
-        turnos_pagados = len([s for s in shifts if s.pagado])
+        total_turnos = shift_summary['total_turnos']
+        turnos_pagados = shift_summary['turnos_pagados']
         turnos_pendientes = total_turnos - turnos_pagados
         
         # Calcular días trabajados (días únicos)
-        dias_trabajados = len(set([s.fecha_turno for s in shifts]))
+        dias_trabajados = shift_summary['dias_trabajados']
         
         # Calcular sueldos
-        sueldo_total = sum([float(s.sueldo_turno or 0) for s in shifts])
-        sueldo_pagado = sum([float(s.sueldo_turno or 0) for s in shifts if s.pagado])
+        sueldo_total = shift_summary['sueldo_total']
+        sueldo_pagado = shift_summary['sueldo_pagado']
         
-        # Obtener abonos/pagos excepcionales (no aplicados aún)
-        abonos = EmployeeAdvance.query.filter_by(
-            employee_id=employee_id,
-            aplicado=False
+        # Obtener abonos/pagos excepcionales del empleado (los no aplicados se descuentan)
+        abonos = EmployeeAdvance.query.filter_by(employee_id=employee_id).order_by(
+            EmployeeAdvance.fecha_abono.desc(),
+            EmployeeAdvance.created_at.desc()
         ).all()
-        total_abonos = sum([float(a.monto or 0) for a in abonos])
+        total_abonos = sum([float(a.monto or 0) for a in abonos if not a.aplicado])
         
         # El sueldo pendiente se calcula restando los abonos
         sueldo_pendiente = (sueldo_total - sueldo_pagado) - total_abonos
@@ -231,61 +223,34 @@ def ficha_personal(employee_id):
         promedio_turnos_por_dia = total_turnos / dias_trabajados if dias_trabajados > 0 else 0.0
         
         # Calcular bonos y descuentos totales
-        bonos_totales = sum([float(s.bonos or 0) for s in shifts])
-        descuentos_totales = sum([float(s.descuentos or 0) for s in shifts])
-        
-        # Calcular estadísticas por mes (últimos 6 meses)
-        estadisticas_por_mes = defaultdict(lambda: {
-            'turnos': 0,
-            'sueldo': 0.0,
-            'dias': set()
-        })
-        
-        fecha_limite = datetime.now(CHILE_TZ) - timedelta(days=180)  # 6 meses
-        
-        for shift in shifts:
-            try:
-                fecha_turno = datetime.strptime(shift.fecha_turno, '%Y-%m-%d')
-                fecha_turno = CHILE_TZ.localize(fecha_turno)
-                
-                if fecha_turno >= fecha_limite:
-                    mes_key = fecha_turno.strftime('%Y-%m')
-                    estadisticas_por_mes[mes_key]['turnos'] += 1
-                    estadisticas_por_mes[mes_key]['sueldo'] += float(shift.sueldo_turno or 0)
-                    estadisticas_por_mes[mes_key]['dias'].add(shift.fecha_turno)
-            except:
-                pass
+        bonos_totales = shift_summary['bonos_totales']
+        descuentos_totales = shift_summary['descuentos_totales']
         
         # Formatear estadísticas por mes
-        estadisticas_mensuales = []
-        for mes, datos in sorted(estadisticas_por_mes.items(), reverse=True):
-            estadisticas_mensuales.append({
-                'mes': mes,
-                'turnos': datos['turnos'],
-                'sueldo': datos['sueldo'],
-                'dias': len(datos['dias'])
-            })
+        estadisticas_mensuales = [
+            {'mes': mes, 'turnos': datos['turnos'], 'sueldo': datos['sueldo'], 'dias': datos['dias']}
+            for mes, datos in sorted(shift_summary['por_mes'].items(), reverse=True)
+        ]
         
         # Calcular estadísticas de rendimiento
         # Período actual (último mes)
         fecha_actual = datetime.now(CHILE_TZ)
-        fecha_inicio_mes_actual = fecha_actual.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        fecha_inicio_mes_anterior = (fecha_inicio_mes_actual - timedelta(days=1)).replace(day=1)
+        mes_actual = fecha_actual.strftime('%Y-%m')
+        mes_anterior = (fecha_actual.replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
         
-        # Turnos del mes actual
-        turnos_mes_actual = [s for s in shifts if s.fecha_turno >= fecha_inicio_mes_actual.strftime('%Y-%m-%d')]
-        turnos_mes_anterior = [s for s in shifts if 
-                               fecha_inicio_mes_anterior.strftime('%Y-%m-%d') <= s.fecha_turno < fecha_inicio_mes_actual.strftime('%Y-%m-%d')]
+        # Turnos del mes actual (incluye turnos ya programados en meses siguientes) y del anterior
+        meses_actual = [datos for mes, datos in shift_summary['por_mes'].items() if mes >= mes_actual]
+        datos_anterior = shift_summary['por_mes'].get(mes_anterior, {})
         
         # Estadísticas del mes actual
-        turnos_actual = len(turnos_mes_actual)
-        sueldo_actual = sum([float(s.sueldo_turno or 0) for s in turnos_mes_actual])
-        dias_actual = len(set([s.fecha_turno for s in turnos_mes_actual]))
+        turnos_actual = sum([d['turnos'] for d in meses_actual])
+        sueldo_actual = sum([d['sueldo'] for d in meses_actual])
+        dias_actual = sum([d['dias'] for d in meses_actual])
         
         # Estadísticas del mes anterior
-        turnos_anterior = len(turnos_mes_anterior)
-        sueldo_anterior = sum([float(s.sueldo_turno or 0) for s in turnos_mes_anterior])
-        dias_anterior = len(set([s.fecha_turno for s in turnos_mes_anterior]))
+        turnos_anterior = datos_anterior.get('turnos', 0)
+        sueldo_anterior = datos_anterior.get('sueldo', 0.0)
+        dias_anterior = datos_anterior.get('dias', 0)
         
         # Calcular variaciones
         variacion_turnos = ((turnos_actual - turnos_anterior) / turnos_anterior * 100) if turnos_anterior > 0 else 0.0
@@ -296,7 +261,7 @@ def ficha_personal(employee_id):
         tasa_cumplimiento = (turnos_pagados / total_turnos * 100) if total_turnos > 0 else 0.0
         
         # Promedio de horas trabajadas
-        horas_totales = sum([float(s.horas_trabajadas or 0) for s in shifts if s.horas_trabajadas])
+        horas_totales = shift_summary['horas_totales']
         promedio_horas = horas_totales / total_turnos if total_turnos > 0 else 0.0
         
         # Mejor mes (más turnos)
@@ -319,8 +284,18 @@ def ficha_personal(employee_id):
             desviacion_turnos = 0.0
             coeficiente_variacion = 0.0
         
+        # Turnos a mostrar: todos los pendientes de pago y los últimos pagados
+        shifts_query = EmployeeShift.query.filter_by(employee_id=employee_id_str).order_by(
+            EmployeeShift.fecha_turno.desc(), 
+            EmployeeShift.hora_inicio.desc()
+        )
+        recientes = shifts_query.limit(TURNOS_RECIENTES).all()
+        pendientes = shifts_query.filter(EmployeeShift.pagado == False).all()
+        shifts = list({s.id: s for s in recientes + pendientes}.values())
+        shifts.sort(key=lambda s: (s.fecha_turno or '', s.hora_inicio or datetime.min), reverse=True)
+        
         # Calcular días desde último turno
-        ultimo_turno = shifts[0] if shifts else None
+        ultimo_turno = recientes[0] if recientes else None
         dias_desde_ultimo_turno = None
         if ultimo_turno:
             try:
@@ -334,329 +309,15 @@ def ficha_personal(employee_id):
         semanas_trabajadas = dias_trabajados / 7.0 if dias_trabajados > 0 else 0.0
         frecuencia_semanal = total_turnos / semanas_trabajadas if semanas_trabajadas > 0 else 0.0
         
-        # ===== ESTADÍSTICAS BASADAS EN TICKETS Y ENCUESTAS =====
-        # Obtener entregas (tragos) del empleado por nombre
-        employee_name = employee.name
-        # Búsqueda case-insensitive (compatible MySQL)
-        deliveries = Delivery.query.filter(
-            func.lower(Delivery.bartender).like(func.lower(f'%{employee_name}%'))
-        ).all()
-        
-        # Calcular estadísticas de entregas
-        total_tragos_entregados = sum([d.qty for d in deliveries])
-        total_entregas = len(deliveries)
-        
-        # Agrupar entregas por fecha (noche)
-        entregas_por_fecha = defaultdict(lambda: {'tragos': 0, 'entregas': 0})
-        for delivery in deliveries:
-            fecha_key = delivery.timestamp.strftime('%Y-%m-%d') if delivery.timestamp else None
-            if fecha_key:
-                entregas_por_fecha[fecha_key]['tragos'] += delivery.qty
-                entregas_por_fecha[fecha_key]['entregas'] += 1
-        
-        # Calcular promedio de tragos por noche
-        noches_trabajadas = len(entregas_por_fecha)
-        promedio_tragos_por_noche = total_tragos_entregados / noches_trabajadas if noches_trabajadas > 0 else 0.0
-        
-        # Calcular ritmo de trabajo (tragos por hora) por noche
-        ritmo_por_noche = []
-        for fecha_key, datos in entregas_por_fecha.items():
-            # Obtener entregas de esa fecha
-            fecha_deliveries = [d for d in deliveries if d.timestamp and d.timestamp.strftime('%Y-%m-%d') == fecha_key]
-            if fecha_deliveries:
-                # Calcular horas trabajadas (diferencia entre primera y última entrega)
-                timestamps = sorted([d.timestamp for d in fecha_deliveries if d.timestamp])
-                if len(timestamps) > 1:
-                    horas_trabajadas = (timestamps[-1] - timestamps[0]).total_seconds() / 3600.0
-                    if horas_trabajadas > 0:
-                        ritmo = datos['tragos'] / horas_trabajadas
-                        ritmo_por_noche.append({
-                            'fecha': fecha_key,
-                            'tragos': datos['tragos'],
-                            'horas': horas_trabajadas,
-                            'ritmo': ritmo
-                        })
-        
-        # Promedio de ritmo de trabajo
-        promedio_ritmo = sum([r['ritmo'] for r in ritmo_por_noche]) / len(ritmo_por_noche) if ritmo_por_noche else 0.0
-        
-        # Mejor noche (más tragos entregados)
-        mejor_noche = None
-        if entregas_por_fecha:
-            mejor_fecha = max(entregas_por_fecha.items(), key=lambda x: x[1]['tragos'])
-            mejor_noche = {
-                'fecha': mejor_fecha[0],
-                'tragos': mejor_fecha[1]['tragos'],
-                'entregas': mejor_fecha[1]['entregas']
-            }
-        
-        # Obtener encuestas relacionadas con el empleado
-        # Buscar por nombre de bartender en encuestas (compatible MySQL)
-        survey_responses = SurveyResponse.query.filter(
-            func.lower(SurveyResponse.bartender_nombre).like(func.lower(f'%{employee_name}%'))
-        ).all()
-        
-        # También buscar por barra si el empleado trabajó en alguna barra
-        # Obtener barras únicas donde trabajó el empleado
-        barras_trabajadas = set([d.barra for d in deliveries if d.barra])
-        if barras_trabajadas:
-            # Buscar encuestas de esas barras en las fechas que trabajó
-            fechas_trabajadas = set([d.timestamp.strftime('%Y-%m-%d') if d.timestamp else None for d in deliveries])
-            fechas_trabajadas = [f for f in fechas_trabajadas if f]
-            
-            if fechas_trabajadas:
-                from datetime import datetime as dt
-                survey_by_barra = SurveyResponse.query.filter(
-                    SurveyResponse.barra.in_(barras_trabajadas),
-                    SurveyResponse.fecha_sesion.in_([dt.strptime(f, '%Y-%m-%d').date() for f in fechas_trabajadas])
-                ).all()
-                survey_responses.extend(survey_by_barra)
-        
-        # Eliminar duplicados
-        survey_responses = list({r.id: r for r in survey_responses}.values())
-        
-        # Calcular estadísticas de encuestas
-        total_encuestas = len(survey_responses)
-        if total_encuestas > 0:
-            promedio_rating = sum([r.rating for r in survey_responses]) / total_encuestas
-            ratings_distribucion = defaultdict(int)
-            for r in survey_responses:
-                ratings_distribucion[r.rating] += 1
-        else:
-            promedio_rating = 0.0
-            ratings_distribucion = {}
-        
-        # Calcular estadísticas de entregas por mes
-        entregas_por_mes = defaultdict(lambda: {'tragos': 0, 'entregas': 0, 'noches': set()})
-        for delivery in deliveries:
-            if delivery.timestamp:
-                fecha_key = delivery.timestamp.strftime('%Y-%m')
-                fecha_dia = delivery.timestamp.strftime('%Y-%m-%d')
-                entregas_por_mes[fecha_key]['tragos'] += delivery.qty
-                entregas_por_mes[fecha_key]['entregas'] += 1
-                entregas_por_mes[fecha_key]['noches'].add(fecha_dia)
-        
-        # Formatear entregas por mes
-        estadisticas_entregas_mensuales = []
-        for mes, datos in sorted(entregas_por_mes.items(), reverse=True)[:6]:  # Últimos 6 meses
-            estadisticas_entregas_mensuales.append({
-                'mes': mes,
-                'tragos': datos['tragos'],
-                'entregas': datos['entregas'],
-                'noches': len(datos['noches'])
-            })
-        
-        # ===== ESTADÍSTICAS DE PUNTUALIDAD (Apertura/Cierre de Barra) =====
-        # Inicializar estadísticas de puntualidad con valores por defecto
-        puntualidad_stats = {
-            'total_jornadas': 0,
-            'jornadas_puntuales': 0,
-            'jornadas_tardes': 0,
-            'promedio_retraso_apertura': 0.0,
-            'promedio_retraso_cierre': 0.0,
-            'tasa_puntualidad': 0.0
-        }
-        
+        # ===== ESTADÍSTICAS BASADAS EN TICKETS, ENCUESTAS, PUNTUALIDAD Y EFICIENCIA =====
+        # Una fila por mes cerrado (employee_monthly_stats) + el mes en curso agregado en SQL
+        actividad = {}
         try:
-            # Obtener jornadas donde trabajó el empleado
-            jornadas_empleado = db.session.query(Jornada).join(
-                PlanillaTrabajador,
-                PlanillaTrabajador.jornada_id == Jornada.id
-            ).filter(
-                PlanillaTrabajador.id_empleado == employee_id
-            ).order_by(Jornada.fecha_jornada.desc()).all()
-            
-            puntualidad_stats['total_jornadas'] = len(jornadas_empleado)
-            
-            retrasos_apertura = []
-            retrasos_cierre = []
-            
-            for jornada in jornadas_empleado:
-                # Obtener planilla del empleado en esta jornada
-                planilla = PlanillaTrabajador.query.filter_by(
-                    jornada_id=jornada.id,
-                    id_empleado=employee_id
-                ).first()
-                
-                if not planilla:
-                    continue
-                
-                # Obtener entregas del empleado en la fecha de la jornada
-                fecha_jornada = jornada.fecha_jornada
-                entregas_jornada = [d for d in deliveries if 
-                                   d.timestamp and d.timestamp.strftime('%Y-%m-%d') == fecha_jornada]
-                
-                if not entregas_jornada:
-                    continue
-                
-                # Calcular hora real de inicio (primera entrega)
-                primera_entrega = min(entregas_jornada, key=lambda x: x.timestamp if x.timestamp else datetime.max)
-                ultima_entrega = max(entregas_jornada, key=lambda x: x.timestamp if x.timestamp else datetime.min)
-                
-                if primera_entrega.timestamp and planilla.hora_inicio:
-                    try:
-                        # Parsear hora programada
-                        hora_programada_str = planilla.hora_inicio
-                        hora_programada = datetime.strptime(hora_programada_str, '%H:%M').time()
-                        
-                        # Obtener hora real (primera entrega)
-                        hora_real = primera_entrega.timestamp.time()
-                        
-                        # Calcular diferencia en minutos
-                        hora_programada_dt = datetime.combine(primera_entrega.timestamp.date(), hora_programada)
-                        hora_real_dt = datetime.combine(primera_entrega.timestamp.date(), hora_real)
-                        
-                        # Si la hora real es muy temprano (antes de medianoche), podría ser del día siguiente
-                        if hora_real < hora_programada and hora_real.hour < 12:
-                            hora_real_dt = datetime.combine(
-                                primera_entrega.timestamp.date() + timedelta(days=1), 
-                                hora_real
-                            )
-                        
-                        diferencia_minutos = (hora_real_dt - hora_programada_dt).total_seconds() / 60.0
-                        
-                        if diferencia_minutos > 0:  # Tarde
-                            retrasos_apertura.append(diferencia_minutos)
-                            puntualidad_stats['jornadas_tardes'] += 1
-                        else:  # Puntual o temprano
-                            puntualidad_stats['jornadas_puntuales'] += 1
-                        
-                        # Calcular retraso en cierre (última entrega vs hora programada de fin)
-                        if planilla.hora_fin and ultima_entrega.timestamp:
-                            hora_fin_programada_str = planilla.hora_fin
-                            hora_fin_programada = datetime.strptime(hora_fin_programada_str, '%H:%M').time()
-                            hora_fin_real = ultima_entrega.timestamp.time()
-                            
-                            hora_fin_programada_dt = datetime.combine(ultima_entrega.timestamp.date(), hora_fin_programada)
-                            hora_fin_real_dt = datetime.combine(ultima_entrega.timestamp.date(), hora_fin_real)
-                            
-                            # Ajustar si cruza medianoche
-                            if hora_fin_programada.hour > 12 and hora_fin_real.hour < 12:
-                                hora_fin_real_dt = datetime.combine(
-                                    ultima_entrega.timestamp.date() + timedelta(days=1),
-                                    hora_fin_real
-                                )
-                            
-                            diferencia_cierre = (hora_fin_real_dt - hora_fin_programada_dt).total_seconds() / 60.0
-                            if diferencia_cierre > 0:
-                                retrasos_cierre.append(diferencia_cierre)
-                    
-                    except Exception as e:
-                        current_app.logger.warning(f"Error al calcular puntualidad: {e}")
-                        continue
-            
-            # Calcular promedios
-            if retrasos_apertura:
-                puntualidad_stats['promedio_retraso_apertura'] = sum(retrasos_apertura) / len(retrasos_apertura)
-            if retrasos_cierre:
-                puntualidad_stats['promedio_retraso_cierre'] = sum(retrasos_cierre) / len(retrasos_cierre)
-            
-            if puntualidad_stats['total_jornadas'] > 0:
-                puntualidad_stats['tasa_puntualidad'] = (
-                    puntualidad_stats['jornadas_puntuales'] / puntualidad_stats['total_jornadas'] * 100
-                )
+            actividad = summarize_activity(get_employee_activity(employee_id_str, employee.name))
         except Exception as e:
-            current_app.logger.warning(f"Error al calcular estadísticas de puntualidad: {e}", exc_info=True)
-        
-        # ===== ESTADÍSTICAS DE EFICIENCIA (Merma del Inventario) =====
-        # Inicializar estadísticas de eficiencia con valores por defecto
-        eficiencia_stats = {
-            'total_inventarios': 0,
-            'inventarios_sin_merma': 0,
-            'inventarios_con_merma': 0,
-            'merma_total': 0.0,
-            'merma_promedio': 0.0,
-            'eficiencia_promedio': 0.0,
-            'mejor_inventario': None,
-            'peor_inventario': None
-        }
-        
-        try:
-            # Obtener barras donde trabajó el empleado
-            barras_empleado = set([d.barra for d in deliveries if d.barra])
-            
-            inventarios_evaluados = []
-            
-            for barra in barras_empleado:
-                # Obtener fechas donde trabajó en esta barra
-                fechas_barra = set([
-                    d.timestamp.strftime('%Y-%m-%d') 
-                    for d in deliveries 
-                    if d.barra == barra and d.timestamp
-                ])
-                
-                for fecha_str in fechas_barra:
-                    try:
-                        fecha_date = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-                        
-                        # Obtener items de inventario de esta barra y fecha
-                        items_inventario = InventoryItem.query.filter_by(
-                            shift_date=fecha_date,
-                            barra=barra,
-                            status='closed'  # Solo inventarios cerrados
-                        ).all()
-                        
-                        if not items_inventario:
-                            continue
-                        
-                        # Calcular merma total del inventario
-                        merma_total_inventario = 0.0
-                        items_con_merma = 0
-                        items_sin_merma = 0
-                        
-                        for item in items_inventario:
-                            if item.final_quantity is not None:
-                                # Calcular cantidad esperada
-                                cantidad_esperada = item.initial_quantity - item.delivered_quantity
-                                # Calcular diferencia (merma si es negativa)
-                                diferencia = item.final_quantity - cantidad_esperada
-                                
-                                if diferencia < 0:  # Hay merma
-                                    merma_total_inventario += abs(diferencia)
-                                    items_con_merma += 1
-                                else:
-                                    items_sin_merma += 1
-                        
-                        if items_inventario:
-                            eficiencia = (items_sin_merma / len(items_inventario)) * 100 if items_inventario else 0.0
-                            
-                            inventario_data = {
-                                'fecha': fecha_str,
-                                'barra': barra,
-                                'merma': merma_total_inventario,
-                                'items_total': len(items_inventario),
-                                'items_con_merma': items_con_merma,
-                                'items_sin_merma': items_sin_merma,
-                                'eficiencia': eficiencia
-                            }
-                            
-                            inventarios_evaluados.append(inventario_data)
-                            
-                            eficiencia_stats['total_inventarios'] += 1
-                            eficiencia_stats['merma_total'] += merma_total_inventario
-                            
-                            if items_con_merma == 0:
-                                eficiencia_stats['inventarios_sin_merma'] += 1
-                            else:
-                                eficiencia_stats['inventarios_con_merma'] += 1
-                    
-                    except Exception as e:
-                        current_app.logger.warning(f"Error al calcular eficiencia para {barra} en {fecha_str}: {e}")
-                        continue
-            
-            # Calcular promedios de eficiencia
-            if inventarios_evaluados:
-                eficiencia_stats['merma_promedio'] = eficiencia_stats['merma_total'] / len(inventarios_evaluados)
-                eficiencia_stats['eficiencia_promedio'] = sum([inv['eficiencia'] for inv in inventarios_evaluados]) / len(inventarios_evaluados)
-                
-                # Mejor y peor inventario
-                mejor_inv = min(inventarios_evaluados, key=lambda x: x['merma'])
-                peor_inv = max(inventarios_evaluados, key=lambda x: x['merma'])
-                
-                eficiencia_stats['mejor_inventario'] = mejor_inv
-                eficiencia_stats['peor_inventario'] = peor_inv
-        except Exception as e:
-            current_app.logger.warning(f"Error al calcular estadísticas de eficiencia: {e}", exc_info=True)
+            db.session.rollback()
+            current_app.logger.warning(f"Error al calcular estadísticas de rendimiento: {e}", exc_info=True)
+            actividad = summarize_activity([])
         
         # Estadísticas de rendimiento
         rendimiento_stats = {
@@ -676,30 +337,10 @@ def ficha_personal(employee_id):
             'dias_desde_ultimo_turno': dias_desde_ultimo_turno,
             'frecuencia_semanal': frecuencia_semanal,
             'semanas_trabajadas': semanas_trabajadas,
-            # Estadísticas de tickets/entregas
-            'total_tragos_entregados': total_tragos_entregados,
-            'total_entregas': total_entregas,
-            'noches_trabajadas': noches_trabajadas,
-            'promedio_tragos_por_noche': promedio_tragos_por_noche,
-            'promedio_ritmo_trabajo': promedio_ritmo,
-            'mejor_noche': mejor_noche,
-            'estadisticas_entregas_mensuales': estadisticas_entregas_mensuales,
-            # Estadísticas de encuestas
-            'total_encuestas': total_encuestas,
-            'promedio_rating': promedio_rating,
-            'ratings_distribucion': dict(ratings_distribucion),
-            # Estadísticas de puntualidad
-            'puntualidad': puntualidad_stats,
-            # Estadísticas de eficiencia
-            'eficiencia': eficiencia_stats
+            # Estadísticas de tickets/entregas, encuestas, puntualidad y eficiencia
+            **actividad
         }
         
-        # Formatear turnos
-        # Log para debugging
-        current_app.logger.info(
-            f"📊 Procesando {len(shifts)} turnos para crear shifts_data"
-        )
-        
         shifts_data = []
         for shift in shifts:
             hora_inicio_chile = shift.hora_inicio
@@ -732,11 +373,7 @@ def ficha_personal(employee_id):
                 'notas': shift.notas
             })
         
-        # Log final para debugging
-        current_app.logger.info(
-            f"✅ shifts_data creado con {len(shifts_data)} turnos para employee_id={employee_id_str}"
-        )
-        
+
         # Obtener log de revisiones (últimas 20)
         review_logs = FichaReviewLog.query.filter_by(employee_id=employee_id)\
             .order_by(FichaReviewLog.reviewed_at.desc())\
@@ -762,12 +399,6 @@ def ficha_personal(employee_id):
                 'ip_address': log.ip_address or 'N/A'
             })
         
-        # Obtener abonos/pagos excepcionales del empleado
-        abonos = EmployeeAdvance.query.filter_by(employee_id=employee_id).order_by(
-            EmployeeAdvance.fecha_abono.desc(),
-            EmployeeAdvance.created_at.desc()
-        ).all()
-        
         abonos_data = []
         total_abonos_pendientes = 0.0
         total_abonos_aplicados = 0.0
@@ -787,6 +418,7 @@ def ficha_personal(employee_id):
                              employee=employee,
                              salary_config=salary_config,
                              shifts=shifts_data,
+                             turnos_recientes=TURNOS_RECIENTES,
                              total_turnos=total_turnos,
                              turnos_pagados=turnos_pagados,
                              turnos_pendientes=turnos_pendientes,
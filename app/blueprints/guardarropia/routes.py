@@ -137,14 +137,11 @@ def index():
             
             # Obtener items depositados recientes
             from app.models.guardarropia_models import GuardarropiaItem
-            from sqlalchemy import or_, desc
+            from sqlalchemy import desc
             
             recent_items = GuardarropiaItem.query.filter(
                 GuardarropiaItem.status == 'deposited',
-                or_(
-                    GuardarropiaItem.notes.is_(None),
-                    ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-                )
+                GuardarropiaItem.not_deleted()
             ).order_by(desc(GuardarropiaItem.deposited_at)).limit(10).all()
             
             return render_template(
@@ -471,8 +468,8 @@ def depositar():
                     from app.infrastructure.services.ticket_printer_service import TicketPrinterService
                     printer_service = TicketPrinterService()
                     
-                    # Generar ticket específico para guardarropía
-                    ticket_img = printer_service.generate_guardarropia_ticket(
+                    # Generar e imprimir ticket específico para guardarropía
+                    printer_service.print_guardarropia_ticket(
                         ticket_code=item.ticket_code,
                         customer_name=customer_name,
                         customer_phone=customer_phone,
@@ -481,23 +478,6 @@ def depositar():
                         payment_type=payment_type,
                         deposited_at=item.deposited_at.isoformat() if item.deposited_at else None
                     )
-                    
-                    # Guardar y imprimir
-                    import tempfile
-                    import os
-                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                    ticket_img.save(temp_file.name, 'PNG')
-                    temp_file.close()
-                    
-                    # Imprimir
-                    printer_service._print_macos(temp_file.name)
-                    
-                    # Limpiar
-                    try:
-                        os.remove(temp_file.name)
-                    except:
-                        pass
-                        
                 except Exception as e:
                     current_app.logger.error(f"Error al imprimir ticket: {e}", exc_info=True)
                     # Continuar aunque falle la impresión
@@ -784,10 +764,8 @@ def ticket_success(ticket_code):
             flash(f"No se encontró el ticket {ticket_code}", "error")
             return redirect(url_for('guardarropia.index'))
         
-        # Generar QR code para mostrar en pantalla
-        import qrcode
-        import base64
-        import io
+        # Generar QR code para mostrar en pantalla (cacheado por contenido)
+        from app.helpers.qr_ticket_helper import get_qr_image
         
         # FASE 3: Buscar ticket QR asociado para usar token seguro
         qr_token = None
@@ -799,22 +777,7 @@ def ticket_success(ticket_code):
             # Si no existe ticket QR, usar ticket_code (legacy)
             qr_token = item.ticket_code
         
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4
-        )
-        qr.add_data(qr_token)  # El QR contiene el token, no el display_code
-        qr.make(fit=True)
-        
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convertir a base64 para mostrar en HTML
-        img_buffer = io.BytesIO()
-        qr_img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        qr_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+        qr_base64 = get_qr_image(qr_token, 'H').base64  # El QR contiene el token, no el display_code
         
         return render_template(
             'guardarropia/ticket_success.html',
@@ -851,27 +814,9 @@ def admin_ticket_detail(ticket_code):
             flash(f"No se encontró el ticket {ticket_code}", "error")
             return redirect(url_for('routes.admin_dashboard'))
         
-        # Generar QR code para mostrar en pantalla
-        import qrcode
-        import base64
-        import io
-        
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4
-        )
-        qr.add_data(ticket_code)
-        qr.make(fit=True)
-        
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convertir a base64 para mostrar en HTML
-        img_buffer = io.BytesIO()
-        qr_img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        qr_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+        # Generar QR code para mostrar en pantalla (cacheado por contenido)
+        from app.helpers.qr_ticket_helper import get_qr_image
+        qr_base64 = get_qr_image(ticket_code, 'H').base64
         
         return render_template(
             'guardarropia/ticket_success.html',
@@ -983,10 +928,7 @@ def admin_index():
             func.max(GuardarropiaItem.id).label('max_id')
         ).filter(
             GuardarropiaItem.status == 'deposited',
-            or_(
-                GuardarropiaItem.notes.is_(None),
-                ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-            )
+            GuardarropiaItem.not_deleted()
         ).group_by(GuardarropiaItem.ticket_code).subquery()
         
         # Obtener los items completos usando los IDs únicos
@@ -1026,10 +968,7 @@ def admin_index():
         items_deposited_today = GuardarropiaItem.query.filter(
             GuardarropiaItem.shift_date == shift_date,
             GuardarropiaItem.status == 'deposited',
-            or_(
-                GuardarropiaItem.notes.is_(None),
-                ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-            )
+            GuardarropiaItem.not_deleted()
         ).count()
         
         # Items retirados hoy
@@ -1049,10 +988,7 @@ def admin_index():
         items_deposited_yesterday = GuardarropiaItem.query.filter(
             GuardarropiaItem.shift_date == fecha_ayer,
             GuardarropiaItem.status == 'deposited',
-            or_(
-                GuardarropiaItem.notes.is_(None),
-                ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-            )
+            GuardarropiaItem.not_deleted()
         ).count()
         
         # Recaudación ayer
@@ -1076,10 +1012,7 @@ def admin_index():
         items_last_7_days = GuardarropiaItem.query.filter(
             GuardarropiaItem.shift_date >= fecha_7_dias_atras,
             GuardarropiaItem.status == 'deposited',
-            or_(
-                GuardarropiaItem.notes.is_(None),
-                ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-            )
+            GuardarropiaItem.not_deleted()
         ).count()
         
         guardarropia_sales_last_7d = [s for s in guardarropia_sales if s.shift_date >= fecha_7_dias_atras]
@@ -1092,10 +1025,7 @@ def admin_index():
         # 7. Items pendientes de retiro
         items_pending = GuardarropiaItem.query.filter(
             GuardarropiaItem.status == 'deposited',
-            or_(
-                GuardarropiaItem.notes.is_(None),
-                ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-            )
+            GuardarropiaItem.not_deleted()
         ).count()
         
         # ========== ANÁLISIS DE UTILIDAD Y HORAS PEAK ==========
@@ -1433,30 +1363,7 @@ def informe_espacios():
         occupied_cluster_numbers = service.get_occupied_cluster_numbers(shift_date=shift_date if shift_date else None)
         cluster_info = service.get_cluster_info(shift_date=shift_date if shift_date else None)  # Información detallada de cada cluster
         
-        # Enriquecer cluster_info con datos completos del item para el modal
-        from app.models.guardarropia_models import GuardarropiaItem
-        from sqlalchemy import or_
-        for cluster_num, items in cluster_info.items():
-            for item_info in items:
-                # Buscar el item completo para obtener todos los datos
-                item = GuardarropiaItem.query.filter_by(
-                    ticket_code=item_info['ticket_code'],
-                    status='deposited'
-                ).filter(
-                    or_(
-                        GuardarropiaItem.notes.is_(None),
-                        ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-                    )
-                ).first()
-                if item:
-                    # Agregar todos los campos disponibles
-                    item_info['id'] = item.id
-                    item_info['payment_type'] = item.payment_type
-                    item_info['clusters'] = item.clusters
-                    item_info['cluster_numbers'] = item.cluster_numbers
-                    item_info['deposited_by'] = item.deposited_by
-                    item_info['notes'] = item.notes
-                    item_info['sale_id'] = item.sale_id
+        # cluster_info ya incluye los datos completos del item para el modal (id, pago, notas, ...)
         
         all_clusters = list(range(1, 91))  # Clusters del 1 al 90
         
@@ -1478,17 +1385,11 @@ def informe_espacios():
         from app.helpers.timezone_utils import CHILE_TZ
         
         # Usar shift_date (que ahora siempre tiene un valor: turno actual, hoy, o filtro)
-        # Filtrar items depositados que NO estén eliminados (no tengan [ELIMINADO] en notas)
-        from sqlalchemy import or_
+        # Filtrar items depositados que NO estén eliminados (soft delete)
         deposited_items_query = GuardarropiaItem.query.filter_by(
             status='deposited',
             shift_date=shift_date
-        ).filter(
-            or_(
-                GuardarropiaItem.notes.is_(None),
-                ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-            )
-        )
+        ).filter(GuardarropiaItem.not_deleted())
         
         deposited_items = deposited_items_query.order_by(
             GuardarropiaItem.deposited_at.desc()
@@ -1712,6 +1613,9 @@ def api_close_register():
         db.session.add(register_close)
         db.session.commit()
         
+        from app.helpers.register_sales_monitor import invalidate_register_closes
+        invalidate_register_closes()
+        
         current_app.logger.info(f"✅ Cierre de guardarropía registrado: ID {register_close.id}, Diferencia: ${difference}")
         
         # Limpiar sesión solo si es empleado de guardarropía
@@ -1940,8 +1844,9 @@ def api_delete_item():
         # El ticket permanece en la base de datos pero se marca como eliminado
         eliminacion_info = f"\n\n[ELIMINADO] Por: {deleted_by} | Fecha: {deleted_at} | Razón: {reason}"
         item.notes = (item.notes or '') + eliminacion_info
+        item.deleted_at = datetime.now(CHILE_TZ).replace(tzinfo=None)
         
-        # NO cambiar el status, mantenerlo como 'deposited' pero marcado en notas
+        # NO cambiar el status, mantenerlo como 'deposited' pero marcado como eliminado (deleted_at)
         # Esto permite que el ticket siga existiendo en la BD pero no se muestre en listados activos
         
         # Liberar los clusters asignados para que estén disponibles nuevamente
@@ -1977,17 +1882,14 @@ def prendas_no_retiradas():
     
     try:
         from app.models.guardarropia_models import GuardarropiaItem
-        from sqlalchemy import or_, desc
+        from sqlalchemy import desc
         from datetime import datetime, timedelta
         from app.helpers.timezone_utils import CHILE_TZ
         
         # Obtener prendas no retiradas (que tienen marked_unretrieved_at)
         prendas = GuardarropiaItem.query.filter(
             GuardarropiaItem.marked_unretrieved_at.isnot(None),
-            or_(
-                GuardarropiaItem.notes.is_(None),
-                ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-            )
+            GuardarropiaItem.not_deleted()
         ).order_by(desc(GuardarropiaItem.marked_unretrieved_at)).all()
         
         # Calcular estadísticas
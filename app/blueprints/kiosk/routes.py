@@ -1,19 +1,15 @@
 """
 Rutas del sistema de Kiosko
 """
-from flask import render_template, request, jsonify, redirect, url_for, session, send_file, current_app
+from flask import render_template, request, jsonify, redirect, url_for, session, current_app
 from datetime import datetime, timedelta
 import logging
 import os
 from decimal import Decimal
-import io
-import base64
-import barcode
-from barcode.writer import ImageWriter
-import qrcode
 
 from ...models import db
 from ...models.kiosk_models import Pago, PagoItem
+from ...helpers.qr_ticket_helper import get_qr_image, get_barcode_image, image_response
 from ...infrastructure.external.phppos_kiosk_client import PHPPosKioskClient
 from ...infrastructure.external.sumup_client import SumUpClient
 from . import kiosk_bp
@@ -255,20 +251,7 @@ def kiosk_sumup_payment(pago_id):
         # Generar QR code si no existe
         qr_image = None
         if pago.sumup_checkout_url:
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(pago.sumup_checkout_url)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            img_buffer = io.BytesIO()
-            img.save(img_buffer, format='PNG')
-            qr_image = base64.b64encode(img_buffer.getvalue()).decode()
-            qr_image = f"data:image/png;base64,{qr_image}"
+            qr_image = get_qr_image(pago.sumup_checkout_url, 'L').data_uri
         
         return render_template('kiosk/kiosk_sumup_payment.html', pago=pago, qr_image=qr_image)
     except Exception as e:
@@ -305,16 +288,8 @@ def get_ticket_barcode(ticket_code):
         else:
             barcode_text = ticket_code_clean
         
-        logger.debug(f"Generando código de barras: '{barcode_text}' para ticket '{ticket_code}'")
-        
-        code128 = barcode.get_barcode_class('code128')
-        barcode_instance = code128(barcode_text, writer=ImageWriter())
-        
-        img_buffer = io.BytesIO()
-        barcode_instance.write(img_buffer)
-        img_buffer.seek(0)
-        
-        return send_file(img_buffer, mimetype='image/png')
+        # Cacheado por contenido + ETag/Cache-Control (las pantallas del kiosko hacen polling)
+        return image_response(get_barcode_image(barcode_text))
         
     except Exception as e:
         logger.error(f"Error al generar código de barras: {e}")
@@ -469,24 +444,12 @@ def api_get_sumup_qr(pago_id):
         if not pago.sumup_checkout_url:
             return jsonify({'ok': False, 'error': 'No hay URL de checkout disponible'}), 404
         
-        # Generar QR code con la URL del checkout
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(pago.sumup_checkout_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format='PNG')
-        img_str = base64.b64encode(img_buffer.getvalue()).decode()
+        # QR con la URL del checkout (cacheado por contenido: la pantalla hace polling)
+        qr_image = get_qr_image(pago.sumup_checkout_url, 'L').data_uri
         
         return jsonify({
             'ok': True,
-            'qr_image': f"data:image/png;base64,{img_str}",
+            'qr_image': qr_image,
             'checkout_url': pago.sumup_checkout_url,
             'pago_id': pago.id
         })
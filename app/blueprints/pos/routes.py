@@ -367,8 +367,8 @@ def api_get_products():
         return jsonify({'success': False, 'error': 'No autenticado'}), 401
     
     try:
-        # Obtener productos desde servicio local
-        products = pos_service.get_products()
+        from app.services.pos_catalog import get_catalog_snapshot
+        import hashlib
         
         # Obtener caja actual y sus categorías permitidas
         register_id = session.get('pos_register_id')
@@ -379,12 +379,26 @@ def api_get_products():
                 from app.models.pos_models import PosRegister
                 register = PosRegister.query.filter_by(id=int(register_id) if register_id.isdigit() else None).first()
                 if register and register.allowed_categories:
-                    import json
                     allowed_categories = json.loads(register.allowed_categories)
-                    logger.info(f"🔍 Caja {register.name} tiene restricción de categorías: {allowed_categories}")
+                    logger.debug(f"🔍 Caja {register.name} tiene restricción de categorías: {allowed_categories}")
             except Exception as e:
                 logger.warning(f"Error al obtener categorías permitidas de la caja: {e}")
         
+        # ETag = versión del catálogo + filtro de la caja: las tablets que consultan
+        # el menú periódicamente reciben 304 si nada cambió
+        snapshot = get_catalog_snapshot()
+        etag = hashlib.sha1(
+            f"{snapshot.etag}:{json.dumps(allowed_categories, sort_keys=True)}".encode('utf-8')
+        ).hexdigest()[:20]
+        if request.if_none_match.contains(etag):
+            not_modified = current_app.response_class(status=304)
+            not_modified.set_etag(etag)
+            not_modified.headers['Cache-Control'] = 'private, no-cache'
+            return not_modified
+        
+        # Obtener productos desde servicio local
+        products = pos_service.get_products()
+        
         # Filtrar productos por categorías permitidas de la caja
         filtered_products = []
         categorized_products = {}
@@ -444,11 +458,14 @@ def api_get_products():
         # Ordenar categorías alfabéticamente
         sorted_categories = {k: categorized_products[k] for k in sorted(categorized_products.keys())}
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'products': filtered_products,
             'categorized_products': sorted_categories
         })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     except Exception as e:
         logger.error(f"Error al obtener productos: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -10,6 +10,7 @@ from app.blueprints.pos import caja_bp
 from app.models import db
 from app.models.pos_models import PaymentIntent, PosSale, PosSaleItem, PosRegister, PaymentAgent
 from app.helpers.rate_limiter import rate_limit
+from app.helpers.payment_agent_channel import get_payment_agent_channel, MAX_WAIT_SECONDS
 from app.helpers.sale_security_validator import comprehensive_sale_validation
 from app.helpers.register_session_service import RegisterSessionService
 from app.helpers.financial_utils import to_decimal, round_currency
@@ -299,6 +300,7 @@ def _process_agent_result_payload(data: dict):
         # para mantener sesión/validaciones y evitar crear ventas "fantasma" si la UI cae.
         intent.approved_at = datetime.utcnow()
         db.session.commit()
+        get_payment_agent_channel().record_terminal(intent)
         current_app.logger.info(
             f"[PAYMENT_INTENT] APPROVED→ id={intent.id} register={intent.register_id} amount={intent.amount_total} auth_code={auth_code} provider_ref={provider_ref}"
         )
@@ -313,6 +315,7 @@ def _process_agent_result_payload(data: dict):
 
     # DECLINED / ERROR
     db.session.commit()
+    get_payment_agent_channel().record_terminal(intent)
     logger.info(f"✅ PaymentIntent {status}: {intent_id} - NO se creó venta")
     return jsonify({
         'success': True,
@@ -336,13 +339,18 @@ def get_payment_intent(intent_id):
 
 
 @caja_bp.route('/api/payment/agent/pending', methods=['GET'])
-@rate_limit(max_requests=120, window_seconds=60)  # Aumentado para permitir polling cada 0.5s
+@rate_limit(max_requests=120, window_seconds=60)  # Compat: agentes antiguos hacen polling cada 0.5s
 def agent_get_pending():
     """
     Obtener PaymentIntent pendiente más antiguo para una caja (AGENT ONLY)
     
     Autenticación: X-AGENT-KEY header
-    Al entregar, cambia status a IN_PROGRESS y lockea
+    Query params:
+    - register_id: ID de la caja (requerido)
+    - wait: segundos de long-poll (0 = responder de inmediato, máx MAX_WAIT_SECONDS).
+      Con wait el agente se despierta apenas se crea un intent para su caja.
+    Al entregar, cambia status a IN_PROGRESS con un reclamo atómico
+    (dos agentes nunca reciben el mismo intent)
     """
     if not verify_agent_auth():
         return jsonify({'success': False, 'error': 'Autenticación inválida'}), 401
@@ -352,28 +360,22 @@ def agent_get_pending():
         if not register_id:
             return jsonify({'success': False, 'error': 'register_id requerido'}), 400
         
-        # Buscar intent más antiguo con status READY para esta caja
-        intent = PaymentIntent.query.filter_by(
-            register_id=register_id,
-            status=PaymentIntent.STATUS_READY
-        ).order_by(PaymentIntent.created_at.asc()).first()
+        try:
+            wait_seconds = float(request.args.get('wait', 0) or 0)
+        except (ValueError, TypeError):
+            wait_seconds = 0
+        
+        agent_id = request.headers.get('X-AGENT-ID', 'unknown')
+        intent = get_payment_agent_channel().wait_for_intent(register_id, agent_id, wait_seconds)
         
         if not intent:
             return jsonify({
                 'success': True,
                 'pending': False,
-                'message': 'No hay intents pendientes'
+                'message': 'No hay intents pendientes',
+                'max_wait': MAX_WAIT_SECONDS
             })
         
-        # Lockear intent (cambiar a IN_PROGRESS)
-        agent_id = request.headers.get('X-AGENT-ID', 'unknown')
-        intent.status = PaymentIntent.STATUS_IN_PROGRESS
-        intent.locked_by_agent = agent_id
-        intent.locked_at = datetime.utcnow()
-        intent.updated_at = datetime.utcnow()
-        
-        db.session.commit()
-        
         logger.info(f"✅ Agent {agent_id} tomó intent {intent.id} para register {register_id}")
         
         # Parsear cart_json
@@ -401,6 +403,15 @@ def agent_get_pending():
         return jsonify({'success': False, 'error': f'Error interno: {str(e)}'}), 500
 
 
+@caja_bp.route('/api/payment/agent/stats', methods=['GET'])
+@rate_limit(max_requests=30, window_seconds=60)
+def agent_channel_stats():
+    """Contadores y latencias (p50/p95) del canal de agentes de este worker (AGENT o admin)"""
+    if not verify_agent_auth() and not session.get('admin_logged_in'):
+        return jsonify({'success': False, 'error': 'Autenticación inválida'}), 401
+    return jsonify({'success': True, **get_payment_agent_channel().get_stats()})
+
+
 @caja_bp.route('/api/payment/agent/result', methods=['POST'])
 @rate_limit(max_requests=30, window_seconds=60)
 def agent_report_result():
@@ -449,21 +460,12 @@ def getnet_pending_compat():
         register_id = str(register_id)
         agent_id = request.headers.get('X-AGENT-ID', 'unknown')
 
-        intent = PaymentIntent.query.filter_by(
-            register_id=register_id,
-            status=PaymentIntent.STATUS_READY
-        ).order_by(PaymentIntent.created_at.asc()).first()
+        # Reclamo atómico (sin long-poll: los agentes antiguos no envían wait)
+        intent = get_payment_agent_channel().claim_next(register_id, agent_id)
 
         if not intent:
             return jsonify({'hasPayment': False})
 
-        # Lockear intent
-        intent.status = PaymentIntent.STATUS_IN_PROGRESS
-        intent.locked_by_agent = agent_id
-        intent.locked_at = datetime.utcnow()
-        intent.updated_at = datetime.utcnow()
-        db.session.commit()
-
         amount_clp = int(float(intent.amount_total))
         return jsonify({
             'hasPayment': True,
@@ -902,12 +902,10 @@ def api_close_register():
             'timestamp': datetime.now(CHILE_TZ).isoformat()
         }, namespace='/admin')
         
-        # Emitir actualización de métricas del dashboard
+        # Marcar cajas/ventas para el próximo delta del dashboard
         try:
-            from app.helpers.dashboard_metrics_service import get_metrics_service
-            metrics_service = get_metrics_service()
-            metrics = metrics_service.get_all_metrics(use_cache=False)
-            socketio.emit('metrics_update', {'metrics': metrics}, namespace='/admin_stats')
+            from app.helpers.metrics_publisher import get_metrics_publisher
+            get_metrics_publisher().mark_dirty('cajas', 'ventas')
         except Exception as e:
             logger.warning(f"Error al emitir actualización de métricas: {e}")
         
@@ -1,6 +1,6 @@
 import logging
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import uuid
 from decimal import ROUND_HALF_UP
 from flask import render_template, request, jsonify, session, redirect, url_for, flash, current_app, send_file, send_from_directory, abort
@@ -8,7 +8,7 @@ from app.utils.timezone import CHILE_TZ
 from app.blueprints.pos import caja_bp
 from app.blueprints.pos.services import pos_service
 from app.infrastructure.services.ticket_printer_service import TicketPrinterService
-from app.models import PosSale, PosSaleItem, RegisterClose, db
+from app.models import PosSale, PosSaleItem, db
 from app.models.pos_models import PaymentIntent
 from app.helpers.rate_limiter import rate_limit
 from app.helpers.sale_security_validator import (
@@ -23,9 +23,8 @@ from app.infrastructure.external.phppos_kiosk_client import PHPPosKioskClient
 from app.application.services.service_factory import get_shift_service
 from app import socketio
 from app.helpers.financial_utils import to_decimal, round_currency, safe_float
-from app.helpers.register_session_service import RegisterSessionService
+from app.helpers.register_sale_context import get_sale_context_cache, parse_payment_methods, verify_sale_in_db
 from app.helpers.idempotency_helper import generate_sale_idempotency_key
-from app.models.jornada_models import Jornada
 
 logger = logging.getLogger(__name__)
 
@@ -629,10 +628,11 @@ def api_create_sale():
         employee_id = str(employee_id) if employee_id else None
         
         # ==========================================
-        # P0-005: Validar RegisterSession OPEN
+        # P0-005, P0-002: Validar RegisterSession OPEN y jornada activa
+        # (contexto de venta de la caja en cache: sesión, jornada, caja, bloqueo, último cierre)
         # ==========================================
-        can_sell, error_msg = RegisterSessionService.can_sell_in_register(register_id)
-        if not can_sell:
+        sale_context, error_msg = get_sale_context_cache().check_sale(register_id)
+        if error_msg:
             # Registrar auditoría (P0-013)
             from app.models.pos_models import SaleAuditLog
             import json as json_lib
@@ -648,21 +648,9 @@ def api_create_sale():
             db.session.commit()
             return jsonify({'success': False, 'error': error_msg}), 403
         
-        # Obtener sesión activa
-        active_session = RegisterSessionService.get_active_session(register_id)
-        if not active_session:
-            return jsonify({'success': False, 'error': 'No hay sesión abierta para esta caja'}), 403
-        
-        # P0-002, P0-004: Validar jornada activa y obtener datos
-        jornada = Jornada.query.get(active_session.jornada_id)
-        if not jornada:
-            return jsonify({'success': False, 'error': 'Jornada asociada no encontrada'}), 500
-        
-        if jornada.estado_apertura != 'abierto':
-            return jsonify({'success': False, 'error': f'La jornada no está abierta (estado: {jornada.estado_apertura})'}), 403
-        
-        jornada_id = active_session.jornada_id
-        shift_date = active_session.shift_date
+        # P0-004: Datos de la sesión activa
+        jornada_id = sale_context.jornada_id
+        shift_date = sale_context.shift_date
         
         # ==========================================
         # VALIDACIONES DE SEGURIDAD COMPLETAS
@@ -792,35 +780,29 @@ def api_create_sale():
         _, _, payment_type_normalized = validate_payment_type(payment_type)
         
         # Validar que la caja no esté cerrada
-        recent_close = RegisterClose.query.filter(
-            RegisterClose.register_id == register_id,
-            RegisterClose.closed_at >= datetime.now(CHILE_TZ) - timedelta(hours=2)
-        ).order_by(RegisterClose.closed_at.desc()).first()
+        recent_close = sale_context.recent_close()
         
         if recent_close:
             shift_service = get_shift_service()
             current_shift = shift_service.get_current_shift()
             
-            if current_shift and recent_close.shift_date == current_shift.shift_date:
+            if current_shift and recent_close['shift_date'] == current_shift.shift_date:
                 return jsonify({
                     'success': False,
-                    'error': f'Esta caja fue cerrada el {recent_close.closed_at.strftime("%Y-%m-%d %H:%M")}. No se pueden hacer más ventas en esta caja durante este turno.'
+                    'error': f'Esta caja fue cerrada el {recent_close["closed_at"].strftime("%Y-%m-%d %H:%M")}. No se pueden hacer más ventas en esta caja durante este turno.'
                 }), 400
         
         # ==========================================
         # P1-007: Validar register_id válido
         # ==========================================
-        from app.models.pos_models import PosRegister
         is_superadmin = False
         if session.get('admin_logged_in'):
             username = session.get('admin_username', '').lower()
             is_superadmin = (username == 'sebagatica')
         
-        register_obj = PosRegister.query.filter(
-            (PosRegister.id == register_id) | (PosRegister.code == str(register_id))
-        ).first()
+        register_info = sale_context.register
         
-        if not register_obj:
+        if not register_info:
             error_msg = f'Caja no encontrada: {register_id}'
             logger.error(f"⚠️ P1-007: {error_msg}")
             SaleAuditLogger.log_security_event(
@@ -833,7 +815,7 @@ def api_create_sale():
             )
             return jsonify({'success': False, 'error': 'Caja no válida. Por favor, selecciona una caja nuevamente.'}), 400
         
-        is_superadmin_register = register_obj.superadmin_only if register_obj else False
+        is_superadmin_register = register_info['superadmin_only']
         
         # Validar que solo superadmin pueda usar caja SUPERADMIN
         if is_superadmin_register and not is_superadmin:
@@ -841,32 +823,14 @@ def api_create_sale():
 
         # --- FIX BEGIN ---
         # Validar contra la caja SOLO si payment_methods está definido
-        allowed_methods = register_obj.payment_methods
+        allowed_norm = parse_payment_methods(register_info['payment_methods'])
         payment_type_norm = str(payment_type).strip().lower() if payment_type is not None else ''
 
-        if allowed_methods:
-            # allowed_methods puede venir como JSON string
-            if isinstance(allowed_methods, str):
-                try:
-                    allowed_methods = json.loads(allowed_methods)
-                except Exception:
-                    allowed_methods = []
-
-            # Normalizar lista (lowercase/strip) y soportar strings simples
-            if isinstance(allowed_methods, (list, tuple, set)):
-                allowed_norm = {
-                    str(m).strip().lower()
-                    for m in allowed_methods
-                    if m is not None and str(m).strip() != ''
-                }
-            else:
-                allowed_norm = {str(allowed_methods).strip().lower()} if str(allowed_methods).strip() else set()
-
-            if allowed_norm and payment_type_norm not in allowed_norm:
-                return jsonify({
-                    "success": False,
-                    "error": f"Método de pago no permitido para esta caja: {payment_type_norm}"
-                }), 400
+        if allowed_norm and payment_type_norm not in allowed_norm:
+            return jsonify({
+                "success": False,
+                "error": f"Método de pago no permitido para esta caja: {payment_type_norm}"
+            }), 400
         # --- FIX END ---
         
         # Obtener datos de operación especial si es caja SUPERADMIN
@@ -937,24 +901,20 @@ def api_create_sale():
         
         # Guardar venta localmente en base de datos con transacción atómica
         try:
-            # Verificar bloqueo antes de crear la venta
-            if not is_register_locked(register_id):
-                raise Exception("La caja ya no está bloqueada")
-            
-            lock_info = get_register_lock(register_id)
-            if lock_info:
-                lock_employee_id = str(lock_info.get('employee_id', '')) if lock_info.get('employee_id') else ''
-                if lock_employee_id != employee_id:
-                    raise Exception(f"La caja está siendo usada por {lock_info.get('employee_name', 'otro cajero')}")
+            # Verificar contra la BD, en esta transacción, el bloqueo y la sesión/jornada abiertas
+            # (el contexto en cache puede estar atrasado respecto de otro worker)
+            error_msg = verify_sale_in_db(sale_context, employee_id)
+            if error_msg:
+                raise Exception(error_msg)
             
-            # shift_date y jornada_id ya obtenidos de active_session arriba (P0-004)
+            # shift_date y jornada_id ya obtenidos del contexto de venta arriba (P0-004)
 
             # LOG TEMPORAL (DEBUG)
             print("SALE_CREATE DEBUG =>", {
                 "payment_type": payment_type,
                 "payment_provider": payment_provider,
-                "register_id": register_obj.id if register_obj else None,
-                "register_payment_methods": register_obj.payment_methods if register_obj else None
+                "register_id": register_info['id'],
+                "register_payment_methods": register_info['payment_methods']
             })
             
             # Calcular montos por método de pago usando Decimal
@@ -1092,7 +1052,7 @@ def api_create_sale():
                 employee_name=employee_name,
                 register_id=register_id,
                 register_name=session.get('pos_register_name', 'Caja'),
-                shift_date=shift_date,  # P0-004: Ya validado desde active_session
+                shift_date=shift_date,  # P0-004: Ya validado desde el contexto de venta
                 jornada_id=jornada_id,  # P0-004: Asociación fuerte
                 synced_to_phppos=False,
                 is_courtesy=is_courtesy,
@@ -1158,6 +1118,10 @@ def api_create_sale():
                 )
                 db.session.add(sale_item)
             
+            # Inventario al vender (si está activo): el trabajo se persiste en la misma transacción
+            from app.helpers.sale_inventory_pipeline import enqueue_sale_inventory
+            inventory_queued = enqueue_sale_inventory(local_sale)
+            
             # Commit de la transacción
             db.session.commit()
 
@@ -1177,11 +1141,20 @@ def api_create_sale():
             # Si llegamos aquí, la transacción fue exitosa
             logger.info(f"✅ Venta guardada localmente (ID local: {local_sale.id}, ID venta: {local_sale_id})")
             
+            # Actualizar agregados del monitor de cajas (O(1), sin recalcular desde SQL)
+            from app.helpers.register_sales_aggregator import record_sale_committed
+            record_sale_committed(local_sale)
+            
+            if inventory_queued:
+                from app.helpers.sale_inventory_pipeline import get_sale_inventory_worker
+                get_sale_inventory_worker().notify()
+            
             # ==========================================
             # CREAR ESTADO DE ENTREGA (NO DESCONTAR INVENTARIO)
             # ==========================================
             # Según la lógica operativa de Club Bimba:
-            # - NO se descuenta inventario al vender
+            # - NO se descuenta inventario al vender (salvo INVENTORY_APPLY_ON_SALE:
+            #   lo aplica el pipeline post-commit, ver sale_inventory_pipeline)
             # - El inventario solo se descuenta al entregar (por bartender)
             # - Crear estado de entrega para tracking
             try:
@@ -1250,51 +1223,62 @@ def api_create_sale():
                 print_status = "error_impresion"
             
             # P0-015: Notificar en tiempo real SIN exponer datos sensibles
-            try:
-                # Evento público (sin datos sensibles)
-                socketio.emit('pos_sale_created', {
-                    'register_id': register_id,
-                    'event': 'sale_created',
-                    'sale_id': local_sale.id,
-                    'created_at': datetime.now(CHILE_TZ).isoformat()
-                }, namespace='/pos')
-                
-                # Evento privado para admin (solo si es admin)
-                is_admin = session.get('admin_logged_in', False)
-                if is_admin:
-                    socketio.emit('pos_sale_created_admin', {
-                        'sale': local_sale.to_dict(),
+            # Las notificaciones corren después de responder al cajero (tarea de fondo)
+            sale_id_local = local_sale.id
+            register_name = session.get('pos_register_name')
+            admin_sale_data = local_sale.to_dict() if session.get('admin_logged_in', False) else None
+            
+            def notify_sale_created():
+                try:
+                    # Evento público (sin datos sensibles)
+                    socketio.emit('pos_sale_created', {
+                        'register_id': register_id,
+                        'event': 'sale_created',
+                        'sale_id': sale_id_local,
+                        'created_at': datetime.now(CHILE_TZ).isoformat()
+                    }, namespace='/pos')
+                    
+                    # Evento privado para admin (solo si es admin)
+                    if admin_sale_data is not None:
+                        socketio.emit('pos_sale_created_admin', {
+                            'sale': admin_sale_data,
+                            'register_id': register_id,
+                            'register_name': register_name
+                        }, namespace='/admin')
+                    
+                    # FASE 8: Emitir evento de actividad para visor de cajas (sin datos sensibles)
+                    socketio.emit('register_activity', {
                         'register_id': register_id,
-                        'register_name': session.get('pos_register_name')
+                        'action': 'sale_created',
+                        'sale_id': sale_id_local,
+                        'timestamp': datetime.now(CHILE_TZ).isoformat()
                     }, namespace='/admin')
+                    
+                    # Dashboard: marcar secciones afectadas; el publicador agrupa las ventas
+                    # del intervalo y emite un solo delta
+                    from app.helpers.metrics_publisher import get_metrics_publisher
+                    get_metrics_publisher().mark_dirty('ventas', 'cajas')
+                except Exception as e:
+                    logger.warning(f"Error al enviar notificación de venta: {e}")
                 
-                # FASE 8: Emitir evento de actividad para visor de cajas (sin datos sensibles)
-                socketio.emit('register_activity', {
-                    'register_id': register_id,
-                    'action': 'sale_created',
-                    'sale_id': local_sale.id,
-                    'timestamp': datetime.now(CHILE_TZ).isoformat()
-                }, namespace='/admin')
-                
-                # Emitir actualización de métricas del dashboard
-                from app.helpers.dashboard_metrics_service import get_metrics_service
-                metrics_service = get_metrics_service()
-                metrics = metrics_service.get_all_metrics(use_cache=False)
-                socketio.emit('metrics_update', {'metrics': metrics}, namespace='/admin_stats')
-            except Exception as e:
-                logger.warning(f"Error al enviar notificación de venta: {e}")
+                # Enviar evento a n8n (después de crear venta exitosamente)
+                try:
+                    from app.helpers.n8n_client import send_sale_created
+                    send_sale_created(
+                        sale_id=str(sale_id_local),
+                        amount=float(total),
+                        payment_method=payment_type_normalized,
+                        register_id=register_id
+                    )
+                except Exception as e:
+                    logger.warning(f"Error enviando evento de venta a n8n: {e}")
             
-            # Enviar evento a n8n (después de crear venta exitosamente)
             try:
-                from app.helpers.n8n_client import send_sale_created
-                send_sale_created(
-                    sale_id=str(local_sale.id),
-                    amount=float(total),
-                    payment_method=payment_type_normalized,
-                    register_id=register_id
-                )
+                from app.helpers.sale_inventory_pipeline import run_after_response
+                run_after_response(notify_sale_created)
             except Exception as e:
-                logger.warning(f"Error enviando evento de venta a n8n: {e}")
+                logger.warning(f"No se pudo programar notificaciones de venta, enviando en línea: {e}")
+                notify_sale_created()
             
             # Limpiar carrito
             session['pos_cart'] = []
@@ -1373,6 +1357,9 @@ def api_cancel_sale(sale_id):
         
         db.session.commit()
         
+        from app.helpers.register_sales_aggregator import record_sale_cancelled
+        record_sale_cancelled(sale)
+        
         # P0-013: Registrar auditoría
         from app.models.pos_models import SaleAuditLog
         import json as json_lib
@@ -1408,31 +1395,15 @@ def view_ticket(ticket_id):
     """FASE 1: Ver ticket de entrega con QR"""
     try:
         from app.models.ticket_entrega_models import TicketEntrega
-        import qrcode
-        import io
-        import base64
+        from app.helpers.qr_ticket_helper import get_qr_image
         
         ticket = TicketEntrega.query.get(ticket_id)
         if not ticket:
             flash("Ticket no encontrado", "error")
             return redirect(url_for('home.index'))
         
-        # Generar QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(ticket.qr_token)  # El QR contiene el token, no el display_code
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convertir a base64 para mostrar en HTML
-        img_buffer = io.BytesIO()
-        qr_img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        qr_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+        # QR cacheado por contenido (el QR contiene el token, no el display_code)
+        qr_base64 = get_qr_image(ticket.qr_token, 'H').base64
         
         return render_template(
             'pos/ticket_entrega.html',
@@ -1547,19 +1518,11 @@ def api_venta_ok():
                 'subtotal': subtotal
             })
         
-        # Validar sesión activa
-        can_sell, error_msg = RegisterSessionService.can_sell_in_register(register_id)
-        if not can_sell:
+        # Validar sesión activa y jornada abierta (contexto de venta de la caja)
+        sale_context, error_msg = get_sale_context_cache().check_sale(register_id)
+        if error_msg:
             return jsonify({'ok': False, 'error': error_msg}), 403
         
-        active_session = RegisterSessionService.get_active_session(register_id)
-        if not active_session:
-            return jsonify({'ok': False, 'error': 'No hay sesión abierta para esta caja'}), 403
-        
-        jornada = Jornada.query.get(active_session.jornada_id)
-        if not jornada or jornada.estado_apertura != 'abierto':
-            return jsonify({'ok': False, 'error': 'Jornada no está abierta'}), 403
-        
         # Determinar tipo de pago desde getnet
         payment_type = 'Débito'  # Por defecto
         if getnet.get('cardType') == 'CREDIT' or getnet.get('CardType') == 'CREDIT':
@@ -1605,6 +1568,12 @@ def api_venta_ok():
         if validated_items:
             cart = validated_items
         
+        # Revalidar sesión OPEN y jornada abierta contra la BD en la transacción de la venta
+        error_msg = verify_sale_in_db(sale_context)
+        if error_msg:
+            db.session.rollback()
+            return jsonify({'ok': False, 'error': error_msg}), 403
+        
         # Crear la venta
         # NOTA: Los datos de Getnet (authorizationCode, responseCode, etc.) no se guardan directamente en PosSale
         # Se pueden guardar en PaymentIntent si es necesario para trazabilidad futura
@@ -1613,8 +1582,8 @@ def api_venta_ok():
             register_name=session.get('pos_register_name', caja_codigo),
             employee_id=str(employee_id),
             employee_name=employee_name,
-            jornada_id=active_session.jornada_id,
-            shift_date=active_session.shift_date,
+            jornada_id=sale_context.jornada_id,
+            shift_date=sale_context.shift_date,
             total_amount=to_decimal(total),
             payment_type=payment_type,
             payment_provider='GETNET',
@@ -44,6 +44,9 @@ class AlertasTurnoHelper:
             # Obtener todas las desviaciones del turno
             desviaciones = TurnoDesviacionInventario.query.filter_by(turno_id=turno_id).all()
             
+            # Alertas ya registradas del turno (una consulta)
+            existentes = {a.insumo_id: a for a in AlertaFugaTurno.query.filter_by(turno_id=turno_id).all()}
+            
             alertas = []
             hay_fuga_critica = False
             
@@ -74,10 +77,7 @@ class AlertasTurnoHelper:
                         criticidad = "baja"
                     
                     # Crear o actualizar alerta
-                    alerta = AlertaFugaTurno.query.filter_by(
-                        turno_id=turno_id,
-                        insumo_id=desviacion.insumo_id
-                    ).first()
+                    alerta = existentes.get(desviacion.insumo_id)
                     
                     if alerta:
                         alerta.diferencia_turno = desviacion.diferencia_turno
@@ -96,6 +96,7 @@ class AlertasTurnoHelper:
                             atendida=False
                         )
                         db.session.add(alerta)
+                        existentes[desviacion.insumo_id] = alerta
                     
                     alertas.append(alerta)
             
@@ -1,9 +1,12 @@
-import time
+"""
+Cache de resultados de funciones (API del POS, empleados, ventas)
+Delegado a la capa única de cache en app.infrastructure.cache
+"""
 from functools import wraps
-from flask import current_app
 
-# Cache simple en memoria (Tiempo de vida en segundos)
-_cache = {}
+from app.infrastructure.cache import get_cache_manager
+
+# Política por tipo de cache: TTL en segundos y máximo de entradas (LRU)
 _cache_config = {
     'employees': 1800,  # 30 minutos (reducir carga en API)
     'sale_items': 600,  # 10 minutos (reducir carga en API)
@@ -14,6 +17,26 @@ _cache_config = {
     'pos_products': 300,  # 5 minutos (productos del POS)
     'register_sales': 60,  # 1 minuto (monitoreo de ventas por caja)
 }
+_cache_max_entries = {
+    'employees': 16,
+    'sale_items': 2000,
+    'sale_details': 2000,
+    'entity_details': 500,
+    'all_sales': 50,
+    'entradas_sales': 20,
+    'pos_products': 50,
+    'register_sales': 100,
+}
+
+
+def _register_namespaces():
+    manager = get_cache_manager()
+    for cache_type, ttl in _cache_config.items():
+        manager.register_namespace(cache_type, ttl, _cache_max_entries.get(cache_type))
+    return manager
+
+
+_register_namespaces()
 
 
 def get_cache_key(prefix, *args, **kwargs):
@@ -24,10 +47,16 @@ def get_cache_key(prefix, *args, **kwargs):
     return "|".join(key_parts)
 
 
+def _split_key(key):
+    """Separa 'tipo|resto' en (namespace, clave completa)"""
+    cache_type = key.split('|')[0] if '|' in key else 'default'
+    return cache_type, key
+
+
 def cached(cache_type, ttl=None):
     """
     Decorador para cachear resultados de funciones
-    
+
     Args:
         cache_type: Tipo de cache (employees, sale_items, etc.)
         ttl: Tiempo de vida en segundos (opcional, usa el config por defecto)
@@ -35,30 +64,14 @@ def cached(cache_type, ttl=None):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Obtener TTL del config o usar el proporcionado
-            cache_ttl = ttl or _cache_config.get(cache_type, 60)
-            
-            # Generar clave única
             cache_key = get_cache_key(cache_type, *args, **kwargs)
-            
-            # Verificar si existe en cache y no ha expirado
-            if cache_key in _cache:
-                cached_value, cached_time = _cache[cache_key]
-                if time.time() - cached_time < cache_ttl:
-                    return cached_value
-            
-            # Ejecutar función y cachear resultado
-            try:
-                result = func(*args, **kwargs)
-                _cache[cache_key] = (result, time.time())
-                return result
-            except Exception as e:
-                # Si hay error, intentar devolver cache antiguo si existe
-                if cache_key in _cache:
-                    current_app.logger.warning(f"Error en {func.__name__}, usando cache antiguo: {e}")
-                    return _cache[cache_key][0]
-                raise
-        
+            # Misses concurrentes de la misma clave ejecutan la función una sola vez.
+            # Si hay error, se devuelve el cache antiguo si aún existe
+            return get_cache_manager().get_or_load(
+                cache_type, cache_key, lambda: func(*args, **kwargs),
+                ttl=ttl, serve_stale_on_error=True
+            )
+
         return wrapper
     return decorator
 
@@ -66,66 +79,38 @@ def cached(cache_type, ttl=None):
 def clear_cache(cache_type=None):
     """
     Limpia el cache
-    
+
     Args:
         cache_type: Tipo específico a limpiar, o None para limpiar todo
     """
-    if cache_type:
-        keys_to_remove = [k for k in _cache.keys() if k.startswith(f"{cache_type}|")]
-        for key in keys_to_remove:
-            _cache.pop(key, None)
-    else:
-        _cache.clear()
+    get_cache_manager().invalidate(cache_type)
 
 
 def invalidate_sale_cache(sale_id):
     """Invalida el cache de una venta específica"""
-    keys_to_remove = [
-        k for k in _cache.keys() 
-        if ('sale_items' in k or 'sale_details' in k) and str(sale_id) in k
-    ]
-    for key in keys_to_remove:
-        _cache.pop(key, None)
+    sale_id = str(sale_id)
+    manager = get_cache_manager()
+    for cache_type in ('sale_items', 'sale_details'):
+        manager.invalidate(cache_type, lambda k: sale_id in k)
 
 
 def get_cache_stats():
     """Retorna estadísticas del cache"""
-    total_keys = len(_cache)
-    expired = 0
-    valid = 0
-    current_time = time.time()
-    
-    for key, (value, cached_time) in _cache.items():
-        cache_type = key.split('|')[0]
-        ttl = _cache_config.get(cache_type, 60)
-        if current_time - cached_time < ttl:
-            valid += 1
-        else:
-            expired += 1
-    
-    return {
-        'total': total_keys,
-        'valid': valid,
-        'expired': expired
-    }
+    totals = {'total': 0, 'valid': 0, 'expired': 0}
+    for info in get_cache_manager().stats()['namespaces'].values():
+        totals['total'] += info['count']
+        totals['valid'] += info['valid']
+        totals['expired'] += info['expired']
+    return totals
 
 
 def get_cached_value(key):
     """Obtiene un valor del cache por clave"""
-    if key in _cache:
-        value, cached_time = _cache[key]
-        # Verificar si no ha expirado (usar TTL por defecto de 60s si no se especifica)
-        cache_type = key.split('|')[0] if '|' in key else 'default'
-        ttl = _cache_config.get(cache_type, 60)
-        if time.time() - cached_time < ttl:
-            return value
-    return None
+    cache_type, key = _split_key(key)
+    return get_cache_manager().get(cache_type, key)
 
 
 def set_cached_value(key, value, ttl=60):
     """Establece un valor en el cache"""
-    _cache[key] = (value, time.time())
-
-
-
-
+    cache_type, key = _split_key(key)
+    get_cache_manager().set(cache_type, key, value, ttl)
@@ -6,7 +6,7 @@ import time
 import threading
 from typing import Dict, Any
 from flask import current_app
-from .cache import _cache, _cache_config, get_cache_stats as _get_cache_stats
+from app.infrastructure.cache import get_cache_manager
 from .logger import get_logger
 
 logger = get_logger(__name__)
@@ -60,28 +60,17 @@ class CacheCleaner:
     @staticmethod
     def cleanup_expired() -> int:
         """
-        Limpia todas las entradas expiradas del cache
+        Limpia todas las entradas expiradas del cache (todos los namespaces)
         
         Returns:
             Número de entradas eliminadas
         """
-        current_time = time.time()
-        keys_to_remove = []
+        removed = get_cache_manager().purge_expired()
         
-        for key, (value, cached_time) in _cache.items():
-            cache_type = key.split('|')[0]
-            ttl = _cache_config.get(cache_type, 60)
-            
-            if current_time - cached_time >= ttl:
-                keys_to_remove.append(key)
-        
-        for key in keys_to_remove:
-            _cache.pop(key, None)
+        if removed:
+            logger.debug(f"Cache limpiado: {removed} entradas expiradas eliminadas")
         
-        if keys_to_remove:
-            logger.debug(f"Cache limpiado: {len(keys_to_remove)} entradas expiradas eliminadas")
-        
-        return len(keys_to_remove)
+        return removed
     
     def get_last_cleanup_time(self) -> float:
         """Retorna el tiempo de la última limpieza"""
@@ -97,52 +86,33 @@ def get_cache_stats() -> Dict[str, Any]:
     Retorna estadísticas detalladas del cache
     
     Returns:
-        dict con estadísticas del cache
+        dict con estadísticas del cache (incluye hits/misses/evictions por tipo)
     """
-    current_time = time.time()
-    total_keys = len(_cache)
-    valid = 0
-    expired = 0
-    cache_by_type = {}
+    import sys
+    
+    manager = get_cache_manager()
+    stats = manager.stats()
     total_size_estimate = 0
     
-    for key, (value, cached_time) in _cache.items():
-        cache_type = key.split('|')[0]
-        ttl = _cache_config.get(cache_type, 60)
-        age = current_time - cached_time
-        
-        # Contar por tipo
-        if cache_type not in cache_by_type:
-            cache_by_type[cache_type] = {
-                'count': 0,
-                'valid': 0,
-                'expired': 0,
-                'ttl': ttl
-            }
-        cache_by_type[cache_type]['count'] += 1
-        
+    for ns in manager.namespaces().values():
         # Estimar tamaño (aproximado)
         try:
-            import sys
-            total_size_estimate += sys.getsizeof(value) + sys.getsizeof(key)
-        except:
+            for key, value, _ in ns.storage.items():
+                total_size_estimate += sys.getsizeof(value) + sys.getsizeof(key)
+        except Exception:
             pass
-        
-        if age < ttl:
-            valid += 1
-            cache_by_type[cache_type]['valid'] += 1
-        else:
-            expired += 1
-            cache_by_type[cache_type]['expired'] += 1
     
+    by_type = stats['namespaces']
     return {
-        'total': total_keys,
-        'valid': valid,
-        'expired': expired,
+        'total': sum(info['count'] for info in by_type.values()),
+        'valid': sum(info['valid'] for info in by_type.values()),
+        'expired': sum(info['expired'] for info in by_type.values()),
         'size_estimate_bytes': total_size_estimate,
         'size_estimate_kb': round(total_size_estimate / 1024, 2),
-        'by_type': cache_by_type,
-        'config': _cache_config.copy()
+        'by_type': by_type,
+        'counters': stats['totals'],
+        'backend': stats['backend'],
+        'config': {name: info['ttl'] for name, info in by_type.items()}
     }
 
 
@@ -163,7 +133,7 @@ def get_cache_info() -> Dict[str, Any]:
     return {
         'stats': stats,
         'cleaner': cleaner_info,
-        'config': _cache_config.copy()
+        'config': stats['config']
     }
 
 
@@ -0,0 +1,254 @@
+"""
+Validación de carritos completos en lote
+
+Resuelve todos los productos del carrito de una vez (snapshot del catálogo
+POS + grafo de recetas, sin consultas en el caso común; una sola consulta IN
+para los ids que falten) y, si se pide, compara los requerimientos de
+ingredientes de todo el carrito contra IngredientStock con una consulta
+agregada por ubicación. Entrega un veredicto estructurado por línea.
+"""
+from typing import Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, field
+from decimal import Decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Códigos de veredicto por línea
+CODE_MISSING_ID = 'missing_id'
+CODE_NOT_FOUND = 'not_found'
+CODE_NOT_SELLABLE = 'not_sellable'
+CODE_UNAVAILABLE = 'unavailable'
+CODE_PRICE_MISMATCH = 'price_mismatch'
+
+PRICE_TOLERANCE = 0.01  # Tolerancia de 1 centavo
+
+
+@dataclass
+class CartLineVerdict:
+    """Resultado de validar una línea del carrito"""
+    index: int
+    item_id: str
+    name: str
+    quantity: float
+    cart_price: float
+    product: Optional[Dict[str, Any]] = None
+    price: Optional[float] = None
+    code: Optional[str] = None
+    message: Optional[str] = None
+    stock_issues: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.code is None
+
+    def fail(self, code: str, message: str) -> None:
+        if self.code is None:
+            self.code = code
+            self.message = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'index': self.index,
+            'item_id': self.item_id,
+            'name': self.name,
+            'quantity': self.quantity,
+            'cart_price': self.cart_price,
+            'price': self.price,
+            'ok': self.ok,
+            'code': self.code,
+            'message': self.message,
+            'stock_issues': self.stock_issues
+        }
+
+
+@dataclass
+class CartVerdict:
+    """Resultado de validar un carrito completo"""
+    lines: List[CartLineVerdict]
+    location: Optional[str] = None
+    stock_checked: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return all(line.ok for line in self.lines)
+
+    def first_error(self, *codes: str) -> Optional[str]:
+        """Mensaje de la primera línea con alguno de los códigos dados (todos si no se indican)"""
+        for line in self.lines:
+            if line.code and (not codes or line.code in codes):
+                return line.message
+        return None
+
+    @property
+    def price_mismatches(self) -> List[CartLineVerdict]:
+        return [line for line in self.lines if line.code == CODE_PRICE_MISMATCH]
+
+    @property
+    def stock_issues(self) -> List[Dict[str, Any]]:
+        return [issue for line in self.lines for issue in line.stock_issues]
+
+    def corrected_items(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Items con el precio vigente del catálogo (mismo formato que validate_prices_match_api)"""
+        corrected = []
+        for item, line in zip(items, self.lines):
+            corrected_item = item.copy()
+            if line.price is not None:
+                corrected_item['price'] = line.price
+                corrected_item['subtotal'] = line.price * int(item.get('quantity', 1))
+            corrected.append(corrected_item)
+        return corrected
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'ok': self.ok,
+            'location': self.location,
+            'stock_checked': self.stock_checked,
+            'lines': [line.to_dict() for line in self.lines]
+        }
+
+
+def _unavailable_reason(product: Dict[str, Any]) -> Optional[str]:
+    """Motivo por el que un producto resuelto no se puede vender (eliminado / inactivo)"""
+    deleted = product.get('deleted', '0')
+    if deleted == '1' or str(deleted).lower() == 'true':
+        return 'está eliminado'
+    is_active = product.get('active', True)
+    if is_active is False or str(is_active).lower() == 'false':
+        return 'está inactivo'
+    return None
+
+
+def _check_sellable(line: CartLineVerdict) -> None:
+    """Kits sin receta (o con receta vacía) no se pueden vender (mismo criterio que can_sell_product)"""
+    from app.application.services.recipe_graph import get_recipe_graph, STATUS_NO_RECIPE, STATUS_EMPTY
+
+    compiled = get_recipe_graph().resolve(line.item_id, line.name)
+    if compiled is None:
+        # El grafo aún no conoce el producto: validar contra la BD
+        from app.models.product_models import Product
+        from app.helpers.product_validation_helper import can_sell_product
+        product_db = Product.query.get(int(line.item_id)) if line.item_id.isdigit() else None
+        if product_db:
+            puede_venderse, mensaje_error = can_sell_product(product_db)
+            if not puede_venderse:
+                line.fail(CODE_NOT_SELLABLE, mensaje_error or f"Producto '{line.name}' no puede venderse: requiere receta configurada")
+        return
+    if compiled.status == STATUS_NO_RECIPE:
+        line.fail(CODE_NOT_SELLABLE, f"Producto '{compiled.name}' está marcado como kit pero no tiene receta configurada")
+    elif compiled.status == STATUS_EMPTY:
+        line.fail(CODE_NOT_SELLABLE, f"Producto '{compiled.name}' tiene receta pero sin ingredientes configurados")
+
+
+def check_stock(lines: List[CartLineVerdict], location: str) -> None:
+    """
+    Compara el consumo de todo el carrito contra el stock de la ubicación
+    (una consulta agregada). El consumo es acumulativo: si dos líneas usan el
+    mismo ingrediente, la segunda ve el stock que deja la primera.
+    """
+    from sqlalchemy import func
+    from app.models import db
+    from app.models.inventory_stock_models import IngredientStock
+    from app.application.services.recipe_graph import get_recipe_graph, STATUS_OK
+
+    graph = get_recipe_graph()
+    requirements: List[Tuple[CartLineVerdict, Any, Decimal]] = []
+    for line in lines:
+        if line.code in (CODE_MISSING_ID, CODE_NOT_FOUND):
+            continue
+        compiled = graph.resolve(line.item_id, line.name)
+        if not compiled or compiled.status != STATUS_OK:
+            continue
+        quantity = Decimal(str(line.quantity))
+        for component in compiled.components:
+            requirements.append((line, component, component.quantity_per_portion * quantity))
+    if not requirements:
+        return
+
+    ingredient_ids = {component.ingredient_id for _, component, _ in requirements}
+    remaining = {
+        ingredient_id: Decimal(str(quantity or 0))
+        for ingredient_id, quantity in db.session.query(
+            IngredientStock.ingredient_id, func.sum(IngredientStock.quantity)
+        ).filter(
+            IngredientStock.location == location,
+            IngredientStock.ingredient_id.in_(ingredient_ids)
+        ).group_by(IngredientStock.ingredient_id).all()
+    }
+
+    for line, component, required in requirements:
+        available = remaining.get(component.ingredient_id, Decimal('0'))
+        if available < required:
+            line.stock_issues.append({
+                'product_id': int(line.item_id),
+                'product_name': line.product['name'] if line.product else line.name,
+                'ingredient_id': component.ingredient_id,
+                'ingredient_name': component.ingredient_name,
+                'required': float(required),
+                'available': float(max(available, Decimal('0'))),
+                'deficit': float(required - max(available, Decimal('0'))),
+                'unit': component.unit
+            })
+        remaining[component.ingredient_id] = available - required
+
+
+def validate_cart(
+    items: List[Dict[str, Any]],
+    location: Optional[str] = None,
+    check_prices: bool = True,
+    pos_service: Any = None
+) -> CartVerdict:
+    """
+    Valida un carrito completo.
+
+    Args:
+        items: Items del carrito ('item_id' o 'product_id', 'quantity', 'price', 'name')
+        location: Si se indica, también valida stock de ingredientes en esa ubicación
+        check_prices: Comparar el precio del carrito con el del catálogo
+        pos_service: Si se indica, los ids que no resuelve el catálogo se buscan como kit
+
+    Returns:
+        CartVerdict con un CartLineVerdict por item (mismo orden)
+    """
+    lines = []
+    for index, item in enumerate(items):
+        lines.append(CartLineVerdict(
+            index=index,
+            item_id=str(item.get('item_id') or item.get('product_id') or ''),
+            name=item.get('name', 'Producto desconocido'),
+            quantity=float(item.get('quantity', 1) or 0),
+            cart_price=float(item.get('price', 0) or 0)
+        ))
+
+    from app.services.pos_catalog import resolve_products
+    products = resolve_products([line.item_id for line in lines if line.item_id])
+
+    for line in lines:
+        if not line.item_id:
+            line.fail(CODE_MISSING_ID, f"Producto sin ID: {line.name}")
+            continue
+        line.product = products.get(line.item_id)
+        if not line.product and pos_service is not None:
+            # Si no se encuentra como item activo, buscar como kit
+            line.product = pos_service.get_item_kit(line.item_id)
+        if not line.product:
+            line.fail(CODE_NOT_FOUND, f"Producto no encontrado o eliminado: {line.name} (ID: {line.item_id})")
+            continue
+        line.price = float(line.product.get('unit_price', 0) or line.product.get('price', 0))
+        reason = _unavailable_reason(line.product)
+        if reason:
+            line.fail(CODE_UNAVAILABLE, f"Producto no disponible: {line.name} ({reason})")
+            continue
+        try:
+            _check_sellable(line)
+        except Exception as e:
+            # Si falla la validación de receta, solo loguear (no bloquear el flujo)
+            logger.warning(f"Error al validar receta de producto {line.name}: {e}")
+        if check_prices and line.ok and abs(line.cart_price - line.price) > PRICE_TOLERANCE:
+            line.fail(CODE_PRICE_MISMATCH, f"{line.name}: carrito=${line.cart_price:.2f} vs API=${line.price:.2f}")
+
+    verdict = CartVerdict(lines=lines, location=location)
+    if location:
+        check_stock(lines, location)
+        verdict.stock_checked = True
+    return verdict
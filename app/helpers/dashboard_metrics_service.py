@@ -2,68 +2,291 @@
 Servicio de Métricas del Dashboard
 Calcula todas las métricas, indicadores y reportes para el dashboard administrativo
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from flask import current_app
 from sqlalchemy import func, and_, or_, distinct, extract
 from app.helpers.timezone_utils import CHILE_TZ
 from app.models import db
-from app.helpers.thread_safe_cache import get_cached_shift_info, set_cached_shift_info
+from app.infrastructure.cache import get_cache_manager, MISSING
+import copy
+import os
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class MetricSection:
+    """
+    Sección del dashboard registrada con su propia política de refresco.
+
+    - ttl: segundos que un valor calculado se considera vigente
+    - depends_on: secciones de las que deriva; se calcula después de ellas y
+      se invalida cuando se invalidan
+    - fallback: valor a usar si no hay cálculo previo y la sección falla o
+      no alcanza a terminar
+    """
+    name: str
+    method: str
+    ttl: float
+    depends_on: Tuple[str, ...] = ()
+    fallback: Any = None
+
+
+# Registro de secciones: las "en vivo" refrescan cada pocos segundos y las
+# que casi no cambian (equipo, encuestas, inventario, comparativas) mucho menos
+SECTIONS: Tuple[MetricSection, ...] = (
+    MetricSection('system_status', '_get_system_status', 15),
+    MetricSection('turno_actual', '_get_turno_actual_metrics', 15, fallback={'existe': False}),
+    MetricSection('ventas', '_get_ventas_metrics', 5, fallback={'turno': {'total': 0, 'monto': 0}}),
+    MetricSection('entregas', '_get_entregas_metrics', 5, fallback={'turno': 0, 'hoy': 0}),
+    MetricSection('cajas', '_get_cajas_metrics', 5, fallback={'abiertas': 0}),
+    MetricSection('kioskos', '_get_kioskos_metrics', 10, fallback={'pagos_turno': 0}),
+    MetricSection('guardarropia', '_get_guardarropia_metrics', 10,
+                  fallback={'items_pendientes': 0, 'revenue_hoy': 0.0}),
+    MetricSection('equipo', '_get_equipo_metrics', 120, fallback={'total_trabajadores': 0}),
+    MetricSection('inventario', '_get_inventario_metrics', 300,
+                  fallback={'total_productos': 0, 'stock_bajo': 0}),
+    MetricSection('encuestas', '_get_encuestas_metrics', 120,
+                  fallback={'respuestas_hoy': 0, 'promedio_calificacion': 0.0}),
+    MetricSection('comparativas', '_get_comparativas', 120, depends_on=('ventas', 'entregas'), fallback={}),
+    MetricSection('graficos', '_get_graficos_data', 60, depends_on=('ventas',), fallback={}),
+    MetricSection('alertas', '_get_alertas_proactivas', 30, depends_on=('system_status', 'cajas'), fallback=[]),
+)
+
+SECTIONS_CACHE_NAMESPACE = 'dashboard_sections'
+get_cache_manager().register_namespace(SECTIONS_CACHE_NAMESPACE, 30, max_entries=64)
+
+# Pool compartido para calcular secciones independientes en paralelo
+_SECTION_WORKERS = int(os.environ.get('DASHBOARD_SECTION_WORKERS', '4'))
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_SECTION_WORKERS,
+                                               thread_name_prefix='dashboard-section')
+    return _executor
+
+
 class DashboardMetricsService:
     """Servicio para calcular métricas del dashboard"""
     
+    # Tiempo máximo que get_all_metrics espera una sección; si no alcanza,
+    # se sirve el último valor conocido y el cálculo termina en segundo plano
+    SECTION_TIMEOUT = float(os.environ.get('DASHBOARD_SECTION_TIMEOUT', '3'))
+    
     def __init__(self):
-        self.cache_ttl = 30  # Cache de 30 segundos para métricas
+        self.cache_ttl = 30  # TTL por defecto (cada sección define el suyo)
+        self.sections: Dict[str, MetricSection] = {section.name: section for section in SECTIONS}
+        self._timings: Dict[str, Dict[str, Any]] = {}
+        self._timings_lock = threading.Lock()
+        # Cálculo en curso por sección (single-flight): un cálculo que excedió el
+        # timeout sigue en el pool y las cargas siguientes lo esperan en vez de
+        # encolar otro
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
     
     def get_all_metrics(self, use_cache: bool = True) -> Dict[str, Any]:
         """
         Obtiene todas las métricas del dashboard
         
+        Cada sección se sirve desde su cache mientras esté vigente (TTL propio);
+        las vencidas se calculan en paralelo, respetando dependencias.
+        
         Args:
             use_cache: Si usar caché o forzar recálculo
             
         Returns:
             Dict con todas las métricas organizadas
         """
-        cache_key = 'dashboard_metrics'
-        
-        if use_cache:
-            cached_metrics = get_cached_shift_info(cache_key)
-            if cached_metrics:
-                return cached_metrics
-        
         try:
-            metrics = {
-                'system_status': self._get_system_status(),
-                'turno_actual': self._get_turno_actual_metrics(),
-                'ventas': self._get_ventas_metrics(),
-                'entregas': self._get_entregas_metrics(),
-                'cajas': self._get_cajas_metrics(),
-                'kioskos': self._get_kioskos_metrics(),
-                'equipo': self._get_equipo_metrics(),
-                'inventario': self._get_inventario_metrics(),
-                'guardarropia': self._get_guardarropia_metrics(),
-                'encuestas': self._get_encuestas_metrics(),
-                'comparativas': self._get_comparativas(),
-                'graficos': self._get_graficos_data(),
-                'alertas': self._get_alertas_proactivas(),
-                'timestamp': datetime.now(CHILE_TZ).isoformat()
-            }
-            
-            # Guardar en caché
-            set_cached_shift_info(metrics, cache_key, self.cache_ttl)
-            
+            metrics: Dict[str, Any] = {}
+            pending = []
+            for name in self.sections:
+                cached = self._get_cached_section(name) if use_cache else MISSING
+                if cached is MISSING:
+                    pending.append(name)
+                else:
+                    metrics[name] = cached
+                    self._record_cache_hit(name)
+            
+            if pending:
+                metrics.update(self._compute_sections(pending))
+            
+            metrics['timestamp'] = datetime.now(CHILE_TZ).isoformat()
             return metrics
             
         except Exception as e:
             logger.error(f"Error calculando métricas del dashboard: {e}", exc_info=True)
             return self._get_empty_metrics()
     
+    def get_section(self, name: str, use_cache: bool = False) -> Any:
+        """
+        Calcula una sola sección de métricas (sin tocar el resto)
+        
+        Args:
+            name: Nombre de la sección (ver SECTIONS)
+            use_cache: Si es True, retorna el valor vigente en cache si existe
+        """
+        if name not in self.sections:
+            raise ValueError(f"Sección de métricas desconocida: {name}")
+        if use_cache:
+            cached = self._get_cached_section(name)
+            if cached is not MISSING:
+                self._record_cache_hit(name)
+                return cached
+        return self._compute_section(name)
+    
+    def invalidate_sections(self, *names: str) -> None:
+        """Invalida secciones (y las que dependen de ellas) para forzar su recálculo"""
+        targets = set()
+        queue = list(names or self.sections)
+        while queue:
+            name = queue.pop()
+            if name in targets:
+                continue
+            targets.add(name)
+            queue.extend(s.name for s in self.sections.values() if name in s.depends_on)
+        manager = get_cache_manager()
+        for name in targets:
+            manager.delete(SECTIONS_CACHE_NAMESPACE, name)
+    
+    def get_section_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Timing por sección: última duración, promedio, máximo, hits de cache y timeouts"""
+        with self._timings_lock:
+            stats = {}
+            for name, section in self.sections.items():
+                timing = dict(self._timings.get(name) or {})
+                computed = timing.get('computed', 0)
+                timing['avg_ms'] = round(timing.get('total_ms', 0.0) / computed, 2) if computed else None
+                timing['ttl'] = section.ttl
+                timing['depends_on'] = list(section.depends_on)
+                stats[name] = timing
+            return stats
+    
+    # ------------------------------------------------------------------
+    # Cálculo por secciones
+    # ------------------------------------------------------------------
+    def _get_cached_section(self, name: str, allow_expired: bool = False) -> Any:
+        return get_cache_manager().get(SECTIONS_CACHE_NAMESPACE, name, MISSING, allow_expired=allow_expired)
+    
+    def _timing(self, name: str) -> Dict[str, Any]:
+        timing = self._timings.get(name)
+        if timing is None:
+            timing = self._timings[name] = {
+                'computed': 0, 'errors': 0, 'cache_hits': 0, 'timeouts': 0,
+                'last_ms': None, 'max_ms': 0.0, 'total_ms': 0.0, 'last_computed_at': None
+            }
+        return timing
+    
+    def _record_cache_hit(self, name: str) -> None:
+        with self._timings_lock:
+            self._timing(name)['cache_hits'] += 1
+    
+    def _compute_section(self, name: str) -> Any:
+        """Calcula una sección, la guarda en cache con su TTL y registra su duración"""
+        section = self.sections[name]
+        start = time.perf_counter()
+        error = False
+        try:
+            value = getattr(self, section.method)()
+            get_cache_manager().set(SECTIONS_CACHE_NAMESPACE, name, value, section.ttl)
+            return value
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._timings_lock:
+                timing = self._timing(name)
+                timing['computed'] += 1
+                timing['errors'] += int(error)
+                timing['last_ms'] = round(elapsed_ms, 2)
+                timing['max_ms'] = round(max(timing['max_ms'], elapsed_ms), 2)
+                timing['total_ms'] += elapsed_ms
+                timing['last_computed_at'] = datetime.now(CHILE_TZ).isoformat()
+    
+    def _compute_in_context(self, app, name: str) -> Any:
+        # Cada worker del pool necesita su propio app context (y sesión de BD)
+        with app.app_context():
+            return self._compute_section(name)
+    
+    def _submit(self, executor: ThreadPoolExecutor, app, name: str) -> Future:
+        """Encola el cálculo de una sección, o retorna el que ya está en curso"""
+        with self._inflight_lock:
+            future = self._inflight.get(name)
+            if future is not None and not future.done():
+                return future
+            future = executor.submit(self._compute_in_context, app, name)
+            self._inflight[name] = future
+        future.add_done_callback(lambda done, name=name: self._clear_inflight(name, done))
+        return future
+    
+    def _clear_inflight(self, name: str, future: Future) -> None:
+        with self._inflight_lock:
+            if self._inflight.get(name) is future:
+                del self._inflight[name]
+    
+    def _dependency(self, name: str) -> Any:
+        """Valor de una sección de la que se deriva (ya calculada en la oleada anterior)"""
+        value = self._get_cached_section(name, allow_expired=True)
+        return value if value is not MISSING else getattr(self, self.sections[name].method)()
+    
+    def _fallback(self, name: str) -> Any:
+        """Último valor conocido (aunque esté vencido) o el valor por defecto de la sección"""
+        stale = self._get_cached_section(name, allow_expired=True)
+        if stale is not MISSING:
+            return stale
+        fallback = self.sections[name].fallback
+        return copy.deepcopy(fallback) if fallback is not None else {}
+    
+    def _compute_sections(self, names: List[str]) -> Dict[str, Any]:
+        """
+        Calcula varias secciones en el pool, por oleadas según dependencias.
+        
+        Cada oleada tiene su propio plazo de SECTION_TIMEOUT. Una sección que
+        no termina dentro de él no bloquea el resultado: se usa su último valor
+        conocido y el cálculo sigue en segundo plano (quedará en cache para la
+        próxima llamada, que lo espera en vez de lanzar otro).
+        """
+        app = current_app._get_current_object()
+        executor = _get_executor()
+        results: Dict[str, Any] = {}
+        remaining = list(names)
+        
+        while remaining:
+            # Oleada: secciones cuyas dependencias pendientes ya terminaron
+            wave = [name for name in remaining
+                    if not any(dep in remaining for dep in self.sections[name].depends_on)]
+            if not wave:
+                wave = list(remaining)  # dependencia circular: calcular igual
+            deadline = time.monotonic() + self.SECTION_TIMEOUT
+            futures = {name: self._submit(executor, app, name) for name in wave}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeoutError:
+                    with self._timings_lock:
+                        self._timing(name)['timeouts'] += 1
+                    logger.warning(f"Sección de métricas '{name}' excedió {self.SECTION_TIMEOUT}s, usando último valor")
+                    results[name] = self._fallback(name)
+                except Exception as e:
+                    logger.error(f"Error calculando sección de métricas '{name}': {e}", exc_info=True)
+                    results[name] = self._fallback(name)
+            remaining = [name for name in remaining if name not in futures]
+        
+        return results
+    
     def _get_system_status(self) -> Dict[str, Any]:
         """Obtiene el estado del sistema"""
         try:
@@ -434,8 +657,8 @@ class DashboardMetricsService:
     def _get_comparativas(self) -> Dict[str, Any]:
         """Obtiene comparativas (hoy vs ayer)"""
         try:
-            ventas = self._get_ventas_metrics()
-            entregas = self._get_entregas_metrics()
+            ventas = self._dependency('ventas')
+            entregas = self._dependency('entregas')
             
             # Comparativa de ventas
             ventas_hoy = ventas.get('hoy', {}).get('monto', 0)
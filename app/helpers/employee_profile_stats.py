@@ -0,0 +1,546 @@
+"""
+Estadísticas de la ficha personal calculadas con SQL agregado
+
+La ficha ya no carga todas las entregas, encuestas, jornadas e inventarios del
+empleado para sumarlos en Python. Cada mes se agrega con consultas GROUP BY
+acotadas al rango del mes (compute_month_activity) y los meses cerrados se
+guardan en employee_monthly_stats, de modo que la ficha lee una fila por mes
+trabajado más el mes en curso:
+
+- Los meses cerrados se leen de la tabla. Una fila calculada antes de que el
+  mes terminara (más FINAL_GRACE, para inventarios y encuestas de la última
+  noche) o con otro nombre de empleado se recalcula al consultarla.
+- La primera vez que se consulta un empleado se busca su primer mes con
+  actividad y se guardan todos los meses desde ese hasta el mes anterior
+  (también los vacíos): una vez que un empleado tiene filas, estas cubren
+  todo su historial.
+- El cierre de jornada (refresh_jornada_rollups) recalcula el mes de la
+  jornada para los trabajadores de su planilla que ya tienen historial.
+
+Los turnos (EmployeeShift) se agregan directamente con SQL (get_shift_summary).
+"""
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+import logging
+
+from sqlalchemy import func, and_, or_, case
+
+from app.models import db
+from app.models.delivery_models import Delivery
+from app.models.survey_models import SurveyResponse
+from app.models.inventory_models import InventoryItem
+from app.models.jornada_models import Jornada, PlanillaTrabajador
+from app.models.employee_shift_models import EmployeeShift
+from app.models.employee_stats_models import EmployeeMonthlyStats
+
+logger = logging.getLogger(__name__)
+
+MONTH_FORMAT = '%Y-%m'
+FINAL_GRACE = timedelta(days=1)  # Cierres de inventario y encuestas de la última noche del mes
+
+
+# ===== Meses =====
+
+def month_bounds(mes: str) -> Tuple[datetime, datetime]:
+    """Inicio (incluido) y fin (excluido) de un mes 'YYYY-MM'"""
+    start = datetime.strptime(mes, MONTH_FORMAT)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def shift_month(mes: str, months: int) -> str:
+    """Mes desplazado en `months` (negativo hacia atrás)"""
+    year, month = (int(part) for part in mes.split('-'))
+    index = year * 12 + (month - 1) + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def months_between(first: str, last: str) -> List[str]:
+    """Meses desde first hasta last (ambos incluidos)"""
+    months = []
+    mes = first
+    while mes <= last:
+        months.append(mes)
+        mes = shift_month(mes, 1)
+    return months
+
+
+def _day_key(value) -> Optional[str]:
+    """func.date() devuelve string en SQLite y date en MySQL/PostgreSQL"""
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)[:10]
+
+
+def _name_filter(column, employee_name: str):
+    # Búsqueda case-insensitive (compatible MySQL)
+    return func.lower(column).like(func.lower(f'%{employee_name}%'))
+
+
+def empty_activity(mes: str) -> Dict[str, Any]:
+    activity = {field: 0 for field in EmployeeMonthlyStats.COUNTERS}
+    activity.update({
+        'mes': mes,
+        'mejor_noche': None,
+        'ratings_count': {},
+        'mejor_inventario': None,
+        'peor_inventario': None,
+    })
+    return activity
+
+
+# ===== Agregados de un mes =====
+
+def _aggregate_deliveries(activity, employee_name, start, end) -> Dict[str, Dict[str, Any]]:
+    """Entregas del mes agrupadas por noche y barra. Devuelve las noches (fecha -> datos)"""
+    day = func.date(Delivery.timestamp)
+    rows = db.session.query(
+        day,
+        Delivery.barra,
+        func.sum(Delivery.qty),
+        func.count(Delivery.id),
+        func.min(Delivery.timestamp),
+        func.max(Delivery.timestamp),
+    ).filter(
+        _name_filter(Delivery.bartender, employee_name),
+        Delivery.timestamp >= start,
+        Delivery.timestamp < end,
+    ).group_by(day, Delivery.barra).all()
+
+    nights: Dict[str, Dict[str, Any]] = {}
+    for row_day, barra, tragos, entregas, first, last in rows:
+        fecha = _day_key(row_day)
+        if not fecha:
+            continue
+        night = nights.setdefault(fecha, {'tragos': 0, 'entregas': 0, 'first': first, 'last': last, 'barras': set()})
+        night['tragos'] += int(tragos or 0)
+        night['entregas'] += int(entregas or 0)
+        if first is not None and (night['first'] is None or first < night['first']):
+            night['first'] = first
+        if last is not None and (night['last'] is None or last > night['last']):
+            night['last'] = last
+        if barra:
+            night['barras'].add(barra)
+
+    for fecha, night in nights.items():
+        activity['tragos'] += night['tragos']
+        activity['entregas'] += night['entregas']
+        activity['noches'] += 1
+        # Ritmo (tragos por hora) entre la primera y la última entrega de la noche
+        if night['entregas'] > 1 and night['first'] and night['last']:
+            horas = (night['last'] - night['first']).total_seconds() / 3600.0
+            if horas > 0:
+                activity['ritmo_sum'] += night['tragos'] / horas
+                activity['ritmo_noches'] += 1
+        mejor = activity['mejor_noche']
+        if mejor is None or night['tragos'] > mejor['tragos']:
+            activity['mejor_noche'] = {'fecha': fecha, 'tragos': night['tragos'], 'entregas': night['entregas']}
+    return nights
+
+
+def _aggregate_surveys(activity, employee_name, start, end, nights) -> None:
+    """Encuestas del mes: por nombre de bartender o de sus barras en las noches trabajadas"""
+    condition = _name_filter(SurveyResponse.bartender_nombre, employee_name)
+    barras = set().union(*(night['barras'] for night in nights.values())) if nights else set()
+    if barras:
+        fechas = [datetime.strptime(fecha, '%Y-%m-%d').date() for fecha in nights]
+        condition = or_(condition, and_(
+            SurveyResponse.barra.in_(barras),
+            SurveyResponse.fecha_sesion.in_(fechas),
+        ))
+
+    rows = db.session.query(SurveyResponse.rating, func.count(SurveyResponse.id)).filter(
+        SurveyResponse.fecha_sesion >= start.date(),
+        SurveyResponse.fecha_sesion < end.date(),
+        condition,
+    ).group_by(SurveyResponse.rating).all()
+
+    for rating, count in rows:
+        if rating is None:
+            continue
+        activity['encuestas'] += count
+        activity['rating_sum'] += rating * count
+        activity['ratings_count'][int(rating)] = count
+
+
+def _aggregate_punctuality(activity, employee_id, mes, nights) -> None:
+    """Primera/última entrega de cada jornada del mes contra el horario de la planilla"""
+    rows = db.session.query(
+        Jornada.id,
+        Jornada.fecha_jornada,
+        PlanillaTrabajador.hora_inicio,
+        PlanillaTrabajador.hora_fin,
+    ).join(
+        PlanillaTrabajador,
+        PlanillaTrabajador.jornada_id == Jornada.id,
+    ).filter(
+        PlanillaTrabajador.id_empleado == employee_id,
+        Jornada.fecha_jornada >= f'{mes}-01',
+        Jornada.fecha_jornada < f'{shift_month(mes, 1)}-01',
+    ).order_by(Jornada.id, PlanillaTrabajador.id).all()
+
+    seen = set()
+    for jornada_id, fecha_jornada, hora_inicio, hora_fin in rows:
+        # Una fila de planilla por jornada (la primera)
+        if jornada_id in seen:
+            continue
+        seen.add(jornada_id)
+        activity['jornadas'] += 1
+
+        night = nights.get(fecha_jornada)
+        if not night or not night['first'] or not hora_inicio:
+            continue
+        primera, ultima = night['first'], night['last']
+        try:
+            hora_programada = datetime.strptime(hora_inicio, '%H:%M').time()
+            hora_real = primera.time()
+            hora_programada_dt = datetime.combine(primera.date(), hora_programada)
+            hora_real_dt = datetime.combine(primera.date(), hora_real)
+            # Si la hora real es muy temprano (antes de medianoche), podría ser del día siguiente
+            if hora_real < hora_programada and hora_real.hour < 12:
+                hora_real_dt = datetime.combine(primera.date() + timedelta(days=1), hora_real)
+
+            diferencia_minutos = (hora_real_dt - hora_programada_dt).total_seconds() / 60.0
+            if diferencia_minutos > 0:  # Tarde
+                activity['retraso_apertura_sum'] += diferencia_minutos
+                activity['retraso_apertura_n'] += 1
+                activity['jornadas_tardes'] += 1
+            else:  # Puntual o temprano
+                activity['jornadas_puntuales'] += 1
+
+            # Retraso en cierre (última entrega vs hora programada de fin)
+            if hora_fin and ultima:
+                hora_fin_programada = datetime.strptime(hora_fin, '%H:%M').time()
+                hora_fin_real = ultima.time()
+                hora_fin_programada_dt = datetime.combine(ultima.date(), hora_fin_programada)
+                hora_fin_real_dt = datetime.combine(ultima.date(), hora_fin_real)
+                # Ajustar si cruza medianoche
+                if hora_fin_programada.hour > 12 and hora_fin_real.hour < 12:
+                    hora_fin_real_dt = datetime.combine(ultima.date() + timedelta(days=1), hora_fin_real)
+
+                diferencia_cierre = (hora_fin_real_dt - hora_fin_programada_dt).total_seconds() / 60.0
+                if diferencia_cierre > 0:
+                    activity['retraso_cierre_sum'] += diferencia_cierre
+                    activity['retraso_cierre_n'] += 1
+        except Exception as e:
+            logger.warning(f"Error al calcular puntualidad de {employee_id} en {fecha_jornada}: {e}")
+
+
+def _aggregate_efficiency(activity, start, end, nights) -> None:
+    """Merma de los inventarios cerrados de cada barra en las noches que trabajó en ella"""
+    pairs = {(fecha, barra) for fecha, night in nights.items() for barra in night['barras']}
+    if not pairs:
+        return
+
+    esperado = InventoryItem.initial_quantity - InventoryItem.delivered_quantity
+    con_final = InventoryItem.final_quantity.isnot(None)
+    con_merma = and_(con_final, InventoryItem.final_quantity < esperado)
+    sin_merma = and_(con_final, InventoryItem.final_quantity >= esperado)
+
+    rows = db.session.query(
+        InventoryItem.shift_date,
+        InventoryItem.barra,
+        func.count(InventoryItem.id),
+        func.sum(case((con_merma, 1), else_=0)),
+        func.sum(case((sin_merma, 1), else_=0)),
+        func.sum(case((con_merma, esperado - InventoryItem.final_quantity), else_=0)),
+    ).filter(
+        InventoryItem.status == 'closed',  # Solo inventarios cerrados
+        InventoryItem.shift_date >= start.date(),
+        InventoryItem.shift_date < end.date(),
+        InventoryItem.barra.in_({barra for _, barra in pairs}),
+    ).group_by(InventoryItem.shift_date, InventoryItem.barra).all()
+
+    for shift_date, barra, items_total, items_con_merma, items_sin_merma, merma in rows:
+        fecha = _day_key(shift_date)
+        if (fecha, barra) not in pairs or not items_total:
+            continue
+        items_con_merma = int(items_con_merma or 0)
+        items_sin_merma = int(items_sin_merma or 0)
+        inventario = {
+            'fecha': fecha,
+            'barra': barra,
+            'merma': float(merma or 0),
+            'items_total': int(items_total),
+            'items_con_merma': items_con_merma,
+            'items_sin_merma': items_sin_merma,
+            'eficiencia': items_sin_merma / items_total * 100,
+        }
+        activity['inventarios'] += 1
+        activity['merma_total'] += inventario['merma']
+        activity['eficiencia_sum'] += inventario['eficiencia']
+        if items_con_merma == 0:
+            activity['inventarios_sin_merma'] += 1
+        else:
+            activity['inventarios_con_merma'] += 1
+        mejor, peor = activity['mejor_inventario'], activity['peor_inventario']
+        if mejor is None or inventario['merma'] < mejor['merma']:
+            activity['mejor_inventario'] = inventario
+        if peor is None or inventario['merma'] > peor['merma']:
+            activity['peor_inventario'] = inventario
+
+
+def compute_month_activity(employee_id: str, employee_name: Optional[str], mes: str) -> Dict[str, Any]:
+    """Entregas, encuestas, puntualidad y eficiencia de un empleado en un mes"""
+    activity = empty_activity(mes)
+    start, end = month_bounds(mes)
+    nights: Dict[str, Dict[str, Any]] = {}
+
+    if employee_name:
+        nights = _aggregate_deliveries(activity, employee_name, start, end)
+        try:
+            _aggregate_surveys(activity, employee_name, start, end, nights)
+        except Exception as e:
+            logger.warning(f"Error al agregar encuestas de {employee_id} en {mes}: {e}")
+    try:
+        _aggregate_punctuality(activity, str(employee_id), mes, nights)
+    except Exception as e:
+        logger.warning(f"Error al agregar puntualidad de {employee_id} en {mes}: {e}")
+    try:
+        _aggregate_efficiency(activity, start, end, nights)
+    except Exception as e:
+        logger.warning(f"Error al agregar eficiencia de {employee_id} en {mes}: {e}")
+    return activity
+
+
+# ===== Resumen mensual materializado =====
+
+def _is_final(row: EmployeeMonthlyStats, mes: str, employee_name: Optional[str]) -> bool:
+    """La fila se calculó con el mes ya terminado y con el nombre actual del empleado"""
+    _, end = month_bounds(mes)
+    return bool(row.computed_at) and row.computed_at >= end + FINAL_GRACE and row.employee_name == employee_name
+
+
+def _first_activity_month(employee_id: str, employee_name: Optional[str]) -> Optional[str]:
+    """Primer mes con entregas, encuestas o planilla del empleado (una consulta MIN por fuente)"""
+    candidates = []
+    if employee_name:
+        first_delivery = db.session.query(func.min(Delivery.timestamp)).filter(
+            _name_filter(Delivery.bartender, employee_name)
+        ).scalar()
+        first_survey = db.session.query(func.min(SurveyResponse.fecha_sesion)).filter(
+            _name_filter(SurveyResponse.bartender_nombre, employee_name)
+        ).scalar()
+        candidates.extend(_day_key(value) for value in (first_delivery, first_survey))
+    first_jornada = db.session.query(func.min(Jornada.fecha_jornada)).join(
+        PlanillaTrabajador,
+        PlanillaTrabajador.jornada_id == Jornada.id,
+    ).filter(PlanillaTrabajador.id_empleado == employee_id).scalar()
+    candidates.append(first_jornada)
+
+    months = [value[:7] for value in candidates if value and len(value) >= 7]
+    return min(months) if months else None
+
+
+def refresh_employee_months(employee_id: str, employee_name: Optional[str], months: Iterable[str],
+                            rows: Optional[Dict[str, EmployeeMonthlyStats]] = None) -> List[Dict[str, Any]]:
+    """Recalcula y guarda los meses indicados; devuelve sus agregados"""
+    employee_id = str(employee_id)
+    rows = rows if rows is not None else {}
+    activities = [compute_month_activity(employee_id, employee_name, mes) for mes in months]
+    try:
+        for activity in activities:
+            row = rows.get(activity['mes'])
+            if row is None:
+                row = EmployeeMonthlyStats(employee_id=employee_id, mes=activity['mes'])
+                db.session.add(row)
+                rows[activity['mes']] = row
+            row.employee_name = employee_name
+            row.update_from(activity)
+        db.session.commit()
+    except Exception as e:
+        # Otro worker pudo insertar el mismo mes: la ficha se muestra igual con lo calculado
+        db.session.rollback()
+        logger.warning(f"No se pudo guardar el resumen mensual de {employee_id}: {e}")
+    return activities
+
+
+def get_employee_activity(employee_id: str, employee_name: Optional[str],
+                          now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Agregados por mes de todo el historial del empleado (meses cerrados + mes en curso)"""
+    from app.helpers.timezone_utils import CHILE_TZ
+
+    employee_id = str(employee_id)
+    now = now or datetime.now(CHILE_TZ)
+    current = now.strftime(MONTH_FORMAT)
+    last_closed = shift_month(current, -1)
+
+    rows = {row.mes: row for row in EmployeeMonthlyStats.query.filter_by(employee_id=employee_id).all()}
+    if rows:
+        first = min(rows)
+    else:
+        # Primera consulta: el historial completo queda guardado (sin actividad, un mes vacío como ancla)
+        first = _first_activity_month(employee_id, employee_name) or last_closed
+    first = min(first, last_closed)
+
+    activities = []
+    stale = []
+    for mes in months_between(first, last_closed):
+        row = rows.get(mes)
+        if row is not None and _is_final(row, mes, employee_name):
+            activities.append(row.to_activity())
+        else:
+            stale.append(mes)
+    if stale:
+        activities.extend(refresh_employee_months(employee_id, employee_name, stale, rows))
+
+    # El mes en curso siempre en vivo (acotado a un mes de datos)
+    activities.append(compute_month_activity(employee_id, employee_name, current))
+    activities.sort(key=lambda activity: activity['mes'])
+    return activities
+
+
+def refresh_jornada_rollups(jornada) -> int:
+    """
+    Recalcula el mes de una jornada recién cerrada para los trabajadores de su planilla
+
+    Solo para empleados que ya tienen historial en employee_monthly_stats (los
+    demás lo generan completo en su primera consulta). Devuelve cuántos
+    empleados se recalcularon. Nunca lanza: el cierre ya está confirmado.
+    """
+    try:
+        from app.models.pos_models import Employee
+
+        mes = (jornada.fecha_jornada or '')[:7]
+        month_bounds(mes)
+        employee_ids = {
+            str(planilla.id_empleado)
+            for planilla in PlanillaTrabajador.query.filter_by(jornada_id=jornada.id).all()
+            if planilla.id_empleado
+        }
+        if not employee_ids:
+            return 0
+
+        tracked = {
+            employee_id for (employee_id,) in db.session.query(EmployeeMonthlyStats.employee_id).filter(
+                EmployeeMonthlyStats.employee_id.in_(employee_ids)
+            ).distinct().all()
+        }
+        if not tracked:
+            return 0
+
+        names = {
+            str(employee.id): employee.name
+            for employee in Employee.query.filter(Employee.id.in_(tracked)).all()
+        }
+        existing = EmployeeMonthlyStats.query.filter(
+            EmployeeMonthlyStats.employee_id.in_(tracked),
+            EmployeeMonthlyStats.mes == mes,
+        ).all()
+        rows_by_employee = {row.employee_id: {mes: row} for row in existing}
+
+        for employee_id in tracked:
+            refresh_employee_months(employee_id, names.get(employee_id), [mes], rows_by_employee.get(employee_id, {}))
+        return len(tracked)
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"No se pudo actualizar el resumen mensual de la jornada {getattr(jornada, 'id', None)}: {e}")
+        return 0
+
+
+# ===== Estadísticas para la ficha =====
+
+def summarize_activity(activities: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combina los meses en las claves de rendimiento que usa la ficha"""
+    total = empty_activity('')
+    for activity in activities:
+        for field in EmployeeMonthlyStats.COUNTERS:
+            total[field] += activity.get(field) or 0
+        for rating, count in (activity.get('ratings_count') or {}).items():
+            total['ratings_count'][rating] = total['ratings_count'].get(rating, 0) + count
+        noche = activity.get('mejor_noche')
+        if noche and (total['mejor_noche'] is None or noche['tragos'] > total['mejor_noche']['tragos']):
+            total['mejor_noche'] = noche
+        mejor = activity.get('mejor_inventario')
+        if mejor and (total['mejor_inventario'] is None or mejor['merma'] < total['mejor_inventario']['merma']):
+            total['mejor_inventario'] = mejor
+        peor = activity.get('peor_inventario')
+        if peor and (total['peor_inventario'] is None or peor['merma'] > total['peor_inventario']['merma']):
+            total['peor_inventario'] = peor
+
+    estadisticas_entregas_mensuales = [
+        {'mes': a['mes'], 'tragos': a['tragos'], 'entregas': a['entregas'], 'noches': a['noches']}
+        for a in sorted(activities, key=lambda a: a['mes'], reverse=True)
+        if a['entregas']
+    ][:6]  # Últimos 6 meses con entregas
+
+    return {
+        'total_tragos_entregados': total['tragos'],
+        'total_entregas': total['entregas'],
+        'noches_trabajadas': total['noches'],
+        'promedio_tragos_por_noche': total['tragos'] / total['noches'] if total['noches'] else 0.0,
+        'promedio_ritmo_trabajo': total['ritmo_sum'] / total['ritmo_noches'] if total['ritmo_noches'] else 0.0,
+        'mejor_noche': total['mejor_noche'],
+        'estadisticas_entregas_mensuales': estadisticas_entregas_mensuales,
+        'total_encuestas': total['encuestas'],
+        'promedio_rating': total['rating_sum'] / total['encuestas'] if total['encuestas'] else 0.0,
+        'ratings_distribucion': dict(total['ratings_count']),
+        'puntualidad': {
+            'total_jornadas': total['jornadas'],
+            'jornadas_puntuales': total['jornadas_puntuales'],
+            'jornadas_tardes': total['jornadas_tardes'],
+            'promedio_retraso_apertura': (
+                total['retraso_apertura_sum'] / total['retraso_apertura_n'] if total['retraso_apertura_n'] else 0.0
+            ),
+            'promedio_retraso_cierre': (
+                total['retraso_cierre_sum'] / total['retraso_cierre_n'] if total['retraso_cierre_n'] else 0.0
+            ),
+            'tasa_puntualidad': total['jornadas_puntuales'] / total['jornadas'] * 100 if total['jornadas'] else 0.0,
+        },
+        'eficiencia': {
+            'total_inventarios': total['inventarios'],
+            'inventarios_sin_merma': total['inventarios_sin_merma'],
+            'inventarios_con_merma': total['inventarios_con_merma'],
+            'merma_total': total['merma_total'],
+            'merma_promedio': total['merma_total'] / total['inventarios'] if total['inventarios'] else 0.0,
+            'eficiencia_promedio': total['eficiencia_sum'] / total['inventarios'] if total['inventarios'] else 0.0,
+            'mejor_inventario': total['mejor_inventario'],
+            'peor_inventario': total['peor_inventario'],
+        },
+    }
+
+
+def get_shift_summary(employee_id: str, desde: str) -> Dict[str, Any]:
+    """
+    Totales de turnos (EmployeeShift) del empleado y turnos por mes desde `desde`
+    ('YYYY-MM-DD'), con dos consultas agregadas
+    """
+    employee_id = str(employee_id)
+    pagado = EmployeeShift.pagado == True  # noqa: E712
+    totals = db.session.query(
+        func.count(EmployeeShift.id),
+        func.sum(case((pagado, 1), else_=0)),
+        func.count(func.distinct(EmployeeShift.fecha_turno)),
+        func.sum(EmployeeShift.sueldo_turno),
+        func.sum(case((pagado, EmployeeShift.sueldo_turno), else_=0)),
+        func.sum(EmployeeShift.bonos),
+        func.sum(EmployeeShift.descuentos),
+        func.sum(EmployeeShift.horas_trabajadas),
+    ).filter(EmployeeShift.employee_id == employee_id).one()
+
+    mes = func.substr(EmployeeShift.fecha_turno, 1, 7)
+    monthly = db.session.query(
+        mes,
+        func.count(EmployeeShift.id),
+        func.sum(EmployeeShift.sueldo_turno),
+        func.count(func.distinct(EmployeeShift.fecha_turno)),
+    ).filter(
+        EmployeeShift.employee_id == employee_id,
+        EmployeeShift.fecha_turno >= desde,
+    ).group_by(mes).all()
+
+    return {
+        'total_turnos': int(totals[0] or 0),
+        'turnos_pagados': int(totals[1] or 0),
+        'dias_trabajados': int(totals[2] or 0),
+        'sueldo_total': float(totals[3] or 0),
+        'sueldo_pagado': float(totals[4] or 0),
+        'bonos_totales': float(totals[5] or 0),
+        'descuentos_totales': float(totals[6] or 0),
+        'horas_totales': float(totals[7] or 0),
+        'por_mes': {
+            row_mes: {'turnos': int(turnos or 0), 'sueldo': float(sueldo or 0), 'dias': int(dias or 0)}
+            for row_mes, turnos, sueldo, dias in monthly
+            if row_mes
+        },
+    }
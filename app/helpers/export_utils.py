@@ -5,9 +5,9 @@ Formato CSV, JSON y otros
 import csv
 import json
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable
 from io import StringIO
-from flask import Response
+from flask import Response, stream_with_context
 from .logger import get_logger
 
 logger = get_logger(__name__)
@@ -122,6 +122,71 @@ class DataExporter:
         output.close()
         return response
 
+    
+    @staticmethod
+    def stream_csv(rows: Iterable[List[Any]], header: List[str], filename: str = "export") -> Response:
+        """
+        Exporta filas a CSV en streaming (sin cargar todo en memoria)
+        
+        Args:
+            rows: Iterable de filas (listas), ej: generador de iter_logs()
+            header: Encabezado del CSV
+            filename: Nombre del archivo (sin extensión)
+            
+        Returns:
+            Flask Response con el CSV (chunked)
+        """
+        def generate():
+            output = StringIO()
+            writer = csv.writer(output)
+            writer.writerow(header)
+            count = 0
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+                # Emitir en bloques para no generar un chunk por fila
+                if count % 500 == 0:
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate(0)
+            yield output.getvalue()
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/csv',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+            }
+        )
+    
+    @staticmethod
+    def stream_json(rows: Iterable[Dict[str, Any]], filename: str = "export") -> Response:
+        """
+        Exporta registros a JSON en streaming (misma estructura que export_to_json)
+        
+        Args:
+            rows: Iterable de diccionarios
+            filename: Nombre del archivo (sin extensión)
+            
+        Returns:
+            Flask Response con el JSON (chunked)
+        """
+        def generate():
+            yield '{"export_date": %s, "data": [' % json.dumps(datetime.now().isoformat())
+            count = 0
+            for row in rows:
+                yield (',' if count else '') + json.dumps(row, ensure_ascii=False, default=str)
+                count += 1
+            yield '], "count": %d}' % count
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/json',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json"'
+            }
+        )
+
 
 class MetricsExporter:
     """Exportador de métricas y estadísticas"""
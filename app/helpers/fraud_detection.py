@@ -3,7 +3,7 @@ import csv
 from datetime import datetime, timedelta
 from collections import defaultdict
 from flask import current_app
-from .logs import load_logs
+from .logs import apply_keyset, iter_keyset, encode_cursor, parse_datetime_filter, LOG_PAGE_SIZE, LOG_STREAM_BATCH_SIZE
 from .fraud_config import load_fraud_config
 from ..models import db
 from ..models.delivery_models import FraudAttempt, Delivery
@@ -33,16 +33,85 @@ def save_fraud_attempt(sale_id, bartender, barra, item_name, qty, fraud_type, au
         return False
 
 
-def load_fraud_attempts():
-    """Carga todos los intentos de fraude desde la base de datos"""
+def query_fraud_attempts(sale_id=None, fraud_type=None, bartender=None, barra=None,
+                         authorized=None, start=None, end=None):
+    """Consulta de intentos de fraude con filtros (sin ordenar ni ejecutar)"""
+    query = FraudAttempt.query
+    if sale_id:
+        query = query.filter(FraudAttempt.sale_id == str(sale_id))
+    if fraud_type:
+        query = query.filter(FraudAttempt.fraud_type == fraud_type)
+    if bartender:
+        query = query.filter(FraudAttempt.bartender == bartender)
+    if barra:
+        query = query.filter(FraudAttempt.barra == barra)
+    if authorized is not None:
+        query = query.filter(FraudAttempt.authorized == bool(authorized))
+    start, end = parse_datetime_filter(start), parse_datetime_filter(end)
+    if start:
+        query = query.filter(FraudAttempt.timestamp >= start)
+    if end:
+        query = query.filter(FraudAttempt.timestamp < end)
+    return query
+
+
+def load_fraud_attempts_page(cursor=None, limit=LOG_PAGE_SIZE, **filters):
+    """
+    Página de intentos de fraude (más recientes primero) con paginación por keyset.
+
+    Returns:
+        dict: {'fraud_attempts': [filas CSV], 'next_cursor': str o None}
+    """
     try:
-        fraud_attempts = FraudAttempt.query.order_by(FraudAttempt.timestamp.desc()).all()
-        return [fraud.to_csv_row() for fraud in fraud_attempts]
+        limit = max(1, min(int(limit or LOG_PAGE_SIZE), 1000))
+        attempts = apply_keyset(query_fraud_attempts(**filters), FraudAttempt, cursor).limit(limit + 1).all()
+        has_more = len(attempts) > limit
+        attempts = attempts[:limit]
+        return {
+            'fraud_attempts': [fraud.to_csv_row() for fraud in attempts],
+            'next_cursor': encode_cursor(attempts[-1].timestamp, attempts[-1].id) if has_more else None
+        }
+    except Exception as e:
+        current_app.logger.error(f"Error al cargar página de intentos de fraude desde BD: {e}")
+        return {'fraud_attempts': [], 'next_cursor': None}
+
+
+def iter_fraud_attempts(batch_size=LOG_STREAM_BATCH_SIZE, **filters):
+    """Genera filas CSV de intentos de fraude en lotes (para exportación en streaming)"""
+    for fraud in iter_keyset(query_fraud_attempts(**filters), FraudAttempt, batch_size):
+        yield fraud.to_csv_row()
+
+
+def load_fraud_attempts(limit=None, **filters):
+    """
+    Carga intentos de fraude desde la base de datos.
+    Para historiales grandes usar load_fraud_attempts_page() o iter_fraud_attempts().
+    """
+    try:
+        query = apply_keyset(query_fraud_attempts(**filters), FraudAttempt, None)
+        if limit:
+            query = query.limit(limit)
+        return [fraud.to_csv_row() for fraud in query.all()]
     except Exception as e:
         current_app.logger.error(f"Error al cargar intentos de fraude desde BD: {e}")
         return []
 
 
+def get_fraud_attempt_counts():
+    """Totales de intentos de fraude (autorizados / no autorizados) con una consulta agregada"""
+    from sqlalchemy import func, case
+    try:
+        total, authorized = db.session.query(
+            func.count(FraudAttempt.id),
+            func.sum(case((FraudAttempt.authorized == True, 1), else_=0))
+        ).one()
+        total, authorized = int(total or 0), int(authorized or 0)
+        return {'total': total, 'authorized': authorized, 'unauthorized': total - authorized}
+    except Exception as e:
+        current_app.logger.error(f"Error al contar intentos de fraude: {e}")
+        return {'total': 0, 'authorized': 0, 'unauthorized': 0}
+
+
 def count_delivery_attempts(sale_id):
     """Cuenta cuántas veces se ha intentado entregar un ticket (incluyendo entregas exitosas y autorizadas)"""
     # CORRECCIÓN: Validar que sale_id no sea None o vacío
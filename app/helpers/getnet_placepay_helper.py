@@ -9,6 +9,7 @@ import base64
 import secrets
 from typing import Optional, Dict, Any
 from flask import current_app
+from app.infrastructure.external.http_client import get_http_client
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -294,7 +295,7 @@ def create_getnet_payment_placetopay(
         for endpoint in possible_endpoints:
             logger.info(f"Intentando endpoint: {endpoint}")
             try:
-                response = requests.post(
+                response = get_http_client().post(
                     endpoint,
                     json=payment_request,
                     headers=headers,
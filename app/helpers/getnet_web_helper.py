@@ -8,6 +8,7 @@ import base64
 import secrets
 from typing import Optional, Dict, Any
 from flask import current_app
+from app.infrastructure.external.http_client import get_http_client
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -154,12 +155,13 @@ def get_getnet_access_token(force_refresh: bool = False) -> Optional[str]:
         auth = (config['client_id'], config['client_secret'])
         
         logger.info(f"Obteniendo token OAuth2 de GetNet desde {auth_url}")
-        response = requests.post(
+        response = get_http_client().post(
             auth_url,
             headers=headers,
             data=data,
             auth=auth,
-            timeout=10
+            timeout=10,
+            idempotent=True  # Pedir otro token no tiene efectos
         )
         
         if response.status_code == 200:
@@ -328,7 +330,7 @@ def create_getnet_payment(
             return None
         
         try:
-            response = requests.post(
+            response = get_http_client().post(
                 payment_url,
                 json=payment_data,
                 headers=headers,
@@ -459,7 +461,7 @@ def get_getnet_payment_status(payment_id: str) -> Optional[Dict[str, Any]]:
         payment_status_url = f"{config['api_base_url']}/v1/payments/{payment_id}"
         
         logger.debug(f"Consultando estado de pago GetNet: payment_id={payment_id}, endpoint={payment_status_url}")
-        response = requests.get(
+        response = get_http_client().get(
             payment_status_url,
             headers=headers,
             timeout=10
@@ -0,0 +1,394 @@
+"""
+Mapa de ocupación de clusters de guardarropía
+
+Bitmap por turno (shift_date) de los clusters ocupados por items depositados
+y no eliminados; la vista global es el OR de todos los turnos. Se construye
+con una sola consulta (columnas necesarias, sin objetos ORM) y se mantiene
+con eventos de la sesión ORM (depósito, retiro, pérdida, eliminación).
+
+Entre workers, cada cambio confirmado incrementa una versión compartida en
+el cache manager; un worker con otra versión (o con el mapa más antiguo que
+MAX_AGE) lo reconstruye desde la BD antes de responder.
+
+reserve() asigna N clusters contiguos (o valida los pedidos) y los deja
+reservados hasta que el depósito se confirma o se libera, de modo que dos
+depósitos simultáneos del mismo worker no reciben los mismos clusters. Entre
+workers el mapa puede estar atrasado: find_db_conflicts() revalida los
+clusters contra la BD y allocate_clusters() los registra con una restricción
+única (turno, cluster), ambos dentro de la transacción que inserta el
+depósito.
+"""
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime
+import threading
+import time
+import logging
+
+from app.infrastructure.cache import get_cache_manager
+from app.infrastructure.session_changes import watch, KIND_DELETED
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = 'guardarropia_clusters'
+VERSION_KEY = 'version'
+
+TOTAL_CLUSTERS = 90         # Clusters del 1 al 90
+MAX_AGE = 30.0              # Respaldo para cambios hechos fuera de la sesión ORM / sin cache compartido
+RESERVATION_TTL = 30.0      # Reserva de un depósito en curso
+
+ALL_CLUSTERS_MASK = ((1 << TOTAL_CLUSTERS) - 1) << 1  # Bits 1..TOTAL_CLUSTERS
+
+get_cache_manager().register_namespace(CACHE_NAMESPACE, 24 * 3600, max_entries=10)
+
+
+def parse_cluster_numbers(value: Optional[str]) -> List[int]:
+    """Números de cluster de un item (formato: "1,2,3" o "1, 2, 3")"""
+    if not value:
+        return []
+    return [int(c.strip()) for c in value.split(',') if c.strip().isdigit()]
+
+
+def _bits(clusters) -> int:
+    mask = 0
+    for cluster in clusters:
+        if 1 <= cluster <= TOTAL_CLUSTERS:
+            mask |= 1 << cluster
+    return mask
+
+
+def _clusters(mask: int) -> List[int]:
+    return [cluster for cluster in range(1, TOTAL_CLUSTERS + 1) if mask >> cluster & 1]
+
+
+def _item_info(row) -> Dict[str, Any]:
+    """Datos del item que muestran el mapa y el modal del informe"""
+    return {
+        'ticket_code': row.ticket_code,
+        'customer_name': row.customer_name or 'Sin nombre',
+        'customer_phone': row.customer_phone or '-',
+        'description': row.description or '-',
+        'price': float(row.price) if row.price else 0,
+        'deposited_at': row.deposited_at.isoformat() if row.deposited_at else None,
+        'id': row.id,
+        'payment_type': row.payment_type,
+        'clusters': row.clusters,
+        'cluster_numbers': row.cluster_numbers,
+        'deposited_by': row.deposited_by,
+        'notes': row.notes,
+        'sale_id': row.sale_id
+    }
+
+
+ITEM_COLUMNS = (
+    'id', 'ticket_code', 'customer_name', 'customer_phone', 'description', 'price',
+    'deposited_at', 'payment_type', 'clusters', 'cluster_numbers', 'deposited_by',
+    'notes', 'sale_id', 'shift_date', 'status', 'deleted_at'
+)
+
+
+class ClusterMap:
+    """Ocupación de clusters por turno (uno por proceso)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._items: Dict[int, Dict[str, Any]] = {}       # item_id -> {'shift', 'clusters', 'info'}
+        self._counts: Dict[str, List[int]] = {}           # turno -> items por cluster
+        self._bitmaps: Dict[str, int] = {}                # turno -> bitmap de ocupados
+        self._reserved: Dict[int, float] = {}             # cluster -> vencimiento de la reserva
+        self._version = None
+        self._loaded_at = 0.0
+        self._stats = {'rebuilds': 0, 'applied': 0, 'reservations': 0, 'conflicts': 0}
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+    @staticmethod
+    def shared_version() -> int:
+        return get_cache_manager().get(CACHE_NAMESPACE, VERSION_KEY, 0)
+
+    def rebuild(self) -> int:
+        """Reconstruye el mapa desde la BD (items depositados y no eliminados)"""
+        from app.models.guardarropia_models import GuardarropiaItem
+
+        version = self.shared_version()
+        rows = GuardarropiaItem.query.with_entities(
+            *(getattr(GuardarropiaItem, column) for column in ITEM_COLUMNS)
+        ).filter(
+            GuardarropiaItem.status == 'deposited',
+            GuardarropiaItem.not_deleted(),
+            GuardarropiaItem.cluster_numbers.isnot(None)
+        ).order_by(GuardarropiaItem.id).all()
+
+        with self._lock:
+            self._items.clear()
+            self._counts.clear()
+            self._bitmaps.clear()
+            for row in rows:
+                self._add_locked(row.id, row.shift_date, parse_cluster_numbers(row.cluster_numbers), _item_info(row))
+            self._version = version
+            self._loaded_at = time.monotonic()
+            self._stats['rebuilds'] += 1
+        return len(rows)
+
+    def _ensure_current(self) -> None:
+        if (self._version is None or time.monotonic() - self._loaded_at >= MAX_AGE
+                or self._version != self.shared_version()):
+            self.rebuild()
+
+    def _add_locked(self, item_id: int, shift_date: Optional[str], clusters: List[int], info: Dict[str, Any]) -> None:
+        shift = shift_date or ''
+        counts = self._counts.setdefault(shift, [0] * (TOTAL_CLUSTERS + 1))
+        clusters = [cluster for cluster in clusters if 1 <= cluster <= TOTAL_CLUSTERS]
+        for cluster in clusters:
+            counts[cluster] += 1
+            self._reserved.pop(cluster, None)
+        self._bitmaps[shift] = self._bitmaps.get(shift, 0) | _bits(clusters)
+        self._items[item_id] = {'shift': shift, 'clusters': clusters, 'info': info}
+
+    def _remove_locked(self, item_id: int) -> None:
+        entry = self._items.pop(item_id, None)
+        if entry is None:
+            return
+        counts = self._counts[entry['shift']]
+        bitmap = self._bitmaps.get(entry['shift'], 0)
+        for cluster in entry['clusters']:
+            counts[cluster] -= 1
+            if counts[cluster] <= 0:
+                counts[cluster] = 0
+                bitmap &= ~(1 << cluster)
+        self._bitmaps[entry['shift']] = bitmap
+
+    def apply(self, snapshots: List[Dict[str, Any]]) -> None:
+        """Aplica cambios confirmados en este proceso (snapshots tomados en after_flush)"""
+        with self._lock:
+            for snap in snapshots:
+                self._remove_locked(snap['id'])
+                if snap['active']:
+                    self._add_locked(snap['id'], snap['shift_date'], snap['clusters'], snap['info'])
+            self._stats['applied'] += len(snapshots)
+            # Avisar a los otros workers; si este ya estaba atrasado, reconstruir en la próxima consulta
+            manager = get_cache_manager()
+            shared = manager.get(CACHE_NAMESPACE, VERSION_KEY, 0)
+            manager.set(CACHE_NAMESPACE, VERSION_KEY, shared + 1)
+            self._version = shared + 1 if shared == self._version else None
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def _mask_locked(self, shift_date: Optional[str] = None) -> int:
+        if shift_date:
+            return self._bitmaps.get(shift_date, 0)
+        mask = 0
+        for bitmap in self._bitmaps.values():
+            mask |= bitmap
+        return mask
+
+    def occupied(self, shift_date: Optional[str] = None) -> List[int]:
+        """Clusters ocupados del turno (o de todos los turnos si shift_date es None)"""
+        with self._lock:
+            self._ensure_current()
+            return _clusters(self._mask_locked(shift_date))
+
+    def available(self, count: int = 1, shift_date: Optional[str] = None) -> List[int]:
+        """Clusters libres (primeros `count`; todos si count <= 0)"""
+        with self._lock:
+            self._ensure_current()
+            free = _clusters(ALL_CLUSTERS_MASK & ~self._mask_locked(shift_date))
+        return free[:count] if count > 0 else free
+
+    def cluster_info(self, shift_date: Optional[str] = None) -> Dict[int, List[Dict[str, Any]]]:
+        """{cluster: [datos de cada item que lo ocupa]}"""
+        with self._lock:
+            self._ensure_current()
+            info: Dict[int, List[Dict[str, Any]]] = {}
+            for entry in self._items.values():
+                if shift_date and entry['shift'] != shift_date:
+                    continue
+                for cluster in entry['clusters']:
+                    info.setdefault(cluster, []).append(dict(entry['info']))
+            return info
+
+    # ------------------------------------------------------------------
+    # Asignación
+    # ------------------------------------------------------------------
+    def _reserved_mask_locked(self) -> int:
+        now = time.monotonic()
+        for cluster in [c for c, expires in self._reserved.items() if expires <= now]:
+            del self._reserved[cluster]
+        return _bits(self._reserved)
+
+    def reserve(self, shift_date: Optional[str], count: int = 1,
+                requested: Optional[List[int]] = None) -> Tuple[List[int], List[int]]:
+        """
+        Reserva clusters para un depósito (atómico dentro del proceso).
+
+        Sin `requested` busca `count` clusters contiguos libres en todos los
+        turnos (si no hay un tramo contiguo, los primeros libres). Con
+        `requested` valida que estén libres en el turno.
+
+        Returns:
+            (clusters reservados, clusters en conflicto); si hay conflicto o
+            no alcanzan, no se reserva nada
+        """
+        with self._lock:
+            self._ensure_current()
+            reserved = self._reserved_mask_locked()
+            if requested:
+                busy = self._mask_locked(shift_date) | reserved
+                conflicts = [cluster for cluster in requested if busy >> cluster & 1]
+                if conflicts:
+                    self._stats['conflicts'] += 1
+                    return [], conflicts
+                clusters = list(requested)
+            else:
+                free_mask = ALL_CLUSTERS_MASK & ~(self._mask_locked() | reserved)
+                clusters = self._contiguous(free_mask, count) or _clusters(free_mask)[:count]
+                if len(clusters) < count:
+                    return clusters, []
+            expires = time.monotonic() + RESERVATION_TTL
+            for cluster in clusters:
+                self._reserved[cluster] = expires
+            self._stats['reservations'] += 1
+            return clusters, []
+
+    @staticmethod
+    def _contiguous(free_mask: int, count: int) -> List[int]:
+        """Primer tramo de `count` clusters libres consecutivos ([] si no hay)"""
+        if count <= 0:
+            return []
+        # run tiene el bit c encendido si c..c+count-1 están libres
+        run = free_mask
+        for offset in range(1, count):
+            run &= free_mask >> offset
+        if not run:
+            return []
+        start = (run & -run).bit_length() - 1
+        return list(range(start, start + count))
+
+    def mark_stale(self) -> None:
+        """Fuerza la reconstrucción en la próxima consulta (ej: la BD mostró un conflicto)"""
+        with self._lock:
+            self._version = None
+
+    def release(self, clusters: List[int]) -> None:
+        """Libera una reserva (depósito fallido)"""
+        with self._lock:
+            for cluster in clusters:
+                self._reserved.pop(cluster, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'items': len(self._items),
+                'reserved': sorted(self._reserved),
+                'occupied_by_shift': {shift or '-': bin(bitmap).count('1') for shift, bitmap in self._bitmaps.items()},
+                'version': self._version
+            }
+
+
+_map = ClusterMap()
+
+
+def get_cluster_map() -> ClusterMap:
+    """Mapa de clusters de guardarropía (uno por proceso)"""
+    return _map
+
+
+def find_db_conflicts(item_id: int, clusters: List[int], shift_date: Optional[str] = None) -> List[int]:
+    """
+    Clusters de `clusters` que otro item depositado ocupa en la BD.
+
+    Llamar dentro de la transacción que inserta el depósito, después del
+    flush: lee con FOR UPDATE los items depositados del turno (de todos los
+    turnos si shift_date es None). Solo bloquea filas existentes; dos
+    depósitos concurrentes en un turno vacío los separa allocate_clusters().
+    """
+    from app.models.guardarropia_models import GuardarropiaItem
+
+    query = GuardarropiaItem.query.with_entities(GuardarropiaItem.id, GuardarropiaItem.cluster_numbers).filter(
+        GuardarropiaItem.status == 'deposited',
+        GuardarropiaItem.not_deleted(),
+        GuardarropiaItem.cluster_numbers.isnot(None),
+        GuardarropiaItem.id != item_id
+    )
+    if shift_date:
+        query = query.filter(GuardarropiaItem.shift_date == shift_date)
+
+    busy = 0
+    for row in query.with_for_update().all():
+        busy |= _bits(parse_cluster_numbers(row.cluster_numbers))
+    return [cluster for cluster in clusters if busy >> cluster & 1]
+
+
+def _occupies(item_id: int, cluster: int) -> bool:
+    """True si el item sigue depositado, no eliminado y con `cluster` asignado"""
+    from app.models.guardarropia_models import GuardarropiaItem
+
+    row = GuardarropiaItem.query.with_entities(
+        GuardarropiaItem.status, GuardarropiaItem.deleted_at, GuardarropiaItem.cluster_numbers
+    ).filter(GuardarropiaItem.id == item_id).first()
+    return (row is not None and row.status == 'deposited' and row.deleted_at is None
+            and cluster in parse_cluster_numbers(row.cluster_numbers))
+
+
+def allocate_clusters(item_id: int, shift_date: Optional[str], clusters: List[int]) -> List[int]:
+    """
+    Registra (turno, cluster) para el depósito; retorna los clusters en conflicto.
+
+    Llamar dentro de la transacción que inserta el depósito. La restricción
+    única hace que, de dos depósitos concurrentes del mismo cluster, el
+    segundo falle al insertar (espera a que el primero confirme). Si la
+    asignación existente es de un item que ya no ocupa el cluster (retirado,
+    perdido, eliminado o reasignado) se toma con un UPDATE condicional.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from app.models import db
+    from app.models.guardarropia_models import GuardarropiaClusterAllocation as Allocation
+
+    shift = shift_date or ''
+    conflicts = []
+    for cluster in clusters:
+        try:
+            with db.session.begin_nested():
+                db.session.add(Allocation(shift_date=shift, cluster=cluster, item_id=item_id))
+            continue
+        except IntegrityError:
+            pass
+        holder = db.session.query(Allocation.item_id).filter_by(shift_date=shift, cluster=cluster).scalar()
+        if holder is not None and _occupies(holder, cluster):
+            conflicts.append(cluster)
+            continue
+        taken = Allocation.query.filter_by(shift_date=shift, cluster=cluster, item_id=holder).update(
+            {'item_id': item_id, 'allocated_at': datetime.utcnow()}, synchronize_session=False
+        )
+        if not taken:
+            # Otro depósito tomó la asignación entre la lectura y el UPDATE
+            conflicts.append(cluster)
+    return conflicts
+
+
+# ----------------------------------------------------------------------
+# Mantención: depósitos, retiros, pérdidas y eliminaciones confirmados
+# ----------------------------------------------------------------------
+def _item_models():
+    from app.models.guardarropia_models import GuardarropiaItem
+    return (GuardarropiaItem,)
+
+
+def _item_snapshot(obj, kind: str, changed) -> Optional[Dict[str, Any]]:
+    if obj.id is None:
+        return None
+    if kind == KIND_DELETED:
+        return {'id': obj.id, 'active': False}
+    return {
+        'id': obj.id,
+        'active': obj.status == 'deposited' and obj.deleted_at is None and bool(obj.cluster_numbers),
+        'shift_date': obj.shift_date,
+        'clusters': parse_cluster_numbers(obj.cluster_numbers),
+        'info': _item_info(obj)
+    }
+
+
+watch('guardarropia_cluster_map', models=_item_models, apply=lambda snapshots: _map.apply(snapshots),
+      collect=_item_snapshot)
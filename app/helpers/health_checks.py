@@ -85,11 +85,12 @@ def check_external_api() -> Dict[str, Any]:
         
         # Si está configurada, verificar conectividad básica
         import requests
+        from app.infrastructure.external.http_client import get_http_client
         start_time = time.time()
         try:
-            response = requests.get(f"{api_url}/employees", 
+            response = get_http_client().get(f"{api_url}/employees", 
                                   headers={'Authorization': f'Bearer {api_key}'},
-                                  timeout=5)
+                                  timeout=5, retries=0)
             response_time = (time.time() - start_time) * 1000
             
             if response.status_code in [200, 401, 403]:  # 401/403 significa que la API responde
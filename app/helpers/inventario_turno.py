@@ -2,19 +2,282 @@
 Helper para cálculos de inventario durante turnos de bartenders
 Calcula stock esperado, desviaciones y costos
 """
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from functools import cached_property
+from typing import Dict, List, Any, Optional, Tuple, Iterable
 from flask import current_app
+from sqlalchemy import and_, or_
 from app.models import db
 from app.models.bartender_turno_models import (
     BartenderTurno, TurnoStockInicial, TurnoStockFinal,
-    TurnoDesviacionInventario
+    TurnoDesviacionInventario, MermaInventario
 )
 from app.models.inventory_stock_models import InventoryMovement, Ingredient
-from app.models.sale_delivery_models import DeliveryItem
+from app.models.sale_delivery_models import DeliveryItem, SaleDeliveryStatus
 from decimal import Decimal
 
 
+def _dec(value) -> Decimal:
+    """Decimal exacto desde Numeric/float/str (None -> 0)"""
+    return Decimal(str(value)) if value is not None else Decimal('0.0')
+
+
+class DatosCierreTurno:
+    """
+    Datos de un turno cargados en bloque para el cierre.
+    
+    Cada fuente (stock inicial y final, movimientos, mermas, entregas, costos
+    de insumos, precios de venta) se lee con una sola consulta, solo con las
+    columnas necesarias, y se cruza en memoria por insumo_id. Los montos se
+    suman en Decimal fila a fila, igual que antes, para que los totales no
+    cambien por redondeos de SUM en la base de datos. El número de consultas
+    no depende de la cantidad de insumos ni de entregas.
+    """
+    
+    def __init__(self, turno: BartenderTurno):
+        self.turno = turno
+        self.hasta = turno.fecha_hora_cierre or datetime.utcnow()
+        self._costos: Dict[int, Decimal] = {}
+        self._ids_por_nombre: Dict[str, Optional[int]] = {}
+        self._entregas: Dict[str, List[DeliveryItem]] = {}
+    
+    # ===== Stock declarado =====
+    
+    @cached_property
+    def stock_inicial(self) -> Dict[int, TurnoStockInicial]:
+        return {s.insumo_id: s for s in TurnoStockInicial.query.filter_by(turno_id=self.turno.id).all()}
+    
+    @cached_property
+    def stock_final(self) -> Dict[int, TurnoStockFinal]:
+        return {s.insumo_id: s for s in TurnoStockFinal.query.filter_by(turno_id=self.turno.id).all()}
+    
+    @cached_property
+    def desviaciones(self) -> Dict[int, TurnoDesviacionInventario]:
+        return {d.insumo_id: d for d in TurnoDesviacionInventario.query.filter_by(turno_id=self.turno.id).all()}
+    
+    # ===== Costos e insumos =====
+    
+    def cargar_costos(self, insumo_ids: Iterable[int]) -> Dict[int, Decimal]:
+        """Costo unitario actual de los insumos (los que falten se leen en una consulta)"""
+        faltantes = {i for i in insumo_ids if i is not None and i not in self._costos}
+        if faltantes:
+            rows = db.session.query(Ingredient.id, Ingredient.cost_per_unit).filter(
+                Ingredient.id.in_(faltantes)
+            ).all()
+            for insumo_id, costo in rows:
+                self._costos[insumo_id] = _dec(costo) if costo else Decimal('0.0')
+            for insumo_id in faltantes:
+                self._costos.setdefault(insumo_id, Decimal('0.0'))
+        return self._costos
+    
+    def costo(self, insumo_id: int) -> Decimal:
+        return self.cargar_costos([insumo_id]).get(insumo_id, Decimal('0.0'))
+    
+    def ids_por_nombre(self, nombres: Iterable[str]) -> Dict[str, Optional[int]]:
+        """ID de insumo por nombre (ingredients_consumed de las entregas guarda nombres)"""
+        faltantes = {n for n in nombres if n and n not in self._ids_por_nombre}
+        if faltantes:
+            rows = db.session.query(Ingredient.name, Ingredient.id).filter(Ingredient.name.in_(faltantes)).all()
+            self._ids_por_nombre.update(dict(rows))
+            for nombre in faltantes:
+                self._ids_por_nombre.setdefault(nombre, None)
+        return self._ids_por_nombre
+    
+    # ===== Movimientos y mermas (agregados por insumo) =====
+    
+    @cached_property
+    def movimientos_turno(self) -> Tuple[Dict[int, Decimal], Dict[int, Decimal]]:
+        """(transferencias entrantes, consumo registrado) por insumo en la ubicación del turno"""
+        entrada = and_(
+            InventoryMovement.movement_type.in_(['entrada', 'transferencia']),
+            InventoryMovement.quantity > 0
+        )
+        consumo = and_(
+            InventoryMovement.movement_type.in_(['venta', 'delivery']),
+            InventoryMovement.quantity < 0
+        )
+        rows = db.session.query(
+            InventoryMovement.ingredient_id,
+            InventoryMovement.movement_type,
+            InventoryMovement.quantity
+        ).filter(
+            InventoryMovement.location == self.turno.ubicacion,
+            InventoryMovement.turno_id == self.turno.id,
+            or_(entrada, consumo)
+        ).all()
+        
+        entradas: Dict[int, Decimal] = defaultdict(Decimal)
+        consumos: Dict[int, Decimal] = defaultdict(Decimal)
+        for insumo_id, tipo, cantidad in rows:
+            if tipo in ('entrada', 'transferencia'):
+                entradas[insumo_id] += _dec(cantidad)
+            else:
+                # La cantidad es negativa, así que sumamos el valor absoluto
+                consumos[insumo_id] += abs(_dec(cantidad))
+        return entradas, consumos
+    
+    @cached_property
+    def mermas(self) -> Tuple[Dict[int, Decimal], Decimal]:
+        """(cantidad mermada por insumo, costo total de merma) del turno"""
+        rows = db.session.query(
+            MermaInventario.insumo_id,
+            MermaInventario.cantidad_mermada,
+            MermaInventario.costo_merma
+        ).filter(MermaInventario.turno_id == self.turno.id).all()
+        
+        cantidades: Dict[int, Decimal] = defaultdict(Decimal)
+        valor = Decimal('0.0')
+        for insumo_id, cantidad, costo in rows:
+            cantidades[insumo_id] += _dec(cantidad)
+            valor += _dec(costo)
+        return cantidades, valor
+    
+    # ===== Entregas =====
+    
+    def entregas(self, location: str) -> List[DeliveryItem]:
+        """Entregas de una ubicación durante el turno"""
+        if location not in self._entregas:
+            self._entregas[location] = DeliveryItem.query.filter(
+                DeliveryItem.location == location,
+                DeliveryItem.delivered_at >= self.turno.fecha_hora_apertura,
+                DeliveryItem.delivered_at <= self.hasta
+            ).all()
+        return self._entregas[location]
+    
+    @staticmethod
+    def _consumos(entregas: Iterable[DeliveryItem]) -> List[Tuple[str, Any]]:
+        return [
+            (consumo.get('ingrediente', ''), consumo.get('cantidad', 0))
+            for entrega in entregas
+            for consumo in (entrega.ingredients_consumed or [])
+            if isinstance(consumo, dict)
+        ]
+    
+    @cached_property
+    def consumo_entregas(self) -> Dict[int, Decimal]:
+        """Consumo de insumos declarado en las entregas con estado de entrega (por si no se registró en InventoryMovement)"""
+        entregas = self.entregas(self.turno.ubicacion)
+        sale_ids = {e.sale_id for e in entregas}
+        con_estado = set()
+        if sale_ids:
+            con_estado = {
+                sale_id for (sale_id,) in db.session.query(SaleDeliveryStatus.sale_id).filter(
+                    SaleDeliveryStatus.sale_id.in_(sale_ids)
+                ).all()
+            }
+        consumos = self._consumos(e for e in entregas if e.sale_id in con_estado)
+        ids = self.ids_por_nombre(nombre for nombre, _ in consumos)
+        
+        resultado: Dict[int, Decimal] = defaultdict(Decimal)
+        for nombre, cantidad in consumos:
+            insumo_id = ids.get(nombre)
+            if insumo_id:
+                resultado[insumo_id] += _dec(cantidad)
+        return resultado
+    
+    def costo_consumo_entregas(self) -> Decimal:
+        """Costo teórico de los insumos declarados en las entregas del turno"""
+        consumos = self._consumos(self.entregas(self.turno.ubicacion))
+        ids = self.ids_por_nombre(nombre for nombre, _ in consumos)
+        costos = self.cargar_costos(i for i in ids.values() if i)
+        
+        valor_total = Decimal('0.0')
+        for nombre, cantidad in consumos:
+            insumo_id = ids.get(nombre)
+            if insumo_id:
+                valor_total += _dec(cantidad) * costos[insumo_id]
+        return valor_total
+    
+    def valor_vendido_venta(self, location: str, ids_locales: bool = False) -> Decimal:
+        """
+        Valor de venta de lo entregado: precio del item de la venta asociada a
+        cada entrega. Con ids_locales, las ventas BMB-...-<id> sin sale_id_phppos
+        se buscan por ID local.
+        """
+        from app.models.pos_models import PosSale, PosSaleItem
+        
+        entregas = self.entregas(location)
+        sale_ids = {e.sale_id for e in entregas if e.sale_id}
+        if not sale_ids:
+            return Decimal('0.0')
+        
+        ventas = dict(db.session.query(PosSale.sale_id_phppos, PosSale.id).filter(
+            PosSale.sale_id_phppos.in_(sale_ids)
+        ).all())
+        
+        if ids_locales:
+            locales = {}
+            for sale_id in sale_ids - set(ventas):
+                parts = sale_id.split('-')
+                if sale_id.startswith('BMB-') and len(parts) >= 3 and parts[-1].isdigit():
+                    locales[sale_id] = int(parts[-1])
+            if locales:
+                existentes = {
+                    sale_pk for (sale_pk,) in db.session.query(PosSale.id).filter(
+                        PosSale.id.in_(set(locales.values()))
+                    ).all()
+                }
+                ventas.update({s: pk for s, pk in locales.items() if pk in existentes})
+        
+        if not ventas:
+            return Decimal('0.0')
+        
+        # Primer item de la venta con el nombre del producto entregado
+        precios = {}
+        rows = db.session.query(PosSaleItem.sale_id, PosSaleItem.product_name, PosSaleItem.unit_price).filter(
+            PosSaleItem.sale_id.in_(set(ventas.values())),
+            PosSaleItem.product_name.in_({e.product_name for e in entregas})
+        ).order_by(PosSaleItem.id).all()
+        for sale_pk, product_name, unit_price in rows:
+            precios.setdefault((sale_pk, product_name), unit_price)
+        
+        valor_total = Decimal('0.0')
+        for entrega in entregas:
+            sale_pk = ventas.get(entrega.sale_id)
+            if sale_pk is None or (sale_pk, entrega.product_name) not in precios:
+                continue
+            valor_total += _dec(precios[(sale_pk, entrega.product_name)]) * _dec(entrega.quantity_delivered)
+        return valor_total
+    
+    # ===== Stock esperado =====
+    
+    def stock_esperado(self, insumo_id: int) -> Decimal:
+        """
+        STOCK_ESPERADO = STOCK_INICIAL_TURNO
+                         + TRANSFERENCIAS_ENTRANTES
+                         - CONSUMO_POR_RECETAS
+                         - MERMAS_REGISTRADAS
+        """
+        stock_inicial_reg = self.stock_inicial.get(insumo_id)
+        stock_inicial = _dec(stock_inicial_reg.cantidad_inicial) if stock_inicial_reg else Decimal('0.0')
+        entradas, consumos = self.movimientos_turno
+        consumo_por_recetas = consumos.get(insumo_id, Decimal('0.0')) + self.consumo_entregas.get(insumo_id, Decimal('0.0'))
+        mermas_registradas = self.mermas[0].get(insumo_id, Decimal('0.0'))
+        return stock_inicial + entradas.get(insumo_id, Decimal('0.0')) - consumo_por_recetas - mermas_registradas
+    
+    def valor_perdida_no_justificada(self) -> Decimal:
+        """Suma de costos de las desviaciones negativas (pérdidas) ya guardadas"""
+        rows = db.session.query(TurnoDesviacionInventario.costo_diferencia).filter(
+            TurnoDesviacionInventario.turno_id == self.turno.id,
+            TurnoDesviacionInventario.diferencia_turno < 0
+        ).all()
+        return sum((abs(_dec(costo)) for (costo,) in rows), Decimal('0.0'))
+    
+    def valores_stock(self) -> Tuple[Decimal, Decimal]:
+        """(valor costo del stock inicial, valor costo del stock final) del turno"""
+        inicial = db.session.query(TurnoStockInicial.valor_costo_inicial).filter(
+            TurnoStockInicial.turno_id == self.turno.id
+        ).all()
+        final = db.session.query(TurnoStockFinal.valor_costo_final).filter(
+            TurnoStockFinal.turno_id == self.turno.id
+        ).all()
+        return (
+            sum((_dec(valor) for (valor,) in inicial if valor), Decimal('0.0')),
+            sum((_dec(valor) for (valor,) in final if valor), Decimal('0.0'))
+        )
+
+
 class InventarioTurnoHelper:
     """
     Helper para calcular:
@@ -49,79 +312,7 @@ class InventarioTurnoHelper:
             if not turno:
                 return Decimal('0.0')
             
-            # 1. Stock inicial del turno
-            stock_inicial_reg = TurnoStockInicial.query.filter_by(
-                turno_id=turno_id,
-                insumo_id=insumo_id
-            ).first()
-            
-            stock_inicial = Decimal('0.0')
-            if stock_inicial_reg:
-                stock_inicial = Decimal(str(stock_inicial_reg.cantidad_inicial))
-            
-            # 2. Transferencias entrantes (movimientos tipo 'entrada' o 'transferencia' durante el turno)
-            transferencias_entrantes = Decimal('0.0')
-            movimientos_entrada = InventoryMovement.query.filter(
-                InventoryMovement.ingredient_id == insumo_id,
-                InventoryMovement.location == turno.ubicacion,
-                InventoryMovement.turno_id == turno_id,
-                InventoryMovement.movement_type.in_(['entrada', 'transferencia']),
-                InventoryMovement.quantity > 0
-            ).all()
-            
-            for mov in movimientos_entrada:
-                transferencias_entrantes += Decimal(str(mov.quantity))
-            
-            # 3. Consumo por recetas (movimientos tipo 'venta' o 'delivery' durante el turno)
-            consumo_por_recetas = Decimal('0.0')
-            movimientos_consumo = InventoryMovement.query.filter(
-                InventoryMovement.ingredient_id == insumo_id,
-                InventoryMovement.location == turno.ubicacion,
-                InventoryMovement.turno_id == turno_id,
-                InventoryMovement.movement_type.in_(['venta', 'delivery']),
-                InventoryMovement.quantity < 0
-            ).all()
-            
-            for mov in movimientos_consumo:
-                # La cantidad es negativa, así que sumamos el valor absoluto
-                consumo_por_recetas += abs(Decimal(str(mov.quantity)))
-            
-            # También buscar en DeliveryItem directamente (por si no se registró en InventoryMovement)
-            from app.models.sale_delivery_models import SaleDeliveryStatus
-            entregas_turno = db.session.query(DeliveryItem).join(
-                SaleDeliveryStatus, DeliveryItem.sale_id == SaleDeliveryStatus.sale_id
-            ).filter(
-                DeliveryItem.location == turno.ubicacion,
-                DeliveryItem.delivered_at >= turno.fecha_hora_apertura,
-                DeliveryItem.delivered_at <= (turno.fecha_hora_cierre or datetime.utcnow())
-            ).all()
-            
-            # Sumar consumo de ingredientes desde entregas
-            for entrega in entregas_turno:
-                if entrega.ingredients_consumed:
-                    for consumo in entrega.ingredients_consumed:
-                        # Buscar insumo por nombre (si no tenemos ID directo)
-                        ingrediente_nombre = consumo.get('ingrediente', '')
-                        ingrediente = Ingredient.query.filter_by(name=ingrediente_nombre).first()
-                        if ingrediente and ingrediente.id == insumo_id:
-                            cantidad_consumida = Decimal(str(consumo.get('cantidad', 0)))
-                            consumo_por_recetas += cantidad_consumida
-            
-            # 4. Mermas registradas durante el turno
-            from app.models.bartender_turno_models import MermaInventario
-            mermas = MermaInventario.query.filter_by(
-                turno_id=turno_id,
-                insumo_id=insumo_id
-            ).all()
-            
-            mermas_registradas = Decimal('0.0')
-            for merma in mermas:
-                mermas_registradas += Decimal(str(merma.cantidad_mermada))
-            
-            # Calcular stock esperado
-            stock_esperado = stock_inicial + transferencias_entrantes - consumo_por_recetas - mermas_registradas
-            
-            return stock_esperado
+            return DatosCierreTurno(turno).stock_esperado(insumo_id)
             
         except Exception as e:
             current_app.logger.error(f"Error al calcular stock esperado: {e}", exc_info=True)
@@ -148,31 +339,25 @@ class InventarioTurnoHelper:
             if turno.estado != 'cerrado':
                 return False, "El turno debe estar cerrado para calcular desviaciones", []
             
-            # Obtener todos los insumos con stock inicial
-            stocks_iniciales = TurnoStockInicial.query.filter_by(turno_id=turno_id).all()
+            # Stock, movimientos, entregas, mermas y costos del turno en bloque
+            datos = DatosCierreTurno(turno)
+            costos = datos.cargar_costos(datos.stock_inicial.keys())
+            existentes = datos.desviaciones
             
             desviaciones = []
             
-            for stock_inicial in stocks_iniciales:
-                insumo_id = stock_inicial.insumo_id
-                
+            for insumo_id, stock_inicial in datos.stock_inicial.items():
                 # Obtener stock final reportado
-                stock_final_reg = TurnoStockFinal.query.filter_by(
-                    turno_id=turno_id,
-                    insumo_id=insumo_id
-                ).first()
+                stock_final_reg = datos.stock_final.get(insumo_id)
                 
                 if not stock_final_reg:
                     current_app.logger.warning(f"No hay stock final para insumo {insumo_id} en turno {turno_id}")
                     continue
                 
-                # Calcular stock esperado
-                stock_esperado = self.calcular_stock_esperado_turno(turno_id, insumo_id)
-                
                 # Obtener valores
-                stock_inicial_val = Decimal(str(stock_inicial.cantidad_inicial))
-                stock_esperado_val = stock_esperado
-                stock_final_val = Decimal(str(stock_final_reg.cantidad_final))
+                stock_inicial_val = _dec(stock_inicial.cantidad_inicial)
+                stock_esperado_val = datos.stock_esperado(insumo_id)
+                stock_final_val = _dec(stock_final_reg.cantidad_final)
                 
                 # Calcular diferencia
                 diferencia_turno = stock_final_val - stock_esperado_val
@@ -183,18 +368,14 @@ class InventarioTurnoHelper:
                 else:
                     diferencia_porcentual = Decimal('0.0') if diferencia_turno == 0 else Decimal('100.0')
                 
-                # Obtener costo unitario para calcular costo de diferencia
-                costo_unitario = self._get_costo_unitario_actual(insumo_id, turno.ubicacion)
-                costo_diferencia = diferencia_turno * costo_unitario
+                # Costo de la diferencia con el costo unitario actual
+                costo_diferencia = diferencia_turno * costos[insumo_id]
                 
                 # Determinar tipo de desviación
                 tipo = self._determinar_tipo_desviacion(diferencia_turno, diferencia_porcentual, costo_diferencia)
                 
                 # Crear o actualizar registro de desviación
-                desviacion = TurnoDesviacionInventario.query.filter_by(
-                    turno_id=turno_id,
-                    insumo_id=insumo_id
-                ).first()
+                desviacion = existentes.get(insumo_id)
                 
                 if desviacion:
                     desviacion.stock_inicial_turno = stock_inicial_val
@@ -245,21 +426,23 @@ class InventarioTurnoHelper:
             if not turno:
                 return {}
             
+            datos = DatosCierreTurno(turno)
+            
             # Valores ya guardados en el turno
-            valor_inicial = Decimal(str(turno.valor_inicial_barra_costo)) if turno.valor_inicial_barra_costo else Decimal('0.0')
-            valor_final = Decimal(str(turno.valor_final_barra_costo)) if turno.valor_final_barra_costo else Decimal('0.0')
+            valor_inicial = _dec(turno.valor_inicial_barra_costo) if turno.valor_inicial_barra_costo else Decimal('0.0')
+            valor_final = _dec(turno.valor_final_barra_costo) if turno.valor_final_barra_costo else Decimal('0.0')
             
             # Valor vendido (venta)
-            valor_vendido_venta = self._calcular_valor_vendido_venta(turno_id)
+            valor_vendido_venta = datos.valor_vendido_venta(turno.ubicacion)
             
-            # Valor vendido (costo teórico)
-            valor_vendido_costo = self._calcular_valor_vendido_costo(turno_id)
+            # Valor vendido (costo teórico desde los insumos declarados en las entregas)
+            valor_vendido_costo = datos.costo_consumo_entregas()
             
             # Valor de merma
-            valor_merma = self._calcular_valor_merma(turno_id)
+            valor_merma = datos.mermas[1]
             
             # Valor de pérdida no justificada (suma de costos de diferencia negativos)
-            valor_perdida_no_justificada = self._calcular_valor_perdida_no_justificada(turno_id)
+            valor_perdida_no_justificada = datos.valor_perdida_no_justificada()
             
             return {
                 'valor_inicial_barra_costo': float(valor_inicial),
@@ -276,114 +459,6 @@ class InventarioTurnoHelper:
             current_app.logger.error(f"Error al calcular resumen financiero: {e}", exc_info=True)
             return {}
     
-    def _calcular_valor_vendido_venta(self, turno_id: int) -> Decimal:
-        """Calcula el valor de venta de productos entregados en el turno"""
-        try:
-            turno = BartenderTurno.query.get(turno_id)
-            if not turno:
-                return Decimal('0.0')
-            
-            # Buscar entregas del turno
-            entregas = DeliveryItem.query.filter(
-                DeliveryItem.location == turno.ubicacion,
-                DeliveryItem.delivered_at >= turno.fecha_hora_apertura,
-                DeliveryItem.delivered_at <= (turno.fecha_hora_cierre or datetime.utcnow())
-            ).all()
-            
-            valor_total = Decimal('0.0')
-            
-            # Obtener precios de productos desde PosSale
-            from app.models.pos_models import PosSale, PosSaleItem
-            
-            for entrega in entregas:
-                # Buscar venta asociada
-                sale = PosSale.query.filter_by(sale_id_phppos=entrega.sale_id).first()
-                if sale:
-                    # Buscar item en la venta
-                    item = PosSaleItem.query.filter_by(
-                        sale_id=sale.id,
-                        product_name=entrega.product_name
-                    ).first()
-                    
-                    if item:
-                        precio_unitario = Decimal(str(item.unit_price))
-                        cantidad = Decimal(str(entrega.quantity_delivered))
-                        valor_total += precio_unitario * cantidad
-            
-            return valor_total
-            
-        except Exception as e:
-            current_app.logger.error(f"Error al calcular valor vendido venta: {e}", exc_info=True)
-            return Decimal('0.0')
-    
-    def _calcular_valor_vendido_costo(self, turno_id: int) -> Decimal:
-        """Calcula el costo teórico de productos entregados usando recetas"""
-        try:
-            turno = BartenderTurno.query.get(turno_id)
-            if not turno:
-                return Decimal('0.0')
-            
-            # Sumar costos de ingredientes consumidos en entregas
-            entregas = DeliveryItem.query.filter(
-                DeliveryItem.location == turno.ubicacion,
-                DeliveryItem.delivered_at >= turno.fecha_hora_apertura,
-                DeliveryItem.delivered_at <= (turno.fecha_hora_cierre or datetime.utcnow())
-            ).all()
-            
-            valor_total = Decimal('0.0')
-            
-            for entrega in entregas:
-                if entrega.ingredients_consumed:
-                    for consumo in entrega.ingredients_consumed:
-                        ingrediente_nombre = consumo.get('ingrediente', '')
-                        cantidad = Decimal(str(consumo.get('cantidad', 0)))
-                        
-                        # Buscar insumo y su costo
-                        ingrediente = Ingredient.query.filter_by(name=ingrediente_nombre).first()
-                        if ingrediente:
-                            costo_unitario = self._get_costo_unitario_actual(ingrediente.id, turno.ubicacion)
-                            valor_total += cantidad * costo_unitario
-            
-            return valor_total
-            
-        except Exception as e:
-            current_app.logger.error(f"Error al calcular valor vendido costo: {e}", exc_info=True)
-            return Decimal('0.0')
-    
-    def _calcular_valor_merma(self, turno_id: int) -> Decimal:
-        """Calcula el valor total de merma registrada en el turno"""
-        try:
-            from app.models.bartender_turno_models import MermaInventario
-            
-            mermas = MermaInventario.query.filter_by(turno_id=turno_id).all()
-            
-            valor_total = Decimal('0.0')
-            for merma in mermas:
-                valor_total += Decimal(str(merma.costo_merma))
-            
-            return valor_total
-            
-        except Exception as e:
-            current_app.logger.error(f"Error al calcular valor merma: {e}", exc_info=True)
-            return Decimal('0.0')
-    
-    def _calcular_valor_perdida_no_justificada(self, turno_id: int) -> Decimal:
-        """Calcula el valor de pérdida no justificada (desviaciones negativas)"""
-        try:
-            desviaciones = TurnoDesviacionInventario.query.filter_by(turno_id=turno_id).all()
-            
-            valor_total = Decimal('0.0')
-            for desviacion in desviaciones:
-                # Solo sumar diferencias negativas (pérdidas)
-                if desviacion.diferencia_turno < 0:
-                    valor_total += abs(Decimal(str(desviacion.costo_diferencia)))
-            
-            return valor_total
-            
-        except Exception as e:
-            current_app.logger.error(f"Error al calcular valor pérdida no justificada: {e}", exc_info=True)
-            return Decimal('0.0')
-    
     def _get_costo_unitario_actual(self, insumo_id: int, ubicacion: str) -> Decimal:
         """Obtiene el costo unitario actual de un insumo"""
         try:
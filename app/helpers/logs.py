@@ -9,11 +9,127 @@ from ..models.delivery_models import Delivery
 EXPECTED_LOG_HEADER = ['sale_id', 'item_name', 'qty', 'bartender', 'barra', 'timestamp']
 
 
-def load_logs():
-    """Carga logs desde la base de datos"""
+LOG_PAGE_SIZE = 100
+LOG_STREAM_BATCH_SIZE = 1000
+
+
+def parse_datetime_filter(value):
+    """Acepta datetime, 'YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS' (None si no se puede parsear)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(str(value).strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def encode_cursor(timestamp, row_id):
+    """Cursor de paginación: posición (timestamp, id) de la última fila entregada"""
+    return f"{timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')}|{row_id}"
+
+
+def decode_cursor(cursor):
     try:
-        deliveries = Delivery.query.order_by(Delivery.timestamp.desc()).all()
-        return [delivery.to_csv_row() for delivery in deliveries]
+        timestamp_str, row_id = cursor.rsplit('|', 1)
+        return datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S.%f'), int(row_id)
+    except (ValueError, AttributeError):
+        return None
+
+
+def apply_keyset(query, model, cursor):
+    """Filtra filas posteriores al cursor en orden (timestamp desc, id desc)"""
+    from sqlalchemy import and_, or_
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        timestamp, row_id = position
+        query = query.filter(or_(
+            model.timestamp < timestamp,
+            and_(model.timestamp == timestamp, model.id < row_id)
+        ))
+    return query.order_by(model.timestamp.desc(), model.id.desc())
+
+
+def iter_keyset(query, model, batch_size=LOG_STREAM_BATCH_SIZE, cursor=None):
+    """Recorre una consulta en lotes por keyset (memoria acotada, sin OFFSET)"""
+    while True:
+        rows = apply_keyset(query, model, cursor).limit(batch_size).all()
+        if not rows:
+            return
+        for row in rows:
+            yield row
+        if len(rows) < batch_size:
+            return
+        cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+
+
+def query_logs(shift_date=None, barra=None, bartender=None, start=None, end=None, sale_id=None):
+    """
+    Consulta de entregas con filtros (sin ordenar ni ejecutar).
+
+    Args:
+        shift_date: Fecha del turno (YYYY-MM-DD)
+        barra, bartender, sale_id: Filtros exactos
+        start, end: Rango de tiempo (datetime o string); end es exclusivo
+    """
+    from datetime import timedelta
+    query = Delivery.query
+    if shift_date:
+        day = parse_datetime_filter(shift_date)
+        if day:
+            query = query.filter(Delivery.timestamp >= day, Delivery.timestamp < day + timedelta(days=1))
+    if barra:
+        query = query.filter(Delivery.barra == barra)
+    if bartender:
+        query = query.filter(Delivery.bartender == bartender)
+    if sale_id:
+        query = query.filter(Delivery.sale_id == str(sale_id))
+    start, end = parse_datetime_filter(start), parse_datetime_filter(end)
+    if start:
+        query = query.filter(Delivery.timestamp >= start)
+    if end:
+        query = query.filter(Delivery.timestamp < end)
+    return query
+
+
+def load_logs_page(cursor=None, limit=LOG_PAGE_SIZE, **filters):
+    """
+    Página de logs (más recientes primero) con paginación por keyset.
+
+    Returns:
+        dict: {'logs': [filas CSV], 'next_cursor': str o None}
+    """
+    try:
+        limit = max(1, min(int(limit or LOG_PAGE_SIZE), 1000))
+        deliveries = apply_keyset(query_logs(**filters), Delivery, cursor).limit(limit + 1).all()
+        has_more = len(deliveries) > limit
+        deliveries = deliveries[:limit]
+        return {
+            'logs': [delivery.to_csv_row() for delivery in deliveries],
+            'next_cursor': encode_cursor(deliveries[-1].timestamp, deliveries[-1].id) if has_more else None
+        }
+    except Exception as e:
+        current_app.logger.error(f"Error al cargar página de logs desde BD: {e}")
+        return {'logs': [], 'next_cursor': None}
+
+
+def iter_logs(batch_size=LOG_STREAM_BATCH_SIZE, **filters):
+    """Genera filas CSV de logs en lotes (para exportación en streaming)"""
+    for delivery in iter_keyset(query_logs(**filters), Delivery, batch_size):
+        yield delivery.to_csv_row()
+
+
+def load_logs(limit=None, **filters):
+    """
+    Carga logs desde la base de datos.
+    Para historiales grandes usar load_logs_page() o iter_logs().
+    """
+    try:
+        query = apply_keyset(query_logs(**filters), Delivery, None)
+        if limit:
+            query = query.limit(limit)
+        return [delivery.to_csv_row() for delivery in query.all()]
     except Exception as e:
         current_app.logger.error(f"Error al cargar logs desde BD: {e}")
         return []
@@ -131,6 +247,10 @@ def clear_all_logs():
         deleted_count = Delivery.query.delete()
         db.session.commit()
         
+        # El borrado masivo no pasa por los hooks de sesión: invalidar los resúmenes a mano
+        from app.application.services.stats_service import invalidate_shift_summaries
+        invalidate_shift_summaries()
+        
         # Notificar a clientes admin conectados que se borró todo
         socketio.emit('all_logs_cleared', {}, namespace='/admin_logs')
         
@@ -0,0 +1,205 @@
+"""
+Publicador de métricas del dashboard por deltas (namespace /admin_stats)
+Mantiene un estado versionado y emite solo las secciones que cambiaron
+"""
+from typing import Dict, Any, Optional, Iterable
+from datetime import datetime
+import hashlib
+import json
+import threading
+import time
+import logging
+
+from app.helpers.timezone_utils import CHILE_TZ
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = '/admin_stats'
+
+# Secciones "en vivo" que se recalculan y se envían como delta
+LIVE_SECTIONS = ('ventas', 'cajas', 'entregas', 'kioskos', 'guardarropia')
+
+
+class MetricsPublisher:
+    """
+    Estado versionado de las secciones en vivo del dashboard.
+
+    - mark_dirty(): lo llaman los eventos (ej: venta creada). No calcula nada;
+      varias ventas dentro del mismo intervalo generan una sola emisión.
+    - El loop recalcula solo las secciones sucias cada `interval` segundos y
+      todas las secciones en vivo cada `full_refresh_interval` (cambios de
+      otros workers o de procesos que no marcan secciones).
+    - Solo se emite `metrics_delta` con las secciones cuyo contenido cambió.
+    - Un cliente que se reconecta (o detecta un salto de versión) pide
+      `request_metrics` y recibe el snapshot completo con su versión.
+    """
+
+    def __init__(self, interval: float = 2.0, full_refresh_interval: float = 10.0):
+        self.interval = interval
+        self.full_refresh_interval = full_refresh_interval
+        self._lock = threading.Lock()
+        self._version = 0
+        self._sections: Dict[str, Any] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._dirty = set()
+        self._last_full_refresh = 0.0
+        self._clients = 0
+        self._started = False
+        self._socketio = None
+        self._app = None
+        self._stats = {'emissions': 0, 'sections_sent': 0, 'sections_unchanged': 0, 'coalesced_marks': 0}
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def ensure_started(self, socketio, app) -> None:
+        """Inicia el loop de publicación (una vez por proceso)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._socketio = socketio
+            self._app = app
+        socketio.start_background_task(self._run)
+        logger.info("✅ Publicador de métricas (deltas) iniciado")
+
+    def client_connected(self) -> None:
+        with self._lock:
+            self._clients += 1
+
+    def client_disconnected(self) -> None:
+        with self._lock:
+            self._clients = max(0, self._clients - 1)
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+    def mark_dirty(self, *sections: str) -> None:
+        """Marca secciones para recálculo en la próxima emisión"""
+        with self._lock:
+            for section in sections or LIVE_SECTIONS:
+                if section in self._dirty:
+                    self._stats['coalesced_marks'] += 1
+                self._dirty.add(section)
+
+    # ------------------------------------------------------------------
+    # Cálculo
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _fingerprint(value: Any) -> str:
+        payload = json.dumps(value, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def refresh(self, sections: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Recalcula secciones y retorna el delta (o None si nada cambió).
+
+        Returns:
+            {'version', 'base_version', 'sections': {...}, 'timestamp'} o None
+        """
+        from app.helpers.dashboard_metrics_service import get_metrics_service
+        service = get_metrics_service()
+
+        sections = list(sections or LIVE_SECTIONS)
+        computed = {}
+        for name in sections:
+            try:
+                computed[name] = service.get_section(name)
+            except Exception as e:
+                logger.error(f"Error calculando sección de métricas '{name}': {e}")
+
+        with self._lock:
+            changed = {}
+            for name, value in computed.items():
+                fingerprint = self._fingerprint(value)
+                if self._fingerprints.get(name) == fingerprint:
+                    self._stats['sections_unchanged'] += 1
+                    continue
+                self._fingerprints[name] = fingerprint
+                self._sections[name] = value
+                changed[name] = value
+            if not changed:
+                return None
+            base_version = self._version
+            self._version += 1
+            self._stats['sections_sent'] += len(changed)
+            return {
+                'version': self._version,
+                'base_version': base_version,
+                'sections': changed,
+                'timestamp': datetime.now(CHILE_TZ).isoformat()
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Snapshot completo para clientes nuevos o reconectados.
+
+        Las secciones en vivo salen del estado versionado; el resto, del cálculo
+        completo cacheado del servicio de métricas.
+        """
+        from app.helpers.dashboard_metrics_service import get_metrics_service
+        if not self._sections:
+            self.refresh()
+        metrics = dict(get_metrics_service().get_all_metrics(use_cache=True))
+        with self._lock:
+            metrics.update(self._sections)
+            version = self._version
+        return {'metrics': metrics, 'version': version}
+
+    # ------------------------------------------------------------------
+    # Loop
+    # ------------------------------------------------------------------
+    def _next_sections(self):
+        now = time.time()
+        with self._lock:
+            if self._clients <= 0:
+                return None
+            if now - self._last_full_refresh >= self.full_refresh_interval:
+                self._last_full_refresh = now
+                sections = set(LIVE_SECTIONS) | self._dirty
+                self._dirty.clear()
+                return sorted(sections)
+            if not self._dirty:
+                return None
+            sections = list(self._dirty)
+            self._dirty.clear()
+            return sections
+
+    def publish_once(self) -> Optional[Dict[str, Any]]:
+        """Recalcula lo pendiente y emite el delta si hubo cambios"""
+        sections = self._next_sections()
+        if not sections:
+            return None
+        with self._app.app_context():
+            delta = self.refresh(sections)
+        if delta:
+            self._socketio.emit('metrics_delta', delta, namespace=NAMESPACE)
+            with self._lock:
+                self._stats['emissions'] += 1
+        return delta
+
+    def _run(self):
+        while True:
+            try:
+                self._socketio.sleep(self.interval)
+                self.publish_once()
+            except Exception as e:
+                logger.error(f"Error en publicador de métricas: {e}")
+                self._socketio.sleep(30)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'version': self._version,
+                'clients': self._clients,
+                'dirty': sorted(self._dirty),
+                **self._stats
+            }
+
+
+_publisher = MetricsPublisher()
+
+
+def get_metrics_publisher() -> MetricsPublisher:
+    """Obtiene el publicador de métricas (uno por proceso)"""
+    return _publisher
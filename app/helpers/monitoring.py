@@ -1,196 +1,692 @@
 """
 Sistema de monitoreo y métricas de rendimiento
+
+Latencias por endpoint y clase de estado (2xx/3xx/4xx/5xx) en histogramas de
+buckets fijos en escala logarítmica (4 buckets por duplicación desde 0,1 ms,
+error relativo máximo ~19%), con memoria constante por serie:
+
+- Acumulado desde el arranque del worker (exportación Prometheus).
+- Ranuras de SLOT_SECONDS para p50/p95/p99 en ventanas móviles (WINDOWS).
+
+Cada serie tiene su propio lock: no hay un lock global en la ruta del
+request. Por request también se cuentan las consultas SQL y su tiempo
+(eventos de cursor de SQLAlchemy).
+
+Cada worker publica un snapshot en el cache compartido cada
+PUBLISH_INTERVAL segundos; con backend de cache compartido las estadísticas
+y la exportación combinan los snapshots de todos los workers vivos.
 """
 
+import math
+import os
 import time
+import logging
 from functools import wraps
 from collections import defaultdict, deque
-from datetime import datetime, timedelta
-from flask import current_app, request
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from flask import g, has_request_context, request
 from threading import Lock
-import json
 
-# Almacenamiento de métricas en memoria
-_metrics = {
-    'request_times': deque(maxlen=1000),  # Últimos 1000 requests
-    'endpoint_stats': defaultdict(lambda: {'count': 0, 'total_time': 0, 'errors': 0}),
-    'error_counts': defaultdict(int),
-    'slow_requests': deque(maxlen=100),  # Requests > 1s
-}
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
-_metrics_lock = Lock()
+logger = logging.getLogger(__name__)
 
+MIN_LATENCY = 0.0001            # Límite superior del primer bucket (0,1 ms)
+BUCKETS_PER_DOUBLING = 4
+BUCKET_COUNT = 81               # 80 buckets acotados (hasta ~88 s) + desborde
 
-def record_request_time(endpoint, duration, status_code=None):
-    """Registra el tiempo de respuesta de un request"""
-    with _metrics_lock:
-        _metrics['request_times'].append({
-            'endpoint': endpoint,
-            'duration': duration,
-            'timestamp': time.time(),
-            'status_code': status_code
-        })
-        
-        # Actualizar estadísticas del endpoint
-        stats = _metrics['endpoint_stats'][endpoint]
-        stats['count'] += 1
-        stats['total_time'] += duration
-        
-        if status_code and status_code >= 400:
-            stats['errors'] += 1
-            _metrics['error_counts'][f"{endpoint}:{status_code}"] += 1
-        
-        # Registrar requests lentos
-        if duration > 1.0:
-            _metrics['slow_requests'].append({
-                'endpoint': endpoint,
-                'duration': duration,
-                'timestamp': datetime.now().isoformat(),
-                'status_code': status_code
-            })
+# Límites "le" de la exportación Prometheus (los buckets finos se agrupan en estos)
+EXPORT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SLOT_SECONDS = 10
+WINDOWS = {'1m': 60, '5m': 300}
+SLOT_COUNT = max(WINDOWS.values()) // SLOT_SECONDS + 1
+
+SLOW_REQUEST_SECONDS = 1.0
+PUBLISH_INTERVAL = 10
+SNAPSHOT_TTL = 120              # Un worker que no publica en este tiempo se descarta
+
+CACHE_NAMESPACE = 'request_metrics'
+
+
+class LatencyWindow:
+    """Últimas N latencias (en segundos) de una operación, con p50/p95"""
+
+    def __init__(self, maxlen=1000):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = Lock()
+
+    def record(self, seconds):
+        if seconds >= 0:
+            with self._lock:
+                self._samples.append(seconds)
+
+    def summary(self, unit='s'):
+        """{'count', 'p50', 'p95', 'max'} en segundos ('s') o milisegundos ('ms')"""
+        with self._lock:
+            values = sorted(self._samples)
+        if not values:
+            return {'count': 0, 'p50': None, 'p95': None, 'max': None}
+        scale = 1000.0 if unit == 'ms' else 1.0
+        return {
+            'count': len(values),
+            'p50': round(values[int(len(values) * 0.50)] * scale, 3),
+            'p95': round(values[min(int(len(values) * 0.95), len(values) - 1)] * scale, 3),
+            'max': round(values[-1] * scale, 3)
+        }
+
+
+# ----------------------------------------------------------------------
+# Histogramas
+# ----------------------------------------------------------------------
+def bucket_index(seconds: float) -> int:
+    """Bucket fino de una latencia"""
+    if seconds <= MIN_LATENCY:
+        return 0
+    index = int(math.ceil(math.log2(seconds / MIN_LATENCY) * BUCKETS_PER_DOUBLING))
+    return min(index, BUCKET_COUNT - 1)
+
+
+def bucket_upper(index: int) -> float:
+    """Límite superior de un bucket fino (inf para el de desborde)"""
+    if index >= BUCKET_COUNT - 1:
+        return math.inf
+    return MIN_LATENCY * 2 ** (index / BUCKETS_PER_DOUBLING)
+
+
+# Bucket de exportación (posición en EXPORT_BUCKETS, o len = +Inf) de cada bucket fino
+_EXPORT_INDEX = [
+    next((i for i, bound in enumerate(EXPORT_BUCKETS) if bucket_upper(index) <= bound), len(EXPORT_BUCKETS))
+    for index in range(BUCKET_COUNT)
+]
+
+
+def _percentile(buckets: Dict[int, int], total: int, q: float, max_value: float) -> Optional[float]:
+    """Percentil q (0-1) desde los buckets: límite superior del bucket, acotado por el máximo observado"""
+    if not total:
+        return None
+    target = q * total
+    cumulative = 0
+    for index in sorted(buckets):
+        cumulative += buckets[index]
+        if cumulative >= target:
+            return min(bucket_upper(index), max_value)
+    return max_value
+
+
+def status_class(status_code: Optional[int]) -> str:
+    if not status_code:
+        return '2xx'
+    return f"{int(status_code) // 100}xx"
+
+
+class _Series:
+    """Latencias y consultas de un (endpoint, clase de estado)"""
+
+    __slots__ = ('lock', 'count', 'duration_sum', 'db_queries', 'db_time', 'buckets', 'slots')
+
+    def __init__(self):
+        self.lock = Lock()
+        self.count = 0
+        self.duration_sum = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.buckets = [0] * BUCKET_COUNT
+        # {slot_id: [count, duration_sum, db_queries, db_time, min, max, {bucket: n}]}
+        self.slots: Dict[int, list] = {}
+
+    def record(self, duration: float, db_queries: int, db_time: float, slot_id: int) -> None:
+        index = bucket_index(duration)
+        with self.lock:
+            self.count += 1
+            self.duration_sum += duration
+            self.db_queries += db_queries
+            self.db_time += db_time
+            self.buckets[index] += 1
+            slot = self.slots.get(slot_id)
+            if slot is None:
+                slot = self.slots[slot_id] = [0, 0.0, 0, 0.0, duration, duration, {}]
+                for old in [s for s in self.slots if s <= slot_id - SLOT_COUNT]:
+                    del self.slots[old]
+            slot[0] += 1
+            slot[1] += duration
+            slot[2] += db_queries
+            slot[3] += db_time
+            if duration < slot[4]:
+                slot[4] = duration
+            if duration > slot[5]:
+                slot[5] = duration
+            slot[6][index] = slot[6].get(index, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'count': self.count,
+                'duration_sum': self.duration_sum,
+                'db_queries': self.db_queries,
+                'db_time': self.db_time,
+                'buckets': list(self.buckets),
+                'slots': {slot_id: slot[:6] + [dict(slot[6])] for slot_id, slot in self.slots.items()}
+            }
+
+
+class RequestMetrics:
+    """Registro de métricas de requests del worker"""
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._lock = Lock()            # Solo para crear series y registrar errores/lentos
+        self._error_counts: Dict[str, int] = defaultdict(int)
+        self._slow_requests = deque(maxlen=100)
+        self._last_publish = 0.0
+
+    def record(self, endpoint: str, duration: float, status_code: Optional[int] = None,
+               db_queries: int = 0, db_time: float = 0.0) -> None:
+        key = (endpoint, status_class(status_code))
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, _Series())
+        now = time.time()
+        series.record(duration, db_queries, db_time, int(now // SLOT_SECONDS))
+
+        if (status_code and status_code >= 400) or duration > SLOW_REQUEST_SECONDS:
+            with self._lock:
+                if status_code and status_code >= 400:
+                    self._error_counts[f"{endpoint}:{status_code}"] += 1
+                if duration > SLOW_REQUEST_SECONDS:
+                    self._slow_requests.append({
+                        'endpoint': endpoint,
+                        'duration': duration,
+                        'timestamp': datetime.now().isoformat(),
+                        'status_code': status_code,
+                        'db_queries': db_queries
+                    })
+
+        if now - self._last_publish >= PUBLISH_INTERVAL:
+            self.publish(now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = list(self._series.items())
+            errors = dict(self._error_counts)
+            slow = list(self._slow_requests)
+        return {
+            'pid': os.getpid(),
+            'series': {key: series.snapshot() for key, series in keys},
+            'errors': errors,
+            'slow_requests': slow
+        }
+
+    # ------------------------------------------------------------------
+    # Snapshots compartidos entre workers
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _shared() -> bool:
+        from app.infrastructure.cache import get_cache_manager
+        return get_cache_manager().backend_name != 'memory'
+
+    def publish(self, now: Optional[float] = None) -> None:
+        self._last_publish = now or time.time()
+        try:
+            if not self._shared():
+                return
+            from app.infrastructure.cache import get_cache_manager
+            get_cache_manager().set(CACHE_NAMESPACE, f"w:{os.getpid()}", self.snapshot())
+        except Exception as e:
+            logger.warning(f"No se pudo publicar el snapshot de métricas: {e}")
+
+    def cluster_snapshots(self) -> List[Dict[str, Any]]:
+        """Snapshot de este worker (al día) y los publicados por los demás workers"""
+        local = self.snapshot()
+        snapshots = [local]
+        try:
+            if not self._shared():
+                return snapshots
+            from app.infrastructure.cache import get_cache_manager
+            manager = get_cache_manager()
+            own_key = f"w:{os.getpid()}"
+            keys = [key for key, _, expires_at in manager.namespace(CACHE_NAMESPACE).storage.items()
+                    if key.startswith('w:') and key != own_key and expires_at > time.time()]
+            for key in keys:
+                snapshot = manager.get(CACHE_NAMESPACE, key)
+                if snapshot:
+                    snapshots.append(snapshot)
+        except Exception as e:
+            logger.warning(f"No se pudieron leer los snapshots de métricas de otros workers: {e}")
+        return snapshots
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._error_counts.clear()
+            self._slow_requests.clear()
+        try:
+            if self._shared():
+                from app.infrastructure.cache import get_cache_manager
+                get_cache_manager().invalidate(CACHE_NAMESPACE)
+        except Exception as e:
+            logger.warning(f"No se pudieron resetear las métricas compartidas: {e}")
+
+
+def _register_namespace():
+    try:
+        from app.infrastructure.cache import get_cache_manager
+        get_cache_manager().register_namespace(CACHE_NAMESPACE, SNAPSHOT_TTL, max_entries=64)
+    except Exception as e:
+        logger.warning(f"No se pudo registrar el namespace de métricas: {e}")
+
+
+_register_namespace()
+_request_metrics = RequestMetrics()
+
+
+def get_request_metrics() -> RequestMetrics:
+    """Registro de métricas de requests (uno por proceso)"""
+    return _request_metrics
+
+
+# ----------------------------------------------------------------------
+# Agregación
+# ----------------------------------------------------------------------
+def _merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Suma las series, errores y requests lentos de varios workers"""
+    series: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    errors: Dict[str, int] = defaultdict(int)
+    slow = []
+    for snapshot in snapshots:
+        for key, data in snapshot['series'].items():
+            merged = series.get(key)
+            if merged is None:
+                series[key] = {**data, 'buckets': list(data['buckets']),
+                               'slots': {k: v[:6] + [dict(v[6])] for k, v in data['slots'].items()}}
+                continue
+            for field in ('count', 'duration_sum', 'db_queries', 'db_time'):
+                merged[field] += data[field]
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], data['buckets'])]
+            for slot_id, slot in data['slots'].items():
+                target = merged['slots'].get(slot_id)
+                if target is None:
+                    merged['slots'][slot_id] = slot[:6] + [dict(slot[6])]
+                    continue
+                for i in range(4):
+                    target[i] += slot[i]
+                target[4] = min(target[4], slot[4])
+                target[5] = max(target[5], slot[5])
+                for index, n in slot[6].items():
+                    target[6][index] = target[6].get(index, 0) + n
+        for error_key, count in snapshot['errors'].items():
+            errors[error_key] += count
+        slow.extend(snapshot['slow_requests'])
+    slow.sort(key=lambda r: r['timestamp'])
+    return {'series': series, 'errors': errors, 'slow_requests': slow[-100:], 'workers': len(snapshots)}
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {'count': 0, 'duration_sum': 0.0, 'db_queries': 0, 'db_time': 0.0,
+            'min': None, 'max': 0.0, 'buckets': defaultdict(int)}
+
+
+def _add_window(totals: Dict[str, Any], slots: Dict[int, list], first_slot: int) -> None:
+    """Acumula en totals las ranuras desde first_slot"""
+    for slot_id, slot in slots.items():
+        if slot_id < first_slot:
+            continue
+        totals['count'] += slot[0]
+        totals['duration_sum'] += slot[1]
+        totals['db_queries'] += slot[2]
+        totals['db_time'] += slot[3]
+        totals['min'] = slot[4] if totals['min'] is None else min(totals['min'], slot[4])
+        totals['max'] = max(totals['max'], slot[5])
+        for index, n in slot[6].items():
+            totals['buckets'][index] += n
+
+
+def _window_first_slot(window: str) -> int:
+    seconds = WINDOWS.get(window, WINDOWS['5m'])
+    return int(time.time() // SLOT_SECONDS) - seconds // SLOT_SECONDS + 1
+
+
+def _quantiles(totals: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    return {
+        name: _percentile(totals['buckets'], totals['count'], q, totals['max'])
+        for name, q in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+    }
+
+
+def _round(value: Optional[float], digits: int = 4) -> float:
+    return round(value, digits) if value is not None else 0
+
+
+# ----------------------------------------------------------------------
+# Registro de requests
+# ----------------------------------------------------------------------
+def record_request_time(endpoint, duration, status_code=None, db_queries=0, db_time=0.0):
+    """Registra el tiempo de respuesta de un request (y sus consultas SQL)"""
+    _request_metrics.record(endpoint, duration, status_code, db_queries, db_time)
 
 
 def monitor_performance(func):
     """Decorator para monitorear el rendimiento de funciones"""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
+        # Los requests ya medidos por init_request_metrics no se registran dos veces
+        if g.get('_request_metrics') is not None:
+            return func(*args, **kwargs)
+
+        start_time = time.perf_counter()
         status_code = None
-        
+
         try:
             result = func(*args, **kwargs)
-            
+
             # Intentar obtener status_code del resultado
             if hasattr(result, 'status_code'):
                 status_code = result.status_code
             elif isinstance(result, tuple) and len(result) > 1:
                 status_code = result[1] if isinstance(result[1], int) else None
-            
+
             return result
-        except Exception as e:
+        except Exception:
             status_code = 500
             raise
         finally:
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             endpoint = request.endpoint or func.__name__
             record_request_time(endpoint, duration, status_code)
-    
+
     return wrapper
 
 
-def get_performance_stats():
-    """Obtiene estadísticas de rendimiento"""
-    with _metrics_lock:
-        request_times = list(_metrics['request_times'])
-        
-        if not request_times:
-            return {
-                'total_requests': 0,
-                'avg_response_time': 0,
-                'min_response_time': 0,
-                'max_response_time': 0,
-                'p95_response_time': 0,
-                'p99_response_time': 0,
-                'error_rate': 0,
-                'slow_requests_count': len(_metrics['slow_requests']),
-                'endpoint_stats': {},
-                'recent_errors': []
-            }
-        
-        durations = [r['duration'] for r in request_times]
-        durations_sorted = sorted(durations)
-        
-        total_requests = len(durations)
-        avg_time = sum(durations) / total_requests if total_requests > 0 else 0
-        min_time = min(durations) if durations else 0
-        max_time = max(durations) if durations else 0
-        
-        # Calcular percentiles
-        p95_idx = int(total_requests * 0.95)
-        p99_idx = int(total_requests * 0.99)
-        p95_time = durations_sorted[p95_idx] if p95_idx < total_requests else max_time
-        p99_time = durations_sorted[p99_idx] if p99_idx < total_requests else max_time
-        
-        # Calcular tasa de errores
-        error_count = sum(1 for r in request_times if r.get('status_code', 200) >= 400)
-        error_rate = (error_count / total_requests * 100) if total_requests > 0 else 0
-        
-        # Estadísticas por endpoint
-        endpoint_stats = {}
-        for endpoint, stats in _metrics['endpoint_stats'].items():
-            if stats['count'] > 0:
-                endpoint_stats[endpoint] = {
-                    'count': stats['count'],
-                    'avg_time': stats['total_time'] / stats['count'],
-                    'errors': stats['errors'],
-                    'error_rate': (stats['errors'] / stats['count'] * 100) if stats['count'] > 0 else 0
-                }
-        
-        # Errores recientes
-        recent_errors = []
-        for error_key, count in sorted(_metrics['error_counts'].items(), key=lambda x: x[1], reverse=True)[:10]:
-            endpoint, status = error_key.rsplit(':', 1)
-            recent_errors.append({
-                'endpoint': endpoint,
-                'status_code': int(status),
-                'count': count
-            })
-        
-        return {
-            'total_requests': total_requests,
-            'avg_response_time': round(avg_time, 3),
-            'min_response_time': round(min_time, 3),
-            'max_response_time': round(max_time, 3),
-            'p95_response_time': round(p95_time, 3),
-            'p99_response_time': round(p99_time, 3),
-            'error_rate': round(error_rate, 2),
-            'slow_requests_count': len(_metrics['slow_requests']),
-            'endpoint_stats': endpoint_stats,
-            'recent_errors': recent_errors,
-            'slow_requests': list(_metrics['slow_requests'])[-10:]  # Últimos 10
+def _finish_request(status_code: int) -> None:
+    metrics = g.pop('_request_metrics', None)
+    if metrics is None:
+        return
+    endpoint = request.endpoint or 'unmatched'
+    if endpoint == 'static' or endpoint.endswith('.static'):
+        return
+    try:
+        record_request_time(endpoint, time.perf_counter() - metrics[2], status_code, metrics[0], metrics[1])
+    except Exception as e:
+        logger.warning(f"No se pudo registrar la métrica del request {endpoint}: {e}")
+
+
+def init_request_metrics(app):
+    """Mide todos los requests de la app (latencia, estado, consultas SQL)"""
+
+    @app.before_request
+    def _start_request_metrics():
+        # [consultas, tiempo en BD, inicio]
+        g._request_metrics = [0, 0.0, time.perf_counter()]
+
+    @app.after_request
+    def _record_request_metrics(response):
+        _finish_request(response.status_code)
+        return response
+
+    @app.teardown_request
+    def _record_failed_request_metrics(exc):
+        # Excepciones no manejadas no pasan por after_request
+        if exc is not None:
+            _finish_request(500)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, '_metrics_started_at', None)
+    if started_at is None or not has_request_context():
+        return
+    metrics = g.get('_request_metrics')
+    if metrics is not None:
+        metrics[0] += 1
+        metrics[1] += time.perf_counter() - started_at
+
+
+# ----------------------------------------------------------------------
+# Consultas
+# ----------------------------------------------------------------------
+def get_performance_stats(window='5m'):
+    """
+    Obtiene estadísticas de rendimiento de la ventana móvil (todos los workers
+    con cache compartido). Tiempos en segundos.
+    """
+    merged = _merge_snapshots(_request_metrics.cluster_snapshots())
+    first_slot = _window_first_slot(window)
+
+    overall = _empty_totals()
+    errors_total = 0
+    endpoints: Dict[str, Dict[str, Any]] = {}
+    for (endpoint, status), data in merged['series'].items():
+        endpoint_totals = endpoints.setdefault(endpoint, {'totals': _empty_totals(), 'errors': 0, 'by_status': {}})
+        before = endpoint_totals['totals']['count']
+        _add_window(endpoint_totals['totals'], data['slots'], first_slot)
+        count = endpoint_totals['totals']['count'] - before
+        if count:
+            endpoint_totals['by_status'][status] = count
+        if status in ('4xx', '5xx'):
+            endpoint_totals['errors'] += count
+            errors_total += count
+        _add_window(overall, data['slots'], first_slot)
+
+    total_requests = overall['count']
+    quantiles = _quantiles(overall)
+
+    endpoint_stats = {}
+    for endpoint, data in endpoints.items():
+        totals = data['totals']
+        if not totals['count']:
+            continue
+        endpoint_quantiles = _quantiles(totals)
+        endpoint_stats[endpoint] = {
+            'count': totals['count'],
+            'avg_time': _round(totals['duration_sum'] / totals['count']),
+            'p50_time': _round(endpoint_quantiles['p50']),
+            'p95_time': _round(endpoint_quantiles['p95']),
+            'p99_time': _round(endpoint_quantiles['p99']),
+            'max_time': _round(totals['max']),
+            'errors': data['errors'],
+            'error_rate': round(data['errors'] / totals['count'] * 100, 2),
+            'by_status': data['by_status'],
+            'avg_db_queries': round(totals['db_queries'] / totals['count'], 2),
+            'avg_db_time': _round(totals['db_time'] / totals['count'])
         }
 
+    # Errores recientes
+    recent_errors = []
+    for error_key, count in sorted(merged['errors'].items(), key=lambda x: x[1], reverse=True)[:10]:
+        endpoint, status = error_key.rsplit(':', 1)
+        recent_errors.append({
+            'endpoint': endpoint,
+            'status_code': int(status),
+            'count': count
+        })
+
+    return {
+        'window': window if window in WINDOWS else '5m',
+        'workers': merged['workers'],
+        'total_requests': total_requests,
+        'avg_response_time': round(overall['duration_sum'] / total_requests, 3) if total_requests else 0,
+        'min_response_time': round(overall['min'] or 0, 3),
+        'max_response_time': round(overall['max'], 3),
+        'p50_response_time': round(quantiles['p50'] or 0, 3),
+        'p95_response_time': round(quantiles['p95'] or 0, 3),
+        'p99_response_time': round(quantiles['p99'] or 0, 3),
+        'error_rate': round(errors_total / total_requests * 100, 2) if total_requests else 0,
+        'avg_db_queries': round(overall['db_queries'] / total_requests, 2) if total_requests else 0,
+        'slow_requests_count': len(merged['slow_requests']),
+        'endpoint_stats': endpoint_stats,
+        'recent_errors': recent_errors,
+        'slow_requests': merged['slow_requests'][-10:]  # Últimos 10
+    }
+
+
+def _label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value is not None else 'NaN'
+
+
+def _http_client_lines() -> List[str]:
+    """Llamadas salientes del cliente HTTP compartido (de este worker), por host"""
+    try:
+        from app.infrastructure.external.http_client import get_http_client
+        hosts = sorted(get_http_client().get_stats()['hosts'].items())
+    except Exception as e:
+        logger.warning(f"No se pudieron leer las métricas del cliente HTTP: {e}")
+        return []
+
+    lines = [
+        '# HELP bimba_http_client_requests_total Solicitudes a servicios externos por clase de estado',
+        '# TYPE bimba_http_client_requests_total counter',
+    ]
+    for host, data in hosts:
+        for status, n in sorted(data['by_status'].items()):
+            lines.append(f'bimba_http_client_requests_total{{host="{_label(host)}",status="{status}"}} {n}')
+    lines += [
+        '# HELP bimba_http_client_errors_total Errores de red, timeouts y 5xx de servicios externos',
+        '# TYPE bimba_http_client_errors_total counter',
+    ]
+    for host, data in hosts:
+        for kind, n in sorted(data['errors_by_kind'].items()):
+            lines.append(f'bimba_http_client_errors_total{{host="{_label(host)}",kind="{kind}"}} {n}')
+    lines += [
+        '# HELP bimba_http_client_retries_total Reintentos hacia servicios externos',
+        '# TYPE bimba_http_client_retries_total counter',
+    ]
+    lines += [f'bimba_http_client_retries_total{{host="{_label(host)}"}} {data["retries"]}' for host, data in hosts]
+    lines += [
+        '# HELP bimba_http_client_circuit_rejections_total Solicitudes rechazadas con el circuito abierto',
+        '# TYPE bimba_http_client_circuit_rejections_total counter',
+    ]
+    lines += [f'bimba_http_client_circuit_rejections_total{{host="{_label(host)}"}} {data["circuit_rejections"]}'
+              for host, data in hosts]
+    lines += [
+        '# HELP bimba_http_client_circuit_open Circuito abierto (1) o cerrado/semiabierto (0) por host',
+        '# TYPE bimba_http_client_circuit_open gauge',
+    ]
+    lines += [f'bimba_http_client_circuit_open{{host="{_label(host)}"}} {int(data["circuit"] == "open")}'
+              for host, data in hosts]
+    lines += [
+        '# HELP bimba_http_client_latency_seconds Percentiles de latencia de las últimas llamadas por host',
+        '# TYPE bimba_http_client_latency_seconds gauge',
+    ]
+    for host, data in hosts:
+        latency = data['latency_ms']
+        if not latency['count']:
+            continue
+        for name, quantile in (('p50', '0.5'), ('p95', '0.95')):
+            lines.append(f'bimba_http_client_latency_seconds{{host="{_label(host)}",quantile="{quantile}"}} '
+                         f'{_number(latency[name] / 1000.0)}')
+    return lines
+
+
+def render_prometheus() -> str:
+    """Métricas en formato de texto de Prometheus (0.0.4), sumadas entre workers"""
+    merged = _merge_snapshots(_request_metrics.cluster_snapshots())
+    series = sorted(merged['series'].items())
+    lines = [
+        '# HELP bimba_http_request_duration_seconds Latencia de los requests HTTP',
+        '# TYPE bimba_http_request_duration_seconds histogram',
+    ]
+    for (endpoint, status), data in series:
+        labels = f'endpoint="{_label(endpoint)}",status="{status}"'
+        export = [0] * (len(EXPORT_BUCKETS) + 1)
+        for index, n in enumerate(data['buckets']):
+            export[_EXPORT_INDEX[index]] += n
+        cumulative = 0
+        for bound, n in zip(EXPORT_BUCKETS, export):
+            cumulative += n
+            lines.append(f'bimba_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'bimba_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {data["count"]}')
+        lines.append(f'bimba_http_request_duration_seconds_sum{{{labels}}} {_number(data["duration_sum"])}')
+        lines.append(f'bimba_http_request_duration_seconds_count{{{labels}}} {data["count"]}')
+
+    lines += [
+        '# HELP bimba_http_request_db_queries_total Consultas SQL ejecutadas por los requests',
+        '# TYPE bimba_http_request_db_queries_total counter',
+    ]
+    for (endpoint, status), data in series:
+        lines.append(f'bimba_http_request_db_queries_total{{endpoint="{_label(endpoint)}",status="{status}"}} '
+                     f'{data["db_queries"]}')
+
+    lines += [
+        '# HELP bimba_http_request_db_seconds_total Tiempo en consultas SQL de los requests',
+        '# TYPE bimba_http_request_db_seconds_total counter',
+    ]
+    for (endpoint, status), data in series:
+        lines.append(f'bimba_http_request_db_seconds_total{{endpoint="{_label(endpoint)}",status="{status}"}} '
+                     f'{_number(data["db_time"])}')
+
+    lines += [
+        '# HELP bimba_http_request_latency_seconds Percentiles de latencia en ventanas móviles',
+        '# TYPE bimba_http_request_latency_seconds gauge',
+    ]
+    for window in WINDOWS:
+        first_slot = _window_first_slot(window)
+        by_endpoint: Dict[str, Dict[str, Any]] = {}
+        for (endpoint, _), data in series:
+            _add_window(by_endpoint.setdefault(endpoint, _empty_totals()), data['slots'], first_slot)
+        for endpoint, totals in sorted(by_endpoint.items()):
+            if not totals['count']:
+                continue
+            for name, value in _quantiles(totals).items():
+                quantile = {'p50': '0.5', 'p95': '0.95', 'p99': '0.99'}[name]
+                lines.append(f'bimba_http_request_latency_seconds{{endpoint="{_label(endpoint)}",'
+                             f'window="{window}",quantile="{quantile}"}} {_number(value)}')
+
+    lines += _http_client_lines()
+
+    lines += [
+        '# HELP bimba_metrics_workers Workers incluidos en esta exportación',
+        '# TYPE bimba_metrics_workers gauge',
+        f'bimba_metrics_workers {merged["workers"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
 
 def check_performance_thresholds():
     """Verifica si se exceden umbrales de rendimiento"""
     stats = get_performance_stats()
     alerts = []
-    
+
     # Umbrales de alerta
     if stats['avg_response_time'] > 0.5:
         alerts.append({
             'level': 'warning',
             'message': f"Tiempo promedio de respuesta alto: {stats['avg_response_time']}s"
         })
-    
+
     if stats['p95_response_time'] > 1.0:
         alerts.append({
             'level': 'warning',
             'message': f"P95 de tiempo de respuesta alto: {stats['p95_response_time']}s"
         })
-    
+
     if stats['error_rate'] > 5.0:
         alerts.append({
             'level': 'critical',
             'message': f"Tasa de errores alta: {stats['error_rate']}%"
         })
-    
+
     if stats['slow_requests_count'] > 50:
         alerts.append({
             'level': 'warning',
             'message': f"Muchos requests lentos: {stats['slow_requests_count']}"
         })
-    
+
     return alerts
 
 
 def reset_metrics():
     """Resetea todas las métricas (útil para testing)"""
-    with _metrics_lock:
-        _metrics['request_times'].clear()
-        _metrics['endpoint_stats'].clear()
-        _metrics['error_counts'].clear()
-        _metrics['slow_requests'].clear()
-
-
-
+    _request_metrics.reset()
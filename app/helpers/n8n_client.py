@@ -4,12 +4,15 @@ Permite que la aplicación envíe eventos a n8n cuando ocurren acciones específ
 """
 import requests
 import logging
-import time
+import os
 import threading
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from flask import current_app
 
+from app.infrastructure.cache import get_cache_manager
+from app.infrastructure.external.http_client import get_http_client
+
 logger = logging.getLogger(__name__)
 
 # Métricas de webhooks (thread-safe)
@@ -43,10 +46,95 @@ def _update_metrics(success: bool, error_type: Optional[str] = None, error_msg:
 
 
 def get_webhook_metrics() -> Dict[str, Any]:
-    """Obtiene métricas de webhooks"""
+    """Obtiene métricas de webhooks (incluye estado del outbox: profundidad, lag y descartes)"""
     global _webhook_metrics
     with _metrics_lock:
-        return _webhook_metrics.copy()
+        metrics = _webhook_metrics.copy()
+    try:
+        from app.helpers.webhook_outbox import get_webhook_dispatcher
+        metrics['outbox'] = get_webhook_dispatcher().get_stats()
+    except Exception as e:
+        logger.debug(f"No se pudieron obtener métricas del outbox: {e}")
+    return metrics
+
+
+CONFIG_CACHE_NAMESPACE = 'n8n_config'
+CONFIG_CACHE_TTL = 60
+
+get_cache_manager().register_namespace(CONFIG_CACHE_NAMESPACE, CONFIG_CACHE_TTL, max_entries=4)
+
+
+def _parse_workflow_list(value: Optional[str]) -> List[str]:
+    """'wf1, wf2' -> ['wf1', 'wf2'] ('default' = webhook sin workflow_id)"""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def _load_n8n_config() -> Dict[str, Any]:
+    """Lee la configuración de n8n desde SystemConfig (con fallback a app.config)"""
+    batch_env = current_app.config.get('N8N_BATCH_WORKFLOWS') or os.environ.get('N8N_BATCH_WORKFLOWS')
+    try:
+        from app.models.system_config_models import SystemConfig
+        return {
+            'webhook_url': SystemConfig.get('n8n_webhook_url') or current_app.config.get('N8N_WEBHOOK_URL'),
+            'secret': SystemConfig.get('n8n_webhook_secret') or current_app.config.get('N8N_WEBHOOK_SECRET'),
+            'api_key': SystemConfig.get('n8n_api_key') or current_app.config.get('N8N_API_KEY'),
+            'batch_workflows': _parse_workflow_list(SystemConfig.get('n8n_batch_workflows') or batch_env),
+        }
+    except Exception:
+        return {
+            'webhook_url': current_app.config.get('N8N_WEBHOOK_URL'),
+            'secret': current_app.config.get('N8N_WEBHOOK_SECRET'),
+            'api_key': current_app.config.get('N8N_API_KEY'),
+            'batch_workflows': _parse_workflow_list(batch_env),
+        }
+
+
+def get_n8n_config() -> Dict[str, Any]:
+    """
+    Configuración de n8n cacheada (evita consultar SystemConfig en cada evento)
+    
+    Returns:
+        Dict con webhook_url, secret, api_key y batch_workflows
+    """
+    return get_cache_manager().get_or_load(CONFIG_CACHE_NAMESPACE, 'config', _load_n8n_config,
+                                           ttl=CONFIG_CACHE_TTL)
+
+
+def invalidate_n8n_config():
+    """Invalida la configuración cacheada (llamar al guardar la configuración de n8n)"""
+    get_cache_manager().invalidate(CONFIG_CACHE_NAMESPACE)
+
+
+def build_webhook_url(webhook_url: str, workflow_id: Optional[str] = None) -> str:
+    """Agrega el workflow_id a la URL base del webhook (si hay)"""
+    if not workflow_id:
+        return webhook_url
+    if webhook_url.endswith('/'):
+        return f"{webhook_url}{workflow_id}"
+    return f"{webhook_url}/{workflow_id}"
+
+
+def batching_enabled(config: Dict[str, Any], workflow_id: Optional[str] = None) -> bool:
+    """
+    El workflow aceptó recibir lotes (n8n_batch_workflows / N8N_BATCH_WORKFLOWS).
+    Los demás reciben un POST por evento con su event_type de siempre.
+    """
+    return (workflow_id or 'default') in (config.get('batch_workflows') or [])
+
+
+def build_webhook_headers(config: Dict[str, Any]) -> Dict[str, str]:
+    """Headers del webhook (secreto y API key si están configurados)"""
+    headers = {
+        'Content-Type': 'application/json'
+    }
+    
+    if config.get('secret'):
+        headers['X-Webhook-Secret'] = config['secret']
+    
+    if config.get('api_key'):
+        headers['X-API-Key'] = config['api_key']
+    
+    return headers
 
 
 def _send_to_n8n_sync(event_type: str, data: Dict[str, Any], workflow_id: Optional[str] = None, 
@@ -73,27 +161,14 @@ def _send_to_n8n_sync(event_type: str, data: Dict[str, Any], workflow_id: Option
         # Si no hay contexto Flask u otro error, continuar con el comportamiento normal
         pass
 
-    # Leer configuración desde SystemConfig primero
-    try:
-        from app.models.system_config_models import SystemConfig
-        webhook_url = SystemConfig.get('n8n_webhook_url') or current_app.config.get('N8N_WEBHOOK_URL')
-        secret = SystemConfig.get('n8n_webhook_secret') or current_app.config.get('N8N_WEBHOOK_SECRET')
-        api_key = SystemConfig.get('n8n_api_key') or current_app.config.get('N8N_API_KEY')
-    except:
-        webhook_url = current_app.config.get('N8N_WEBHOOK_URL')
-        secret = current_app.config.get('N8N_WEBHOOK_SECRET')
-        api_key = current_app.config.get('N8N_API_KEY')
+    config = get_n8n_config()
+    webhook_url = config.get('webhook_url')
     
     if not webhook_url:
         logger.debug("N8N_WEBHOOK_URL no configurada, no se enviará evento a n8n")
         return False
     
-    # Si hay workflow_id, agregarlo a la URL
-    if workflow_id:
-        if webhook_url.endswith('/'):
-            webhook_url = f"{webhook_url}{workflow_id}"
-        else:
-            webhook_url = f"{webhook_url}/{workflow_id}"
+    webhook_url = build_webhook_url(webhook_url, workflow_id)
     
     payload = {
         'event_type': event_type,
@@ -101,66 +176,40 @@ def _send_to_n8n_sync(event_type: str, data: Dict[str, Any], workflow_id: Option
         'data': data
     }
     
-    headers = {
-        'Content-Type': 'application/json'
-    }
-    
-    if secret:
-        headers['X-Webhook-Secret'] = secret
+    headers = build_webhook_headers(config)
     
-    if api_key:
-        headers['X-API-Key'] = api_key
-    
-    # Retry con backoff exponencial
-    last_error = None
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(
-                webhook_url,
-                json=payload,
-                headers=headers,
-                timeout=timeout
-            )
-            response.raise_for_status()
-            logger.info(f"Evento enviado a n8n: {event_type} (intento {attempt + 1}/{max_retries})")
-            _update_metrics(True)
-            return True
-        except requests.exceptions.Timeout as e:
-            last_error = ('timeout', str(e))
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt  # Backoff exponencial: 1s, 2s, 4s
-                logger.warning(f"Timeout enviando evento a n8n (intento {attempt + 1}/{max_retries}), reintentando en {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"Timeout enviando evento a n8n después de {max_retries} intentos: {event_type}")
-                _update_metrics(False, 'timeout', str(e))
-                return False
-        except requests.exceptions.RequestException as e:
-            last_error = ('request_error', str(e))
-            # Para errores 4xx (client errors), no reintentar
-            if hasattr(e.response, 'status_code') and 400 <= e.response.status_code < 500:
-                logger.error(f"Error del cliente enviando evento a n8n: {event_type}, error: {e}")
-                _update_metrics(False, 'client_error', str(e))
-                return False
-            # Para errores 5xx (server errors), reintentar
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt
-                logger.warning(f"Error del servidor enviando evento a n8n (intento {attempt + 1}/{max_retries}), reintentando en {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"Error enviando evento a n8n después de {max_retries} intentos: {event_type}, error: {e}")
-                _update_metrics(False, 'server_error', str(e))
-                return False
-        except Exception as e:
-            last_error = ('unexpected_error', str(e))
-            logger.error(f"Error inesperado enviando evento a n8n: {event_type}, error: {e}")
-            _update_metrics(False, 'unexpected_error', str(e))
+    # Reintentos con backoff (cliente HTTP compartido). El evento se puede
+    # entregar más de una vez, igual que desde el outbox: se marca idempotente
+    try:
+        response = get_http_client().post(
+            webhook_url,
+            json=payload,
+            headers=headers,
+            timeout=timeout,
+            retries=max(max_retries - 1, 0),
+            idempotent=True
+        )
+        response.raise_for_status()
+        logger.info(f"Evento enviado a n8n: {event_type}")
+        _update_metrics(True)
+        return True
+    except requests.exceptions.Timeout as e:
+        logger.error(f"Timeout enviando evento a n8n (hasta {max_retries} intentos): {event_type}")
+        _update_metrics(False, 'timeout', str(e))
+        return False
+    except requests.exceptions.RequestException as e:
+        # Errores 4xx (client errors): el cliente no los reintenta
+        if hasattr(e.response, 'status_code') and 400 <= e.response.status_code < 500:
+            logger.error(f"Error del cliente enviando evento a n8n: {event_type}, error: {e}")
+            _update_metrics(False, 'client_error', str(e))
             return False
-    
-    # Si llegamos aquí, todos los intentos fallaron
-    if last_error:
-        _update_metrics(False, last_error[0], last_error[1])
-    return False
+        logger.error(f"Error del servidor enviando evento a n8n: {event_type}, error: {e}")
+        _update_metrics(False, 'server_error', str(e))
+        return False
+    except Exception as e:
+        logger.error(f"Error inesperado enviando evento a n8n: {event_type}, error: {e}")
+        _update_metrics(False, 'unexpected_error', str(e))
+        return False
 
 
 def send_to_n8n(event_type: str, data: Dict[str, Any], workflow_id: Optional[str] = None, 
@@ -172,25 +221,31 @@ def send_to_n8n(event_type: str, data: Dict[str, Any], workflow_id: Optional[str
         event_type: Tipo de evento (ej: 'delivery_created', 'inventory_updated', 'shift_closed')
         data: Datos del evento
         workflow_id: ID del workflow específico (opcional)
-        async_mode: Si True, envía en un thread separado (no bloquea)
+        async_mode: Si True, encola en el outbox persistente (no bloquea)
         max_retries: Número máximo de reintentos (default: 3)
         timeout: Timeout en segundos (default: 5)
         
     Returns:
-        bool: True si se programó el envío (async) o se envió correctamente (sync), False en caso contrario
+        bool: True si se encoló el envío (async) o se envió correctamente (sync), False en caso contrario
     """
     if async_mode:
-        # Enviar en un thread separado para no bloquear
-        def send_async():
-            try:
-                _send_to_n8n_sync(event_type, data, workflow_id, max_retries, timeout)
-            except Exception as e:
-                logger.error(f"Error en envío asíncrono a n8n: {event_type}, error: {e}")
+        # Encolar en el outbox persistente; el dispatcher lo envía (en lote)
+        try:
+            if current_app and current_app.config.get('LOCAL_ONLY', True):
+                logger.debug(f"LOCAL_ONLY activo: no se encola evento a n8n ({event_type})")
+                return True
+        except Exception:
+            pass
         
-        thread = threading.Thread(target=send_async, daemon=True)
-        thread.start()
-        logger.debug(f"Evento programado para envío asíncrono a n8n: {event_type}")
-        return True
+        if not get_n8n_config().get('webhook_url'):
+            logger.debug("N8N_WEBHOOK_URL no configurada, no se encolará evento a n8n")
+            return False
+        
+        from app.helpers.webhook_outbox import get_webhook_dispatcher
+        queued = get_webhook_dispatcher().enqueue(event_type, data, workflow_id)
+        if queued:
+            logger.debug(f"Evento encolado para envío a n8n: {event_type}")
+        return queued
     else:
         # Envío síncrono
         return _send_to_n8n_sync(event_type, data, workflow_id, max_retries, timeout)
@@ -0,0 +1,249 @@
+"""
+Canal de entrega de PaymentIntents a los agentes de pago (GETNET)
+
+Reemplaza el polling cada 0.5s de /api/payment/agent/pending:
+- Long-poll: el agente espera (hasta `wait` segundos) y se despierta apenas
+  se confirma un PaymentIntent READY para su caja. Mientras espera no se
+  consulta la BD: solo se revisa la señal de la caja (contador compartido en
+  el cache manager) y, como respaldo, la BD cada FALLBACK_INTERVAL. Con el
+  backend de cache en memoria la señal no cruza workers (un intent creado
+  en otro worker solo se ve por la consulta de respaldo), así que el
+  respaldo baja a LOCAL_FALLBACK_INTERVAL.
+- Push opcional: SocketIO namespace /payment_agent, sala por caja
+  (evento 'payment_intent_ready'); el agente luego reclama por HTTP.
+- Reclamo atómico: UPDATE condicional (status = READY) con SKIP LOCKED donde
+  el motor lo soporta; dos agentes nunca toman el mismo intent.
+- Latencias (creación -> tomado -> resultado) con p50/p95 por proceso.
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import threading
+import time
+import logging
+
+from app.helpers.monitoring import LatencyWindow
+from app.infrastructure.cache import get_cache_manager
+from app.infrastructure.session_changes import watch, KIND_NEW, KIND_DIRTY
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = 'payment_agent'
+SOCKETIO_NAMESPACE = '/payment_agent'
+
+MAX_WAIT_SECONDS = 25       # Bajo los timeouts típicos de proxy (30s)
+SIGNAL_CHECK_INTERVAL = 0.5  # Revisión de la señal compartida (sin tocar la BD)
+FALLBACK_INTERVAL = 5.0     # Consulta de respaldo con cache compartido (señal perdida)
+LOCAL_FALLBACK_INTERVAL = 1.0  # Consulta de respaldo con cache en memoria (única vía entre workers)
+CLAIM_CANDIDATES = 5
+LATENCY_SAMPLES = 500
+
+get_cache_manager().register_namespace(CACHE_NAMESPACE, 24 * 3600, max_entries=200)
+
+
+def fallback_interval() -> float:
+    """Intervalo de la consulta de respaldo según si la señal se comparte entre workers"""
+    shared = get_cache_manager().backend_name != 'memory'
+    return FALLBACK_INTERVAL if shared else LOCAL_FALLBACK_INTERVAL
+
+
+def socketio_room(register_id: str) -> str:
+    return f"register:{register_id}"
+
+
+def _supports_skip_locked(dialect) -> bool:
+    """FOR UPDATE SKIP LOCKED: PostgreSQL 9.5+, MySQL 8.0+ y MariaDB 10.6+"""
+    version = dialect.server_version_info or ()
+    if dialect.name == 'postgresql':
+        return version >= (9, 5)
+    if dialect.name == 'mysql':
+        return version >= ((10, 6) if getattr(dialect, 'is_mariadb', False) else (8, 0))
+    return False
+
+
+class PaymentAgentChannel:
+    """Señales por caja, reclamo atómico y métricas del canal (uno por proceso)"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._lock = threading.Lock()
+        self._latencies = {
+            'pickup': LatencyWindow(LATENCY_SAMPLES),      # READY -> tomado por el agente
+            'processing': LatencyWindow(LATENCY_SAMPLES),  # tomado -> resultado del agente
+            'total': LatencyWindow(LATENCY_SAMPLES)        # READY -> resultado (terminal)
+        }
+        self._stats = {
+            'polls': 0, 'long_polls': 0, 'wakeups': 0, 'fallback_checks': 0,
+            'claims': 0, 'claim_conflicts': 0, 'empty_polls': 0, 'signals': 0, 'pushes': 0
+        }
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    # ------------------------------------------------------------------
+    # Señales
+    # ------------------------------------------------------------------
+    @staticmethod
+    def signal_version(register_id: str) -> int:
+        return get_cache_manager().get(CACHE_NAMESPACE, str(register_id), 0)
+
+    def notify(self, register_id: str) -> None:
+        """Despierta a los agentes de la caja (este worker, otros workers vía cache y SocketIO)"""
+        register_id = str(register_id)
+        manager = get_cache_manager()
+        manager.set(CACHE_NAMESPACE, register_id, manager.get(CACHE_NAMESPACE, register_id, 0) + 1)
+        with self._condition:
+            self._condition.notify_all()
+        self._count('signals')
+        try:
+            from app import socketio
+            socketio.emit(
+                'payment_intent_ready',
+                {'register_id': register_id},
+                namespace=SOCKETIO_NAMESPACE,
+                to=socketio_room(register_id)
+            )
+            self._count('pushes')
+        except Exception as e:
+            logger.warning(f"No se pudo emitir payment_intent_ready para caja {register_id}: {e}")
+
+    def _wait_signal(self, register_id: str, seen: int, timeout: float) -> bool:
+        """Espera hasta `timeout` a que cambie la señal de la caja; True si cambió"""
+        with self._condition:
+            self._condition.wait(timeout)
+        return self.signal_version(register_id) != seen
+
+    # ------------------------------------------------------------------
+    # Reclamo atómico
+    # ------------------------------------------------------------------
+    def claim_next(self, register_id: str, agent_id: str):
+        """
+        Toma el PaymentIntent READY más antiguo de la caja y lo pasa a IN_PROGRESS.
+
+        Returns:
+            PaymentIntent tomado por este agente, o None si no hay pendientes
+        """
+        from app.models import db
+        from app.models.pos_models import PaymentIntent
+
+        register_id = str(register_id)
+        try:
+            candidates = db.session.query(PaymentIntent.id).filter(
+                PaymentIntent.register_id == register_id,
+                PaymentIntent.status == PaymentIntent.STATUS_READY
+            ).order_by(PaymentIntent.created_at.asc()).limit(CLAIM_CANDIDATES)
+            if _supports_skip_locked(db.engine.dialect):
+                candidates = candidates.with_for_update(skip_locked=True)
+
+            for (intent_id,) in candidates.all():
+                now = datetime.utcnow()
+                updated = PaymentIntent.query.filter(
+                    PaymentIntent.id == intent_id,
+                    PaymentIntent.status == PaymentIntent.STATUS_READY
+                ).update({
+                    PaymentIntent.status: PaymentIntent.STATUS_IN_PROGRESS,
+                    PaymentIntent.locked_by_agent: agent_id,
+                    PaymentIntent.locked_at: now,
+                    PaymentIntent.updated_at: now
+                }, synchronize_session=False)
+                if updated == 1:
+                    db.session.commit()
+                    intent = PaymentIntent.query.get(intent_id)
+                    self._count('claims')
+                    if intent and intent.created_at:
+                        self._record('pickup', (now - intent.created_at).total_seconds())
+                    return intent
+                # Otro agente lo tomó entre la lectura y el UPDATE
+                self._count('claim_conflicts')
+            # Liberar la conexión (el long-poll no debe retener una del pool)
+            db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+        return None
+
+    def wait_for_intent(self, register_id: str, agent_id: str, wait_seconds: float = 0):
+        """
+        Reclama un intent; si no hay y wait_seconds > 0, espera la señal de la caja
+        y reintenta hasta que aparezca uno o se cumpla el plazo.
+        """
+        register_id = str(register_id)
+        wait_seconds = max(0.0, min(float(wait_seconds or 0), MAX_WAIT_SECONDS))
+        self._count('long_polls' if wait_seconds else 'polls')
+
+        # Leer la señal antes de consultar: un intent confirmado después la cambia
+        seen = self.signal_version(register_id)
+        intent = self.claim_next(register_id, agent_id)
+        deadline = time.monotonic() + wait_seconds
+        last_db_check = time.monotonic()
+        interval = fallback_interval()
+
+        while intent is None and time.monotonic() < deadline:
+            remaining = deadline - time.monotonic()
+            signaled = self._wait_signal(register_id, seen, min(SIGNAL_CHECK_INTERVAL, remaining))
+            fallback = time.monotonic() - last_db_check >= interval
+            if not signaled and not fallback:
+                continue
+            self._count('wakeups' if signaled else 'fallback_checks')
+            seen = self.signal_version(register_id)
+            intent = self.claim_next(register_id, agent_id)
+            last_db_check = time.monotonic()
+
+        if intent is None:
+            self._count('empty_polls')
+        return intent
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    def _record(self, kind: str, seconds: float) -> None:
+        self._latencies[kind].record(seconds)
+
+    def record_terminal(self, intent) -> None:
+        """Registra las latencias de un intent que llegó a estado terminal (resultado del agente)"""
+        now = datetime.utcnow()
+        if intent.locked_at:
+            self._record('processing', (now - intent.locked_at).total_seconds())
+        if intent.created_at:
+            self._record('total', (now - intent.created_at).total_seconds())
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'latency_seconds': {kind: window.summary() for kind, window in self._latencies.items()},
+                'max_wait_seconds': MAX_WAIT_SECONDS,
+                'fallback_interval': fallback_interval()
+            }
+
+
+_channel = PaymentAgentChannel()
+
+
+def get_payment_agent_channel() -> PaymentAgentChannel:
+    """Canal de agentes de pago (uno por proceso)"""
+    return _channel
+
+
+# ----------------------------------------------------------------------
+# Señal automática: PaymentIntent READY confirmado
+# ----------------------------------------------------------------------
+def _intent_models():
+    from app.models.pos_models import PaymentIntent
+    return (PaymentIntent,)
+
+
+def _ready_register(obj, kind: str, changed) -> Optional[str]:
+    return str(obj.register_id) if obj.status == obj.STATUS_READY else None
+
+
+def _notify_ready_intents(registers: List[str]) -> None:
+    for register_id in set(registers):
+        try:
+            _channel.notify(register_id)
+        except Exception as e:
+            logger.warning(f"No se pudo notificar a los agentes de la caja {register_id}: {e}")
+
+
+watch('payment_agent_channel', models=_intent_models, apply=_notify_ready_intents,
+      collect=_ready_register, kinds=(KIND_NEW, KIND_DIRTY))
@@ -1,10 +1,31 @@
 """
-Helper para generación de códigos QR para tickets
+Helper para generación de códigos QR y de barras para tickets
+
+Las imágenes se direccionan por contenido (sha256 de tipo + parámetros +
+payload): la misma entrada siempre produce la misma clave, así que se
+renderizan una sola vez y se sirven desde:
+- cache en memoria (CacheManager, namespace 'ticket_images', LRU)
+- almacén en disco (instance/ticket_images/<aa>/<clave>.png), que sobrevive
+  reinicios y se comparte entre workers. Las lecturas renuevan la fecha de
+  modificación y un barrido periódico borra lo que no se usa hace DISK_MAX_AGE
+
+Al crear un TicketEntrega o una Entrada se pregeneran sus QR en segundo
+plano, de modo que la primera vista también sale del cache.
 """
 import logging
 import io
+import os
 import base64
-from typing import Optional
+import hashlib
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Callable, List, Tuple
+
+from app.infrastructure.cache import get_cache_manager
+from app.infrastructure.session_changes import watch, KIND_NEW
+
 try:
     import qrcode
     from qrcode.image.pil import PilImage
@@ -15,49 +36,200 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+CACHE_NAMESPACE = 'ticket_images'
+IMAGE_MAX_AGE = 24 * 3600  # Cache HTTP: la URL determina el contenido
+DISK_MAX_AGE = 30 * 24 * 3600  # Imágenes en disco sin uso por más de esto se borran
+DISK_SWEEP_INTERVAL = 3600  # Como máximo un barrido por hora por proceso
+
+get_cache_manager().register_namespace(CACHE_NAMESPACE, 24 * 3600, max_entries=512)
+
+
+@dataclass(frozen=True)
+class CachedImage:
+    """PNG generado y su clave de contenido (sirve de ETag)"""
+    key: str
+    png: bytes
+
+    @property
+    def base64(self) -> str:
+        return base64.b64encode(self.png).decode()
+
+    @property
+    def data_uri(self) -> str:
+        return f"data:image/png;base64,{self.base64}"
+
+
+def image_key(kind: str, payload: str, *params) -> str:
+    """Clave de contenido de una imagen"""
+    raw = '|'.join([kind, *(str(p) for p in params), str(payload)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _default_disk_dir() -> Optional[str]:
+    try:
+        from flask import current_app
+        return os.path.join(current_app.instance_path, 'ticket_images')
+    except RuntimeError:
+        return None
+
+
+def _disk_path(disk_dir: Optional[str], key: str) -> Optional[str]:
+    return os.path.join(disk_dir, key[:2], f"{key}.png") if disk_dir else None
+
+
+def _write_disk(path: str, png: bytes) -> None:
+    """Escritura atómica (tmp + rename): otro worker nunca lee un PNG a medias"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar imagen de ticket en disco ({path}): {e}")
+
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+def sweep_disk(disk_dir: str, max_age: float = DISK_MAX_AGE) -> int:
+    """
+    Borra del almacén en disco las imágenes sin uso hace más de `max_age`
+    segundos (y temporales huérfanos). Una imagen borrada se vuelve a
+    renderizar si se pide otra vez.
+
+    Returns:
+        Número de archivos borrados
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    for root, _, files in os.walk(disk_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue  # Otro worker lo borró o lo reemplazó
+    if removed:
+        logger.info(f"Imágenes de tickets: {removed} archivo(s) sin uso borrados de {disk_dir}")
+    return removed
+
+
+def _maybe_sweep_disk(disk_dir: str) -> None:
+    global _last_sweep
+    now = time.time()
+    with _sweep_lock:
+        if now - _last_sweep < DISK_SWEEP_INTERVAL:
+            return
+        _last_sweep = now
+    try:
+        sweep_disk(disk_dir)
+    except OSError as e:
+        logger.warning(f"No se pudo limpiar el almacén de imágenes de tickets ({disk_dir}): {e}")
+
+
+def _load_or_render(key: str, render: Callable[[], bytes], disk_dir: Optional[str] = None) -> CachedImage:
+    manager = get_cache_manager()
+    png = manager.get(CACHE_NAMESPACE, key)
+    if png is None:
+        disk_dir = disk_dir or _default_disk_dir()
+        path = _disk_path(disk_dir, key)
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                png = f.read()
+            try:
+                os.utime(path)  # En uso: que el barrido no la borre
+            except OSError:
+                pass
+        else:
+            png = render()
+            if path:
+                _write_disk(path, png)
+                _maybe_sweep_disk(disk_dir)
+        manager.set(CACHE_NAMESPACE, key, png)
+    return CachedImage(key, png)
+
+
+def get_qr_image(payload: str, error_correction: str = 'L', box_size: int = 10, border: int = 4,
+                 size: Optional[int] = None, disk_dir: Optional[str] = None) -> CachedImage:
+    """
+    QR PNG (cacheado por contenido).
+
+    Args:
+        payload: Contenido del QR
+        error_correction: 'L', 'M', 'Q' o 'H'
+        size: Si se indica, el QR se redimensiona a size x size px
+    """
+    if not QR_AVAILABLE:
+        raise RuntimeError("qrcode no está disponible")
+
+    def render() -> bytes:
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{error_correction}"),
+            box_size=box_size,
+            border=border,
+        )
+        qr.add_data(payload)
+        qr.make(fit=True)
+        img = qr.make_image(fill_color="black", back_color="white")
+        if size:
+            img = img.resize((size, size))
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    key = image_key('qr', payload, error_correction, box_size, border, size or '')
+    return _load_or_render(key, render, disk_dir)
+
+
+def get_barcode_image(text: str, disk_dir: Optional[str] = None) -> CachedImage:
+    """Código de barras Code128 PNG (cacheado por contenido)"""
+    def render() -> bytes:
+        import barcode
+        from barcode.writer import ImageWriter
+        code128 = barcode.get_barcode_class('code128')
+        buffer = io.BytesIO()
+        code128(text, writer=ImageWriter()).write(buffer)
+        return buffer.getvalue()
+
+    return _load_or_render(image_key('code128', text), render, disk_dir)
+
+
+def image_response(image: CachedImage, max_age: int = IMAGE_MAX_AGE):
+    """Respuesta PNG con ETag (clave de contenido) y Cache-Control; 304 si el cliente ya la tiene"""
+    from flask import request, Response
+    etag = f'"{image.key[:32]}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={max_age}, immutable'
+    }
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+    return Response(image.png, mimetype='image/png', headers=headers)
+
 
 def generate_ticket_qr(ticket_code: str, size: int = 200) -> Optional[str]:
     """
     Genera un código QR para el ticket en formato base64
-    
+
     Args:
         ticket_code: Código del ticket
         size: Tamaño del QR en píxeles
-        
+
     Returns:
         String base64 de la imagen QR o None si hay error
     """
     if not QR_AVAILABLE:
         logger.warning("qrcode no está disponible. No se generará QR.")
         return None
-    
+
     try:
-        # Crear QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        
-        # Agregar datos
-        qr.add_data(ticket_code)
-        qr.make(fit=True)
-        
-        # Crear imagen
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Redimensionar si es necesario
-        if size != 200:
-            img = img.resize((size, size))
-        
-        # Convertir a base64
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        
-        return f"data:image/png;base64,{img_str}"
-        
+        # Redimensionar solo si es necesario (200 = tamaño natural)
+        return get_qr_image(ticket_code, 'L', size=size if size != 200 else None).data_uri
     except Exception as e:
         logger.error(f"Error al generar QR para ticket {ticket_code}: {e}", exc_info=True)
         return None
@@ -66,13 +238,57 @@ def generate_ticket_qr(ticket_code: str, size: int = 200) -> Optional[str]:
 def generate_ticket_qr_url(ticket_code: str) -> str:
     """
     Genera URL para el QR del ticket (para usar en templates)
-    
+
     Args:
         ticket_code: Código del ticket
-        
+
     Returns:
         URL del QR o string vacío si no está disponible
     """
     qr_data = generate_ticket_qr(ticket_code)
     return qr_data or ''
 
+
+# ----------------------------------------------------------------------
+# Pregeneración al crear tickets
+# ----------------------------------------------------------------------
+# (payload, error_correction, size) de cada QR que se mostrará para el ticket
+QrSpec = Tuple[str, str, Optional[int]]
+
+
+def pregenerate_qr_images(specs: List[QrSpec], disk_dir: Optional[str] = None) -> None:
+    """Genera (si no existen) los QR indicados; pensado para correr en segundo plano"""
+    for payload, error_correction, size in specs:
+        try:
+            get_qr_image(payload, error_correction, size=size, disk_dir=disk_dir)
+        except Exception as e:
+            logger.warning(f"No se pudo pregenerar QR de ticket: {e}")
+
+
+def _ticket_models():
+    from app.models.ticket_entrega_models import TicketEntrega
+    from app.models.ecommerce_models import Entrada
+    return (TicketEntrega, Entrada)
+
+
+def _ticket_qr_specs(obj, kind: str, changed) -> Optional[List[QrSpec]]:
+    from app.models.ticket_entrega_models import TicketEntrega
+    if isinstance(obj, TicketEntrega):
+        # Vista del ticket en caja / guardarropía (corrección alta)
+        return [(obj.qr_token, 'H', None)] if obj.qr_token else None
+    if obj.ticket_code:
+        # Confirmación / vista pública (200px) y email (250px)
+        return [(obj.ticket_code, 'L', None), (obj.ticket_code, 'L', 250)]
+    return None
+
+
+def _pregenerate_on_commit(changes: List[List[QrSpec]]) -> None:
+    if not QR_AVAILABLE:
+        return
+    from app import socketio
+    specs = [spec for specs in changes for spec in specs]
+    socketio.start_background_task(pregenerate_qr_images, specs, _default_disk_dir())
+
+
+watch('ticket_qr_images', models=_ticket_models, apply=_pregenerate_on_commit,
+      collect=_ticket_qr_specs, kinds=(KIND_NEW,))
@@ -2,7 +2,6 @@
 Helpers para optimización de consultas de base de datos
 """
 from functools import wraps
-from flask import current_app
 from app.models import db
 from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy import func, case
@@ -180,35 +179,25 @@ def get_deliveries_by_hour_for_shift(shift_opened_at, shift_closed_at=None):
     return query.all()
 
 
-def cache_query_result(cache_key_prefix, ttl=300):
+def cache_query_result(cache_key_prefix, ttl=300, max_entries=256):
     """
     Decorator para cachear resultados de queries
+    Usa un namespace propio (cache_key_prefix) en la capa única de cache
     """
+    import hashlib
+    import json
+    from app.infrastructure.cache import get_cache_manager
+
+    get_cache_manager().register_namespace(cache_key_prefix, ttl, max_entries)
+
     def decorator(func):
-        cache = {}
-        cache_times = {}
-        
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Crear clave de cache única
-            import hashlib
-            import json
             cache_key = f"{cache_key_prefix}_{hashlib.md5(json.dumps((args, sorted(kwargs.items())), default=str).encode()).hexdigest()}"
-            
-            # Verificar cache
-            import time
-            if cache_key in cache:
-                cache_time = cache_times.get(cache_key, 0)
-                if time.time() - cache_time < ttl:
-                    current_app.logger.debug(f"Cache hit: {cache_key}")
-                    return cache[cache_key]
-            
-            # Ejecutar query y cachear
-            result = func(*args, **kwargs)
-            cache[cache_key] = result
-            cache_times[cache_key] = time.time()
-            
-            return result
-        
+            return get_cache_manager().get_or_load(
+                cache_key_prefix, cache_key, lambda: func(*args, **kwargs), ttl=ttl
+            )
+
         return wrapper
     return decorator
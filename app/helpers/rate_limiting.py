@@ -1,17 +1,21 @@
-import time
-from collections import defaultdict
+import zlib
 from flask import request, session
 
-# Almacenamiento en memoria de intentos fallidos
-_failed_attempts = defaultdict(list)
+from app.infrastructure.rate_limiter.storage import get_rate_limit_storage
+
+# Intentos fallidos y límites por endpoint sobre el storage común de rate
+# limiting (ventana deslizante, compartido entre workers con backend sqlite)
 _max_attempts = 5
 _lockout_duration = 300  # 5 minutos en segundos
 
+FAILED_PREFIX = 'login_failed:'
+ENDPOINT_PREFIX = 'endpoint_rate:'
+
 
 def record_failed_attempt(identifier, max_attempts=None, lockout_duration=None):
     """
     Registra un intento fallido de autenticación
-    
+
     Args:
         identifier: Identificador único (IP, employee_id, etc.)
         max_attempts: Máximo de intentos permitidos
@@ -19,64 +23,41 @@ def record_failed_attempt(identifier, max_attempts=None, lockout_duration=None):
     """
     max_att = max_attempts or _max_attempts
     lockout = lockout_duration or _lockout_duration
-    
-    current_time = time.time()
-    
-    # Limpiar intentos antiguos (más antiguos que el lockout_duration)
-    _failed_attempts[identifier] = [
-        attempt_time for attempt_time in _failed_attempts[identifier]
-        if current_time - attempt_time < lockout
-    ]
-    
-    # Agregar nuevo intento
-    _failed_attempts[identifier].append(current_time)
+
+    # Se registra siempre, aunque ya esté bloqueado
+    get_rate_limit_storage().hit(f"{FAILED_PREFIX}{identifier}", lockout, max_att, force=True)
 
 
 def clear_failed_attempts(identifier):
     """Limpia los intentos fallidos para un identificador"""
-    if identifier in _failed_attempts:
-        del _failed_attempts[identifier]
+    get_rate_limit_storage().reset(f"{FAILED_PREFIX}{identifier}")
 
 
 def is_locked_out(identifier, max_attempts=None, lockout_duration=None):
     """
     Verifica si un identificador está bloqueado
-    
+
     Returns:
         tuple: (is_locked, remaining_time, attempts)
     """
     max_att = max_attempts or _max_attempts
     lockout = lockout_duration or _lockout_duration
-    
-    if identifier not in _failed_attempts:
-        return False, 0, 0
-    
-    current_time = time.time()
-    attempts = _failed_attempts[identifier]
-    
-    # Limpiar intentos antiguos
-    recent_attempts = [
-        attempt_time for attempt_time in attempts
-        if current_time - attempt_time < lockout
-    ]
-    _failed_attempts[identifier] = recent_attempts
-    
-    if len(recent_attempts) >= max_att:
-        # Calcular tiempo restante del bloqueo
-        oldest_attempt = min(recent_attempts)
-        unlock_time = oldest_attempt + lockout
-        remaining = max(0, unlock_time - current_time)
-        return True, remaining, len(recent_attempts)
-    
-    return False, 0, len(recent_attempts)
+
+    # Bloqueado si un intento más superaría el máximo
+    result = get_rate_limit_storage().peek(f"{FAILED_PREFIX}{identifier}", lockout, max_att, cost=1)
+    if not result.allowed:
+        return True, result.retry_after, result.count
+
+    return False, 0, result.count
 
 
 def get_client_identifier():
     """Obtiene un identificador único para el cliente"""
-    # Usar IP + User-Agent para mejor identificación
+    # Usar IP + User-Agent para mejor identificación. crc32 (no hash()) para
+    # que el identificador sea el mismo en todos los workers
     ip = request.remote_addr or 'unknown'
     user_agent = request.headers.get('User-Agent', 'unknown')[:50]
-    return f"{ip}:{hash(user_agent)}"
+    return f"{ip}:{zlib.crc32(user_agent.encode('utf-8'))}"
 
 
 # Rate limiting por endpoint (requests por minuto)
@@ -95,45 +76,25 @@ ENDPOINT_RATE_LIMITS = {
 def check_endpoint_rate_limit(endpoint, client_id=None):
     """
     Verifica si un endpoint ha excedido su límite de rate
-    
+
     Args:
         endpoint: Ruta del endpoint
         client_id: ID del cliente (opcional)
-    
+
     Returns:
         Tuple[bool, str]: (permitido, mensaje)
     """
     if client_id is None:
         client_id = get_client_identifier()
-    
+
     # Obtener límite para el endpoint
     limit = ENDPOINT_RATE_LIMITS.get(endpoint, ENDPOINT_RATE_LIMITS['default'])
-    
-    # Contar requests en la última ventana (1 minuto)
-    current_time = time.time()
-    window_start = current_time - 60
-    
-    # Limpiar entradas antiguas
-    key = f"endpoint_rate:{endpoint}:{client_id}"
-    
-    if key not in _failed_attempts:
-        _failed_attempts[key] = []
-    
-    # Filtrar intentos dentro de la ventana
-    _failed_attempts[key] = [
-        t for t in _failed_attempts[key] 
-        if t > window_start
-    ]
-    
-    # Verificar si excede el límite
-    if len(_failed_attempts[key]) >= limit:
-        return False, f"Rate limit excedido para {endpoint}. Máximo {limit} requests por minuto."
-    
-    # Registrar el request
-    _failed_attempts[key].append(current_time)
-    
-    return True, "OK"
-
 
+    # Ventana de 1 minuto; el request solo se registra si se permite
+    key = f"{ENDPOINT_PREFIX}{endpoint}:{client_id}"
+    result = get_rate_limit_storage().hit(key, 60, limit)
 
+    if not result.allowed:
+        return False, f"Rate limit excedido para {endpoint}. Máximo {limit} requests por minuto."
 
+    return True, "OK"
@@ -16,6 +16,15 @@ logger = logging.getLogger(__name__)
 BALANCE_TOLERANCE = 100.0
 
 
+def _invalidate_monitor_closes():
+    """Invalida los cierres cacheados por el monitor de cajas"""
+    try:
+        from app.helpers.register_sales_monitor import invalidate_register_closes
+        invalidate_register_closes()
+    except Exception as e:
+        logger.warning(f"No se pudo invalidar cache de cierres: {e}")
+
+
 def save_register_close(close_data: Dict[str, Any], validate_integrity: bool = True) -> Optional[RegisterClose]:
     """
     Guarda un nuevo cierre de caja en la base de datos con validación de integridad
@@ -115,8 +124,10 @@ def save_register_close(close_data: Dict[str, Any], validate_integrity: bool = T
             # Commit se hace automáticamente al salir del with
             
             logger.info(f"✅ Cierre de caja guardado en BD: {register_close.register_name} - {register_close.employee_name} (ID: {register_close.id}) - difference_total={register_close.difference_total}")
-            return register_close
         # El commit se hace automáticamente al salir del with db.session.begin()
+        
+        _invalidate_monitor_closes()
+        return register_close
 
     except Exception as e:
         db.session.rollback()
@@ -155,6 +166,7 @@ def update_register_close(close_id: int, updates: Dict[str, Any]) -> bool:
                 setattr(register_close, key, value)
         
         db.session.commit()
+        _invalidate_monitor_closes()
         logger.info(f"✅ Cierre de caja actualizado: ID {close_id}")
         return True
         
@@ -246,6 +258,7 @@ def accept_register_close(close_id: int, accepted_by: str, notes: str = '') -> b
             register_close.resolution_notes = notes
         
         db.session.commit()
+        _invalidate_monitor_closes()
         
         # Desbloquear la caja ahora que el admin aceptó el cierre
         from app.helpers.register_lock_db import unlock_register
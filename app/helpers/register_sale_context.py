@@ -0,0 +1,357 @@
+"""
+Contexto de venta por caja para la ruta caliente de api_create_sale
+
+Antes, cada venta consultaba por separado la RegisterSession OPEN (dos
+veces), la Jornada (dos veces), el último RegisterClose, la PosRegister y el
+RegisterLock (dos veces en validate_register_lock). SaleContext reúne esos
+datos ya serializados (sin objetos ORM) y se guarda por caja en memoria:
+una venta hace una sola búsqueda y, en el caso normal, ninguna consulta.
+
+Invalidación: eventos de la sesión ORM sobre RegisterSession, RegisterLock,
+RegisterClose y PosRegister incrementan la versión compartida de la caja
+(cache manager); cualquier cambio de Jornada incrementa la versión de
+jornadas. Una entrada con otra versión, o más antigua que ENTRY_MAX_AGE, se
+vuelve a leer de la BD. Refrescar el bloqueo (solo expires_at) no invalida.
+
+El cache solo adelanta rechazos: si el contexto no permite la venta se relee
+desde la BD antes de responder, y una venta aprobada por el contexto se
+revalida con verify_sale_in_db() dentro de la transacción que la inserta
+(sesión OPEN bloqueada, jornada abierta y bloqueo de la caja), porque un
+cierre hecho en otro worker sin cache compartido se ve recién en
+ENTRY_MAX_AGE.
+"""
+from typing import Dict, Any, Optional, Tuple, Set
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import json
+import threading
+import time
+import logging
+
+from app.helpers.timezone_utils import CHILE_TZ
+from app.infrastructure.cache import get_cache_manager
+from app.infrastructure.session_changes import watch, KIND_DIRTY
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = 'register_sale_context'
+JORNADAS_VERSION_KEY = 'jornadas'
+
+ENTRY_MAX_AGE = 10.0               # Respaldo para cambios hechos fuera de la sesión ORM / sin cache compartido
+RECENT_CLOSE_WINDOW = timedelta(hours=2)
+
+get_cache_manager().register_namespace(CACHE_NAMESPACE, 24 * 3600, max_entries=500)
+
+
+def _now_chile() -> datetime:
+    return datetime.now(CHILE_TZ).replace(tzinfo=None)
+
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo:
+        return value.replace(tzinfo=None)
+    return value
+
+
+@dataclass
+class SaleContext:
+    """Datos de una caja necesarios para validar una venta"""
+    register_id: str
+    session: Optional[Dict[str, Any]] = None       # RegisterSession OPEN: id, status, jornada_id, shift_date
+    jornada: Optional[Dict[str, Any]] = None       # id, estado_apertura, fecha_jornada
+    register: Optional[Dict[str, Any]] = None      # PosRegister: id, code, name, superadmin_only, payment_methods
+    lock: Optional[Dict[str, Any]] = None          # RegisterLock: employee_id, employee_name, expires_at
+    last_close: Optional[Dict[str, Any]] = None    # Último RegisterClose: closed_at, shift_date
+    versions: Tuple[int, int] = (0, 0)
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def jornada_id(self) -> Optional[int]:
+        return self.session['jornada_id'] if self.session else None
+
+    @property
+    def shift_date(self) -> Optional[str]:
+        return self.session['shift_date'] if self.session else None
+
+    def can_sell(self) -> Tuple[bool, Optional[str]]:
+        """Mismas reglas y mensajes que RegisterSessionService.can_sell_in_register (P0-005, P0-002)"""
+        if not self.session:
+            return False, "No hay sesión abierta para esta caja. Debe abrir la caja antes de vender."
+        if self.session['status'] != 'OPEN':
+            return False, f"La caja está en estado {self.session['status']}. No se pueden hacer ventas."
+        if not self.jornada:
+            return False, "Jornada asociada no encontrada"
+        if self.jornada['estado_apertura'] != 'abierto':
+            return False, f"La jornada no está abierta (estado: {self.jornada['estado_apertura']})"
+        return True, None
+
+    def recent_close(self) -> Optional[Dict[str, Any]]:
+        """Último cierre de la caja si ocurrió dentro de RECENT_CLOSE_WINDOW"""
+        if self.last_close and self.last_close['closed_at'] >= _now_chile() - RECENT_CLOSE_WINDOW:
+            return self.last_close
+        return None
+
+    def lock_held_by(self, employee_id: str) -> bool:
+        """True si la caja está bloqueada (sin vencer) por el empleado"""
+        if not self.lock or str(self.lock['employee_id']) != str(employee_id):
+            return False
+        expires_at = self.lock['expires_at']
+        return expires_at is None or expires_at >= _now_chile()
+
+
+def load_sale_context(register_id: str) -> SaleContext:
+    """Lee el contexto de venta de la caja desde la BD"""
+    from app.models import db
+    from app.models.pos_models import RegisterSession, RegisterLock, RegisterClose, PosRegister
+    from app.models.jornada_models import Jornada
+
+    register_id = str(register_id)
+    versions = SaleContextCache.shared_versions(register_id)
+    context = SaleContext(register_id=register_id, versions=versions)
+
+    active_session = RegisterSession.query.filter_by(register_id=register_id, status='OPEN').first()
+    if active_session:
+        context.session = {
+            'id': active_session.id,
+            'status': active_session.status,
+            'jornada_id': active_session.jornada_id,
+            'shift_date': active_session.shift_date
+        }
+        jornada = db.session.get(Jornada, active_session.jornada_id) if active_session.jornada_id else None
+        if jornada:
+            context.jornada = {
+                'id': jornada.id,
+                'estado_apertura': jornada.estado_apertura,
+                'fecha_jornada': jornada.fecha_jornada
+            }
+
+    register = PosRegister.query.filter(
+        (PosRegister.id == register_id) | (PosRegister.code == register_id)
+    ).first()
+    if register:
+        context.register = {
+            'id': register.id,
+            'code': register.code,
+            'name': register.name,
+            'superadmin_only': bool(register.superadmin_only),
+            'payment_methods': register.payment_methods
+        }
+
+    lock = db.session.get(RegisterLock, register_id)
+    if lock:
+        context.lock = {
+            'employee_id': str(lock.employee_id),
+            'employee_name': lock.employee_name,
+            'expires_at': _naive(lock.expires_at)
+        }
+
+    last_close = RegisterClose.query.with_entities(
+        RegisterClose.closed_at, RegisterClose.shift_date
+    ).filter(
+        RegisterClose.register_id == register_id
+    ).order_by(RegisterClose.closed_at.desc()).first()
+    if last_close and last_close.closed_at:
+        context.last_close = {'closed_at': _naive(last_close.closed_at), 'shift_date': last_close.shift_date}
+
+    return context
+
+
+def verify_sale_in_db(context: SaleContext, employee_id: Optional[str] = None) -> Optional[str]:
+    """
+    Revalida contra la BD lo que aprobó el contexto en cache. Llamar dentro de
+    la transacción que inserta la venta: la RegisterSession queda bloqueada
+    (FOR UPDATE), así un cierre concurrente espera a que la venta confirme.
+
+    Args:
+        context: Contexto con el que se aprobó la venta
+        employee_id: Si se indica, el bloqueo de la caja debe ser suyo y no estar vencido
+
+    Returns:
+        Mensaje de error (None si se puede vender)
+    """
+    from app.models import db
+    from app.models.pos_models import RegisterSession, RegisterLock
+    from app.models.jornada_models import Jornada
+
+    current = SaleContext(register_id=context.register_id)
+    if context.session:
+        register_session = db.session.get(RegisterSession, context.session['id'],
+                                          with_for_update=True, populate_existing=True)
+        if register_session:
+            current.session = {
+                'id': register_session.id,
+                'status': register_session.status,
+                'jornada_id': register_session.jornada_id,
+                'shift_date': register_session.shift_date
+            }
+            jornada = db.session.get(Jornada, register_session.jornada_id,
+                                     populate_existing=True) if register_session.jornada_id else None
+            if jornada:
+                current.jornada = {
+                    'id': jornada.id,
+                    'estado_apertura': jornada.estado_apertura,
+                    'fecha_jornada': jornada.fecha_jornada
+                }
+    can_sell, error_msg = current.can_sell()
+
+    if can_sell and employee_id is not None:
+        lock = db.session.get(RegisterLock, context.register_id, populate_existing=True)
+        if lock:
+            current.lock = {
+                'employee_id': str(lock.employee_id),
+                'employee_name': lock.employee_name,
+                'expires_at': _naive(lock.expires_at)
+            }
+        if not current.lock_held_by(employee_id):
+            if not current.lock or (current.lock['expires_at'] and current.lock['expires_at'] < _now_chile()):
+                error_msg = "La caja ya no está bloqueada"
+            else:
+                error_msg = f"La caja está siendo usada por {current.lock['employee_name'] or 'otro cajero'}"
+
+    if error_msg:
+        # El contexto en cache estaba atrasado: que todos los workers lo relean
+        _cache.invalidate({context.register_id})
+    return error_msg
+
+
+class SaleContextCache:
+    """Contextos de venta por caja (uno por proceso)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contexts: Dict[str, SaleContext] = {}
+        self._stats = {'hits': 0, 'loads': 0, 'stale': 0, 'rechecks': 0, 'invalidations': 0}
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    # ------------------------------------------------------------------
+    # Versiones compartidas
+    # ------------------------------------------------------------------
+    @staticmethod
+    def shared_versions(register_id: str) -> Tuple[int, int]:
+        manager = get_cache_manager()
+        return (
+            manager.get(CACHE_NAMESPACE, f"r:{register_id}", 0),
+            manager.get(CACHE_NAMESPACE, JORNADAS_VERSION_KEY, 0)
+        )
+
+    @staticmethod
+    def _bump(key: str) -> None:
+        manager = get_cache_manager()
+        manager.set(CACHE_NAMESPACE, key, manager.get(CACHE_NAMESPACE, key, 0) + 1)
+
+    def invalidate(self, register_ids: Set[str], jornadas: bool = False) -> None:
+        """Invalida los contextos de las cajas (y de todas si cambió una jornada)"""
+        for register_id in register_ids:
+            self._bump(f"r:{register_id}")
+        if jornadas:
+            self._bump(JORNADAS_VERSION_KEY)
+        with self._lock:
+            if jornadas:
+                self._contexts.clear()
+            else:
+                for register_id in register_ids:
+                    self._contexts.pop(register_id, None)
+            self._stats['invalidations'] += 1
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def get(self, register_id: str, refresh: bool = False) -> SaleContext:
+        register_id = str(register_id)
+        if not refresh:
+            with self._lock:
+                context = self._contexts.get(register_id)
+            if context is not None:
+                if (time.monotonic() - context.loaded_at < ENTRY_MAX_AGE
+                        and context.versions == self.shared_versions(register_id)):
+                    self._count('hits')
+                    return context
+                self._count('stale')
+
+        context = load_sale_context(register_id)
+        with self._lock:
+            self._contexts[register_id] = context
+        self._count('loads')
+        return context
+
+    def check_sale(self, register_id: str) -> Tuple[SaleContext, Optional[str]]:
+        """
+        Contexto de la caja y error si no se puede vender (None si se puede).
+        Un rechazo se confirma releyendo desde la BD (el cache nunca bloquea una
+        venta); una aprobación es provisoria hasta verify_sale_in_db().
+        """
+        context = self.get(register_id)
+        can_sell, error_msg = context.can_sell()
+        if not can_sell:
+            self._count('rechecks')
+            context = self.get(register_id, refresh=True)
+            can_sell, error_msg = context.can_sell()
+        return context, error_msg
+
+    def lock_held_by(self, register_id: str, employee_id: str) -> bool:
+        """Verificación previa del bloqueo de caja desde el contexto (la definitiva es verify_sale_in_db)"""
+        try:
+            return self.get(register_id).lock_held_by(employee_id)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el contexto de venta de la caja {register_id}: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'registers': len(self._contexts), 'entry_max_age': ENTRY_MAX_AGE}
+
+
+_cache = SaleContextCache()
+
+
+def get_sale_context_cache() -> SaleContextCache:
+    """Cache de contextos de venta (uno por proceso)"""
+    return _cache
+
+
+def parse_payment_methods(value) -> Set[str]:
+    """Métodos de pago habilitados de la caja normalizados (vacío = sin restricción)"""
+    if not value:
+        return set()
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except Exception:
+            return set()
+    if isinstance(value, (list, tuple, set)):
+        return {str(m).strip().lower() for m in value if m is not None and str(m).strip() != ''}
+    return {str(value).strip().lower()} if str(value).strip() else set()
+
+
+# ----------------------------------------------------------------------
+# Invalidación: aperturas/cierres de caja, bloqueos, cierres y jornadas
+# ----------------------------------------------------------------------
+def _context_models():
+    from app.models.pos_models import RegisterSession, RegisterLock, RegisterClose, PosRegister
+    from app.models.jornada_models import Jornada
+    return (RegisterSession, RegisterLock, RegisterClose, PosRegister, Jornada)
+
+
+def _affected_registers(obj, kind: str, changed) -> Optional[Tuple[str, ...]]:
+    """Cajas afectadas por el cambio; tupla vacía = cambió una jornada (todas)"""
+    from app.models.pos_models import RegisterLock, PosRegister
+    from app.models.jornada_models import Jornada
+    if isinstance(obj, Jornada):
+        return ()
+    if isinstance(obj, PosRegister):
+        return tuple(str(value) for value in (obj.id, obj.code) if value is not None)
+    if isinstance(obj, RegisterLock) and kind == KIND_DIRTY and changed == {'expires_at'}:
+        return None  # refresh_lock: el titular no cambia
+    return (str(obj.register_id),) if obj.register_id is not None else None
+
+
+def _invalidate_sale_contexts(changes) -> None:
+    registers = {register for affected in changes for register in affected}
+    jornadas = any(not affected for affected in changes)
+    _cache.invalidate(registers, jornadas=jornadas)
+
+
+watch('sale_context', models=_context_models, apply=_invalidate_sale_contexts, collect=_affected_registers)
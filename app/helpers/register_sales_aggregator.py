@@ -0,0 +1,338 @@
+"""
+Agregados incrementales de ventas por caja para el monitor en tiempo real
+Se actualizan al confirmar/cancelar ventas y se reconstruyen desde SQL solo al
+cambiar de jornada (o al arrancar el proceso)
+"""
+from typing import Dict, Any, Optional
+from datetime import datetime
+import threading
+import time
+import logging
+
+from app.infrastructure.cache import get_cache_manager
+
+logger = logging.getLogger(__name__)
+
+# Namespace compartido: contador de generación para invalidar agregados de otros workers
+GENERATION_NAMESPACE = 'register_sales'
+GENERATION_KEY = 'aggregates_generation'
+
+
+class RegisterSalesAggregator:
+    """
+    Totales por caja (cantidad, monto, efectivo/débito/crédito, última venta)
+    de la jornada actual, mantenidos en memoria.
+
+    - record_sale() / record_cancel(): O(1), llamados después del commit.
+    - snapshot(): sin GROUP BY; solo una query por PK (id > high-water menos
+      CATCH_UP_OVERLAP) para incorporar ventas creadas por otros workers. Las
+      ventas ya contadas se descartan por id (_counted_ids, acotado a la
+      jornada), así una venta que confirma después de otra con id mayor
+      (cajas concurrentes) no se pierde.
+    - Reconstrucción completa: al cambiar la jornada, cuando otro worker
+      invalida la generación compartida, o cada RECONCILE_INTERVAL segundos
+      como red de seguridad entre procesos.
+    """
+
+    SCOPE_TTL = 15  # segundos que se reutiliza la jornada resuelta
+    RECONCILE_INTERVAL = 600
+    CATCH_UP_OVERLAP = 200  # ids bajo el high-water que se vuelven a revisar (confirmaciones tardías)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._scope: Optional[Dict[str, Any]] = None
+        self._scope_resolved_at = 0.0
+        self._registers: Dict[str, Dict[str, Any]] = {}
+        self._high_water_id = 0
+        self._counted_ids = set()  # ventas ya sumadas en la jornada actual
+        self._built_at = 0.0
+        self._built_scope_key = None
+        self._generation = None
+
+    # ------------------------------------------------------------------
+    # Jornada
+    # ------------------------------------------------------------------
+    def invalidate_scope(self) -> None:
+        """Fuerza resolver nuevamente la jornada (llamar al abrir/cerrar jornada)"""
+        with self._lock:
+            self._scope_resolved_at = 0.0
+
+    def _resolve_scope(self) -> Dict[str, Any]:
+        now = time.time()
+        if self._scope is not None and now - self._scope_resolved_at < self.SCOPE_TTL:
+            return self._scope
+
+        from app.models.jornada_models import Jornada, SnapshotCajas
+        from app.utils.timezone import CHILE_TZ
+        fecha_hoy = datetime.now(CHILE_TZ).strftime('%Y-%m-%d')
+
+        jornada_actual = Jornada.query.filter_by(
+            fecha_jornada=fecha_hoy,
+            estado_apertura='abierto'
+        ).first()
+
+        if jornada_actual and jornada_actual.abierto_en:
+            opened_dt = jornada_actual.abierto_en
+            if opened_dt.tzinfo:
+                opened_dt = opened_dt.replace(tzinfo=None)
+            key = ('jornada', jornada_actual.id, opened_dt)
+            if self._scope is not None and self._scope['key'] == key:
+                scope = self._scope
+            else:
+                registers_map = {}
+                try:
+                    snapshot_cajas = SnapshotCajas.query.filter_by(jornada_id=jornada_actual.id).all()
+                    registers_map = {caja.caja_id: caja.nombre_caja for caja in snapshot_cajas}
+                except Exception as e:
+                    logger.warning(f"No se pudieron obtener nombres de cajas desde snapshot: {e}")
+                scope = {
+                    'key': key,
+                    'jornada_id': jornada_actual.id,
+                    'shift_date': jornada_actual.fecha_jornada,
+                    'opened_at': jornada_actual.abierto_en.isoformat(),
+                    'opened_dt': opened_dt,
+                    'registers_map': registers_map,
+                }
+        else:
+            logger.debug(f"No hay turno abierto para hoy ({fecha_hoy}), se usará shift_date={fecha_hoy}")
+            key = ('fecha', fecha_hoy)
+            if self._scope is not None and self._scope['key'] == key:
+                scope = self._scope
+            else:
+                scope = {
+                    'key': key,
+                    'jornada_id': None,
+                    'shift_date': fecha_hoy,
+                    'opened_at': None,
+                    'opened_dt': None,
+                    'registers_map': {},
+                }
+
+        self._scope = scope
+        self._scope_resolved_at = now
+        return scope
+
+    @staticmethod
+    def _apply_scope_filter(query, scope):
+        from app.models import PosSale
+        if scope['opened_dt'] is not None:
+            return query.filter(PosSale.created_at >= scope['opened_dt'])
+        return query.filter(PosSale.shift_date == scope['shift_date'])
+
+    @staticmethod
+    def _sale_in_scope(sale, scope) -> bool:
+        if scope['opened_dt'] is not None:
+            created_at = sale.created_at
+            if created_at is None:
+                return True
+            if created_at.tzinfo:
+                created_at = created_at.replace(tzinfo=None)
+            return created_at >= scope['opened_dt']
+        return str(sale.shift_date) == str(scope['shift_date'])
+
+    # ------------------------------------------------------------------
+    # Construcción desde SQL
+    # ------------------------------------------------------------------
+    def _sale_rows(self, scope, min_id: Optional[int] = None):
+        from app.models import db, PosSale
+
+        query = db.session.query(
+            PosSale.id,
+            PosSale.register_id,
+            PosSale.register_name,
+            PosSale.total_amount,
+            PosSale.payment_cash,
+            PosSale.payment_debit,
+            PosSale.payment_credit,
+            PosSale.created_at
+        ).filter(PosSale.is_cancelled == False)
+
+        if min_id is not None:
+            query = query.filter(PosSale.id > min_id)
+        query = self._apply_scope_filter(query, scope)
+        return query.all()
+
+    def _add_totals(self, reg_id: str, register_name, count, amount, cash, debit, credit, last_sale_at):
+        entry = self._registers.get(reg_id)
+        if entry is None:
+            entry = {
+                'register_id': reg_id,
+                'register_name': register_name,
+                'total_sales': 0,
+                'total_amount': 0.0,
+                'total_cash': 0.0,
+                'total_debit': 0.0,
+                'total_credit': 0.0,
+                'last_sale_at': None,
+            }
+            self._registers[reg_id] = entry
+        if register_name and not entry['register_name']:
+            entry['register_name'] = register_name
+        entry['total_sales'] += count
+        entry['total_amount'] += amount
+        entry['total_cash'] += cash
+        entry['total_debit'] += debit
+        entry['total_credit'] += credit
+        if last_sale_at is not None and (entry['last_sale_at'] is None or last_sale_at > entry['last_sale_at']):
+            entry['last_sale_at'] = last_sale_at
+
+    def _merge_rows(self, rows) -> None:
+        for row in rows:
+            if row.id in self._counted_ids:
+                continue
+            self._add_totals(
+                str(row.register_id),
+                row.register_name,
+                1,
+                float(row.total_amount or 0),
+                float(row.payment_cash or 0),
+                float(row.payment_debit or 0),
+                float(row.payment_credit or 0),
+                row.created_at
+            )
+            self._counted_ids.add(row.id)
+            if row.id > self._high_water_id:
+                self._high_water_id = row.id
+
+    def rebuild(self, scope: Optional[Dict[str, Any]] = None) -> None:
+        """Reconstruye los agregados desde SQL (apertura de jornada / recuperación)"""
+        with self._lock:
+            scope = scope or self._resolve_scope()
+            rows = self._sale_rows(scope)
+            self._registers = {}
+            self._high_water_id = 0
+            self._counted_ids = set()
+            self._merge_rows(rows)
+            self._built_at = time.time()
+            self._generation = self._shared_generation()
+            self._built_scope_key = scope['key']
+            logger.info(
+                f"📊 Agregados de ventas por caja reconstruidos: {len(self._registers)} cajas "
+                f"(shift_date={scope['shift_date']})"
+            )
+
+    def _catch_up(self, scope) -> None:
+        """
+        Incorpora ventas confirmadas por otros procesos. Revisa también los
+        CATCH_UP_OVERLAP ids bajo el high-water: una venta con id menor puede
+        confirmarse después (las ya contadas se descartan por id). Las que
+        confirman aún más tarde entran en la reconciliación periódica.
+        """
+        rows = self._sale_rows(scope, min_id=max(0, self._high_water_id - self.CATCH_UP_OVERLAP))
+        self._merge_rows(rows)
+
+    @staticmethod
+    def _shared_generation():
+        return get_cache_manager().get(GENERATION_NAMESPACE, GENERATION_KEY, 0)
+
+    def _needs_rebuild(self, scope) -> bool:
+        if self._built_at == 0.0 or self._built_scope_key != scope['key']:
+            return True
+        if time.time() - self._built_at > self.RECONCILE_INTERVAL:
+            return True
+        return self._shared_generation() != self._generation
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+    def record_sale(self, sale) -> None:
+        """Aplica una venta recién confirmada (llamar después del commit)"""
+        try:
+            with self._lock:
+                scope = self._scope
+                if scope is None or self._built_at == 0.0 or not self._sale_in_scope(sale, scope):
+                    return
+                if sale.is_cancelled:
+                    return
+                self._merge_rows([sale])
+        except Exception as e:
+            logger.warning(f"No se pudo aplicar venta al agregado por caja: {e}")
+            self.mark_stale()
+
+    def record_cancel(self, sale) -> None:
+        """Descuenta una venta cancelada (llamar después del commit)"""
+        try:
+            with self._lock:
+                scope = self._scope
+                if scope is not None and self._built_at != 0.0 and self._sale_in_scope(sale, scope):
+                    counted = sale.id in self._counted_ids
+                    entry = self._registers.get(str(sale.register_id))
+                    if counted and entry is not None:
+                        entry['total_sales'] = max(0, entry['total_sales'] - 1)
+                        entry['total_amount'] -= float(sale.total_amount or 0)
+                        entry['total_cash'] -= float(sale.payment_cash or 0)
+                        entry['total_debit'] -= float(sale.payment_debit or 0)
+                        entry['total_credit'] -= float(sale.payment_credit or 0)
+                        self._counted_ids.discard(sale.id)
+                        self._generation = self._bump_generation()
+                        return
+            self._bump_generation()
+        except Exception as e:
+            logger.warning(f"No se pudo aplicar cancelación al agregado por caja: {e}")
+            self.mark_stale()
+
+    @staticmethod
+    def _bump_generation():
+        # Con backend de cache compartido, los demás workers reconstruyen en su próxima lectura
+        generation = time.time()
+        get_cache_manager().set(GENERATION_NAMESPACE, GENERATION_KEY, generation, ttl=86400)
+        return generation
+
+    def mark_stale(self) -> None:
+        """Fuerza una reconstrucción en la próxima lectura"""
+        with self._lock:
+            self._built_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna la jornada resuelta y una copia de los totales por caja.
+
+        Returns:
+            {'scope': {...}, 'registers': {register_id: {...totales...}}}
+        """
+        with self._lock:
+            scope = self._resolve_scope()
+            if self._needs_rebuild(scope):
+                self.rebuild(scope)
+            else:
+                self._catch_up(scope)
+            return {
+                'scope': scope,
+                'registers': {reg_id: dict(entry) for reg_id, entry in self._registers.items()},
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'registers': len(self._registers),
+                'high_water_id': self._high_water_id,
+                'counted_sales': len(self._counted_ids),
+                'built_at': self._built_at,
+                'shift_date': self._scope['shift_date'] if self._scope else None,
+            }
+
+
+_aggregator = RegisterSalesAggregator()
+
+
+def get_register_sales_aggregator() -> RegisterSalesAggregator:
+    """Obtiene la instancia del agregador (una por proceso)"""
+    return _aggregator
+
+
+def record_sale_committed(sale) -> None:
+    """Hook post-commit para api_create_sale"""
+    _aggregator.record_sale(sale)
+
+
+def record_sale_cancelled(sale) -> None:
+    """Hook post-commit para api_cancel_sale"""
+    _aggregator.record_cancel(sale)
+
+
+def invalidate_register_sales_scope() -> None:
+    """Hook para apertura/cierre de jornada"""
+    _aggregator.invalidate_scope()
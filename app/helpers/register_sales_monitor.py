@@ -3,15 +3,114 @@ Helper para monitoreo de ventas por caja en tiempo real
 Obtiene datos desde nuestra base de datos local (PosSale)
 PHP POS solo se usa para inventario y empleados, NO para ventas
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from flask import current_app
 # NO importamos PhpPosApiClient - solo usamos nuestra BD local para ventas
 from app.helpers.cache import cached
+from app.helpers.register_sales_aggregator import get_register_sales_aggregator
+from app.infrastructure.cache import get_cache_manager
+import pytz
 import logging
 
 logger = logging.getLogger(__name__)
 
+CLOSES_CACHE_NAMESPACE = 'register_closes'
+CLOSES_CACHE_TTL = 60
+get_cache_manager().register_namespace(CLOSES_CACHE_NAMESPACE, CLOSES_CACHE_TTL, max_entries=16)
+
+
+def _format_close(close, chile_tz) -> Dict[str, Any]:
+    """Convierte un RegisterClose al formato usado por el monitor"""
+    # Formatear opened_at (puede ser string o datetime)
+    opened_at_formatted = None
+    if close.opened_at:
+        if isinstance(close.opened_at, str):
+            opened_at_formatted = close.opened_at
+        elif isinstance(close.opened_at, datetime):
+            opened_at_formatted = close.opened_at.strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            opened_at_formatted = str(close.opened_at)
+    
+    # Formatear closed_at (siempre datetime)
+    # IMPORTANTE: Si no tiene timezone, podría estar en UTC desde SQLite
+    closed_at_formatted = None
+    if isinstance(close.closed_at, datetime):
+        if close.closed_at.tzinfo:
+            # Ya tiene timezone, convertir a hora de Chile
+            closed_at_chile = close.closed_at.astimezone(chile_tz)
+        else:
+            # Sin timezone: asumir UTC y convertir a hora de Chile
+            # Esto corrige el problema si SQLite almacenó como UTC
+            closed_at_chile = pytz.UTC.localize(close.closed_at).astimezone(chile_tz)
+        closed_at_formatted = closed_at_chile.strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        closed_at_formatted = str(close.closed_at)
+    
+    return {
+        'id': close.id,
+        'employee_id': str(close.employee_id) if close.employee_id else None,
+        'employee_name': close.employee_name or 'Sin asignar',
+        'opened_at': opened_at_formatted,
+        'closed_at': closed_at_formatted,
+        'total_sales': int(close.total_sales) if close.total_sales else 0,
+        'total_amount': float(close.total_amount) if close.total_amount else 0.0,
+        'expected_cash': float(close.expected_cash or 0),
+        'expected_debit': float(close.expected_debit or 0),
+        'expected_credit': float(close.expected_credit or 0),
+        'status': 'closed'
+    }
+
+
+def _load_register_closes(shift_date: str) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Dict[str, Any]]]:
+    from sqlalchemy import or_
+    from app.models.pos_models import RegisterClose
+    from app.utils.timezone import CHILE_TZ
+    
+    # IMPORTANTE: Guardar todos los cierres, no solo el último (un trabajador puede cerrar múltiples veces)
+    # También incluir cierres pendientes de otras fechas para mostrar en la página principal
+    closes = RegisterClose.query.filter(
+        or_(
+            RegisterClose.shift_date == shift_date,
+            RegisterClose.status == 'pending'
+        ),
+        RegisterClose.closed_at.isnot(None)
+    ).order_by(RegisterClose.closed_at.desc()).all()
+    logger.debug(f"📋 Encontrados {len(closes)} cierres para shift_date={shift_date} o status=pending")
+    
+    register_closes = {}  # Dict de listas: {register_id: [cierre1, cierre2, ...]}
+    register_closes_latest = {}  # Dict del último cierre: {register_id: cierre_más_reciente}
+    for close in closes:
+        reg_id = str(close.register_id)
+        close_info = _format_close(close, CHILE_TZ)
+        register_closes.setdefault(reg_id, []).append(close_info)
+        # Guardar solo el más reciente (para compatibilidad con lógica existente)
+        if reg_id not in register_closes_latest:
+            register_closes_latest[reg_id] = close_info
+    return register_closes, register_closes_latest
+
+
+def get_register_closes(shift_date: str) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Dict[str, Any]]]:
+    """
+    Cierres de caja del turno (y pendientes de cualquier fecha), ya formateados.
+    Se cachean hasta que se registra un nuevo cierre (invalidate_register_closes).
+    
+    Returns:
+        (cierres por caja, último cierre por caja)
+    """
+    try:
+        return get_cache_manager().get_or_load(
+            CLOSES_CACHE_NAMESPACE, str(shift_date), lambda: _load_register_closes(shift_date)
+        )
+    except Exception as e:
+        logger.error(f"❌ Error al obtener cierres de cajas: {e}", exc_info=True)
+        return {}, {}
+
+
+def invalidate_register_closes() -> None:
+    """Invalida el cache de cierres (llamar después de guardar un RegisterClose)"""
+    get_cache_manager().invalidate(CLOSES_CACHE_NAMESPACE)
+
 
 # Cache deshabilitado para monitoreo en tiempo real (se actualiza cada 3 segundos)
 # @cached('register_sales', ttl=60)  # Cache de 1 minuto para monitoreo
@@ -51,76 +150,12 @@ def get_sales_by_register(register_id: Optional[str] = None) -> Dict[str, Any]:
         }
     """
     try:
-        # Obtener turno actual desde Jornada (sistema único)
-        from app.models.jornada_models import Jornada
-        from datetime import datetime
-        from app.utils.timezone import CHILE_TZ
-        fecha_hoy = datetime.now(CHILE_TZ).strftime('%Y-%m-%d')
-        
-        jornada_actual = Jornada.query.filter_by(
-            fecha_jornada=fecha_hoy,
-            estado_apertura='abierto'
-        ).first()
-        
-        # Si no hay turno abierto, usar fecha_hoy como shift_date para procesar cierres
-        if not jornada_actual or not jornada_actual.abierto_en:
-            logger.warning(f"⚠️ No hay turno abierto para hoy ({fecha_hoy}), pero procesaremos cierres de guardarropía")
-            shift_date = fecha_hoy
-            opened_at = None
-            opened_datetime = None
-        else:
-            # Obtener fecha de apertura del turno
-            opened_at = jornada_actual.abierto_en.isoformat() if jornada_actual.abierto_en else None
-            shift_date = jornada_actual.fecha_jornada
-            
-            # Convertir opened_at a formato para la API
-            try:
-                if opened_at:
-                    opened_datetime = datetime.fromisoformat(opened_at.replace('Z', '+00:00'))
-                else:
-                    opened_datetime = datetime.now()
-            except:
-                opened_datetime = datetime.now()
-            
-            if opened_datetime.tzinfo:
-                opened_datetime = opened_datetime.replace(tzinfo=None)
-        
-        # start_date y end_date solo se usan si hay turno abierto
-        if opened_datetime:
-            start_date = opened_datetime.strftime('%Y-%m-%dT%H:%M:%SZ')
-            end_date = datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
-        else:
-            start_date = None
-            end_date = None
-        
-        # OPTIMIZADO: Usar agregaciones SQL para totales por caja
-        from sqlalchemy import func, case
-        from app.models import db, PosSale
-        from app.models.jornada_models import AperturaCaja
-        
-        logger.info(f"🔍 Calculando totales por caja usando SQL para turno: {shift_date}")
-        
-        # Query base
-        query = db.session.query(
-            PosSale.register_id,
-            PosSale.register_name,
-            func.count(PosSale.id).label('total_sales'),
-            func.sum(PosSale.total_amount).label('total_amount'),
-            func.sum(PosSale.payment_cash).label('total_cash'),
-            func.sum(PosSale.payment_debit).label('total_debit'),
-            func.sum(PosSale.payment_credit).label('total_credit'),
-            func.max(PosSale.created_at).label('last_sale_at')
-        )
-        
-        if jornada_actual and jornada_actual.abierto_en:
-            opened_dt = jornada_actual.abierto_en
-            if opened_dt.tzinfo:
-                opened_dt = opened_dt.replace(tzinfo=None)
-            query = query.filter(PosSale.created_at >= opened_dt)
-        elif shift_date:
-            query = query.filter(PosSale.shift_date == shift_date)
-            
-        sales_stats = query.group_by(PosSale.register_id, PosSale.register_name).all()
+        # Totales por caja desde el agregado incremental (sin GROUP BY por cada consulta)
+        aggregates = get_register_sales_aggregator().snapshot()
+        scope = aggregates['scope']
+        shift_date = scope['shift_date']
+        opened_at = scope['opened_at']
+        sales_stats = list(aggregates['registers'].values())
         
         # Agrupar ventas por caja
         registers_data = {}
@@ -132,7 +167,6 @@ def get_sales_by_register(register_id: Optional[str] = None) -> Dict[str, Any]:
         
         # Obtener información de bloqueos y cierres de cajas
         from app.helpers.register_lock_db import get_all_register_locks
-        from app.models.pos_models import RegisterClose
         
         try:
             register_locks_list = get_all_register_locks()
@@ -146,96 +180,11 @@ def get_sales_by_register(register_id: Optional[str] = None) -> Dict[str, Any]:
             logger.warning(f"No se pudieron obtener bloqueos de cajas: {e}")
             register_locks = {}
         
-        # Obtener TODOS los cierres de cajas del turno actual (usar shift_date)
-        # IMPORTANTE: Guardar todos los cierres, no solo el último (un trabajador puede cerrar múltiples veces)
-        # También incluir cierres pendientes de otras fechas para mostrar en la página principal
-        register_closes = {}  # Dict de listas: {register_id: [cierre1, cierre2, ...]}
-        register_closes_latest = {}  # Dict del último cierre: {register_id: cierre_más_reciente}
-        try:
-            # Procesar cierres siempre, incluso si no hay turno abierto
-            # Incluir cierres del turno actual Y cierres pendientes de cualquier fecha
-            from sqlalchemy import or_
-            closes = RegisterClose.query.filter(
-                or_(
-                    RegisterClose.shift_date == shift_date,
-                    RegisterClose.status == 'pending'
-                )
-            ).order_by(RegisterClose.closed_at.desc()).all()
-            logger.info(f"📋 Encontrados {len(closes)} cierres para shift_date={shift_date} o status=pending")
-            guardarropia_count = sum(1 for c in closes if str(c.register_id) == 'GUARDARROPIA')
-            logger.info(f"📦 De esos, {guardarropia_count} son de guardarropía")
-                
-            for close in closes:
-                reg_id = str(close.register_id)
-                logger.info(f"🔍 Procesando cierre: register_id={reg_id}, total_sales={close.total_sales}, total_amount={close.total_amount}")
-                
-                # Formatear opened_at (puede ser string o datetime)
-                opened_at_formatted = None
-                if close.opened_at:
-                    if isinstance(close.opened_at, str):
-                        opened_at_formatted = close.opened_at
-                    elif isinstance(close.opened_at, datetime):
-                        opened_at_formatted = close.opened_at.strftime('%Y-%m-%d %H:%M:%S')
-                    else:
-                        opened_at_formatted = str(close.opened_at)
-                
-                # Formatear closed_at (siempre datetime)
-                # IMPORTANTE: Si no tiene timezone, podría estar en UTC desde SQLite
-                closed_at_formatted = None
-                if close.closed_at:
-                    if isinstance(close.closed_at, datetime):
-                        if close.closed_at.tzinfo:
-                            # Ya tiene timezone, convertir a hora de Chile
-                            closed_at_chile = close.closed_at.astimezone(CHILE_TZ)
-                            closed_at_formatted = closed_at_chile.strftime('%Y-%m-%d %H:%M:%S')
-                        else:
-                            # Sin timezone: asumir UTC y convertir a hora de Chile
-                            # Esto corrige el problema si SQLite almacenó como UTC
-                            utc = pytz.UTC
-                            closed_at_utc = utc.localize(close.closed_at)
-                            closed_at_chile = closed_at_utc.astimezone(CHILE_TZ)
-                            closed_at_formatted = closed_at_chile.strftime('%Y-%m-%d %H:%M:%S')
-                    else:
-                        closed_at_formatted = str(close.closed_at)
-                    
-                    close_info = {
-                        'id': close.id,
-                        'employee_id': str(close.employee_id) if close.employee_id else None,
-                        'employee_name': close.employee_name or 'Sin asignar',
-                        'opened_at': opened_at_formatted,
-                        'closed_at': closed_at_formatted,
-                        'total_sales': int(close.total_sales) if close.total_sales else 0,
-                        'total_amount': float(close.total_amount) if close.total_amount else 0.0,
-                        'expected_cash': float(close.expected_cash or 0),
-                        'expected_debit': float(close.expected_debit or 0),
-                        'expected_credit': float(close.expected_credit or 0),
-                        'status': 'closed'
-                    }
-                    
-                    # Agregar a lista de cierres (todos los cierres)
-                    if reg_id not in register_closes:
-                        register_closes[reg_id] = []
-                    register_closes[reg_id].append(close_info)
-                    
-                # Guardar solo el más reciente (para compatibilidad con lógica existente)
-                if reg_id not in register_closes_latest:
-                    register_closes_latest[reg_id] = close_info
-        except Exception as e:
-            logger.error(f"❌ Error al obtener cierres de cajas: {e}", exc_info=True)
-            register_closes = {}
-            register_closes_latest = {}
+        # Cierres del turno actual + pendientes (cacheados hasta que se registre un nuevo cierre)
+        register_closes, register_closes_latest = get_register_closes(shift_date)
         
-        # Obtener nombres de cajas desde snapshot del turno (NO desde API)
-        registers_map = {}
-        try:
-            from app.models.jornada_models import SnapshotCajas
-            
-            if jornada_actual:
-                # Usar snapshot guardado al abrir el turno
-                snapshot_cajas = SnapshotCajas.query.filter_by(jornada_id=jornada_actual.id).all()
-                registers_map = {caja.caja_id: caja.nombre_caja for caja in snapshot_cajas}
-        except Exception as e:
-            logger.warning(f"No se pudieron obtener nombres de cajas desde snapshot: {e}")
+        # Nombres de cajas desde snapshot del turno (resuelto junto con la jornada)
+        registers_map = dict(scope.get('registers_map') or {})
         
         # Si no hay snapshot, crear nombres básicos desde las cajas abiertas
         if not registers_map:
@@ -251,27 +200,27 @@ def get_sales_by_register(register_id: Optional[str] = None) -> Dict[str, Any]:
         
         # También agregar GUARDARROPIA si hay ventas o cierres pero no está en el mapa
         for stat in sales_stats:
-            reg_id = str(stat.register_id)
+            reg_id = stat['register_id']
             if reg_id == 'GUARDARROPIA' and reg_id not in registers_map:
                 registers_map[reg_id] = 'Guardarropía'
         
-        # Procesar resultados de la query SQL
+        # Procesar totales agregados
         for stat in sales_stats:
-            reg_id = str(stat.register_id)
+            reg_id = stat['register_id']
             
             # Filtrar por caja específica si se solicita
             if register_id and reg_id != str(register_id):
                 continue
                 
-            register_name = stat.register_name or registers_map.get(reg_id, f'Caja {reg_id}')
+            register_name = stat['register_name'] or registers_map.get(reg_id, f'Caja {reg_id}')
             
             # Totales
-            total_sales = stat.total_sales or 0
-            total_amount = float(stat.total_amount or 0)
-            total_cash = float(stat.total_cash or 0)
-            total_debit = float(stat.total_debit or 0)
-            total_credit = float(stat.total_credit or 0)
-            last_sale_at = stat.last_sale_at.isoformat() if stat.last_sale_at else None
+            total_sales = stat['total_sales']
+            total_amount = stat['total_amount']
+            total_cash = stat['total_cash']
+            total_debit = stat['total_debit']
+            total_credit = stat['total_credit']
+            last_sale_at = stat['last_sale_at'].isoformat() if stat['last_sale_at'] else None
             
             # Actualizar resumen general
             summary_total_sales += total_sales
@@ -388,12 +337,12 @@ def get_sales_by_register(register_id: Optional[str] = None) -> Dict[str, Any]:
         
         # Agregar cajas con cierres pero sin ventas en el turno actual (ej: Guardarropía)
         # IMPORTANTE: Esto debe ejecutarse DESPUÉS de procesar ventas pero ANTES de agregar cajas abiertas
-        logger.info(f"🔍 Revisando cierres: {list(register_closes.keys())}")
-        logger.info(f"🔍 Cajas ya en registers_data: {list(registers_data.keys())}")
+        logger.debug(f"🔍 Revisando cierres: {list(register_closes.keys())}")
+        logger.debug(f"🔍 Cajas ya en registers_data: {list(registers_data.keys())}")
         
         for reg_id_key, closes_list in register_closes.items():
             reg_id_str = str(reg_id_key)
-            logger.info(f"🔍 Procesando cierre para caja {reg_id_str}: {len(closes_list)} cierres")
+            logger.debug(f"🔍 Procesando cierre para caja {reg_id_str}: {len(closes_list)} cierres")
             
             if register_id and reg_id_str != str(register_id):
                 continue
@@ -411,7 +360,7 @@ def get_sales_by_register(register_id: Optional[str] = None) -> Dict[str, Any]:
                 total_debit_from_close = latest_close.get('expected_debit', 0.0)
                 total_credit_from_close = latest_close.get('expected_credit', 0.0)
                 
-                logger.info(f"📦 Agregando caja {reg_id_str} ({register_name}) con {len(closes_list)} cierres pero sin ventas en turno actual")
+                logger.debug(f"📦 Agregando caja {reg_id_str} ({register_name}) con {len(closes_list)} cierres pero sin ventas en turno actual")
                 registers_data[reg_id_str] = {
                     'register_id': reg_id_str,
                     'register_name': register_name,
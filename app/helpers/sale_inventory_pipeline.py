@@ -0,0 +1,291 @@
+"""
+Pipeline post-commit de ventas
+
+- Inventario: si INVENTORY_APPLY_ON_SALE está activo, la venta inserta un
+  SaleInventoryJob en su misma transacción (durable). Un worker reclama los
+  trabajos pendientes en lote (UPDATE condicional con token, como el outbox
+  de webhooks, para que dos workers no tomen el mismo trabajo) y aplica el inventario de varias ventas con una
+  sola actualización de stock (InventoryStockService.apply_inventory_for_sales).
+  inventory_applied evita el doble descuento.
+- Notificaciones (SocketIO, dashboard, n8n): se ejecutan en una tarea de fondo
+  después de responder al cajero.
+"""
+from typing import Dict, Any, List, Optional, Callable
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+def is_inventory_on_sale_enabled() -> bool:
+    """Si el inventario se descuenta al vender (en vez de al entregar)"""
+    try:
+        return bool(current_app.config.get('INVENTORY_APPLY_ON_SALE', False))
+    except RuntimeError:
+        return False
+
+
+def enqueue_sale_inventory(sale, location: Optional[str] = None) -> bool:
+    """
+    Agrega el trabajo de inventario a la sesión actual (sin commit).
+
+    Debe llamarse antes del commit de la venta: así el trabajo queda
+    persistido en la misma transacción que la venta.
+    """
+    if not is_inventory_on_sale_enabled():
+        return False
+    from app.models import db
+    from app.models.sale_inventory_job_models import SaleInventoryJob
+    db.session.add(SaleInventoryJob(sale_id=sale.id, location=location))
+    return True
+
+
+def has_pending_inventory_job(sale_id: int) -> bool:
+    """
+    True si la venta tiene su inventario a cargo del pipeline (para no descontar en la entrega).
+
+    Un trabajo fallido no cuenta: su inventario no se aplicó, así que la
+    entrega debe descontarlo.
+    """
+    from app.models.sale_inventory_job_models import SaleInventoryJob
+    return SaleInventoryJob.query.filter(
+        SaleInventoryJob.sale_id == sale_id,
+        SaleInventoryJob.status.in_([SaleInventoryJob.STATUS_PENDING,
+                                     SaleInventoryJob.STATUS_PROCESSING,
+                                     SaleInventoryJob.STATUS_DONE])
+    ).first() is not None
+
+
+def run_after_response(func: Callable[[], None]) -> None:
+    """Ejecuta `func` en una tarea de fondo con app context (no bloquea la respuesta)"""
+    from app import socketio
+    app = current_app._get_current_object()
+
+    def task():
+        with app.app_context():
+            try:
+                func()
+            except Exception as e:
+                logger.warning(f"Error en tarea post-commit de venta: {e}")
+
+    socketio.start_background_task(task)
+
+
+class SaleInventoryWorker:
+    """Worker que drena sale_inventory_jobs en lotes"""
+
+    def __init__(self, batch_size: int = 50, poll_interval: float = 2.0,
+                 coalesce_delay: float = 0.5, max_attempts: int = 5, lock_timeout: int = 120):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.coalesce_delay = coalesce_delay  # Espera breve para juntar varias ventas en un lote
+        self.max_attempts = max_attempts
+        self.lock_timeout = lock_timeout  # Segundos antes de devolver a pending un lote de un worker caído
+        self._app = None
+        self._started = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stats = {
+            'batches': 0,
+            'sales_applied': 0,
+            'already_applied': 0,
+            'failed': 0,
+            'recovered': 0,
+            'last_batch_size': 0,
+            'last_batch_ms': None,
+        }
+
+    def start(self, app) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._app = app
+        from app import socketio
+        socketio.start_background_task(self._run)
+        logger.info(f"✅ Worker de inventario por venta iniciado (lotes de {self.batch_size})")
+
+    def notify(self) -> None:
+        """Despierta al worker (llamar después del commit de una venta)"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        from app import socketio
+        while True:
+            try:
+                self._wake.wait(self.poll_interval)
+                if self._wake.is_set():
+                    self._wake.clear()
+                    socketio.sleep(self.coalesce_delay)
+                with self._app.app_context():
+                    while self.process_batch():
+                        pass
+            except Exception as e:
+                logger.error(f"Error en worker de inventario por venta: {e}")
+                socketio.sleep(self.poll_interval)
+
+    def process_batch(self) -> int:
+        """
+        Procesa un lote de trabajos pendientes.
+
+        Returns:
+            Número de trabajos procesados (0 si no había pendientes)
+        """
+        from sqlalchemy.orm import selectinload
+        from app.models import db, PosSale
+        from app.models.sale_inventory_job_models import SaleInventoryJob
+        from app.application.services.inventory_stock_service import InventoryStockService
+
+        jobs = self._claim_batch()
+        if not jobs:
+            return 0
+
+        start = time.perf_counter()
+        sale_ids = [job.sale_id for job in jobs]
+        sales = PosSale.query.options(selectinload(PosSale.items)).filter(PosSale.id.in_(sale_ids)).all()
+        already_applied = {sale.id for sale in sales if sale.inventory_applied}
+        locations = {job.sale_id: job.location for job in jobs if job.location}
+
+        applied_ids, errors = InventoryStockService().apply_inventory_for_sales(sales, locations)
+        applied = set(applied_ids)
+        found = {sale.id for sale in sales}
+
+        now = datetime.utcnow()
+        failed = 0
+        for job in jobs:
+            if job.sale_id in applied or job.sale_id in already_applied:
+                job.status = SaleInventoryJob.STATUS_DONE
+                job.processed_at = now
+                job.last_error = None
+            else:
+                job.attempts = (job.attempts or 0) + 1
+                job.last_error = errors.get(job.sale_id) if job.sale_id in found else "Venta no encontrada"
+                if job.attempts >= self.max_attempts or job.sale_id not in found:
+                    job.status = SaleInventoryJob.STATUS_FAILED
+                    job.processed_at = now
+                    failed += 1
+                    logger.error(f"❌ Inventario de venta #{job.sale_id} no aplicado: {job.last_error}")
+                    if job.sale_id in found:
+                        self._mark_not_applied(job)
+                else:
+                    job.status = SaleInventoryJob.STATUS_PENDING
+            job.locked_by = None
+            job.locked_until = None
+        db.session.commit()
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['sales_applied'] += len(applied)
+            self._stats['already_applied'] += len(already_applied)
+            self._stats['failed'] += failed
+            self._stats['last_batch_size'] = len(jobs)
+            self._stats['last_batch_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return len(jobs)
+
+    @staticmethod
+    def _mark_not_applied(job) -> None:
+        """
+        Deja constancia en la auditoría de la venta (sin commit). Si ya se
+        entregó, la entrega no descontó el inventario porque el trabajo estaba
+        pendiente: hay que ajustarlo a mano.
+        """
+        import json
+        from sqlalchemy import func
+        from app.models import db, PosSale
+        from app.models.pos_models import SaleAuditLog
+        from app.models.delivery_models import Delivery
+
+        sale = db.session.get(PosSale, job.sale_id)
+        delivered = dict(db.session.query(Delivery.item_name, func.sum(Delivery.qty)).filter(
+            Delivery.sale_id == str(job.sale_id)
+        ).group_by(Delivery.item_name).all())
+        db.session.add(SaleAuditLog(
+            event_type='INVENTORY_NOT_APPLIED',
+            severity='error' if delivered else 'warning',
+            actor_user_id=sale.employee_id if sale else None,
+            actor_name='Pipeline de inventario',
+            register_id=sale.register_id if sale else None,
+            sale_id=job.sale_id,
+            jornada_id=sale.jornada_id if sale else None,
+            payload_json=json.dumps({
+                'error': job.last_error,
+                'attempts': job.attempts,
+                'delivered_items': {name: int(qty or 0) for name, qty in delivered.items()},
+                'action': 'Descontar el inventario entregado manualmente' if delivered else
+                          'La entrega descontará el inventario'
+            })
+        ))
+
+    def _claim_batch(self) -> List[Any]:
+        """
+        Reclama atómicamente el próximo lote de trabajos pendientes.
+
+        Solo se quedan con el trabajo las filas que este UPDATE condicional pasó
+        de pending a processing con nuestro token; con varios workers (uno por
+        proceso de gunicorn) cada venta se procesa una sola vez.
+        """
+        from app.models import db
+        from app.models.sale_inventory_job_models import SaleInventoryJob
+
+        now = datetime.utcnow()
+        # Trabajos reclamados por un worker que murió: volver a pendientes
+        recovered = SaleInventoryJob.query.filter(
+            SaleInventoryJob.status == SaleInventoryJob.STATUS_PROCESSING,
+            SaleInventoryJob.locked_until < now
+        ).update({'status': SaleInventoryJob.STATUS_PENDING, 'locked_by': None, 'locked_until': None},
+                 synchronize_session=False)
+        if recovered:
+            logger.warning(f"Inventario por venta: {recovered} trabajo(s) recuperados de un lote interrumpido")
+            with self._lock:
+                self._stats['recovered'] += recovered
+
+        ids = [row.id for row in db.session.query(SaleInventoryJob.id).filter(
+            SaleInventoryJob.status == SaleInventoryJob.STATUS_PENDING
+        ).order_by(SaleInventoryJob.id).limit(self.batch_size)]
+        if not ids:
+            db.session.commit()
+            return []
+
+        token = uuid.uuid4().hex
+        SaleInventoryJob.query.filter(
+            SaleInventoryJob.id.in_(ids),
+            SaleInventoryJob.status == SaleInventoryJob.STATUS_PENDING
+        ).update({'status': SaleInventoryJob.STATUS_PROCESSING, 'locked_by': token,
+                  'locked_until': now + timedelta(seconds=self.lock_timeout)},
+                 synchronize_session=False)
+        db.session.commit()
+        return SaleInventoryJob.query.filter_by(locked_by=token).order_by(SaleInventoryJob.id).all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Backlog (trabajos pendientes y antigüedad del más viejo) y contadores del proceso"""
+        from sqlalchemy import func
+        from app.models import db
+        from app.models.sale_inventory_job_models import SaleInventoryJob
+
+        with self._lock:
+            stats = dict(self._stats)
+        stats['running'] = self._started
+        stats['enabled'] = is_inventory_on_sale_enabled()
+        try:
+            backlog, oldest = db.session.query(
+                func.count(SaleInventoryJob.id), func.min(SaleInventoryJob.created_at)
+            ).filter(SaleInventoryJob.status == SaleInventoryJob.STATUS_PENDING).one()
+            stats['backlog'] = backlog
+            stats['lag_seconds'] = round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0.0
+            stats['failed_total'] = SaleInventoryJob.query.filter_by(status=SaleInventoryJob.STATUS_FAILED).count()
+        except Exception as e:
+            logger.warning(f"No se pudo leer el backlog de inventario por venta: {e}")
+        return stats
+
+
+_worker = SaleInventoryWorker()
+
+
+def get_sale_inventory_worker() -> SaleInventoryWorker:
+    """Obtiene el worker de inventario por venta (uno por proceso)"""
+    return _worker
@@ -32,71 +32,28 @@ class SaleSecurityValidationError(Exception):
 
 def validate_inventory_availability(
     items: List[Dict[str, Any]],
-    pos_service: Any
+    pos_service: Any = None,
+    verdict: Any = None
 ) -> Tuple[bool, Optional[str]]:
     """
     Valida que los productos existan y estén disponibles antes de crear la venta
     
     Args:
         items: Lista de items del carrito
-        pos_service: Instancia de PosService
+        pos_service: Instancia de PosService (compatibilidad; el catálogo se lee en lote)
+        verdict: CartVerdict ya calculado (evita resolver el carrito de nuevo)
         
     Returns:
         Tuple[bool, Optional[str]]: (es_válido, mensaje_error)
     """
+    from app.helpers.cart_validator import (
+        validate_cart, CODE_MISSING_ID, CODE_NOT_FOUND, CODE_UNAVAILABLE, CODE_NOT_SELLABLE
+    )
     try:
-        for item in items:
-            item_id = str(item.get('item_id', ''))
-            quantity = int(item.get('quantity', 0))
-            item_name = item.get('name', 'Producto desconocido')
-            
-            if not item_id:
-                return False, f"Producto sin ID: {item_name}"
-            
-            # Re-validar que el producto existe y está activo
-            product = pos_service.get_product(item_id)
-            
-            # Si no se encuentra como item normal, buscar como kit
-            if not product:
-                product = pos_service.get_item_kit(item_id)
-            
-            if not product:
-                return False, f"Producto no encontrado o eliminado: {item_name} (ID: {item_id})"
-            
-            # Verificar que el producto está activo (si tiene campo deleted o active)
-            deleted = product.get('deleted', '0')
-            if deleted == '1' or str(deleted).lower() == 'true':
-                return False, f"Producto no disponible: {item_name} (está eliminado)"
-            
-            is_active = product.get('active', True)
-            if is_active is False or str(is_active).lower() == 'false':
-                return False, f"Producto no disponible: {item_name} (está inactivo)"
-            
-            # NOTA: Validación de stock físico requeriría un sistema de inventario
-            # Por ahora, solo validamos existencia y estado activo
-            
-            # VALIDACIÓN NUEVA: Verificar que productos kit tengan receta configurada
-            try:
-                from app.models.product_models import Product
-                from app.helpers.product_validation_helper import can_sell_product
-                
-                # Buscar producto en BD
-                product_db = None
-                try:
-                    product_id_int = int(item_id)
-                    product_db = Product.query.get(product_id_int)
-                except (ValueError, TypeError):
-                    # Si no es numérico, buscar por nombre
-                    product_db = Product.query.filter_by(name=item_name).first()
-                
-                if product_db:
-                    puede_venderse, mensaje_error = can_sell_product(product_db)
-                    if not puede_venderse:
-                        return False, mensaje_error or f"Producto '{item_name}' no puede venderse: requiere receta configurada"
-            except Exception as e:
-                # Si falla la validación, solo loguear pero no bloquear (para no romper flujo existente)
-                logger.warning(f"Error al validar receta de producto {item_name}: {e}")
-            
+        verdict = verdict or validate_cart(items, check_prices=False, pos_service=pos_service)
+        error = verdict.first_error(CODE_MISSING_ID, CODE_NOT_FOUND, CODE_UNAVAILABLE, CODE_NOT_SELLABLE)
+        if error:
+            return False, error
         return True, None
         
     except Exception as e:
@@ -106,66 +63,40 @@ def validate_inventory_availability(
 
 def validate_prices_match_api(
     items: List[Dict[str, Any]],
-    pos_service: Any
+    pos_service: Any = None,
+    verdict: Any = None
 ) -> Tuple[bool, Optional[str], Optional[List[Dict[str, Any]]]]:
     """
-    Re-valida precios desde la API y compara con el carrito
+    Re-valida precios desde el catálogo y compara con el carrito
     
     Args:
         items: Lista de items del carrito
-        pos_service: Instancia de PosService
+        pos_service: Instancia de PosService (compatibilidad; el catálogo se lee en lote)
+        verdict: CartVerdict ya calculado (evita resolver el carrito de nuevo)
         
     Returns:
         Tuple[bool, Optional[str], Optional[List]]: (es_válido, mensaje_error, items_corregidos)
     """
+    from app.helpers.cart_validator import validate_cart, CODE_MISSING_ID, CODE_NOT_FOUND
     try:
-        corrected_items = []
-        price_mismatches = []
+        verdict = verdict or validate_cart(items, pos_service=pos_service)
         
-        for item in items:
-            item_id = str(item.get('item_id', ''))
-            cart_price = float(item.get('price', 0))
-            cart_quantity = int(item.get('quantity', 1))
-            item_name = item.get('name', 'Producto desconocido')
-            
-            # Obtener precio actual desde la API
-            product = pos_service.get_product(item_id)
-            if not product:
-                product = pos_service.get_item_kit(item_id)
-            
-            if not product:
-                return False, f"Producto no encontrado para validar precio: {item_name}", None
-            
-            # Obtener precio desde el producto
-            api_price = float(product.get('unit_price', 0) or product.get('price', 0))
-            
-            # Si el precio del carrito difiere del precio de la API, rechazar
-            if abs(cart_price - api_price) > 0.01:  # Tolerancia de 1 centavo
-                price_mismatches.append({
-                    'item': item_name,
-                    'cart_price': cart_price,
-                    'api_price': api_price
-                })
+        for line in verdict.lines:
+            if line.code in (CODE_MISSING_ID, CODE_NOT_FOUND):
+                return False, f"Producto no encontrado para validar precio: {line.name}", None
+        
+        corrected_items = verdict.corrected_items(items)
+        mismatches = verdict.price_mismatches
+        if mismatches:
+            for line in mismatches:
                 logger.warning(
-                    f"Precio no coincide para {item_name}: "
-                    f"carrito=${cart_price}, API=${api_price}"
+                    f"Precio no coincide para {line.name}: "
+                    f"carrito=${line.cart_price}, API=${line.price}"
                 )
-            
-            # Usar precio de la API (actualizado)
-            corrected_item = item.copy()
-            corrected_item['price'] = api_price
-            corrected_item['subtotal'] = api_price * cart_quantity
-            corrected_items.append(corrected_item)
-        
-        if price_mismatches:
             # Formatear mensaje de error
-            mismatch_messages = [
-                f"{m['item']}: carrito=${m['cart_price']:.2f} vs API=${m['api_price']:.2f}"
-                for m in price_mismatches
-            ]
             error_msg = (
                 "Los precios han cambiado. Por favor, actualiza el carrito. "
-                f"Diferencias: {', '.join(mismatch_messages)}"
+                f"Diferencias: {', '.join(line.message for line in mismatches)}"
             )
             return False, error_msg, corrected_items
         
@@ -331,7 +262,12 @@ def validate_register_lock(register_id: str, employee_id: str) -> Tuple[bool, Op
         # Normalizar IDs a string
         register_id = str(register_id) if register_id else ''
         employee_id = str(employee_id) if employee_id else ''
-        
+
+        # Caso normal: el contexto de venta de la caja (cache) confirma el bloqueo sin consultas
+        from app.helpers.register_sale_context import get_sale_context_cache
+        if register_id and employee_id and get_sale_context_cache().lock_held_by(register_id, employee_id):
+            return True, None
+
         if not is_register_locked(register_id):
             return False, "La caja no está bloqueada. Por favor, selecciona la caja nuevamente."
         
@@ -470,13 +406,17 @@ def comprehensive_sale_validation(
         if not is_valid:
             return False, error, None
         
+        # 7-8. Resolver el carrito completo en lote (productos, recetas y precios)
+        from app.helpers.cart_validator import validate_cart
+        verdict = validate_cart(items, pos_service=pos_service)
+        
         # 7. Validar disponibilidad de productos (existen y están activos)
-        is_valid, error = validate_inventory_availability(items, pos_service)
+        is_valid, error = validate_inventory_availability(items, pos_service, verdict=verdict)
         if not is_valid:
             return False, error, None
         
         # 8. Re-validar precios desde la API
-        is_valid, error, corrected_items = validate_prices_match_api(items, pos_service)
+        is_valid, error, corrected_items = validate_prices_match_api(items, pos_service, verdict=verdict)
         if not is_valid:
             return False, error, corrected_items
         
@@ -6,6 +6,7 @@ import requests
 import os
 from flask import current_app
 from app.helpers.logger import get_logger
+from app.infrastructure.external.http_client import get_http_client
 
 logger = get_logger(__name__)
 
@@ -357,7 +358,7 @@ def check_api_status(checked_by='system', log_connection=True):
         }
         
         start_time = time.time()
-        resp = requests.get(url, headers=headers, timeout=2)
+        resp = get_http_client().get(url, headers=headers, timeout=2, retries=0)
         resp.raise_for_status()
         elapsed_ms = (time.time() - start_time) * 1000
         
@@ -174,6 +174,9 @@ def open_shift(fiesta_nombre='', djs='', barras_disponibles=None, bartenders=Non
                         jornada_db.set_checklist_apertura(checklist_apertura)
                         db.session.commit()
                         
+                        from app.helpers.register_sales_aggregator import invalidate_register_sales_scope
+                        invalidate_register_sales_scope()
+                        
                         return True, f"Turno abierto correctamente para el día {fecha_hoy} (sin validación de planilla)"
                     else:
                         return False, f"Jornada creada pero error al abrir: {message_open}"
@@ -224,6 +227,13 @@ def close_shift(closed_by='admin'):
             
             db.session.commit()
             
+            from app.helpers.register_sales_aggregator import invalidate_register_sales_scope
+            invalidate_register_sales_scope()
+            
+            # Recalcular el mes de la jornada en la ficha de su planilla (no falla el cierre)
+            from app.helpers.employee_profile_stats import refresh_jornada_rollups
+            refresh_jornada_rollups(jornada)
+            
             # Enviar evento a n8n (después de commit exitoso)
             try:
                 from app.helpers.n8n_client import send_shift_closed
@@ -0,0 +1,253 @@
+"""
+Agregados incrementales de encuestas por sesión
+
+get_survey_results() ya no relee todas las respuestas de la sesión en cada
+consulta: cada sesión (fecha_sesion) mantiene contadores en memoria que
+save_survey_response actualiza en O(1) (total, suma de ratings, conteo por
+rating, por barra, por hora y últimas respuestas). Hay dos alcances:
+- all: todas las respuestas de la sesión (total_respuestas / promedio de la
+  SurveySession y resumen congelado al cerrar).
+- live: solo las posteriores al inicio del turno (pantalla en vivo).
+Cada alcance lleva una vista global ('*') y una por barra.
+
+Entre workers, cada respuesta guardada incrementa una versión compartida por
+sesión en el cache manager; un worker con otra versión (o con agregados más
+antiguos que MAX_AGE) los reconstruye desde el repositorio (rebuild).
+"""
+from typing import Dict, Any, Optional, List, Callable, Tuple
+from collections import OrderedDict, deque
+from datetime import datetime
+import threading
+import time
+import logging
+
+from app.infrastructure.cache import get_cache_manager
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = 'survey_aggregates'
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+RECENT_RESPONSES = 50       # Últimas respuestas que muestra la pantalla en vivo
+MAX_AGE = 60.0              # Respaldo para respuestas guardadas sin cache compartido
+MAX_SESSIONS = 4            # Sesiones en memoria (la activa y las recién cerradas)
+
+_KEEP = object()            # Mantener el inicio de sesión ya conocido
+
+get_cache_manager().register_namespace(CACHE_NAMESPACE, 24 * 3600, max_entries=50)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+    except (ValueError, TypeError):
+        return None
+
+
+class _View:
+    """Contadores de un conjunto de respuestas"""
+    __slots__ = ('total', 'rating_sum', 'ratings_count', 'by_hour', 'recent')
+
+    def __init__(self):
+        self.total = 0
+        self.rating_sum = 0
+        self.ratings_count: Dict[int, int] = {}
+        self.by_hour: Dict[int, int] = {}
+        self.recent = deque(maxlen=RECENT_RESPONSES)
+
+    def add(self, response, hour: Optional[int]) -> None:
+        self.total += 1
+        self.rating_sum += response.rating
+        self.ratings_count[response.rating] = self.ratings_count.get(response.rating, 0) + 1
+        if hour is not None:
+            self.by_hour[hour] = self.by_hour.get(hour, 0) + 1
+        self.recent.append(response)
+
+    @property
+    def average(self) -> float:
+        return self.rating_sum / self.total if self.total else 0.0
+
+
+class _Scope:
+    """Vista global ('*') y por barra"""
+
+    def __init__(self):
+        self.views: Dict[str, _View] = {'*': _View()}
+
+    def add(self, response, hour: Optional[int]) -> None:
+        self.views['*'].add(response, hour)
+        view = self.views.get(response.barra)
+        if view is None:
+            view = self.views[response.barra] = _View()
+        view.add(response, hour)
+
+    def stats(self, barra: Optional[str] = None) -> Dict[str, Any]:
+        if barra:
+            view = self.views.get(str(barra)) or _View()
+            by_barra = {str(barra): view.total} if view.total else {}
+        else:
+            view = self.views['*']
+            by_barra = {key: v.total for key, v in self.views.items() if key != '*'}
+        return {
+            'total': view.total,
+            'average_rating': view.average,
+            'ratings_count': dict(view.ratings_count),
+            'by_barra': by_barra,
+            'by_hour': dict(view.by_hour),
+            'recent': list(view.recent)
+        }
+
+
+class _SessionAggregate:
+    def __init__(self, session_date: str, start: Optional[datetime]):
+        self.session_date = session_date
+        self.start = start
+        self.all = _Scope()
+        self.live = _Scope()
+        self.version = None
+        self.loaded_at = 0.0
+
+    def add(self, response) -> None:
+        moment = parse_timestamp(response.timestamp)
+        if moment is None:
+            logger.debug(f"Timestamp inválido en respuesta de encuesta: {response.timestamp}")
+        hour = moment.hour if moment else None
+        self.all.add(response, hour)
+        if moment is not None and self.start is not None and moment >= self.start:
+            self.live.add(response, hour)
+
+    def totals(self) -> Tuple[int, float]:
+        view = self.all.views['*']
+        return view.total, round(view.average, 2) if view.total else 0.0
+
+
+class SurveyAggregates:
+    """Agregados por sesión de encuestas (uno por proceso)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sessions: 'OrderedDict[str, _SessionAggregate]' = OrderedDict()
+        self._stats = {'rebuilds': 0, 'applied': 0, 'hits': 0}
+
+    @staticmethod
+    def _version_key(session_date: str) -> str:
+        return f"v:{session_date}"
+
+    def shared_version(self, session_date: str) -> int:
+        return get_cache_manager().get(CACHE_NAMESPACE, self._version_key(session_date), 0)
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+    def rebuild(self, session_date: str, loader: Callable[[], List], start=_KEEP) -> _SessionAggregate:
+        """Reconstruye los agregados de la sesión con las respuestas que entrega loader()"""
+        with self._lock:
+            current = self._sessions.get(session_date)
+        if start is _KEEP:
+            start = current.start if current else None
+
+        version = self.shared_version(session_date)
+        aggregate = _SessionAggregate(session_date, start)
+        for response in loader():
+            aggregate.add(response)
+        aggregate.version = version
+        aggregate.loaded_at = time.monotonic()
+
+        with self._lock:
+            self._sessions[session_date] = aggregate
+            self._sessions.move_to_end(session_date)
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+            self._stats['rebuilds'] += 1
+        return aggregate
+
+    def _current(self, session_date: str, loader: Callable[[], List], start=_KEEP) -> _SessionAggregate:
+        with self._lock:
+            aggregate = self._sessions.get(session_date)
+        if (aggregate is None
+                or (start is not _KEEP and aggregate.start != start)
+                or aggregate.version is None
+                or time.monotonic() - aggregate.loaded_at >= MAX_AGE
+                or aggregate.version != self.shared_version(session_date)):
+            return self.rebuild(session_date, loader, start)
+        with self._lock:
+            self._stats['hits'] += 1
+        return aggregate
+
+    def prepare(self, session_date: str, loader: Callable[[], List]) -> None:
+        """
+        Deja los agregados de la sesión al día antes de guardar una respuesta
+        (si la reconstrucción ocurriera después, la respuesta se contaría dos veces)
+        """
+        self._current(session_date, loader)
+
+    # ------------------------------------------------------------------
+    # Mantención
+    # ------------------------------------------------------------------
+    def apply(self, session_date: str, response, loader: Callable[[], List]) -> Tuple[int, float]:
+        """
+        Suma una respuesta recién guardada.
+
+        Returns:
+            (total, promedio) de todas las respuestas de la sesión
+        """
+        with self._lock:
+            aggregate = self._sessions.get(session_date)
+            if aggregate is not None:
+                aggregate.add(response)
+                self._stats['applied'] += 1
+                # Avisar a los otros workers; si este ya estaba atrasado, reconstruir en la próxima consulta
+                manager = get_cache_manager()
+                key = self._version_key(session_date)
+                shared = manager.get(CACHE_NAMESPACE, key, 0)
+                manager.set(CACHE_NAMESPACE, key, shared + 1)
+                aggregate.version = shared + 1 if shared == aggregate.version else None
+                return aggregate.totals()
+
+        # Sin agregados en memoria (expulsados entre prepare y apply): la respuesta ya está guardada
+        manager = get_cache_manager()
+        key = self._version_key(session_date)
+        manager.set(CACHE_NAMESPACE, key, manager.get(CACHE_NAMESPACE, key, 0) + 1)
+        return self.rebuild(session_date, loader).totals()
+
+    def evict(self, session_date: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_date, None)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def results(self, session_date: str, start: datetime, loader: Callable[[], List],
+                barra: Optional[str] = None) -> Dict[str, Any]:
+        """Estadísticas de las respuestas posteriores a start (estructura de get_survey_results)"""
+        aggregate = self._current(session_date, loader, start)
+        with self._lock:
+            return aggregate.live.stats(barra)
+
+    def session_summary(self, session_date: str, loader: Callable[[], List]) -> Dict[str, Any]:
+        """Estadísticas de todas las respuestas de la sesión, reconstruidas desde el repositorio"""
+        aggregate = self.rebuild(session_date, loader)
+        with self._lock:
+            return aggregate.all.stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'sessions': {
+                    session_date: {
+                        'total': aggregate.all.views['*'].total,
+                        'live': aggregate.live.views['*'].total,
+                        'version': aggregate.version
+                    }
+                    for session_date, aggregate in self._sessions.items()
+                }
+            }
+
+
+_aggregates = SurveyAggregates()
+
+
+def get_survey_aggregates() -> SurveyAggregates:
+    """Agregados de encuestas (uno por proceso)"""
+    return _aggregates
@@ -2,10 +2,13 @@
 Servicio para sincronizar datos entre ambientes (producción y local)
 """
 import os
+import json
 import subprocess
 import threading
 import shutil
-from datetime import datetime
+import time
+from datetime import datetime, date, time as dt_time
+from decimal import Decimal
 from flask import current_app
 from sqlalchemy import create_engine, text
 import sqlite3
@@ -17,19 +20,22 @@ TABLES_TO_SYNC = [
         'description': 'Empleados',
         'icon': '👥',
         'order_by': 'name',
-        'where': 'is_active = true'
+        'where': 'is_active = true',
+        'sync_key': 'updated_at'
     },
     {
         'name': 'cargos',
         'description': 'Cargos',
         'icon': '💼',
-        'order_by': 'nombre'
+        'order_by': 'nombre',
+        'sync_key': 'updated_at'
     },
     {
         'name': 'cargo_salary_configs',
         'description': 'Configuración de Salarios',
         'icon': '💰',
-        'order_by': 'cargo'
+        'order_by': 'cargo',
+        'sync_key': 'updated_at'
     },
     {
         'name': 'jornadas',
@@ -49,7 +55,8 @@ TABLES_TO_SYNC = [
         'name': 'guardarropia_items',
         'description': 'Guardarropía',
         'icon': '🧥',
-        'order_by': 'deposited_at DESC'
+        'order_by': 'deposited_at DESC',
+        'sync_key': 'updated_at'
     },
     {
         'name': 'register_closes',
@@ -67,6 +74,12 @@ TABLES_TO_SYNC = [
     }
 ]
 
+# Filas por lote (una transacción local por lote)
+CHUNK_SIZE = 500
+
+# Tabla local con la posición (marca de agua) alcanzada por tabla
+WATERMARK_TABLE = 'sync_watermarks'
+
 # Estado global de sincronización
 _sync_status = {
     'running': False,
@@ -170,110 +183,306 @@ def cleanup_old_backups(backups_dir, keep_last=10):
     except Exception as e:
         print(f"⚠️  Error al limpiar backups antiguos: {e}")
 
-def sync_table(prod_conn, local_conn, table_config, progress_callback=None):
-    """Sincroniza una tabla específica"""
+# ----------------------------------------------------------------------
+# Sincronización por lotes (keyset) con marca de agua por tabla
+# ----------------------------------------------------------------------
+# Cada tabla se lee de producción en lotes ordenados por su llave de
+# sincronización (sync_key: updated_at + id, o solo id) y cada lote se
+# inserta/actualiza en la BD local con un executemany (INSERT ... ON
+# CONFLICT) en una sola transacción, que también guarda la posición
+# alcanzada en WATERMARK_TABLE. La siguiente sincronización sigue desde esa
+# posición (incremental) y, si una falla a mitad de camino, retoma desde el
+# último lote confirmado.
+#
+# Con sync_key = 'id' solo llegan filas nuevas; por eso las tablas con
+# 'limit' (las últimas N filas según order_by) vuelven a recorrer esa
+# ventana en cada sincronización, que es donde están las filas que aún
+# cambian (jornadas abiertas, cierres recientes).
+
+def _to_sqlite(value):
+    """Convierte un valor de producción a un tipo que sqlite3 pueda guardar"""
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, (date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def _ensure_watermark_table(local_conn):
+    local_conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} ("
+        "table_name TEXT PRIMARY KEY, sync_key TEXT NOT NULL, high_water TEXT, last_id INTEGER, "
+        "rows_synced INTEGER NOT NULL DEFAULT 0, updated_at TEXT)"
+    )
+    local_conn.commit()
+
+
+def get_watermark(local_conn, table_name):
+    """Posición alcanzada en la última sincronización de la tabla (o None)"""
+    _ensure_watermark_table(local_conn)
+    row = local_conn.execute(
+        f"SELECT sync_key, high_water, last_id, rows_synced, updated_at FROM {WATERMARK_TABLE} WHERE table_name = ?",
+        (table_name,)
+    ).fetchone()
+    if not row:
+        return None
+    sync_key, high_water, last_id, rows_synced, updated_at = row
+    if sync_key != 'id' and high_water:
+        high_water = datetime.fromisoformat(high_water)
+    return {
+        'sync_key': sync_key,
+        'high_water': high_water,
+        'last_id': last_id,
+        'rows_synced': rows_synced,
+        'updated_at': updated_at
+    }
+
+
+def reset_watermark(local_conn, table_name=None):
+    """Olvida la posición de una tabla (o de todas): la próxima sincronización será completa"""
+    _ensure_watermark_table(local_conn)
+    if table_name:
+        local_conn.execute(f"DELETE FROM {WATERMARK_TABLE} WHERE table_name = ?", (table_name,))
+    else:
+        local_conn.execute(f"DELETE FROM {WATERMARK_TABLE}")
+    local_conn.commit()
+
+
+def _save_watermark(local_cursor, table_name, sync_key, high_water, last_id, rows):
+    """Guarda la posición dentro de la transacción del lote"""
+    local_cursor.execute(
+        f"INSERT INTO {WATERMARK_TABLE} (table_name, sync_key, high_water, last_id, rows_synced, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(table_name) DO UPDATE SET sync_key = excluded.sync_key, high_water = excluded.high_water, "
+        "last_id = excluded.last_id, rows_synced = rows_synced + excluded.rows_synced, updated_at = excluded.updated_at",
+        (table_name, sync_key, _to_sqlite(high_water), last_id, rows, datetime.now().isoformat())
+    )
+
+
+def _keyset_condition(sync_key, position):
+    """Condición y parámetros para leer después de la posición (None = desde el inicio)"""
+    if position is None:
+        return '1=1', {}
+    high_water, last_id = position
+    if sync_key == 'id':
+        return 'id > :last_id', {'last_id': last_id}
+    return (
+        f'({sync_key} > :high_water OR ({sync_key} = :high_water AND id > :last_id))',
+        {'high_water': high_water, 'last_id': last_id}
+    )
+
+
+def _window_start_id(prod_conn, table_name, where_clause, order_by, limit):
+    """Menor id de las últimas `limit` filas según order_by (ventana de una tabla con 'limit')"""
+    row = prod_conn.execute(text(
+        f"SELECT MIN(id) FROM (SELECT id FROM {table_name} WHERE {where_clause} "
+        f"ORDER BY {order_by} LIMIT {int(limit)}) AS sync_window"
+    )).fetchone()
+    return row[0] if row else None
+
+
+def _start_position(prod_conn, local_conn, table_config, sync_key):
+    """Posición desde la que se lee: marca de agua, acotada por la ventana de 'limit'"""
     table_name = table_config['name']
-    description = table_config.get('description', table_name)
-    icon = table_config.get('icon', '📦')
-    order_by = table_config.get('order_by', 'id')
-    where_clause = table_config.get('where', '1=1')
+    watermark = get_watermark(local_conn, table_name)
+    position = None
+    if watermark and watermark['sync_key'] == sync_key:
+        position = (watermark['high_water'], watermark['last_id'])
+
     limit = table_config.get('limit')
+    if sync_key == 'id' and limit:
+        window_start = _window_start_id(
+            prod_conn, table_name, table_config.get('where', '1=1'),
+            table_config.get('order_by', 'id'), limit
+        )
+        if not isinstance(window_start, int):
+            return position, watermark is not None
+        window_position = (window_start - 1, window_start - 1)
+        if position is None or position[1] is None or position[1] > window_position[1]:
+            position = window_position
+    return position, watermark is not None
+
+
+def sync_table(prod_conn, local_conn, table_config, progress_callback=None, chunk_size=CHUNK_SIZE):
+    """
+    Sincroniza una tabla específica en lotes (keyset) desde la última marca de agua.
+    
+    Returns:
+        dict: inserted, updated, total, chunks, rows_per_second, status (o error)
+    """
+    table_name = table_config['name']
+    where_clause = table_config.get('where', '1=1')
+    started = time.monotonic()
+    inserted = 0
+    updated = 0
+    chunks = 0
+    
+    def report(status, progress, processed=0):
+        if progress_callback:
+            elapsed = time.monotonic() - started
+            progress_callback(
+                table_name, status, progress,
+                rows=processed,
+                rows_per_second=round(processed / elapsed, 1) if elapsed > 0 else 0.0
+            )
     
     try:
         # Actualizar estado
         _sync_status['current_table'] = table_name
-        if progress_callback:
-            progress_callback(table_name, 'iniciando', 0)
-        
-        # Construir query
-        query = f"SELECT * FROM {table_name} WHERE {where_clause} ORDER BY {order_by}"
-        if limit:
-            query += f" LIMIT {limit}"
-        
-        # Obtener datos de producción
-        result = prod_conn.execute(text(query))
-        rows = result.fetchall()
-        
-        if len(rows) == 0:
-            result_data = {'inserted': 0, 'updated': 0, 'total': 0, 'status': 'empty'}
-            if progress_callback:
-                progress_callback(table_name, 'completado', 0)
-            return result_data
-        
-        # Obtener nombres de columnas
-        columns = [desc[0] for desc in result.description]
-        columns_str = ','.join(columns)
-        placeholders = ','.join(['?' for _ in columns])
+        report('iniciando', 0)
         
+        # Columnas de producción (sin leer filas) y columnas que existen en local
+        probe = prod_conn.execute(text(f"SELECT * FROM {table_name} WHERE 1=0"))
+        prod_columns = list(probe.keys())
+        probe.close()
         local_cursor = local_conn.cursor()
+        local_columns = {row[1] for row in local_cursor.execute(f'PRAGMA table_info({table_name})')}
+        columns = [col for col in prod_columns if col in local_columns]
+        if not columns:
+            raise ValueError(f"La tabla {table_name} no tiene columnas en común con la BD local")
+        
+        # Llave de sincronización: la configurada si existe, si no id
+        sync_key = table_config.get('sync_key', 'id')
+        if sync_key not in prod_columns or 'id' not in columns:
+            sync_key = 'id' if 'id' in columns else None
         
         # Contar registros en local antes
         local_cursor.execute(f'SELECT COUNT(*) FROM {table_name}')
         local_count_before = local_cursor.fetchone()[0]
         
-        inserted = 0
-        updated = 0
-        total_rows = len(rows)
-        
-        for idx, row in enumerate(rows):
-            # Convertir row a tupla
-            row_tuple = tuple(row)
+        if sync_key is None:
+            result_data = _sync_table_stream(prod_conn, local_conn, table_config, columns, chunk_size, report)
+        else:
+            _ensure_watermark_table(local_conn)
+            position, incremental = _start_position(prod_conn, local_conn, table_config, sync_key)
+            
+            # Filas pendientes (para el porcentaje de avance)
+            condition, params = _keyset_condition(sync_key, position)
+            pending = prod_conn.execute(
+                text(f"SELECT COUNT(*) FROM {table_name} WHERE ({where_clause}) AND {condition}"), params
+            ).scalar() or 0
             
-            # Actualizar progreso
-            if progress_callback and idx % 10 == 0:
-                progress = int((idx / total_rows) * 100)
-                progress_callback(table_name, 'procesando', progress)
+            columns_str = ','.join(columns)
+            placeholders = ','.join(['?' for _ in columns])
+            update_clause = ','.join([f'{col} = excluded.{col}' for col in columns if col != 'id'])
+            upsert_query = f'INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders}) ON CONFLICT(id) DO '
+            upsert_query += f'UPDATE SET {update_clause}' if update_clause else 'NOTHING'
+            order = 'id' if sync_key == 'id' else f'{sync_key}, id'
+            id_index = columns.index('id')
+            key_index = prod_columns.index(sync_key)
             
-            # Verificar si existe
-            if 'id' in columns:
-                id_index = columns.index('id')
-                id_value = row_tuple[id_index]
-                local_cursor.execute(f'SELECT id FROM {table_name} WHERE id = ?', (id_value,))
-                exists = local_cursor.fetchone()
+            while True:
+                condition, params = _keyset_condition(sync_key, position)
+                rows = prod_conn.execute(text(
+                    f"SELECT * FROM {table_name} WHERE ({where_clause}) AND {condition} "
+                    f"ORDER BY {order} LIMIT {int(chunk_size)}"
+                ), params).fetchall()
+                if not rows:
+                    break
                 
-                if exists:
-                    # Actualizar
-                    set_clause = ','.join([f'{col} = ?' for col in columns])
-                    update_query = f'UPDATE {table_name} SET {set_clause} WHERE id = ?'
-                    local_cursor.execute(update_query, row_tuple + (id_value,))
-                    updated += 1
-                else:
-                    # Insertar
-                    insert_query = f'INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})'
-                    local_cursor.execute(insert_query, row_tuple)
-                    inserted += 1
-            else:
-                # Si no hay columna 'id', solo insertar
-                insert_query = f'INSERT OR REPLACE INTO {table_name} ({columns_str}) VALUES ({placeholders})'
-                local_cursor.execute(insert_query, row_tuple)
-                inserted += 1
-        
-        local_conn.commit()
+                values = [tuple(_to_sqlite(row[prod_columns.index(col)]) for col in columns) for row in rows]
+                ids = [value[id_index] for value in values]
+                
+                # Un lote = una transacción (filas + marca de agua)
+                existing = {
+                    row[0] for row in local_cursor.execute(
+                        f"SELECT id FROM {table_name} WHERE id IN ({','.join('?' for _ in ids)})", ids
+                    )
+                }
+                last = rows[-1]
+                position = (last[key_index], last[prod_columns.index('id')])
+                try:
+                    local_cursor.executemany(upsert_query, values)
+                    _save_watermark(local_cursor, table_name, sync_key, position[0], position[1], len(rows))
+                    local_conn.commit()
+                except Exception:
+                    local_conn.rollback()
+                    raise
+                
+                chunks += 1
+                updated += len(existing)
+                inserted += len(ids) - len(existing)
+                processed = inserted + updated
+                report('procesando', min(99, int(processed * 100 / pending)) if pending else 99, processed)
+                
+                if len(rows) < chunk_size:
+                    break
+            
+            result_data = {
+                'inserted': inserted,
+                'updated': updated,
+                'total': inserted + updated,
+                'chunks': chunks,
+                'sync_key': sync_key,
+                'incremental': incremental,
+                'high_water': _to_sqlite(position[0]) if position else None,
+                'status': 'success' if inserted + updated else 'empty'
+            }
         
         # Contar después
         local_cursor.execute(f'SELECT COUNT(*) FROM {table_name}')
-        local_count_after = local_cursor.fetchone()[0]
-        
-        result_data = {
-            'inserted': inserted,
-            'updated': updated,
-            'total': total_rows,
-            'local_before': local_count_before,
-            'local_after': local_count_after,
-            'status': 'success'
-        }
-        
-        if progress_callback:
-            progress_callback(table_name, 'completado', 100)
+        result_data['local_before'] = local_count_before
+        result_data['local_after'] = local_cursor.fetchone()[0]
+        elapsed = time.monotonic() - started
+        result_data['seconds'] = round(elapsed, 2)
+        result_data['rows_per_second'] = round(result_data['total'] / elapsed, 1) if elapsed > 0 else 0.0
         
+        report('completado', 100, result_data['total'])
         return result_data
         
     except Exception as e:
         error_msg = str(e)
-        current_app.logger.error(f"Error al sincronizar {table_name}: {error_msg}")
-        if progress_callback:
-            progress_callback(table_name, 'error', 0)
-        return {'error': error_msg, 'status': 'error'}
+        # Log simple sin usar current_app (no disponible en thread)
+        print(f"❌ Error al sincronizar {table_name}: {error_msg}")
+        report('error', 0, inserted + updated)
+        return {
+            'error': error_msg,
+            'status': 'error',
+            # Los lotes confirmados quedan guardados; la próxima sincronización retoma desde ahí
+            'synced_before_error': inserted + updated,
+            'resumable': chunks > 0
+        }
+
+def _sync_table_stream(prod_conn, local_conn, table_config, columns, chunk_size, report):
+    """Tablas sin id: lectura por lotes (fetchmany) e INSERT OR REPLACE por lote, sin marca de agua"""
+    table_name = table_config['name']
+    query = f"SELECT {','.join(columns)} FROM {table_name} WHERE {table_config.get('where', '1=1')} ORDER BY {table_config.get('order_by', '1')}"
+    if table_config.get('limit'):
+        query += f" LIMIT {int(table_config['limit'])}"
+    
+    insert_query = f"INSERT OR REPLACE INTO {table_name} ({','.join(columns)}) VALUES ({','.join('?' for _ in columns)})"
+    local_cursor = local_conn.cursor()
+    result = prod_conn.execution_options(stream_results=True).execute(text(query))
+    inserted = 0
+    chunks = 0
+    while True:
+        rows = result.fetchmany(chunk_size)
+        if not rows:
+            break
+        try:
+            local_cursor.executemany(insert_query, [tuple(_to_sqlite(value) for value in row) for row in rows])
+            local_conn.commit()
+        except Exception:
+            local_conn.rollback()
+            raise
+        inserted += len(rows)
+        chunks += 1
+        report('procesando', 50, inserted)
+    return {
+        'inserted': inserted,
+        'updated': 0,
+        'total': inserted,
+        'chunks': chunks,
+        'sync_key': None,
+        'incremental': False,
+        'status': 'success' if inserted else 'empty'
+    }
 
 def sync_all_data_async():
     """Sincroniza todos los datos de forma asíncrona"""
@@ -404,10 +613,11 @@ def sync_all_data_async():
                 tables_synced = 0
                 total_tables = len(TABLES_TO_SYNC)
                 
-                def progress_callback(table_name, status, progress):
+                def progress_callback(table_name, status, progress, **extra):
                     _sync_status['progress'][table_name] = {
                         'status': status,
-                        'progress': progress
+                        'progress': progress,
+                        **extra
                     }
                 
                 # Sincronizar cada tabla
@@ -1,68 +1,47 @@
 """
-Cache thread-safe usando threading.Lock
-Reemplaza el cache global no thread-safe
+Cache thread-safe con TTL por clave
+Delegado a un namespace de la capa única de cache (app.infrastructure.cache)
 """
-import threading
-from datetime import datetime
 from typing import Any, Optional
 
+from app.infrastructure.cache import get_cache_manager
+
+
 class ThreadSafeCache:
-    """Cache thread-safe con TTL"""
-    
-    def __init__(self, default_ttl: int = 60):
-        self._cache = {}
-        self._timestamps = {}
-        self._lock = threading.RLock()
+    """Cache thread-safe con TTL (respeta el TTL entregado en cada set)"""
+
+    def __init__(self, namespace: str, default_ttl: int = 60, max_entries: int = 256):
+        # Nombre explícito: instancias con el mismo nombre comparten el namespace
+        # (no se registra uno nuevo por instancia)
+        if not namespace:
+            raise ValueError("ThreadSafeCache requiere un namespace")
         self.default_ttl = default_ttl
-    
+        self.namespace = namespace
+        get_cache_manager().register_namespace(self.namespace, default_ttl, max_entries)
+
     def get(self, key: str) -> Optional[Any]:
         """Obtiene un valor del cache si no ha expirado"""
-        with self._lock:
-            if key not in self._cache:
-                return None
-            
-            # Verificar TTL
-            if key in self._timestamps:
-                elapsed = (datetime.now() - self._timestamps[key]).total_seconds()
-                if elapsed > self.default_ttl:
-                    # Expirar
-                    self._cache.pop(key, None)
-                    self._timestamps.pop(key, None)
-                    return None
-            
-            return self._cache.get(key)
-    
+        return get_cache_manager().get(self.namespace, key)
+
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """Establece un valor en el cache"""
-        with self._lock:
-            self._cache[key] = value
-            self._timestamps[key] = datetime.now()
-            if ttl:
-                # TTL personalizado se maneja en get()
-                pass
-    
+        """Establece un valor en el cache con su propio TTL (o el TTL por defecto)"""
+        get_cache_manager().set(self.namespace, key, value, ttl or self.default_ttl)
+
     def delete(self, key: str) -> None:
         """Elimina un valor del cache"""
-        with self._lock:
-            self._cache.pop(key, None)
-            self._timestamps.pop(key, None)
-    
+        get_cache_manager().delete(self.namespace, key)
+
     def clear(self) -> None:
         """Limpia todo el cache"""
-        with self._lock:
-            self._cache.clear()
-            self._timestamps.clear()
-    
+        get_cache_manager().invalidate(self.namespace)
+
     def invalidate_pattern(self, pattern: str) -> None:
         """Invalida todas las claves que contengan el patrón"""
-        with self._lock:
-            keys_to_delete = [k for k in self._cache.keys() if pattern in k]
-            for key in keys_to_delete:
-                self.delete(key)
+        get_cache_manager().invalidate(self.namespace, lambda k: pattern in k)
 
 
 # Instancia global thread-safe
-_shift_cache = ThreadSafeCache(default_ttl=60)
+_shift_cache = ThreadSafeCache('shift_info', default_ttl=60)
 
 def get_cached_shift_info(key: str = 'shift_info') -> Optional[Any]:
     """Obtiene información de turno del cache thread-safe"""
@@ -70,14 +49,7 @@ def get_cached_shift_info(key: str = 'shift_info') -> Optional[Any]:
 
 def set_cached_shift_info(value: Any, key: str = 'shift_info', ttl: Optional[int] = None) -> None:
     """Establece información de turno en el cache thread-safe"""
-    if ttl:
-        # Crear cache temporal con TTL personalizado
-        cache_with_ttl = ThreadSafeCache(default_ttl=ttl)
-        cache_with_ttl.set(key, value, ttl)
-        # Copiar al cache principal
-        _shift_cache.set(key, value)
-    else:
-        _shift_cache.set(key, value)
+    _shift_cache.set(key, value, ttl)
 
 def invalidate_shift_cache(key: Optional[str] = None) -> None:
     """Invalida el cache de turno"""
@@ -85,8 +57,3 @@ def invalidate_shift_cache(key: Optional[str] = None) -> None:
         _shift_cache.delete(key)
     else:
         _shift_cache.delete('shift_info')
-
-
-
-
-
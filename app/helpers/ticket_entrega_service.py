@@ -10,6 +10,7 @@ from app.models.ticket_entrega_models import TicketEntrega, TicketEntregaItem, D
 from app.models.pos_models import PosSale
 from app.helpers.timezone_utils import CHILE_TZ
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -163,34 +164,33 @@ class TicketEntregaService:
         Returns:
             Tuple[bool, Optional[Dict], str]: (éxito, datos del ticket, mensaje)
         """
+        from app.helpers.ticket_scan_index import (
+            get_open_ticket_index, get_scan_log_writer, record_scan_latency
+        )
+        started = time.perf_counter()
         try:
-            ticket = TicketEntregaService.get_ticket_by_qr_token(qr_token)
+            # Índice en memoria de tickets pendientes (BD solo si no está o no está vigente)
+            index = get_open_ticket_index()
+            entry = index.lookup(qr_token)
             
-            if not ticket:
+            if not entry:
                 return False, None, "Ticket no encontrado"
             
             # Validar que el ticket no esté anulado
-            if ticket.is_void():
+            if entry['status'] == 'void':
                 return False, None, "Ticket anulado"
             
             # Validar que el ticket no esté completamente entregado
-            if ticket.is_delivered():
+            if entry['status'] == 'delivered':
                 return False, None, "Ticket ya entregado completamente"
             
             # Validar que el ticket sea del turno actual (opcional, configurable)
             validate_shift = current_app.config.get('VALIDATE_TICKET_SHIFT', True)
-            if validate_shift:
-                from app.models.jornada_models import Jornada
-                jornada_actual = Jornada.query.filter_by(
-                    fecha_jornada=ticket.shift_date,
-                    estado_apertura='abierto'
-                ).first()
-                
-                if not jornada_actual:
-                    # Permitir ver pero no entregar si es de otro turno
-                    logger.warning(f"⚠️  Ticket {ticket.display_code} es de turno cerrado")
-            
-            # Registrar log de escaneo
+            if validate_shift and not index.is_shift_open(entry['shift_date']):
+                # Permitir ver pero no entregar si es de otro turno
+                logger.warning(f"⚠️  Ticket {entry['display_code']} es de turno cerrado")
+            
+            # Registrar log de escaneo (escritura en lotes, fuera de la respuesta)
             try:
                 from flask import request as flask_request
                 ip_address = flask_request.remote_addr if flask_request else None
@@ -199,8 +199,8 @@ class TicketEntregaService:
                 ip_address = None
                 user_agent = None
             
-            delivery_log = DeliveryLog(
-                ticket_id=ticket.id,
+            get_scan_log_writer().enqueue(
+                ticket_id=entry['id'],
                 action='scan',
                 bartender_user_id=scanner_id,
                 bartender_name=scanner_name,
@@ -208,17 +208,15 @@ class TicketEntregaService:
                 ip_address=ip_address,
                 user_agent=user_agent
             )
-            db.session.add(delivery_log)
-            db.session.commit()
             
             # Preparar datos del ticket
             ticket_data = {
-                'ticket': ticket.to_dict(),
-                'items': [item.to_dict() for item in ticket.items],
-                'can_deliver': ticket.can_deliver()
+                'ticket': entry['ticket'],
+                'items': entry['items'],
+                'can_deliver': entry['can_deliver']
             }
             
-            logger.info(f"✅ Ticket escaneado: {ticket.display_code} por {scanner_name}")
+            logger.info(f"✅ Ticket escaneado: {entry['display_code']} por {scanner_name}")
             
             return True, ticket_data, "Ticket escaneado correctamente"
             
@@ -226,6 +224,8 @@ class TicketEntregaService:
             db.session.rollback()
             logger.error(f"Error al escanear ticket: {e}", exc_info=True)
             return False, None, f"Error al escanear ticket: {str(e)}"
+        finally:
+            record_scan_latency(time.perf_counter() - started)
     
     @staticmethod
     def deliver_item(
@@ -0,0 +1,431 @@
+"""
+Ruta rápida del escaneo de tickets QR en barra
+
+- OpenTicketIndex: índice en memoria de los tickets con entregas pendientes
+  (qr_token -> ticket + items ya serializados), agrupado por jornada. Se
+  precarga con los tickets abiertos de las jornadas abiertas y se mantiene
+  con eventos de la sesión ORM: al confirmar la creación de un ticket o una
+  entrega se recarga solo ese ticket en segundo plano. Entre workers, cada
+  ticket tiene una versión compartida en el cache manager; una entrada cuya
+  versión no coincide (o más antigua que ENTRY_MAX_AGE) se vuelve a leer de
+  la BD.
+- ScanLogWriter: los DeliveryLog de escaneo (action='scan') se encolan y se
+  insertan en lotes (cada flush_interval, hasta batch_size por INSERT) desde
+  una tarea de fondo, fuera del tiempo de respuesta.
+- Latencia de escaneo (p50/p95) por proceso.
+
+Las entregas (deliver_item) siguen validándose contra la BD.
+"""
+from typing import Dict, Any, Optional, List, Set
+from datetime import datetime
+import threading
+import time
+import logging
+
+from app.helpers.monitoring import LatencyWindow
+from app.infrastructure.cache import get_cache_manager
+from app.infrastructure.session_changes import watch
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = 'ticket_scan_index'
+OPEN_STATUSES = ('open', 'partial')
+
+ENTRY_MAX_AGE = 20.0       # Respaldo para cambios hechos fuera de la sesión ORM / sin cache compartido
+SHIFT_CACHE_TTL = 30.0     # Fechas de jornadas abiertas
+WARM_LIMIT = 5000          # Tope de tickets precargados
+
+get_cache_manager().register_namespace(CACHE_NAMESPACE, 24 * 3600, max_entries=20000)
+
+
+def _entry_from_ticket(ticket) -> Dict[str, Any]:
+    """Entrada del índice: datos ya serializados (lo que devuelve el escaneo)"""
+    items = [item.to_dict() for item in ticket.items]
+    ticket_dict = ticket.to_dict()
+    return {
+        'id': ticket.id,
+        'qr_token': ticket.qr_token,
+        'display_code': ticket.display_code,
+        'jornada_id': ticket.jornada_id,
+        'shift_date': ticket.shift_date,
+        'status': ticket.status,
+        'ticket': ticket_dict,
+        'items': items,
+        'can_deliver': ticket.can_deliver(),
+        'version': OpenTicketIndex.shared_version(ticket.id),
+        'loaded_at': time.monotonic()
+    }
+
+
+class OpenTicketIndex:
+    """Tickets con entregas pendientes por jornada (uno por proceso)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_token: Dict[str, Dict[str, Any]] = {}
+        self._token_by_id: Dict[int, str] = {}
+        self._by_jornada: Dict[int, Set[int]] = {}
+        self._open_shift_dates: Optional[Set[str]] = None
+        self._shift_loaded_at = 0.0
+        self._warmed = False
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'reloads': 0, 'evictions': 0, 'warmed': 0}
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    # ------------------------------------------------------------------
+    # Versiones compartidas
+    # ------------------------------------------------------------------
+    @staticmethod
+    def shared_version(ticket_id: int) -> int:
+        return get_cache_manager().get(CACHE_NAMESPACE, f"t:{ticket_id}", 0)
+
+    @staticmethod
+    def bump_version(ticket_id: int) -> None:
+        manager = get_cache_manager()
+        key = f"t:{ticket_id}"
+        manager.set(CACHE_NAMESPACE, key, manager.get(CACHE_NAMESPACE, key, 0) + 1)
+
+    # ------------------------------------------------------------------
+    # Entradas
+    # ------------------------------------------------------------------
+    def _put(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._drop_locked(entry['id'])
+            self._by_token[entry['qr_token']] = entry
+            self._token_by_id[entry['id']] = entry['qr_token']
+            self._by_jornada.setdefault(entry['jornada_id'], set()).add(entry['id'])
+
+    def _drop_locked(self, ticket_id: int) -> None:
+        token = self._token_by_id.pop(ticket_id, None)
+        if token is None:
+            return
+        entry = self._by_token.pop(token, None)
+        if entry:
+            ids = self._by_jornada.get(entry['jornada_id'])
+            if ids:
+                ids.discard(ticket_id)
+                if not ids:
+                    self._by_jornada.pop(entry['jornada_id'], None)
+
+    def evict(self, ticket_ids) -> None:
+        with self._lock:
+            for ticket_id in ticket_ids:
+                self._drop_locked(ticket_id)
+        self._count('evictions', len(ticket_ids))
+
+    def evict_jornada(self, jornada_id: int) -> None:
+        """Descarta los tickets de una jornada (al cerrarla)"""
+        with self._lock:
+            ids = list(self._by_jornada.get(jornada_id, ()))
+        self.evict(ids)
+
+    def _is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return (time.monotonic() - entry['loaded_at'] < ENTRY_MAX_AGE
+                and entry['version'] == self.shared_version(entry['id']))
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+    def warm(self) -> int:
+        """Precarga los tickets abiertos/parciales de las jornadas abiertas"""
+        from sqlalchemy.orm import selectinload
+        from app.models.ticket_entrega_models import TicketEntrega
+        from app.models.jornada_models import Jornada
+
+        open_jornadas = [j.id for j in Jornada.query.filter_by(estado_apertura='abierto').all()]
+        if not open_jornadas:
+            self._warmed = True
+            return 0
+        tickets = TicketEntrega.query.options(selectinload(TicketEntrega.items)).filter(
+            TicketEntrega.jornada_id.in_(open_jornadas),
+            TicketEntrega.status.in_(OPEN_STATUSES)
+        ).order_by(TicketEntrega.id.desc()).limit(WARM_LIMIT).all()
+        for ticket in tickets:
+            self._put(_entry_from_ticket(ticket))
+        self._warmed = True
+        self._count('warmed', len(tickets))
+        logger.info(f"Índice de tickets QR precargado: {len(tickets)} tickets pendientes")
+        return len(tickets)
+
+    def reload(self, ticket_ids) -> None:
+        """Vuelve a leer tickets de la BD; quedan en el índice solo si aún admiten entregas"""
+        from sqlalchemy.orm import selectinload
+        from app.models.ticket_entrega_models import TicketEntrega
+
+        ticket_ids = list(ticket_ids)
+        tickets = TicketEntrega.query.options(selectinload(TicketEntrega.items)).filter(
+            TicketEntrega.id.in_(ticket_ids)
+        ).all()
+        found = set()
+        for ticket in tickets:
+            found.add(ticket.id)
+            if ticket.can_deliver():
+                self._put(_entry_from_ticket(ticket))
+            else:
+                self.evict([ticket.id])
+        missing = [ticket_id for ticket_id in ticket_ids if ticket_id not in found]
+        if missing:
+            self.evict(missing)
+        self._count('reloads', len(ticket_ids))
+
+    def lookup(self, qr_token: str) -> Optional[Dict[str, Any]]:
+        """
+        Datos de escaneo del ticket (índice si está vigente, si no la BD).
+
+        Returns:
+            Entrada con 'ticket', 'items', 'status', 'can_deliver', ... o None si no existe
+        """
+        if not self._warmed:
+            try:
+                self.warm()
+            except Exception as e:
+                self._warmed = True
+                logger.warning(f"No se pudo precargar el índice de tickets QR: {e}")
+
+        with self._lock:
+            entry = self._by_token.get(qr_token)
+        if entry is not None:
+            if self._is_fresh(entry):
+                self._count('hits')
+                return entry
+            self._count('stale')
+        else:
+            self._count('misses')
+
+        from sqlalchemy.orm import selectinload
+        from app.models.ticket_entrega_models import TicketEntrega
+        ticket = TicketEntrega.query.options(selectinload(TicketEntrega.items)).filter_by(
+            qr_token=qr_token
+        ).first()
+        if ticket is None:
+            return None
+        entry = _entry_from_ticket(ticket)
+        if ticket.can_deliver():
+            self._put(entry)
+        else:
+            self.evict([ticket.id])
+        return entry
+
+    # ------------------------------------------------------------------
+    # Jornadas abiertas
+    # ------------------------------------------------------------------
+    def is_shift_open(self, shift_date: str) -> bool:
+        """True si hay una jornada abierta con esa fecha (cacheado SHIFT_CACHE_TTL)"""
+        if self._open_shift_dates is None or time.monotonic() - self._shift_loaded_at >= SHIFT_CACHE_TTL:
+            from app.models.jornada_models import Jornada
+            rows = Jornada.query.with_entities(Jornada.fecha_jornada).filter_by(estado_apertura='abierto').all()
+            self._open_shift_dates = {row[0] for row in rows}
+            self._shift_loaded_at = time.monotonic()
+        return shift_date in self._open_shift_dates
+
+    def invalidate_shifts(self) -> None:
+        self._open_shift_dates = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'tickets': len(self._by_token),
+                'jornadas': {str(jornada_id): len(ids) for jornada_id, ids in self._by_jornada.items()},
+                'entry_max_age': ENTRY_MAX_AGE
+            }
+
+
+class ScanLogWriter:
+    """Escritura en lotes de DeliveryLog (uno por proceso)"""
+
+    def __init__(self, flush_interval: float = 1.0, batch_size: int = 100, max_attempts: int = 3):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._app = None
+        self._started = False
+        self._lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._stats = {'enqueued': 0, 'written': 0, 'batches': 0, 'failed': 0, 'dropped': 0,
+                       'sync_writes': 0, 'last_batch_size': 0}
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def start(self, app) -> bool:
+        with self._lock:
+            if self._started:
+                return True
+            self._app = app
+        try:
+            from app import socketio
+            socketio.start_background_task(self._run)
+        except Exception as e:
+            logger.warning(f"No se pudo iniciar el escritor de logs de escaneo: {e}")
+            return False
+        with self._lock:
+            self._started = True
+        return True
+
+    def enqueue(self, **fields) -> None:
+        """Encola un DeliveryLog; sin worker disponible se escribe en el momento"""
+        fields.setdefault('created_at', datetime.utcnow())
+        if not self._started:
+            try:
+                from flask import current_app
+                self.start(current_app._get_current_object())
+            except RuntimeError:
+                pass
+        if not self._started:
+            self._write([fields], release_session=False)
+            self._count('sync_writes')
+            return
+        with self._lock:
+            self._pending.append({'row': fields, 'attempts': 0})
+            self._stats['enqueued'] += 1
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self) -> None:
+        from app import socketio
+        while True:
+            try:
+                socketio.sleep(self.flush_interval)
+                if not self.pending():
+                    continue
+                with self._app.app_context():
+                    while self.flush():
+                        pass
+            except Exception as e:
+                logger.error(f"Error en escritor de logs de escaneo: {e}")
+                socketio.sleep(self.flush_interval)
+
+    @staticmethod
+    def _write(rows: List[Dict[str, Any]], release_session: bool = True) -> None:
+        from app.models import db
+        from app.models.ticket_entrega_models import DeliveryLog
+        try:
+            db.session.bulk_insert_mappings(DeliveryLog, rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            if release_session:
+                db.session.remove()
+
+    def flush(self) -> int:
+        """
+        Inserta un lote de logs pendientes (requiere app context).
+
+        Returns:
+            Número de logs escritos (0 si no había pendientes o falló)
+        """
+        with self._lock:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+        if not batch:
+            return 0
+        try:
+            self._write([pending['row'] for pending in batch])
+        except Exception as e:
+            retry = [pending for pending in batch if pending['attempts'] + 1 < self.max_attempts]
+            for pending in retry:
+                pending['attempts'] += 1
+            with self._lock:
+                self._pending[:0] = retry
+                self._stats['failed'] += 1
+                self._stats['dropped'] += len(batch) - len(retry)
+            logger.warning(f"No se pudieron escribir {len(batch)} logs de escaneo: {e}")
+            return 0
+        with self._lock:
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['last_batch_size'] = len(batch)
+        return len(batch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'pending': len(self._pending), 'running': self._started}
+
+
+_index = OpenTicketIndex()
+_writer = ScanLogWriter()
+_scan_latency = LatencyWindow(1000)
+
+
+def get_open_ticket_index() -> OpenTicketIndex:
+    """Índice de tickets pendientes (uno por proceso)"""
+    return _index
+
+
+def get_scan_log_writer() -> ScanLogWriter:
+    """Escritor de logs de escaneo (uno por proceso)"""
+    return _writer
+
+
+def record_scan_latency(seconds: float) -> None:
+    _scan_latency.record(seconds)
+
+
+def get_scan_stats() -> Dict[str, Any]:
+    """Latencia de escaneo (ms), índice y escritor de logs"""
+    return {
+        'scan_latency_ms': _scan_latency.summary(unit='ms'),
+        'index': _index.get_stats(),
+        'log_writer': _writer.get_stats()
+    }
+
+
+# ----------------------------------------------------------------------
+# Mantención del índice: tickets creados / entregas / jornadas
+# ----------------------------------------------------------------------
+def _ticket_models():
+    from app.models.ticket_entrega_models import TicketEntrega, TicketEntregaItem
+    from app.models.jornada_models import Jornada
+    return (TicketEntrega, TicketEntregaItem, Jornada)
+
+
+def _ticket_change(obj, kind: str, changed) -> Optional[tuple]:
+    """('ticket', id) o ('jornada', id, cerrada)"""
+    from app.models.ticket_entrega_models import TicketEntrega, TicketEntregaItem
+    if isinstance(obj, TicketEntrega):
+        return ('ticket', obj.id) if obj.id is not None else None
+    if isinstance(obj, TicketEntregaItem):
+        return ('ticket', obj.ticket_id) if obj.ticket_id is not None else None
+    return ('jornada', obj.id, obj.estado_apertura != 'abierto')
+
+
+def _refresh_ticket_index(changes: List[tuple]) -> None:
+    ticket_ids = {change[1] for change in changes if change[0] == 'ticket'}
+    jornadas = [change for change in changes if change[0] == 'jornada']
+    if jornadas:
+        _index.invalidate_shifts()
+        for _, jornada_id, closed in jornadas:
+            if closed:
+                _index.evict_jornada(jornada_id)
+    if not ticket_ids:
+        return
+    for ticket_id in ticket_ids:
+        OpenTicketIndex.bump_version(ticket_id)
+    _index.evict(ticket_ids)
+
+    from flask import current_app
+    from app import socketio
+    app = current_app._get_current_object()
+
+    def task():
+        with app.app_context():
+            try:
+                _index.reload(ticket_ids)
+            except Exception as e:
+                logger.warning(f"No se pudo recargar tickets en el índice de escaneo: {e}")
+            finally:
+                from app.models import db
+                db.session.remove()
+
+    socketio.start_background_task(task)
+
+
+watch('ticket_scan_index', models=_ticket_models, apply=_refresh_ticket_index, collect=_ticket_change)
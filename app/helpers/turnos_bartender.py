@@ -2,9 +2,11 @@
 Helper para gestión de turnos de bartenders
 Lógica de apertura y cierre de turnos con control de stock
 """
+from collections import defaultdict
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from flask import current_app
+from sqlalchemy import and_
 from app.models import db
 from app.models.bartender_turno_models import (
     BartenderTurno, TurnoStockInicial, TurnoStockFinal
@@ -152,9 +154,20 @@ class TurnosBartenderHelper:
             if stock_inicial_count == 0:
                 return False, "No se puede cerrar un turno sin stock inicial registrado", None
             
-            # Registrar stock final
+            # Registrar stock final (insumos, costos y registros existentes en una consulta cada uno)
             valor_total_final = Decimal('0.0')
             
+            insumo_ids = {item.get('insumo_id') for item in stock_final if item.get('insumo_id')}
+            costos = {}
+            if insumo_ids:
+                costos = {
+                    insumo_id: Decimal(str(costo)) if costo else Decimal('0.0')
+                    for insumo_id, costo in db.session.query(Ingredient.id, Ingredient.cost_per_unit).filter(
+                        Ingredient.id.in_(insumo_ids)
+                    ).all()
+                }
+            finales = {s.insumo_id: s for s in TurnoStockFinal.query.filter_by(turno_id=turno_id).all()}
+            
             for item in stock_final:
                 insumo_id = item.get('insumo_id')
                 cantidad = Decimal(str(item.get('cantidad', 0)))
@@ -162,22 +175,18 @@ class TurnosBartenderHelper:
                 if not insumo_id:
                     continue
                 
-                # Obtener insumo
-                insumo = Ingredient.query.get(insumo_id)
-                if not insumo:
+                # Verificar insumo
+                if insumo_id not in costos:
                     current_app.logger.warning(f"Insumo {insumo_id} no encontrado, saltando...")
                     continue
                 
-                # Obtener costo unitario actual
-                costo_unitario = self._get_costo_unitario_actual(insumo_id, turno.ubicacion)
+                # Costo unitario actual
+                costo_unitario = costos[insumo_id]
                 valor_costo = cantidad * costo_unitario
                 valor_total_final += valor_costo
                 
                 # Crear o actualizar registro de stock final
-                stock_final_reg = TurnoStockFinal.query.filter_by(
-                    turno_id=turno_id,
-                    insumo_id=insumo_id
-                ).first()
+                stock_final_reg = finales.get(insumo_id)
                 
                 if stock_final_reg:
                     stock_final_reg.cantidad_final = cantidad
@@ -190,6 +199,7 @@ class TurnosBartenderHelper:
                         valor_costo_final=valor_costo
                     )
                     db.session.add(stock_final_reg)
+                    finales[insumo_id] = stock_final_reg
             
             # Actualizar turno
             turno.fecha_hora_cierre = datetime.utcnow()
@@ -428,6 +438,10 @@ class TurnosBartenderHelper:
         Calcula y guarda el resumen financiero completo del turno.
         Esta función debe llamarse al cerrar el turno.
         
+        Stock, entregas, movimientos, mermas, recetas y costos se cargan en
+        bloque (DatosCierreTurno) y se cruzan por insumo: la cantidad de
+        consultas no crece con la cantidad de insumos ni de entregas.
+        
         Args:
             turno: BartenderTurno a calcular
             
@@ -435,36 +449,16 @@ class TurnosBartenderHelper:
             Tuple[bool, str]: (éxito, mensaje)
         """
         try:
-            from app.helpers.inventario_turno import get_inventario_turno_helper
-            from app.helpers.alertas_turno import get_alertas_turno_helper
-            from app.models.bartender_turno_models import (
-                TurnoStockInicial, TurnoStockFinal, MermaInventario,
-                TurnoDesviacionInventario, AlertaFugaTurno
-            )
-            from app.models.sale_delivery_models import DeliveryItem
+            from app.helpers.inventario_turno import DatosCierreTurno
+            from app.models.bartender_turno_models import AlertaFugaTurno
             from app.models.inventory_stock_models import InventoryMovement
-            from app.models.pos_models import PosSale, PosSaleItem
-            from app.models.product_models import Product
-            
-            inventario_helper = get_inventario_turno_helper()
             
-            # 1. Calcular valor_inicial_barra_costo
-            stock_inicial_list = TurnoStockInicial.query.filter_by(turno_id=turno.id).all()
-            valor_inicial = Decimal('0.0')
-            for stock in stock_inicial_list:
-                if stock.valor_costo_inicial:
-                    valor_inicial += Decimal(str(stock.valor_costo_inicial))
+            datos = DatosCierreTurno(turno)
             
-            # 2. Calcular valor_final_barra_costo
-            stock_final_list = TurnoStockFinal.query.filter_by(turno_id=turno.id).all()
-            valor_final = Decimal('0.0')
-            for stock in stock_final_list:
-                if stock.valor_costo_final:
-                    valor_final += Decimal(str(stock.valor_costo_final))
+            # 1-2. Calcular valor_inicial_barra_costo y valor_final_barra_costo
+            valor_inicial, valor_final = datos.valores_stock()
             
             # 3. Calcular valor_vendido_venta (precio de venta de productos entregados)
-            valor_vendido_venta = Decimal('0.0')
-            
             # Mapear ubicación del turno a formato de DeliveryItem
             # Los turnos usan: "barra_pista" o "barra_terraza"
             # DeliveryItem usa: "Barra Pista" o "Terraza"
@@ -476,180 +470,74 @@ class TurnosBartenderHelper:
                 # Fallback: intentar convertir
                 ubicacion_delivery = turno.ubicacion.replace('barra_', 'Barra ').title()
             
-            entregas = DeliveryItem.query.filter(
-                DeliveryItem.location == ubicacion_delivery,
-                DeliveryItem.delivered_at >= turno.fecha_hora_apertura,
-                DeliveryItem.delivered_at <= (turno.fecha_hora_cierre or datetime.utcnow())
-            ).all()
+            entregas = datos.entregas(ubicacion_delivery)
             
             current_app.logger.info(f"📦 Encontradas {len(entregas)} entregas para turno {turno.id} en {ubicacion_delivery}")
             
-            for entrega in entregas:
-                # Buscar venta asociada
-                sale = PosSale.query.filter_by(sale_id_phppos=entrega.sale_id).first()
-                if not sale:
-                    # Intentar buscar por ID local si sale_id tiene formato BMB
-                    try:
-                        if entrega.sale_id.startswith('BMB-'):
-                            parts = entrega.sale_id.split('-')
-                            if len(parts) >= 3:
-                                local_id = int(parts[-1])
-                                sale = PosSale.query.get(local_id)
-                    except:
-                        pass
-                
-                if sale:
-                    # Buscar item en la venta
-                    item = PosSaleItem.query.filter_by(
-                        sale_id=sale.id,
-                        product_name=entrega.product_name
-                    ).first()
-                    
-                    if item:
-                        precio_unitario = Decimal(str(item.unit_price))
-                        cantidad = Decimal(str(entrega.quantity_delivered))
-                        valor_vendido_venta += precio_unitario * cantidad
+            # Venta asociada por sale_id_phppos o, si tiene formato BMB, por ID local
+            valor_vendido_venta = datos.valor_vendido_venta(ubicacion_delivery, ids_locales=True)
             
             # 4. Calcular valor_vendido_costo (costo de insumos usados en productos entregados)
             valor_vendido_costo = Decimal('0.0')
-            
-            # Método 1: Buscar movimientos de inventario asociados al turno
-            movimientos_consumo = InventoryMovement.query.filter(
-                InventoryMovement.turno_id == turno.id,
+            salida_venta = and_(
                 InventoryMovement.movement_type == InventoryMovement.TYPE_SALE,
                 InventoryMovement.quantity < 0
-            ).all()
+            )
             
-            current_app.logger.info(f"📊 Método 1: Encontrados {len(movimientos_consumo)} movimientos con turno_id={turno.id}")
+            # Método 1: Movimientos de inventario asociados al turno
+            consumo_turno = self._consumo_movimientos(InventoryMovement.turno_id == turno.id, salida_venta)
+            
+            current_app.logger.info(f"📊 Método 1: {len(consumo_turno)} insumos con movimientos con turno_id={turno.id}")
             
             # Método 2: Si no hay movimientos con turno_id, calcular desde entregas y recetas
-            if len(movimientos_consumo) == 0 and entregas:
+            if not consumo_turno and entregas:
                 current_app.logger.info(f"📊 Método 2: Calculando costo desde entregas y recetas de BD")
-                
-                from app.models.inventory_stock_models import Recipe, RecipeIngredient
-                from app.models.product_models import Product
-                
-                for entrega in entregas:
-                    # Buscar producto
-                    producto = Product.query.filter_by(name=entrega.product_name).first()
-                    if not producto:
-                        continue
-                    
-                    # Buscar receta del producto
-                    receta = Recipe.query.filter_by(product_id=producto.id, is_active=True).first()
-                    if not receta:
-                        continue
-                    
-                    # Obtener ingredientes de la receta
-                    ingredientes_receta = RecipeIngredient.query.filter_by(recipe_id=receta.id).all()
-                    
-                    cantidad_productos = Decimal(str(entrega.quantity_delivered))
-                    
-                    for rec_ing in ingredientes_receta:
-                        ingrediente = rec_ing.ingredient
-                        if ingrediente:
-                            cantidad_por_porcion = Decimal(str(rec_ing.quantity_per_portion))
-                            cantidad_total = cantidad_por_porcion * cantidad_productos
-                            costo_unitario = self._get_costo_unitario_actual(ingrediente.id, turno.ubicacion)
-                            costo_item = cantidad_total * costo_unitario
-                            valor_vendido_costo += costo_item
-                            
-                            current_app.logger.info(
-                                f"  - {ingrediente.name}: "
-                                f"{float(cantidad_total):.2f} × ${float(costo_unitario):.2f} = ${float(costo_item):.2f} "
-                                f"(para {float(cantidad_productos)}x {entrega.product_name})"
-                            )
+                valor_vendido_costo += self._costo_por_recetas(datos, entregas)
             
             # Método 3: Buscar movimientos por referencia de entregas (fallback)
             if valor_vendido_costo == 0 and entregas:
-                sale_ids = [e.sale_id for e in entregas]
-                movimientos_por_referencia = InventoryMovement.query.filter(
+                por_referencia = and_(
                     InventoryMovement.reference_type == 'delivery',
-                    InventoryMovement.reference_id.in_(sale_ids),
-                    InventoryMovement.movement_type == InventoryMovement.TYPE_SALE,
-                    InventoryMovement.quantity < 0
-                ).all()
-                
-                current_app.logger.info(f"📊 Método 3: Encontrados {len(movimientos_por_referencia)} movimientos por referencia")
+                    InventoryMovement.reference_id.in_({e.sale_id for e in entregas}),
+                    salida_venta
+                )
+                consumo_referencia = self._consumo_movimientos(por_referencia)
                 
-                for mov in movimientos_por_referencia:
-                    if mov.turno_id is None:
-                        mov.turno_id = turno.id
-                    cantidad_abs = abs(Decimal(str(mov.quantity)))
-                    costo_unitario = self._get_costo_unitario_actual(mov.ingredient_id, turno.ubicacion)
-                    costo_item = cantidad_abs * costo_unitario
-                    valor_vendido_costo += costo_item
+                current_app.logger.info(f"📊 Método 3: {len(consumo_referencia)} insumos con movimientos por referencia")
                 
-                if movimientos_por_referencia:
-                    db.session.commit()
+                if consumo_referencia:
+                    self._asociar_movimientos(turno, por_referencia)
+                    valor_vendido_costo += self._costo_consumo(datos, consumo_referencia)
             
             # Si no hay movimientos con turno_id, buscar por fecha y ubicación
-            if len(movimientos_consumo) == 0:
+            if not consumo_turno:
                 current_app.logger.warning(f"⚠️  No se encontraron movimientos con turno_id={turno.id}, buscando por fecha/ubicación")
                 
-                # Buscar movimientos por fecha y ubicación (sin filtro de turno_id)
-                movimientos_por_fecha = InventoryMovement.query.filter(
+                por_fecha = and_(
                     InventoryMovement.location == ubicacion_delivery,
-                    InventoryMovement.movement_type == InventoryMovement.TYPE_SALE,
-                    InventoryMovement.quantity < 0,
+                    salida_venta,
                     InventoryMovement.created_at >= turno.fecha_hora_apertura,
-                    InventoryMovement.created_at <= (turno.fecha_hora_cierre or datetime.utcnow())
-                ).all()
-                
-                current_app.logger.info(f"📊 Encontrados {len(movimientos_por_fecha)} movimientos por fecha/ubicación")
-                
-                # Asociar con turno y sumar costos
-                for mov in movimientos_por_fecha:
-                    cantidad_abs = abs(Decimal(str(mov.quantity)))
-                    costo_unitario = self._get_costo_unitario_actual(mov.ingredient_id, turno.ubicacion)
-                    costo_item = cantidad_abs * costo_unitario
-                    valor_vendido_costo += costo_item
-                    
-                    # Asociar con turno para futuras consultas
-                    if mov.turno_id is None:
-                        mov.turno_id = turno.id
-                    
-                    ingrediente = Ingredient.query.get(mov.ingredient_id)
-                    current_app.logger.info(
-                        f"  - {ingrediente.name if ingrediente else 'Desconocido'}: "
-                        f"{float(cantidad_abs):.2f} × ${float(costo_unitario):.2f} = ${float(costo_item):.2f}"
-                    )
+                    InventoryMovement.created_at <= datos.hasta
+                )
+                consumo_fecha = self._consumo_movimientos(por_fecha)
                 
-                # Usar movimientos_por_fecha como lista principal
-                movimientos_consumo = movimientos_por_fecha
+                current_app.logger.info(f"📊 {len(consumo_fecha)} insumos con movimientos por fecha/ubicación")
                 
-                # Commit para guardar los turno_id actualizados
-                db.session.commit()
+                # Asociar con turno para futuras consultas y sumar costos
+                if consumo_fecha:
+                    self._asociar_movimientos(turno, por_fecha)
+                valor_vendido_costo += self._costo_consumo(datos, consumo_fecha)
             else:
                 # Procesar movimientos con turno_id
-                for mov in movimientos_consumo:
-                    cantidad_abs = abs(Decimal(str(mov.quantity)))
-                    costo_unitario = self._get_costo_unitario_actual(mov.ingredient_id, turno.ubicacion)
-                    costo_item = cantidad_abs * costo_unitario
-                    valor_vendido_costo += costo_item
-                    
-                    ingrediente = Ingredient.query.get(mov.ingredient_id)
-                    current_app.logger.info(
-                        f"  - {ingrediente.name if ingrediente else 'Desconocido'}: "
-                        f"{float(cantidad_abs):.2f} × ${float(costo_unitario):.2f} = ${float(costo_item):.2f}"
-                    )
+                valor_vendido_costo += self._costo_consumo(datos, consumo_turno)
             
             current_app.logger.info(f"💰 valor_vendido_costo calculado: ${float(valor_vendido_costo):,.2f}")
             
             # 5. Calcular valor_merma_costo
-            mermas = MermaInventario.query.filter_by(turno_id=turno.id).all()
-            valor_merma = Decimal('0.0')
-            for merma in mermas:
-                if merma.costo_merma:
-                    valor_merma += Decimal(str(merma.costo_merma))
+            valor_merma = datos.mermas[1]
             
             # 6. Calcular valor_perdida_no_justificada_costo (desviaciones negativas)
-            desviaciones = TurnoDesviacionInventario.query.filter_by(turno_id=turno.id).all()
-            valor_perdida_no_justificada = Decimal('0.0')
-            for desviacion in desviaciones:
-                if desviacion.diferencia_turno < 0:  # Solo pérdidas
-                    costo_diff = abs(Decimal(str(desviacion.costo_diferencia)))
-                    valor_perdida_no_justificada += costo_diff
+            valor_perdida_no_justificada = datos.valor_perdida_no_justificada()
             
             # 7. Determinar flag_fuga_critica
             alertas_criticas = AlertaFugaTurno.query.filter_by(
@@ -683,6 +571,78 @@ class TurnosBartenderHelper:
             current_app.logger.error(f"Error al calcular resumen del turno: {e}", exc_info=True)
             return False, f"Error al calcular resumen: {str(e)}"
     
+    def _consumo_movimientos(self, *filtros) -> Dict[int, Decimal]:
+        """Cantidad consumida (valor absoluto) por insumo de los movimientos que cumplen los filtros"""
+        from app.models.inventory_stock_models import InventoryMovement
+        
+        consumo = defaultdict(Decimal)
+        for insumo_id, cantidad in db.session.query(
+            InventoryMovement.ingredient_id,
+            InventoryMovement.quantity
+        ).filter(*filtros).all():
+            consumo[insumo_id] += abs(Decimal(str(cantidad)))
+        return dict(consumo)
+    
+    def _asociar_movimientos(self, turno: BartenderTurno, filtro) -> None:
+        """Asigna el turno a los movimientos sin turno (un UPDATE)"""
+        from app.models.inventory_stock_models import InventoryMovement
+        
+        InventoryMovement.query.filter(filtro, InventoryMovement.turno_id.is_(None)).update(
+            {InventoryMovement.turno_id: turno.id}, synchronize_session=False
+        )
+    
+    def _costo_consumo(self, datos, consumo: Dict[int, Decimal]) -> Decimal:
+        """Costo de un consumo por insumo con el costo unitario actual"""
+        costos = datos.cargar_costos(consumo.keys())
+        valor = Decimal('0.0')
+        for insumo_id, cantidad in consumo.items():
+            costo_item = cantidad * costos[insumo_id]
+            valor += costo_item
+            current_app.logger.debug(
+                f"  - Insumo {insumo_id}: {float(cantidad):.2f} × ${float(costos[insumo_id]):.2f} = ${float(costo_item):.2f}"
+            )
+        return valor
+    
+    def _costo_por_recetas(self, datos, entregas) -> Decimal:
+        """Costo de las entregas según las recetas activas de sus productos"""
+        from app.models.inventory_stock_models import Recipe, RecipeIngredient
+        from app.models.product_models import Product
+        
+        productos = dict(db.session.query(Product.name, Product.id).filter(
+            Product.name.in_({e.product_name for e in entregas})
+        ).all())
+        if not productos:
+            return Decimal('0.0')
+        
+        recetas = dict(db.session.query(Recipe.product_id, Recipe.id).filter(
+            Recipe.product_id.in_(set(productos.values())),
+            Recipe.is_active == True
+        ).all())
+        if not recetas:
+            return Decimal('0.0')
+        
+        ingredientes_receta = defaultdict(list)
+        for recipe_id, ingredient_id, cantidad_por_porcion in db.session.query(
+            RecipeIngredient.recipe_id,
+            RecipeIngredient.ingredient_id,
+            RecipeIngredient.quantity_per_portion
+        ).filter(RecipeIngredient.recipe_id.in_(set(recetas.values()))).order_by(RecipeIngredient.id).all():
+            ingredientes_receta[recipe_id].append((ingredient_id, Decimal(str(cantidad_por_porcion))))
+        
+        costos = datos.cargar_costos(
+            ingredient_id for items in ingredientes_receta.values() for ingredient_id, _ in items
+        )
+        
+        valor = Decimal('0.0')
+        for entrega in entregas:
+            receta_id = recetas.get(productos.get(entrega.product_name))
+            if not receta_id:
+                continue
+            cantidad_productos = Decimal(str(entrega.quantity_delivered))
+            for ingredient_id, cantidad_por_porcion in ingredientes_receta[receta_id]:
+                valor += cantidad_por_porcion * cantidad_productos * costos[ingredient_id]
+        return valor
+    
     def get_estadisticas_bartender(
         self,
         bartender_id: str,
@@ -0,0 +1,412 @@
+"""
+Outbox persistente y dispatcher de webhooks salientes (n8n)
+
+- enqueue(): guarda el evento en la tabla webhook_outbox (no abre threads)
+- Un pool fijo de workers reclama lotes de forma atómica, agrupados por
+  workflow. Por defecto cada evento va en su propio POST (mismo payload y
+  event_type que el envío directo); solo los workflows que lo aceptan
+  (n8n_batch_workflows) reciben un POST por lote, con eventos de un único
+  event_type en un sobre {'event_type': 'batch', 'batch_event_type', 'events'}
+- Backoff por endpoint: si un endpoint falla, no se le envía nada hasta que
+  pase su ventana de espera; los eventos se reprograman con next_attempt_at
+- Los eventos pendientes sobreviven a reinicios y se envían al volver a levantar
+"""
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import requests
+from sqlalchemy import select, update, delete, func, and_
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+
+class WebhookDispatcher:
+    """Pool fijo de workers que drena la tabla webhook_outbox"""
+
+    MAX_BACKOFF_SECONDS = 300
+    MAINTENANCE_INTERVAL = 60
+    SENT_RETENTION = timedelta(hours=24)
+    DEAD_RETENTION = timedelta(days=7)
+
+    def __init__(self, workers: int = 2, batch_size: int = 20, poll_interval: float = 2.0,
+                 max_attempts: int = 8, lock_timeout: int = 60, timeout: int = 5):
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lock_timeout = lock_timeout
+        self.timeout = timeout
+        self._app = None
+        self._started = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._endpoint_backoff: Dict[str, Tuple[int, float]] = {}  # url -> (fallos, bloqueado_hasta)
+        self._last_maintenance = 0.0
+        self._stats = {
+            'enqueued': 0,
+            'enqueue_failed': 0,
+            'batches_sent': 0,
+            'events_sent': 0,
+            'retries_scheduled': 0,
+            'dropped': 0,
+            'last_batch_size': 0,
+        }
+
+    @property
+    def _table(self):
+        from app.models.webhook_outbox_models import WebhookOutbox
+        return WebhookOutbox.__table__
+
+    @staticmethod
+    def _engine():
+        from app.models import db
+        return db.engine
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def start(self, app) -> None:
+        """Inicia el pool de workers (una vez por proceso)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._app = app
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(index,), daemon=True,
+                                      name=f'webhook-dispatcher-{index}')
+            thread.start()
+        logger.info(f"✅ Dispatcher de webhooks iniciado ({self.workers} workers, lotes de {self.batch_size})")
+
+    def _incr(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    # ------------------------------------------------------------------
+    # Encolado
+    # ------------------------------------------------------------------
+    def enqueue(self, event_type: str, data: Dict[str, Any], workflow_id: Optional[str] = None) -> bool:
+        """
+        Guarda un evento en el outbox y despierta a un worker.
+
+        Usa una conexión propia: no toca (ni hace commit de) la sesión del request.
+        """
+        payload = {
+            'event_type': event_type,
+            'timestamp': datetime.utcnow().isoformat(),
+            'data': data
+        }
+        try:
+            now = datetime.utcnow()
+            with self._engine().begin() as conn:
+                conn.execute(self._table.insert().values(
+                    event_type=event_type,
+                    workflow_id=workflow_id,
+                    payload=json.dumps(payload, default=str),
+                    status=STATUS_PENDING,
+                    attempts=0,
+                    next_attempt_at=now,
+                    created_at=now
+                ))
+        except Exception as e:
+            self._incr('enqueue_failed')
+            self._incr('dropped')
+            logger.error(f"No se pudo encolar evento para n8n ({event_type}): {e}")
+            return False
+
+        self._incr('enqueued')
+        self._wake.set()
+        return True
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    def _run(self, index: int) -> None:
+        while True:
+            try:
+                with self._app.app_context():
+                    if index == 0:
+                        self._maybe_run_maintenance()
+                    claimed = self._claim_batch()
+                    if claimed:
+                        self._dispatch(*claimed)
+                        continue
+            except Exception as e:
+                logger.error(f"Error en dispatcher de webhooks: {e}")
+                time.sleep(self.poll_interval)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _endpoint_ready(self, url: str) -> bool:
+        with self._lock:
+            _, blocked_until = self._endpoint_backoff.get(url, (0, 0.0))
+        return time.time() >= blocked_until
+
+    def _claim_batch(self) -> Optional[Tuple[Optional[str], List[Any]]]:
+        """
+        Reclama atómicamente el próximo lote listo de un mismo workflow (y del
+        mismo event_type si el workflow recibe lotes).
+
+        Returns:
+            (workflow_id, filas) o None si no hay nada listo
+        """
+        from app.helpers.n8n_client import get_n8n_config, build_webhook_url, batching_enabled
+
+        config = get_n8n_config()
+        base_url = config.get('webhook_url')
+        if not base_url:
+            return None
+
+        table = self._table
+        now = datetime.utcnow()
+        with self._engine().begin() as conn:
+            candidates = conn.execute(
+                select(table.c.id, table.c.workflow_id, table.c.event_type)
+                .where(and_(table.c.status == STATUS_PENDING, table.c.next_attempt_at <= now))
+                .order_by(table.c.id)
+                .limit(self.batch_size * 4)
+            ).fetchall()
+        if not candidates:
+            return None
+
+        # Primer workflow (por antigüedad) cuyo endpoint no esté en backoff
+        groups: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+        for row in candidates:
+            event_type = row.event_type if batching_enabled(config, row.workflow_id) else None
+            groups.setdefault((row.workflow_id, event_type), []).append(row.id)
+        for (workflow_id, _), ids in groups.items():
+            if not self._endpoint_ready(build_webhook_url(base_url, workflow_id)):
+                continue
+            token = uuid.uuid4().hex
+            with self._engine().begin() as conn:
+                conn.execute(
+                    update(table)
+                    .where(and_(table.c.id.in_(ids[:self.batch_size]), table.c.status == STATUS_PENDING))
+                    .values(status=STATUS_SENDING, locked_by=token,
+                            locked_until=now + timedelta(seconds=self.lock_timeout))
+                )
+                rows = conn.execute(
+                    select(table).where(table.c.locked_by == token).order_by(table.c.id)
+                ).fetchall()
+            if rows:
+                return workflow_id, rows
+        return None
+
+    def _dispatch(self, workflow_id: Optional[str], rows: List[Any]) -> None:
+        """Envía las filas reclamadas (un POST por evento, o uno por lote si el workflow lo acepta)"""
+        from app.helpers.n8n_client import get_n8n_config, build_webhook_url, batching_enabled
+
+        config = get_n8n_config()
+        url = build_webhook_url(config.get('webhook_url'), workflow_id)
+        if len(rows) > 1 and batching_enabled(config, workflow_id):
+            body = {
+                'event_type': 'batch',
+                'batch_event_type': rows[0].event_type,
+                'timestamp': datetime.utcnow().isoformat(),
+                'count': len(rows),
+                'events': [json.loads(row.payload) for row in rows]
+            }
+            self._deliver(config, url, workflow_id, rows, body)
+            return
+
+        # Eventos individuales por la misma conexión keep-alive; si uno falla, el
+        # endpoint entra en espera y el resto vuelve a pendientes sin gastar intento
+        for index, row in enumerate(rows):
+            if not self._deliver(config, url, workflow_id, [row], json.loads(row.payload)):
+                self._release(rows[index + 1:])
+                return
+
+    def _deliver(self, config: Dict[str, Any], url: str, workflow_id: Optional[str],
+                 rows: List[Any], body: Dict[str, Any]) -> bool:
+        """Un POST con body; actualiza el estado de sus filas. True si se envió"""
+        from app.helpers.n8n_client import build_webhook_headers, _update_metrics
+        from app.infrastructure.external.http_client import get_http_client
+
+        error_type, error_msg, retryable = None, None, True
+        try:
+            # Cliente compartido (pool keep-alive por host); los reintentos los
+            # programa el outbox con next_attempt_at, no el cliente
+            response = get_http_client().post(url, json=body, headers=build_webhook_headers(config),
+                                              timeout=self.timeout, retries=0)
+            response.raise_for_status()
+        except requests.exceptions.Timeout as e:
+            error_type, error_msg = 'timeout', str(e)
+        except requests.exceptions.RequestException as e:
+            status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status_code is not None and 400 <= status_code < 500:
+                # Errores 4xx: no reintentar
+                error_type, error_msg, retryable = 'client_error', str(e), False
+            else:
+                error_type, error_msg = 'server_error', str(e)
+        except Exception as e:
+            error_type, error_msg = 'unexpected_error', str(e)
+
+        for _ in rows:
+            _update_metrics(error_type is None, error_type, error_msg)
+
+        if error_type is None:
+            self._mark_sent(rows)
+            with self._lock:
+                self._endpoint_backoff.pop(url, None)
+                self._stats['batches_sent'] += 1
+                self._stats['events_sent'] += len(rows)
+                self._stats['last_batch_size'] = len(rows)
+            logger.info(f"Enviado a n8n: {len(rows)} evento(s) (workflow: {workflow_id or 'default'})")
+            return True
+
+        with self._lock:
+            failures, _ = self._endpoint_backoff.get(url, (0, 0.0))
+            failures += 1
+            wait = min(2 ** failures, self.MAX_BACKOFF_SECONDS)
+            self._endpoint_backoff[url] = (failures, time.time() + wait)
+        logger.warning(f"Error enviando a n8n ({error_type}), endpoint en espera {wait}s: {error_msg}")
+        self._mark_failed(rows, error_msg, retryable)
+        return False
+
+    def _release(self, rows: List[Any]) -> None:
+        """Devuelve filas reclamadas y no enviadas a pendientes (sin contar intento)"""
+        if not rows:
+            return
+        table = self._table
+        with self._engine().begin() as conn:
+            conn.execute(
+                update(table).where(table.c.id.in_([row.id for row in rows]))
+                .values(status=STATUS_PENDING, locked_by=None, locked_until=None)
+            )
+
+    def _mark_sent(self, rows: List[Any]) -> None:
+        table = self._table
+        with self._engine().begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.c.id.in_([row.id for row in rows]))
+                .values(status=STATUS_SENT, sent_at=datetime.utcnow(), attempts=table.c.attempts + 1,
+                        locked_by=None, locked_until=None, last_error=None)
+            )
+
+    def _mark_failed(self, rows: List[Any], error_msg: Optional[str], retryable: bool) -> None:
+        table = self._table
+        now = datetime.utcnow()
+        error_msg = (error_msg or '')[:500]
+        dead_ids, retry = [], {}
+        for row in rows:
+            attempts = (row.attempts or 0) + 1
+            if not retryable or attempts >= self.max_attempts:
+                dead_ids.append(row.id)
+            else:
+                delay = min(2 ** attempts, self.MAX_BACKOFF_SECONDS)
+                retry.setdefault((attempts, delay), []).append(row.id)
+
+        with self._engine().begin() as conn:
+            if dead_ids:
+                conn.execute(
+                    update(table).where(table.c.id.in_(dead_ids))
+                    .values(status=STATUS_DEAD, attempts=table.c.attempts + 1,
+                            locked_by=None, locked_until=None, last_error=error_msg)
+                )
+            for (attempts, delay), ids in retry.items():
+                conn.execute(
+                    update(table).where(table.c.id.in_(ids))
+                    .values(status=STATUS_PENDING, attempts=attempts,
+                            next_attempt_at=now + timedelta(seconds=delay),
+                            locked_by=None, locked_until=None, last_error=error_msg)
+                )
+
+        if dead_ids:
+            self._incr('dropped', len(dead_ids))
+            logger.error(f"{len(dead_ids)} evento(s) n8n descartados tras error: {error_msg}")
+        retried = sum(len(ids) for ids in retry.values())
+        if retried:
+            self._incr('retries_scheduled', retried)
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+    def _maybe_run_maintenance(self) -> None:
+        now_ts = time.time()
+        if now_ts - self._last_maintenance < self.MAINTENANCE_INTERVAL:
+            return
+        self._last_maintenance = now_ts
+
+        table = self._table
+        now = datetime.utcnow()
+        with self._engine().begin() as conn:
+            # Filas reclamadas por un worker que murió: volver a pendientes
+            recovered = conn.execute(
+                update(table)
+                .where(and_(table.c.status == STATUS_SENDING, table.c.locked_until < now))
+                .values(status=STATUS_PENDING, locked_by=None, locked_until=None)
+            ).rowcount
+            conn.execute(delete(table).where(and_(table.c.status == STATUS_SENT,
+                                                  table.c.sent_at < now - self.SENT_RETENTION)))
+            conn.execute(delete(table).where(and_(table.c.status == STATUS_DEAD,
+                                                  table.c.created_at < now - self.DEAD_RETENTION)))
+        if recovered:
+            logger.warning(f"Outbox n8n: {recovered} evento(s) recuperados de un envío interrumpido")
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        """Profundidad de cola, lag del evento más antiguo y contadores del proceso"""
+        with self._lock:
+            stats = dict(self._stats)
+            now_ts = time.time()
+            stats['endpoints_backing_off'] = sum(1 for _, until in self._endpoint_backoff.values() if until > now_ts)
+        stats['workers'] = self.workers if self._started else 0
+        stats['batch_size'] = self.batch_size
+
+        table = self._table
+        try:
+            with self._engine().connect() as conn:
+                counts = dict(conn.execute(
+                    select(table.c.status, func.count(table.c.id))
+                    .where(table.c.status.in_([STATUS_PENDING, STATUS_SENDING, STATUS_DEAD]))
+                    .group_by(table.c.status)
+                ).fetchall())
+                oldest = conn.execute(
+                    select(func.min(table.c.created_at)).where(table.c.status == STATUS_PENDING)
+                ).scalar()
+            stats['queue_depth'] = counts.get(STATUS_PENDING, 0)
+            stats['in_flight'] = counts.get(STATUS_SENDING, 0)
+            stats['dead'] = counts.get(STATUS_DEAD, 0)
+            stats['lag_seconds'] = round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0.0
+        except Exception as e:
+            logger.warning(f"No se pudo leer el estado del outbox n8n: {e}")
+        return stats
+
+
+_dispatcher: Optional[WebhookDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_webhook_dispatcher() -> WebhookDispatcher:
+    """Obtiene el dispatcher de webhooks (uno por proceso)"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = WebhookDispatcher(
+                    workers=int(os.environ.get('N8N_OUTBOX_WORKERS', '2')),
+                    batch_size=int(os.environ.get('N8N_OUTBOX_BATCH_SIZE', '20')),
+                    max_attempts=int(os.environ.get('N8N_OUTBOX_MAX_ATTEMPTS', '8'))
+                )
+    return _dispatcher
+
+
+def start_webhook_dispatcher(app) -> WebhookDispatcher:
+    """Inicia el dispatcher de webhooks para esta app"""
+    dispatcher = get_webhook_dispatcher()
+    dispatcher.start(app)
+    return dispatcher
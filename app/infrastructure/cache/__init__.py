@@ -0,0 +1,26 @@
+"""
+Sistema de Cache
+Capa única de cache con namespaces, TTL por clave, LRU y backends intercambiables
+"""
+from .cache_manager import (
+    CacheManager,
+    CacheNamespace,
+    CacheStats,
+    configure_cache,
+    get_cache_manager,
+    make_key,
+)
+from .storage import CacheStorage, MemoryCacheStorage, SQLiteCacheStorage, MISSING
+
+__all__ = [
+    'CacheManager',
+    'CacheNamespace',
+    'CacheStats',
+    'configure_cache',
+    'get_cache_manager',
+    'make_key',
+    'CacheStorage',
+    'MemoryCacheStorage',
+    'SQLiteCacheStorage',
+    'MISSING',
+]
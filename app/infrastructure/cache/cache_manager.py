@@ -0,0 +1,369 @@
+"""
+Cache Manager Principal
+Namespaces con TTL y límite LRU propios, recálculo single-flight y contadores
+de hits/misses/evictions.
+"""
+import os
+import threading
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from app.helpers.logger import get_logger
+from app.infrastructure.cache.storage import MISSING, CacheStorage, build_storage_factory
+
+logger = get_logger(__name__)
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 1000
+
+
+@dataclass
+class CacheStats:
+    """Contadores de un namespace"""
+    hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    expired_purged: int = 0
+    loads: int = 0
+    load_errors: int = 0
+    stale_served: int = 0
+    coalesced: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'sets': self.sets,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'expired_purged': self.expired_purged,
+            'loads': self.loads,
+            'load_errors': self.load_errors,
+            'stale_served': self.stale_served,
+            'coalesced': self.coalesced,
+        }
+
+
+@dataclass
+class CacheNamespace:
+    """Namespace de cache con su política y su storage"""
+    name: str
+    ttl: float
+    max_entries: int
+    storage: CacheStorage
+    stats: CacheStats = field(default_factory=CacheStats)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class _InFlight:
+    """Cálculo en curso para una clave (single-flight)"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = MISSING
+        self.error: Optional[BaseException] = None
+
+
+class CacheManager:
+    """
+    Capa única de cache de la aplicación.
+
+    - Cada namespace tiene TTL por defecto y tamaño máximo (LRU).
+    - Cada clave puede tener su propio TTL.
+    - get_or_load() asegura que, ante misses concurrentes de la misma clave,
+      solo un thread ejecute el loader; el resto espera su resultado.
+    - El storage es intercambiable (memoria del proceso o SQLite compartido).
+    """
+
+    def __init__(self, storage_factory: Optional[Callable[[str, int], CacheStorage]] = None,
+                 backend_name: str = 'memory'):
+        self._storage_factory = storage_factory or build_storage_factory('memory')
+        self.backend_name = backend_name
+        self._namespaces: Dict[str, CacheNamespace] = {}
+        self._registry_lock = threading.Lock()
+        self._inflight: Dict[tuple, _InFlight] = {}
+        self._inflight_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Namespaces
+    # ------------------------------------------------------------------
+    def register_namespace(self, name: str, ttl: Optional[float] = None,
+                           max_entries: Optional[int] = None) -> CacheNamespace:
+        """
+        Registra (o actualiza la política de) un namespace.
+
+        Args:
+            name: Nombre del namespace (ej: 'employees', 'sale_items')
+            ttl: TTL por defecto en segundos
+            max_entries: Máximo de entradas antes de desalojar por LRU
+        """
+        with self._registry_lock:
+            ns = self._namespaces.get(name)
+            if ns is None:
+                max_entries = max_entries or DEFAULT_MAX_ENTRIES
+                ns = CacheNamespace(
+                    name=name,
+                    ttl=ttl or DEFAULT_TTL,
+                    max_entries=max_entries,
+                    storage=self._storage_factory(name, max_entries)
+                )
+                self._namespaces[name] = ns
+            else:
+                if ttl:
+                    ns.ttl = ttl
+                if max_entries:
+                    ns.max_entries = max_entries
+                    ns.storage.max_entries = max(1, int(max_entries))
+            return ns
+
+    def namespace(self, name: str) -> CacheNamespace:
+        """Obtiene un namespace, registrándolo con valores por defecto si no existe"""
+        ns = self._namespaces.get(name)
+        if ns is None:
+            ns = self.register_namespace(name)
+        return ns
+
+    def namespaces(self) -> Dict[str, CacheNamespace]:
+        return dict(self._namespaces)
+
+    # ------------------------------------------------------------------
+    # Operaciones básicas
+    # ------------------------------------------------------------------
+    def get(self, namespace: str, key: str, default: Any = None, allow_expired: bool = False) -> Any:
+        """
+        Obtiene un valor vigente o `default`
+
+        Args:
+            allow_expired: Si es True, también retorna valores expirados que
+                aún no fueron purgados (útil como respaldo mientras se recalcula)
+        """
+        ns = self.namespace(namespace)
+        value = ns.storage.get(key, allow_expired=allow_expired)
+        with ns.lock:
+            if value is MISSING:
+                ns.stats.misses += 1
+            else:
+                ns.stats.hits += 1
+        return default if value is MISSING else value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Guarda un valor con TTL propio (o el del namespace)"""
+        ns = self.namespace(namespace)
+        evicted = ns.storage.set(key, value, ttl or ns.ttl)
+        with ns.lock:
+            ns.stats.sets += 1
+            ns.stats.evictions += evicted
+
+    def delete(self, namespace: str, key: str) -> bool:
+        ns = self.namespace(namespace)
+        removed = ns.storage.delete(key)
+        if removed:
+            with ns.lock:
+                ns.stats.invalidations += 1
+        return removed
+
+    def invalidate(self, namespace: Optional[str] = None,
+                   predicate: Optional[Callable[[str], bool]] = None) -> int:
+        """
+        Invalida entradas.
+
+        Args:
+            namespace: Namespace a invalidar (None = todos)
+            predicate: Si se entrega, solo invalida las claves que lo cumplan
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        targets = [self.namespace(namespace)] if namespace else list(self._namespaces.values())
+        total = 0
+        for ns in targets:
+            removed = ns.storage.delete_where(predicate) if predicate else ns.storage.clear()
+            with ns.lock:
+                ns.stats.invalidations += removed
+            total += removed
+        return total
+
+    def purge_expired(self) -> int:
+        """Elimina entradas expiradas de todos los namespaces"""
+        total = 0
+        for ns in list(self._namespaces.values()):
+            removed = ns.storage.purge_expired()
+            with ns.lock:
+                ns.stats.expired_purged += removed
+            total += removed
+        return total
+
+    # ------------------------------------------------------------------
+    # Single-flight
+    # ------------------------------------------------------------------
+    def get_or_load(self, namespace: str, key: str, loader: Callable[[], Any],
+                    ttl: Optional[float] = None, serve_stale_on_error: bool = False) -> Any:
+        """
+        Retorna el valor cacheado o lo calcula con `loader`.
+
+        Si varios threads piden la misma clave a la vez, solo uno ejecuta el
+        loader y los demás reciben el mismo resultado (o la misma excepción).
+
+        Args:
+            serve_stale_on_error: Si el loader falla y hay un valor expirado
+                aún en el storage, se retorna ese valor en vez de propagar el error
+        """
+        ns = self.namespace(namespace)
+        value = ns.storage.get(key)
+        if value is not MISSING:
+            with ns.lock:
+                ns.stats.hits += 1
+            return value
+
+        flight_key = (namespace, key)
+        with self._inflight_lock:
+            flight = self._inflight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = _InFlight()
+                self._inflight[flight_key] = flight
+
+        if not leader:
+            with ns.lock:
+                ns.stats.coalesced += 1
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        with ns.lock:
+            ns.stats.misses += 1
+            ns.stats.loads += 1
+        try:
+            try:
+                result = loader()
+            except Exception as e:
+                with ns.lock:
+                    ns.stats.load_errors += 1
+                if serve_stale_on_error:
+                    stale = ns.storage.get(key, allow_expired=True)
+                    if stale is not MISSING:
+                        with ns.lock:
+                            ns.stats.stale_served += 1
+                        logger.warning(f"Error recalculando {namespace}|{key}, usando cache antiguo: {e}")
+                        flight.value = stale
+                        return stale
+                flight.error = e
+                raise
+            self.set(namespace, key, result, ttl)
+            flight.value = result
+            return result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(flight_key, None)
+            flight.event.set()
+
+    def cached(self, namespace: str, ttl: Optional[float] = None,
+               key_func: Optional[Callable[..., str]] = None,
+               serve_stale_on_error: bool = False):
+        """
+        Decorador que cachea el resultado de una función en un namespace.
+
+        Args:
+            namespace: Namespace destino
+            ttl: TTL específico (None = TTL del namespace)
+            key_func: Genera la clave a partir de los argumentos
+            serve_stale_on_error: Ver get_or_load()
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                key = key_func(*args, **kwargs) if key_func else make_key(*args, **kwargs)
+                return self.get_or_load(
+                    namespace, key, lambda: func(*args, **kwargs),
+                    ttl=ttl, serve_stale_on_error=serve_stale_on_error
+                )
+            return wrapper
+        return decorator
+
+    # ------------------------------------------------------------------
+    # Estadísticas
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas por namespace y totales"""
+        by_namespace = {}
+        totals = CacheStats()
+        for name, ns in sorted(self._namespaces.items()):
+            total, valid, expired = ns.storage.summary()
+            with ns.lock:
+                counters = ns.stats.to_dict()
+                for attr in ('hits', 'misses', 'sets', 'evictions', 'invalidations',
+                             'expired_purged', 'loads', 'load_errors', 'stale_served', 'coalesced'):
+                    setattr(totals, attr, getattr(totals, attr) + getattr(ns.stats, attr))
+            by_namespace[name] = {
+                'count': total,
+                'valid': valid,
+                'expired': expired,
+                'ttl': ns.ttl,
+                'max_entries': ns.max_entries,
+                **counters
+            }
+        return {
+            'backend': self.backend_name,
+            'namespaces': by_namespace,
+            'totals': totals.to_dict(),
+        }
+
+    def reset_stats(self) -> None:
+        for ns in self._namespaces.values():
+            with ns.lock:
+                ns.stats = CacheStats()
+
+
+def make_key(*args, **kwargs) -> str:
+    """Genera una clave estable a partir de argumentos"""
+    parts = [str(arg) for arg in args]
+    parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
+    return "|".join(parts)
+
+
+# Instancia global (por proceso). El backend se elige por variables de entorno:
+#   CACHE_BACKEND=memory|sqlite  (default: memory)
+#   CACHE_SQLITE_PATH=/ruta/cache.sqlite3
+_cache_manager: Optional[CacheManager] = None
+_cache_manager_lock = threading.Lock()
+
+
+def _build_manager(backend: Optional[str] = None, path: Optional[str] = None) -> CacheManager:
+    backend = (backend or os.environ.get('CACHE_BACKEND', 'memory')).lower()
+    path = path or os.environ.get('CACHE_SQLITE_PATH')
+    try:
+        return CacheManager(build_storage_factory(backend, path), backend_name=backend)
+    except Exception as e:
+        logger.warning(f"No se pudo inicializar backend de cache '{backend}', usando memoria: {e}")
+        return CacheManager(build_storage_factory('memory'), backend_name='memory')
+
+
+def configure_cache(backend: Optional[str] = None, path: Optional[str] = None) -> CacheManager:
+    """
+    (Re)configura el cache global. Los namespaces ya registrados conservan
+    su política pero se recrean sobre el nuevo backend (vacíos).
+    """
+    global _cache_manager
+    new_manager = _build_manager(backend, path)
+    with _cache_manager_lock:
+        if _cache_manager is not None:
+            for name, ns in _cache_manager.namespaces().items():
+                new_manager.register_namespace(name, ns.ttl, ns.max_entries)
+        _cache_manager = new_manager
+    return new_manager
+
+
+def get_cache_manager() -> CacheManager:
+    """Obtiene el cache global, creándolo con la configuración de entorno"""
+    global _cache_manager
+    if _cache_manager is None:
+        with _cache_manager_lock:
+            if _cache_manager is None:
+                _cache_manager = _build_manager()
+    return _cache_manager
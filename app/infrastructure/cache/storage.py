@@ -0,0 +1,311 @@
+"""
+Storage para el sistema de Cache
+Backends intercambiables: memoria del proceso (LRU) o SQLite local compartido
+entre workers de gunicorn.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+from app.helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Centinela para distinguir "no está en cache" de un valor None cacheado
+MISSING = object()
+
+
+class CacheStorage:
+    """Interfaz para almacenamiento de un namespace de cache"""
+
+    def get(self, key: str, allow_expired: bool = False) -> Any:
+        """
+        Obtiene un valor del storage.
+
+        Args:
+            key: Clave dentro del namespace
+            allow_expired: Si es True, retorna el valor aunque haya expirado
+                (usado para servir datos antiguos cuando falla el recálculo)
+
+        Returns:
+            El valor o MISSING si no existe / expiró
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float) -> int:
+        """
+        Guarda un valor con su TTL propio.
+
+        Returns:
+            int: Número de entradas desalojadas por LRU para hacer espacio
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        """Elimina una clave. Retorna True si existía."""
+        raise NotImplementedError
+
+    def delete_where(self, predicate: Callable[[str], bool]) -> int:
+        """Elimina todas las claves que cumplan el predicado"""
+        raise NotImplementedError
+
+    def clear(self) -> int:
+        """Elimina todas las entradas del namespace"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Elimina las entradas expiradas. Retorna cuántas se eliminaron."""
+        raise NotImplementedError
+
+    def summary(self) -> Tuple[int, int, int]:
+        """Retorna (total, válidas, expiradas)"""
+        raise NotImplementedError
+
+    def items(self) -> Iterable[Tuple[str, Any, float]]:
+        """Itera (clave, valor, expires_at). Solo para estadísticas."""
+        raise NotImplementedError
+
+
+class MemoryCacheStorage(CacheStorage):
+    """
+    Almacenamiento en memoria con LRU acotado y TTL por clave.
+    Thread-safe (un lock por namespace).
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max(1, int(max_entries))
+        # Estructura: {key: (value, expires_at)} en orden de uso (LRU al inicio)
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, allow_expired: bool = False) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if not allow_expired and expires_at <= time.time():
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> int:
+        evicted = 0
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def delete_where(self, predicate: Callable[[str], bool]) -> int:
+        with self._lock:
+            keys_to_remove = [k for k in self._data if predicate(k)]
+            for key in keys_to_remove:
+                del self._data[key]
+        return len(keys_to_remove)
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+        return count
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            keys_to_remove = [k for k, (_, exp) in self._data.items() if exp <= now]
+            for key in keys_to_remove:
+                del self._data[key]
+        return len(keys_to_remove)
+
+    def summary(self) -> Tuple[int, int, int]:
+        now = time.time()
+        with self._lock:
+            total = len(self._data)
+            valid = sum(1 for _, exp in self._data.values() if exp > now)
+        return total, valid, total - valid
+
+    def items(self) -> Iterable[Tuple[str, Any, float]]:
+        with self._lock:
+            snapshot = [(k, v, exp) for k, (v, exp) in self._data.items()]
+        return snapshot
+
+
+class SQLiteCacheStorage(CacheStorage):
+    """
+    Almacenamiento en un archivo SQLite local (modo WAL) compartido por todos
+    los workers de la máquina. Las invalidaciones hechas por un worker son
+    visibles inmediatamente para los demás.
+
+    Los valores se serializan con pickle; los que no se pueden serializar
+    simplemente no se cachean.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache_entries (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value BLOB NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            PRIMARY KEY (namespace, key)
+        )
+    """
+
+    def __init__(self, path: str, namespace: str, max_entries: int = 1000):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max(1, int(max_entries))
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(self._SCHEMA)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_entries_lru "
+            "ON cache_entries (namespace, accessed_at)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # Una conexión por thread (sqlite3 no comparte conexiones entre threads)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, allow_expired: bool = False) -> Any:
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return MISSING
+            if not allow_expired and row[1] <= now:
+                return MISSING
+            conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+            return pickle.loads(row[0])
+        except Exception as e:
+            logger.warning(f"Error leyendo cache SQLite ({self.namespace}): {e}")
+            return MISSING
+
+    def set(self, key: str, value: Any, ttl: float) -> int:
+        now = time.time()
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f"Valor no serializable para cache {self.namespace}|{key}: {e}")
+            return 0
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, payload, now + ttl, now)
+                )
+                (count,) = conn.execute(
+                    "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+                ).fetchone()
+                evicted = 0
+                if count > self.max_entries:
+                    evicted = count - self.max_entries
+                    conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                        "SELECT key FROM cache_entries WHERE namespace = ? "
+                        "ORDER BY accessed_at ASC LIMIT ?)",
+                        (self.namespace, self.namespace, evicted)
+                    )
+                conn.execute("COMMIT")
+                return evicted
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            logger.warning(f"Error escribiendo cache SQLite ({self.namespace}): {e}")
+            return 0
+
+    def delete(self, key: str) -> bool:
+        cur = self._conn().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+        return cur.rowcount > 0
+
+    def delete_where(self, predicate: Callable[[str], bool]) -> int:
+        conn = self._conn()
+        keys = [row[0] for row in conn.execute(
+            "SELECT key FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        )]
+        keys_to_remove = [(self.namespace, k) for k in keys if predicate(k)]
+        if keys_to_remove:
+            conn.executemany(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", keys_to_remove
+            )
+        return len(keys_to_remove)
+
+    def clear(self) -> int:
+        cur = self._conn().execute(
+            "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        )
+        return cur.rowcount
+
+    def purge_expired(self) -> int:
+        cur = self._conn().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, time.time())
+        )
+        return cur.rowcount
+
+    def summary(self) -> Tuple[int, int, int]:
+        row = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(CASE WHEN expires_at > ? THEN 1 ELSE 0 END), 0) "
+            "FROM cache_entries WHERE namespace = ?",
+            (time.time(), self.namespace)
+        ).fetchone()
+        total, valid = row[0], row[1]
+        return total, valid, total - valid
+
+    def items(self) -> Iterable[Tuple[str, Any, float]]:
+        rows = self._conn().execute(
+            "SELECT key, value, expires_at FROM cache_entries WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchall()
+        # El valor se entrega serializado: solo se usa para estimar tamaño
+        return [(k, v, exp) for k, v, exp in rows]
+
+
+def build_storage_factory(backend: str = 'memory', path: Optional[str] = None) -> Callable[[str, int], CacheStorage]:
+    """
+    Crea la fábrica de storage según el backend configurado.
+
+    Args:
+        backend: 'memory' (por proceso) o 'sqlite' (compartido entre workers)
+        path: Ruta del archivo SQLite (solo backend 'sqlite')
+
+    Returns:
+        Callable(namespace, max_entries) -> CacheStorage
+    """
+    if backend == 'sqlite':
+        if not path:
+            path = os.path.join(os.getcwd(), 'instance', 'cache.sqlite3')
+        return lambda namespace, max_entries: SQLiteCacheStorage(path, namespace, max_entries)
+    return lambda namespace, max_entries: MemoryCacheStorage(max_entries)
@@ -34,6 +34,11 @@ class EventPublisher(ABC):
     def emit_survey_response_created(self, response_data: Dict[str, Any]) -> None:
         """Emitir evento cuando se crea una respuesta de encuesta"""
         pass
+    
+    @abstractmethod
+    def emit_survey_stats_update(self, stats_data: Dict[str, Any]) -> None:
+        """Emitir estadísticas actualizadas de la sesión de encuestas activa"""
+        pass
 
 
 class SocketIOEventPublisher(EventPublisher):
@@ -64,8 +69,8 @@ class SocketIOEventPublisher(EventPublisher):
             # Emitir actualización de stats
             self._emit_stats_update_for_delivery(delivery_data)
             
-            # Emitir actualización completa de métricas del dashboard
-            self._emit_dashboard_metrics_update()
+            # Marcar entregas para el próximo delta del dashboard
+            self._emit_dashboard_metrics_update('entregas')
         except Exception as e:
             current_app.logger.error(f"Error al emitir evento de entrega creada: {e}")
     
@@ -100,23 +105,16 @@ class SocketIOEventPublisher(EventPublisher):
                 namespace='/admin_stats'
             )
             
-            # También emitir actualización completa de métricas del dashboard
-            self._emit_dashboard_metrics_update()
+            # También marcar entregas para el próximo delta del dashboard
+            self._emit_dashboard_metrics_update('entregas')
         except Exception as e:
             current_app.logger.error(f"Error al emitir evento de actualización de stats: {e}")
     
-    def _emit_dashboard_metrics_update(self) -> None:
-        """Emitir actualización completa de métricas del dashboard"""
+    def _emit_dashboard_metrics_update(self, *sections: str) -> None:
+        """Marcar secciones del dashboard como modificadas (el publicador emite el delta)"""
         try:
-            from app.helpers.dashboard_metrics_service import get_metrics_service
-            metrics_service = get_metrics_service()
-            metrics = metrics_service.get_all_metrics(use_cache=False)
-            
-            self.socketio.emit(
-                'metrics_update',
-                {'metrics': metrics},
-                namespace='/admin_stats'
-            )
+            from app.helpers.metrics_publisher import get_metrics_publisher
+            get_metrics_publisher().mark_dirty(*sections)
         except Exception as e:
             current_app.logger.error(f"Error al emitir actualización de métricas del dashboard: {e}")
     
@@ -131,6 +129,17 @@ class SocketIOEventPublisher(EventPublisher):
         except Exception as e:
             current_app.logger.error(f"Error al emitir evento de respuesta de encuesta: {e}")
     
+    def emit_survey_stats_update(self, stats_data: Dict[str, Any]) -> None:
+        """Emitir estadísticas actualizadas de la sesión de encuestas activa"""
+        try:
+            self.socketio.emit(
+                'survey_stats_update',
+                stats_data,
+                namespace='/encuesta'
+            )
+        except Exception as e:
+            current_app.logger.error(f"Error al emitir estadísticas de encuestas: {e}")
+    
     def _emit_stats_update_for_delivery(self, delivery_data: Dict[str, Any]) -> None:
         """Emitir actualización de stats específica para una entrega"""
         try:
@@ -185,6 +194,9 @@ class NoOpEventPublisher(EventPublisher):
     
     def emit_survey_response_created(self, response_data: Dict[str, Any]) -> None:
         pass
+    
+    def emit_survey_stats_update(self, stats_data: Dict[str, Any]) -> None:
+        pass
 
 
 
@@ -0,0 +1,384 @@
+"""
+Cliente HTTP compartido para las integraciones externas
+Una sesión de requests por host (scheme://host:puerto) con pool de conexiones
+keep-alive: las llamadas a la misma API reutilizan la conexión TCP+TLS en vez
+de abrir una nueva por request.
+
+Políticas comunes a todas las integraciones:
+
+- Timeouts: (conexión, lectura). Un timeout escalar del llamador se usa como
+  timeout de lectura; la conexión queda acotada por CONNECT_TIMEOUT, así un
+  host caído se detecta rápido aunque la lectura admita 30 s.
+- Reintentos con backoff exponencial con jitter (full jitter). Los métodos
+  idempotentes (GET, HEAD, OPTIONS, PUT, DELETE) reintentan errores de red,
+  timeouts y 429/502/503/504. Los demás (POST, PATCH) solo reintentan cuando
+  la conexión no llegó a establecerse (la solicitud no se envió), salvo que el
+  llamador declare idempotent=True.
+- Un CircuitBreaker por host: cuenta un fallo por solicitud lógica (después
+  de los reintentos) cuando termina en error de red, timeout o 502/503/504
+  (host caído o gateway sin respuesta). Un 500 es un error de la aplicación
+  remota para esa solicitud y no abre el circuito de las demás rutas del
+  host. Con el circuito abierto las llamadas fallan de inmediato
+  con HostUnavailableError (subclase de requests.exceptions.ConnectionError,
+  así los except existentes la manejan como un error de red).
+- Métricas por host: requests por clase de estado, errores por tipo,
+  reintentos, rechazos del circuito y latencia (p50/p95) de las últimas
+  llamadas.
+
+Las cookies no se guardan en las sesiones (igual que requests.get), porque
+una sesión la comparten todos los llamadores del mismo host.
+"""
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from app.helpers.logger import get_logger
+from app.helpers.monitoring import LatencyWindow
+from app.infrastructure.circuit_breaker import CircuitBreakerOpenError, get_circuit_breaker
+
+logger = get_logger(__name__)
+
+CONNECT_TIMEOUT = float(os.environ.get('HTTP_CLIENT_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('HTTP_CLIENT_READ_TIMEOUT', 10))
+RETRIES = int(os.environ.get('HTTP_CLIENT_RETRIES', 2))
+POOL_SIZE = int(os.environ.get('HTTP_CLIENT_POOL_SIZE', 10))
+
+BACKOFF_BASE = 0.25     # Segundos: tope del primer reintento (luego se duplica)
+BACKOFF_MAX = 2.0       # Tope de cada espera; un Retry-After mayor no se reintenta
+FAILURE_THRESHOLD = 5
+RECOVERY_TIMEOUT = 30.0
+LATENCY_SAMPLES = 500
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+BREAKER_STATUSES = frozenset({502, 503, 504})  # Respuestas que cuentan como fallo del host
+
+Timeout = Union[None, float, Tuple[Optional[float], Optional[float]]]
+
+
+class HostUnavailableError(CircuitBreakerOpenError, requests.exceptions.ConnectionError):
+    """Circuito abierto para el host: la solicitud no se envió"""
+    pass
+
+
+class _ServerErrorResponse(Exception):
+    """Respuesta 502/503/504: cuenta como fallo en el circuit breaker, pero se devuelve al llamador"""
+
+    def __init__(self, response: requests.Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+_NETWORK_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+_BREAKER_FAILURES = _NETWORK_ERRORS + (_ServerErrorResponse,)
+
+
+def host_key(url: str) -> str:
+    """scheme://host[:puerto] de una URL (clave del pool, del circuito y de las métricas)"""
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+
+def _not_sent(error: Exception) -> bool:
+    """La conexión no llegó a establecerse: reintentar es seguro para cualquier método"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+def _error_kind(error: Exception) -> str:
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return 'connection'
+    return 'other'
+
+
+class _HostStats:
+    """Contadores y latencias de un host"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.by_status: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.retries = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self.last_error_time: Optional[str] = None
+        self.latency = LatencyWindow(LATENCY_SAMPLES)
+
+    def record(self, seconds: float, status_code: Optional[int], error: Optional[Exception]) -> None:
+        self.latency.record(seconds)
+        with self.lock:
+            self.requests += 1
+            if status_code is not None:
+                status = f"{status_code // 100}xx"
+                self.by_status[status] = self.by_status.get(status, 0) + 1
+                if status_code >= 500:
+                    self.errors['5xx'] = self.errors.get('5xx', 0) + 1
+                    self.last_error, self.last_error_time = f"HTTP {status_code}", datetime.now().isoformat()
+            else:
+                kind = _error_kind(error)
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+                self.last_error, self.last_error_time = str(error)[:200], datetime.now().isoformat()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            errors = sum(self.errors.values())
+            data = {
+                'requests': self.requests,
+                'errors': errors,
+                'error_rate': round(errors / self.requests * 100, 2) if self.requests else 0,
+                'by_status': dict(self.by_status),
+                'errors_by_kind': dict(self.errors),
+                'retries': self.retries,
+                'circuit_rejections': self.rejected,
+                'last_error': self.last_error,
+                'last_error_time': self.last_error_time
+            }
+        data['latency_ms'] = self.latency.summary(unit='ms')
+        return data
+
+
+class HttpClient:
+    """Sesiones HTTP por host con keep-alive, reintentos, circuit breaker y métricas"""
+
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 retries: int = RETRIES, pool_size: int = POOL_SIZE,
+                 backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX,
+                 failure_threshold: int = FAILURE_THRESHOLD, recovery_timeout: float = RECOVERY_TIMEOUT):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._sessions: Dict[str, requests.Session] = {}
+        self._stats: Dict[str, _HostStats] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    # ------------------------------------------------------------------
+    # Sesiones por host
+    # ------------------------------------------------------------------
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        # Los reintentos los hace el cliente (urllib3 no reintenta)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+    def _session(self, host: str) -> requests.Session:
+        session = self._sessions.get(host)
+        if session is not None and self._pid == os.getpid():
+            return session
+        with self._lock:
+            if self._pid != os.getpid():
+                # Proceso hijo (fork de gunicorn): no compartir sockets con el padre
+                self._sessions.clear()
+                self._pid = os.getpid()
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self._new_session()
+            return session
+
+    def _host_stats(self, host: str) -> _HostStats:
+        stats = self._stats.get(host)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(host, _HostStats())
+        return stats
+
+    def _breaker(self, host: str):
+        return get_circuit_breaker(
+            f"http:{host}",
+            failure_threshold=self.failure_threshold,
+            recovery_timeout=self.recovery_timeout,
+            expected_exception=_BREAKER_FAILURES
+        )
+
+    # ------------------------------------------------------------------
+    # Solicitudes
+    # ------------------------------------------------------------------
+    def _timeout(self, timeout: Timeout) -> Tuple[Optional[float], Optional[float]]:
+        if timeout is None:
+            return self.connect_timeout, self.read_timeout
+        if isinstance(timeout, tuple):
+            return timeout
+        return min(self.connect_timeout, timeout), timeout
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> Optional[float]:
+        """Espera antes del reintento (full jitter); None si el Retry-After excede BACKOFF_MAX"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                seconds = float(retry_after)
+            except ValueError:
+                return None
+            if seconds > self.backoff_max:
+                return None
+            delay = max(delay, seconds)
+        return delay
+
+    def request(self, method: str, url: str, *, timeout: Timeout = None, retries: Optional[int] = None,
+                idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Envía una solicitud por la sesión del host (misma firma que requests.request)
+
+        Args:
+            timeout: Segundos de lectura, tupla (conexión, lectura) o None (valores por defecto)
+            retries: Reintentos (por defecto RETRIES; 0 para health checks y sondeos)
+            idempotent: Fuerza si la solicitud se puede reintentar tras haberse enviado
+                        (por defecto según el método)
+
+        Returns:
+            La respuesta (también 4xx/5xx: el llamador decide con raise_for_status)
+
+        Raises:
+            requests.exceptions.RequestException: Error de red o timeout tras los reintentos
+            HostUnavailableError: Circuito abierto para el host
+        """
+        method = method.upper()
+        host = host_key(url)
+        stats = self._host_stats(host)
+        retries = self.retries if retries is None else retries
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        kwargs['timeout'] = self._timeout(timeout)
+
+        def send():
+            # El circuito ve la solicitud lógica completa (con sus reintentos): un fallo por llamada
+            response = self._send(method, url, host, stats, retries, idempotent, kwargs)
+            if response.status_code in BREAKER_STATUSES:
+                raise _ServerErrorResponse(response)
+            return response
+        send.__name__ = f"{method} {host}"
+
+        try:
+            return self._breaker(host).call(send)
+        except CircuitBreakerOpenError as e:
+            with stats.lock:
+                stats.rejected += 1
+            raise HostUnavailableError(f"{host} no disponible: {e}") from None
+        except _ServerErrorResponse as e:
+            return e.response
+
+    def _send(self, method: str, url: str, host: str, stats: _HostStats, retries: int,
+              idempotent: bool, kwargs: Dict[str, Any]) -> requests.Response:
+        """Envía la solicitud con reintentos; lanza el último error de red si ninguno responde"""
+        session = self._session(host)
+        attempt = 0
+        while True:
+            response, error = None, None
+            start = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                error = e
+            stats.record(time.perf_counter() - start, response.status_code if response is not None else None, error)
+
+            if attempt >= retries:
+                break
+            if error is not None:
+                # URL inválida, redirecciones, etc. no mejoran reintentando
+                retryable = isinstance(error, _NETWORK_ERRORS) and (idempotent or _not_sent(error))
+            else:
+                retryable = idempotent and response.status_code in RETRY_STATUSES
+            if not retryable:
+                break
+            delay = self._backoff(attempt, response)
+            if delay is None:
+                break
+
+            attempt += 1
+            with stats.lock:
+                stats.retries += 1
+            reason = error if error is not None else f"HTTP {response.status_code}"
+            logger.warning(f"{method} {host}: intento {attempt}/{retries + 1} falló ({reason}), "
+                           f"reintentando en {delay:.2f}s")
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+        if error is not None:
+            raise error
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Estado
+    # ------------------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas por host (de este worker) y estado de su circuito"""
+        with self._lock:
+            hosts = list(self._stats.items())
+            pooled = set(self._sessions)
+        result = {}
+        for host, stats in sorted(hosts):
+            data = stats.snapshot()
+            data['circuit'] = self._breaker(host).get_state()['state']
+            data['pooled'] = host in pooled
+            result[host] = data
+        return {
+            'hosts': result,
+            'config': {
+                'connect_timeout': self.connect_timeout,
+                'read_timeout': self.read_timeout,
+                'retries': self.retries,
+                'pool_size': self.pool_size,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout
+            }
+        }
+
+    def close(self) -> None:
+        """Cierra las conexiones abiertas de todos los pools"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Cliente HTTP compartido (uno por proceso)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
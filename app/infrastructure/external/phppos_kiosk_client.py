@@ -5,6 +5,7 @@ Incluye create_sale que no está en el cliente base
 import requests
 import logging
 from flask import current_app
+from app.infrastructure.external.http_client import get_http_client
 import os
 
 logger = logging.getLogger(__name__)
@@ -109,7 +110,7 @@ class PHPPosKioskClient:
             
             logger.info(f"Creando venta en PHP POS: {url}")
             
-            response = requests.post(
+            response = get_http_client().post(
                 url,
                 json=payload,
                 headers=self._get_headers(),
@@ -229,7 +230,7 @@ class PHPPosKioskClient:
         try:
             url = f"{self.base_url}/items/{item_id}"
             
-            response = requests.get(
+            response = get_http_client().get(
                 url,
                 headers=self._get_headers(),
                 timeout=10
@@ -263,7 +264,7 @@ class PHPPosKioskClient:
             if category:
                 params['category'] = category
             
-            response = requests.get(
+            response = get_http_client().get(
                 url,
                 headers=self._get_headers(),
                 params=params,
@@ -301,7 +302,7 @@ class PHPPosKioskClient:
             for endpoint in endpoints:
                 try:
                     url = f"{self.base_url}/{endpoint}"
-                    response = requests.get(
+                    response = get_http_client().get(
                         url,
                         headers=self._get_headers(),
                         params={'limit': limit},
@@ -339,7 +340,7 @@ class PHPPosKioskClient:
         try:
             url = f"{self.base_url}/sales/{sale_id}"
             
-            response = requests.get(
+            response = get_http_client().get(
                 url,
                 headers=self._get_headers(),
                 timeout=10
@@ -6,6 +6,7 @@ from abc import ABC, abstractmethod
 from typing import Optional, List, Dict, Any
 import requests
 from flask import current_app
+from app.infrastructure.external.http_client import get_http_client
 
 
 class PosApiClient(ABC):
@@ -83,7 +84,7 @@ class PhpPosApiClient(PosApiClient):
         }
         
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = get_http_client().get(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.Timeout:
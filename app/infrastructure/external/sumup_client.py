@@ -4,6 +4,7 @@ Cliente para interactuar con la API de SumUp
 import requests
 import logging
 from flask import current_app
+from app.infrastructure.external.http_client import get_http_client
 import os
 from typing import Optional, Dict, Any
 
@@ -142,32 +143,17 @@ class SumUpClient:
                 logger.warning(f"⚠️ No se pudo resolver DNS manualmente: {dns_error}")
                 # Continuar de todas formas, requests podría resolverlo
             
-            # Intentar conexión con retry para manejar problemas de DNS intermitentes
-            max_retries = 3
-            last_error = None
-            
-            for attempt in range(1, max_retries + 1):
-                try:
-                    # Usar timeout más largo para conexión y lectura (conexión: 30s, lectura: 30s)
-                    # Usar URL original con hostname (no IP) para que el certificado SSL funcione
-                    response = requests.post(
-                        url,
-                        json=payload,
-                        headers=self._get_headers(),
-                        timeout=(30, 30)  # (connect timeout, read timeout)
-                    )
-                    # Si llegamos aquí, la conexión fue exitosa
-                    break
-                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
-                    last_error = e
-                    if attempt < max_retries:
-                        wait_time = attempt * 2  # Backoff exponencial: 2s, 4s
-                        logger.warning(f"⚠️  Intento {attempt}/{max_retries} falló: {e}. Reintentando en {wait_time}s...")
-                        import time
-                        time.sleep(wait_time)
-                    else:
-                        logger.error(f"❌ Todos los intentos fallaron después de {max_retries} intentos")
-                        raise
+            # El cliente reintenta (con backoff) los fallos de DNS/conexión intermitentes;
+            # un POST que ya se envió no se repite para no duplicar el checkout
+            # Usar timeout más largo para conexión y lectura (conexión: 30s, lectura: 30s)
+            # Usar URL original con hostname (no IP) para que el certificado SSL funcione
+            response = get_http_client().post(
+                url,
+                json=payload,
+                headers=self._get_headers(),
+                timeout=(30, 30),  # (connect timeout, read timeout)
+                retries=2
+            )
             
             # Verificar Content-Type
             content_type = response.headers.get('Content-Type', '').lower()
@@ -256,7 +242,7 @@ class SumUpClient:
             url = f"{self.BASE_URL}/v0.1/checkouts/{checkout_id}"
             
             # Usar timeout más largo para conexión y lectura
-            response = requests.get(
+            response = get_http_client().get(
                 url,
                 headers=self._get_headers(),
                 timeout=(30, 30)  # (connect timeout, read timeout)
@@ -321,7 +307,7 @@ class SumUpClient:
             payload = payment_data or {}
             
             # Usar timeout más largo para conexión y lectura
-            response = requests.post(
+            response = get_http_client().post(
                 url,
                 json=payload,
                 headers=self._get_headers(),
@@ -6,6 +6,7 @@ import logging
 import requests
 from typing import Dict, Optional, List
 from flask import current_app
+from app.infrastructure.external.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -72,7 +73,7 @@ class WhatsAppClient:
             data['MediaUrl'] = media_url
         
         try:
-            response = requests.post(
+            response = get_http_client().post(
                 url,
                 data=data,
                 auth=(self.account_sid, self.auth_token),
@@ -125,7 +126,7 @@ class WhatsAppClient:
                 payload['document'] = {'link': media_url}
         
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=10)
+            response = get_http_client().post(url, json=payload, headers=headers, timeout=10)
             response.raise_for_status()
             
             result = response.json()
@@ -164,7 +165,7 @@ class WhatsAppClient:
         }
         
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=5)
+            response = get_http_client().post(url, json=payload, headers=headers, timeout=5)
             response.raise_for_status()
             return True
         except Exception as e:
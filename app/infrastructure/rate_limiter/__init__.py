@@ -4,7 +4,14 @@ Protección contra abuso y sobrecarga de APIs
 """
 from .rate_limiter import RateLimiter, RateLimitExceeded, APIRateLimiter
 from .decorators import rate_limit, api_rate_limit
-from .storage import MemoryRateLimitStorage
+from .storage import (
+    RateLimitStorage,
+    RateLimitResult,
+    MemoryRateLimitStorage,
+    SQLiteRateLimitStorage,
+    configure_rate_limit_storage,
+    get_rate_limit_storage,
+)
 
 __all__ = [
     'RateLimiter',
@@ -12,6 +19,10 @@ __all__ = [
     'APIRateLimiter',
     'rate_limit',
     'api_rate_limit',
+    'RateLimitStorage',
+    'RateLimitResult',
     'MemoryRateLimitStorage',
+    'SQLiteRateLimitStorage',
+    'configure_rate_limit_storage',
+    'get_rate_limit_storage',
 ]
-
@@ -6,7 +6,6 @@ from functools import wraps
 from typing import Optional, Callable
 from flask import request, jsonify
 from app.infrastructure.rate_limiter.rate_limiter import RateLimiter, RateLimitExceeded
-from app.infrastructure.rate_limiter.storage import MemoryRateLimitStorage
 from app.application.exceptions.app_exceptions import RateLimitError
 
 
@@ -31,10 +30,10 @@ def rate_limit(
         def my_endpoint():
             return jsonify({'status': 'ok'})
     """
+    # Storage global: contadores compartidos entre workers con backend sqlite
     limiter = RateLimiter(
         max_requests=max_requests,
-        window_seconds=per_seconds,
-        storage=MemoryRateLimitStorage()
+        window_seconds=per_seconds
     )
     
     def decorator(func: Callable) -> Callable:
@@ -50,12 +49,17 @@ def rate_limit(
                 key = f"{ip}:{route}"
             
             try:
-                # Verificar rate limit
-                limiter.check(key)
+                # Verificar y registrar en una sola operación del storage
+                result = limiter.hit(key)
+                if not result.allowed:
+                    raise RateLimitExceeded(
+                        f"Rate limit excedido: {result.count}/{max_requests} solicitudes en {per_seconds}s",
+                        retry_after=result.retry_after
+                    )
                 
                 # Agregar headers con información del rate limit
-                remaining = limiter.get_remaining(key)
-                reset_time = limiter.get_reset_time(key)
+                remaining = result.remaining
+                reset_time = result.reset_after
                 
                 response = func(*args, **kwargs)
                 
@@ -123,7 +127,7 @@ def api_rate_limit(api_name: str = "default", error_message: Optional[str] = Non
     """
     from app.infrastructure.rate_limiter.rate_limiter import APIRateLimiter
     
-    api_limiter = APIRateLimiter(storage=MemoryRateLimitStorage())
+    api_limiter = APIRateLimiter()
     
     def decorator(func: Callable) -> Callable:
         @wraps(func)
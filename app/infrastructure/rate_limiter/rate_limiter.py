@@ -1,11 +1,13 @@
 """
 Rate Limiter Principal
-Implementa el algoritmo de token bucket / sliding window
+Implementa el algoritmo de ventana deslizante con contadores (sliding window
+counter). Es el núcleo único sobre el que se apoyan todos los decoradores y
+helpers de rate limiting de la aplicación.
 """
-from typing import Optional, Callable
-import time
-from app.infrastructure.rate_limiter.storage import RateLimitStorage, MemoryRateLimitStorage
-from app.application.exceptions.app_exceptions import RateLimitError
+from typing import Optional
+from app.infrastructure.rate_limiter.storage import (
+    RateLimitStorage, RateLimitResult, get_rate_limit_storage
+)
 
 
 class RateLimitExceeded(Exception):
@@ -20,7 +22,9 @@ class RateLimiter:
     """
     Rate Limiter usando algoritmo de ventana deslizante (sliding window).
     
-    Limita el número de solicitudes por ventana de tiempo.
+    Limita el número de solicitudes por ventana de tiempo. Sin storage
+    explícito usa el storage global (compartido entre workers si el backend
+    es sqlite), resuelto en cada llamada para respetar configure_rate_limit_storage.
     """
     
     def __init__(
@@ -35,11 +39,32 @@ class RateLimiter:
         Args:
             max_requests: Máximo de solicitudes permitidas
             window_seconds: Ventana de tiempo en segundos
-            storage: Almacenamiento para los límites (None = usar memoria)
+            storage: Almacenamiento para los límites (None = storage global)
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.storage = storage or MemoryRateLimitStorage()
+        self._storage = storage
+    
+    @property
+    def storage(self) -> RateLimitStorage:
+        return self._storage or get_rate_limit_storage()
+    
+    def hit(self, key: str, cost: int = 1) -> RateLimitResult:
+        """
+        Verifica y registra una solicitud en una sola operación del storage.
+        
+        Args:
+            key: Clave única para identificar el límite (ej: IP, endpoint)
+            cost: Solicitudes a registrar
+            
+        Returns:
+            RateLimitResult: allowed, remaining, retry_after, reset_after
+        """
+        return self.storage.hit(key, self.window_seconds, self.max_requests, cost=cost)
+    
+    def peek(self, key: str) -> RateLimitResult:
+        """Estado de la clave sin registrar solicitudes"""
+        return self.storage.peek(key, self.window_seconds, self.max_requests)
     
     def check(self, key: str) -> bool:
         """
@@ -54,14 +79,12 @@ class RateLimiter:
         Raises:
             RateLimitExceeded: Si se excede el límite
         """
-        count = self.storage.increment(key, self.window_seconds)
+        result = self.hit(key)
         
-        if count > self.max_requests:
-            # Calcular tiempo restante
-            remaining = self.storage.get_remaining_time(key, self.window_seconds)
+        if not result.allowed:
             raise RateLimitExceeded(
-                f"Rate limit excedido: {count}/{self.max_requests} solicitudes en {self.window_seconds}s",
-                retry_after=remaining
+                f"Rate limit excedido: {result.count}/{self.max_requests} solicitudes en {self.window_seconds}s",
+                retry_after=result.retry_after
             )
         
         return True
@@ -76,8 +99,7 @@ class RateLimiter:
         Returns:
             int: Solicitudes restantes
         """
-        count = self.storage.get_count(key, self.window_seconds)
-        return max(0, self.max_requests - count)
+        return self.peek(key).remaining
     
     def get_reset_time(self, key: str) -> float:
         """
@@ -89,7 +111,7 @@ class RateLimiter:
         Returns:
             float: Tiempo en segundos hasta el reset
         """
-        return self.storage.get_remaining_time(key, self.window_seconds)
+        return self.peek(key).reset_after
     
     def reset(self, key: str):
         """
@@ -145,19 +167,11 @@ class APIRateLimiter:
         key_minute = f"api:{api_name}:minute"
         key_hour = f"api:{api_name}:hour"
         
-        # Verificar ambos límites
-        try:
-            self.per_minute.check(key_minute)
-            self.per_hour.check(key_hour)
-            return True
-        except RateLimitExceeded as e:
-            # Determinar cuál límite se excedió y usar su retry_after
-            try:
-                self.per_minute.check(key_minute)
-            except RateLimitExceeded as e_min:
-                raise e_min
-            
-            raise e
+        # Verificar ambos límites (cada uno lanza con su propio retry_after;
+        # una solicitud rechazada no se cuenta)
+        self.per_minute.check(key_minute)
+        self.per_hour.check(key_hour)
+        return True
 
 
 
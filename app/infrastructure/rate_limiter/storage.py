@@ -1,157 +1,454 @@
 """
 Storage para Rate Limiting
-Almacenamiento de límites de tasa (puede ser memoria, Redis, etc.)
+Contadores de ventana deslizante (sliding window counter) con memoria
+constante por clave: en vez de guardar un timestamp por solicitud, cada
+(clave, ventana) guarda solo el número de la ventana fija actual, su contador
+y el contador de la ventana anterior. La cantidad en la ventana deslizante se
+estima ponderando la ventana anterior por la fracción que aún se solapa:
+
+    estimado = anterior * (1 - transcurrido / ventana) + actual
+
+Backends intercambiables: memoria del proceso o SQLite local (modo WAL)
+compartido por todos los workers de gunicorn de la máquina, de modo que el
+límite configurado es el límite real y no N× por worker.
 """
-from typing import Dict, List, Optional
+import math
+import os
+import sqlite3
+import threading
 import time
-from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from app.helpers.logger import get_logger
+
+logger = get_logger(__name__)
+
+PURGE_INTERVAL = 60  # Segundos entre limpiezas de claves sin actividad
+
+
+@dataclass
+class WindowState:
+    """Estado de una clave en una ventana: (ventana fija, contador actual, contador anterior)"""
+    window: int
+    bucket: int = 0
+    current: int = 0
+    previous: int = 0
+
+    @classmethod
+    def at(cls, window: int, bucket: int, current: int, previous: int, now: float) -> "WindowState":
+        """Estado almacenado llevado a la ventana fija de `now`"""
+        now_bucket = int(now // window)
+        if bucket == now_bucket:
+            return cls(window, now_bucket, current, previous)
+        if bucket == now_bucket - 1:
+            return cls(window, now_bucket, 0, current)
+        return cls(window, now_bucket, 0, 0)
+
+    def elapsed(self, now: float) -> float:
+        return now - self.bucket * self.window
+
+    def estimate(self, now: float) -> float:
+        """Solicitudes estimadas en la ventana deslizante que termina en `now`"""
+        weight = max(0.0, 1.0 - self.elapsed(now) / self.window)
+        return self.previous * weight + self.current
+
+    def retry_after(self, limit: int, now: float, cost: int = 1) -> float:
+        """Segundos hasta que `cost` solicitudes más quepan en el límite"""
+        if self.estimate(now) + cost <= limit:
+            return 0.0
+        elapsed = self.elapsed(now)
+        if self.current + cost <= limit and self.previous:
+            # Basta con que la ventana anterior deje de solaparse lo suficiente
+            needed = self.window * (1.0 - (limit - self.current - cost) / self.previous)
+            return max(0.0, needed - elapsed)
+        if cost > limit:
+            return float(2 * self.window)
+        # Hay que esperar a la próxima ventana fija, donde la actual pasa a ser la anterior
+        needed = self.window * (1.0 - (limit - cost) / self.current) if self.current else 0.0
+        return (self.window - elapsed) + max(0.0, needed)
+
+
+@dataclass
+class RateLimitResult:
+    """Resultado de una verificación de rate limit"""
+    allowed: bool
+    count: int           # Solicitudes estimadas en la ventana (incluida esta si se permitió)
+    limit: int
+    remaining: int
+    retry_after: float   # 0 si se permitió
+    reset_after: float   # Segundos hasta que la ventana quede libre
 
 
 class RateLimitStorage:
     """Interfaz para almacenamiento de rate limits"""
-    
-    def increment(self, key: str, window: int) -> int:
+
+    backend_name = 'base'
+
+    def _load(self, key: str, window: int, now: float) -> WindowState:
+        raise NotImplementedError
+
+    def hit(self, key: str, window: int, limit: int, cost: int = 1, force: bool = False) -> RateLimitResult:
         """
-        Incrementa el contador para una clave.
-        
+        Verifica y registra atómicamente `cost` solicitudes para una clave.
+
         Args:
             key: Clave única (ej: IP, endpoint)
             window: Ventana de tiempo en segundos
-            
+            limit: Máximo de solicitudes en la ventana
+            cost: Solicitudes a registrar
+            force: Registrar aunque se exceda el límite (intentos fallidos)
+
         Returns:
-            int: Nuevo contador
+            RateLimitResult: Las solicitudes rechazadas no se cuentan (salvo force)
         """
         raise NotImplementedError
-    
-    def get_count(self, key: str, window: int) -> int:
+
+    def peek(self, key: str, window: int, limit: int, cost: int = 0) -> RateLimitResult:
         """
-        Obtiene el contador actual para una clave.
-        
-        Args:
-            key: Clave única
-            window: Ventana de tiempo en segundos
-            
-        Returns:
-            int: Contador actual
+        Estado de una clave sin registrar solicitudes.
+        allowed indica si `cost` solicitudes más cabrían en el límite.
         """
-        raise NotImplementedError
-    
+        now = time.time()
+        state = self._load(key, window, now)
+        return _result(state, limit, now, allowed=state.estimate(now) + cost <= limit, cost=cost)
+
     def reset(self, key: str):
         """
-        Resetea el contador para una clave.
-        
+        Resetea el contador para una clave (en todas sus ventanas).
+
         Args:
             key: Clave única
         """
         raise NotImplementedError
 
+    def clear(self, prefix: Optional[str] = None) -> int:
+        """Elimina todas las claves (o las que empiezan con prefix)"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Elimina las claves sin actividad en las dos últimas ventanas"""
+        raise NotImplementedError
+
+    def key_count(self) -> int:
+        raise NotImplementedError
+
+    def _record(self, allowed: bool) -> None:
+        # Contadores por proceso (sin lock: solo son estadísticas)
+        self._hit_stats['allowed' if allowed else 'rejected'] += 1
+
+    def get_stats(self) -> Dict[str, object]:
+        """Backend, claves activas y verificaciones permitidas/rechazadas en este proceso"""
+        return {'backend': self.backend_name, 'keys': self.key_count(), **self._hit_stats}
+
+    # Compatibilidad con la interfaz anterior (contador sin límite)
+    def increment(self, key: str, window: int) -> int:
+        """Registra una solicitud y retorna el contador estimado"""
+        return self.hit(key, window, limit=0, force=True).count
+
+    def get_count(self, key: str, window: int) -> int:
+        """Obtiene el contador estimado actual para una clave"""
+        return self.peek(key, window, limit=0).count
+
+    def get_remaining_time(self, key: str, window: int) -> float:
+        """Tiempo hasta que la ventana de la clave quede libre"""
+        return self.peek(key, window, limit=0).reset_after
+
+
+def _result(state: WindowState, limit: int, now: float, allowed: bool, cost: int) -> RateLimitResult:
+    estimate = state.estimate(now)
+    count = int(math.ceil(estimate - 1e-9))
+    # La ventana queda libre cuando ambos contadores dejan de solaparse
+    if state.current:
+        reset_after = state.window * 2 - state.elapsed(now)
+    elif state.previous:
+        reset_after = state.window - state.elapsed(now)
+    else:
+        reset_after = 0.0
+    return RateLimitResult(
+        allowed=allowed,
+        count=count,
+        limit=limit,
+        remaining=max(0, int(limit - estimate)),
+        retry_after=0.0 if allowed else state.retry_after(limit, now, cost),
+        reset_after=max(0.0, reset_after)
+    )
+
 
 class MemoryRateLimitStorage(RateLimitStorage):
     """
-    Almacenamiento en memoria para rate limits.
-    Simple pero efectivo para aplicaciones pequeñas/medianas.
+    Almacenamiento en memoria para rate limits (por proceso).
+    Memoria constante por clave; thread-safe.
     """
-    
+
+    backend_name = 'memory'
+
     def __init__(self):
-        # Estructura: {key: [(timestamp, count), ...]}
-        self._storage: Dict[str, List[float]] = defaultdict(list)
+        # Estructura: {(key, window): [bucket, current, previous]}
+        self._storage: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
         self._last_cleanup = time.time()
-        self._cleanup_interval = 3600  # Limpiar cada hora
-    
-    def _cleanup_old_entries(self, current_time: float):
-        """Limpia entradas antiguas del storage"""
-        if current_time - self._last_cleanup < self._cleanup_interval:
-            return
-        
-        # Limpiar claves vacías y entradas muy antiguas (más de 24 horas)
-        cutoff = current_time - 86400
-        
-        keys_to_delete = []
-        for key, timestamps in self._storage.items():
-            # Filtrar timestamps antiguos
-            self._storage[key] = [ts for ts in timestamps if ts > cutoff]
-            
-            # Marcar para eliminar si está vacía
-            if not self._storage[key]:
-                keys_to_delete.append(key)
-        
-        # Eliminar claves vacías
-        for key in keys_to_delete:
-            del self._storage[key]
-        
-        self._last_cleanup = current_time
-    
-    def increment(self, key: str, window: int) -> int:
-        """Incrementa el contador para una clave"""
-        current_time = time.time()
-        self._cleanup_old_entries(current_time)
-        
-        # Agregar timestamp actual
-        self._storage[key].append(current_time)
-        
-        # Filtrar timestamps dentro de la ventana
-        cutoff = current_time - window
-        self._storage[key] = [ts for ts in self._storage[key] if ts > cutoff]
-        
-        return len(self._storage[key])
-    
-    def get_count(self, key: str, window: int) -> int:
-        """Obtiene el contador actual para una clave"""
-        current_time = time.time()
-        self._cleanup_old_entries(current_time)
-        
-        if key not in self._storage:
-            return 0
-        
-        # Filtrar timestamps dentro de la ventana
-        cutoff = current_time - window
-        timestamps = [ts for ts in self._storage[key] if ts > cutoff]
-        self._storage[key] = timestamps
-        
-        return len(timestamps)
-    
+        self._hit_stats = {'allowed': 0, 'rejected': 0}
+
+    def _load(self, key: str, window: int, now: float) -> WindowState:
+        with self._lock:
+            entry = self._storage.get((key, window))
+        if entry is None:
+            return WindowState(window, int(now // window))
+        return WindowState.at(window, entry[0], entry[1], entry[2], now)
+
+    def hit(self, key: str, window: int, limit: int, cost: int = 1, force: bool = False) -> RateLimitResult:
+        now = time.time()
+        if now - self._last_cleanup > PURGE_INTERVAL:
+            self.purge_expired()
+        with self._lock:
+            entry = self._storage.get((key, window))
+            if entry is None:
+                state = WindowState(window, int(now // window))
+            else:
+                state = WindowState.at(window, entry[0], entry[1], entry[2], now)
+            allowed = state.estimate(now) + cost <= limit
+            if allowed or force:
+                state.current += cost
+                self._storage[(key, window)] = [state.bucket, state.current, state.previous]
+        self._record(allowed)
+        return _result(state, limit, now, allowed, cost)
+
     def reset(self, key: str):
-        """Resetea el contador para una clave"""
-        if key in self._storage:
-            del self._storage[key]
-    
-    def get_remaining_time(self, key: str, window: int) -> float:
-        """
-        Obtiene el tiempo restante hasta que expiren las solicitudes más antiguas.
-        
-        Args:
-            key: Clave única
-            window: Ventana de tiempo en segundos
-            
-        Returns:
-            float: Tiempo restante en segundos
-        """
-        current_time = time.time()
-        
-        if key not in self._storage or not self._storage[key]:
-            return 0
-        
-        cutoff = current_time - window
-        timestamps = [ts for ts in self._storage[key] if ts > cutoff]
-        
-        if not timestamps:
+        with self._lock:
+            for storage_key in [k for k in self._storage if k[0] == key]:
+                del self._storage[storage_key]
+
+    def clear(self, prefix: Optional[str] = None) -> int:
+        with self._lock:
+            if prefix is None:
+                count = len(self._storage)
+                self._storage.clear()
+                return count
+            keys = [k for k in self._storage if k[0].startswith(prefix)]
+            for storage_key in keys:
+                del self._storage[storage_key]
+        return len(keys)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            self._last_cleanup = now
+            keys = [k for k, entry in self._storage.items() if entry[0] < int(now // k[1]) - 1]
+            for storage_key in keys:
+                del self._storage[storage_key]
+        return len(keys)
+
+    def key_count(self) -> int:
+        with self._lock:
+            return len(self._storage)
+
+
+class SQLiteRateLimitStorage(RateLimitStorage):
+    """
+    Almacenamiento en un archivo SQLite local (modo WAL) compartido por todos
+    los workers de la máquina. Cada verificación es una transacción
+    BEGIN IMMEDIATE (lectura + escritura atómicas entre procesos).
+    """
+
+    backend_name = 'sqlite'
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_limit_windows (
+            key TEXT NOT NULL,
+            window INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            current INTEGER NOT NULL,
+            previous INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (key, window)
+        )
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._last_cleanup = 0.0
+        self._hit_stats = {'allowed': 0, 'rejected': 0}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(self._SCHEMA)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_rate_limit_windows_expires "
+            "ON rate_limit_windows (expires_at)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # Una conexión por thread (sqlite3 no comparte conexiones entre threads)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, key: str, window: int, now: float) -> WindowState:
+        row = self._conn().execute(
+            "SELECT bucket, current, previous FROM rate_limit_windows WHERE key = ? AND window = ?",
+            (key, window)
+        ).fetchone()
+        if row is None:
+            return WindowState(window, int(now // window))
+        return WindowState.at(window, row[0], row[1], row[2], now)
+
+    def hit(self, key: str, window: int, limit: int, cost: int = 1, force: bool = False) -> RateLimitResult:
+        now = time.time()
+        if now - self._last_cleanup > PURGE_INTERVAL:
+            self.purge_expired()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = self._load(key, window, now)
+            allowed = state.estimate(now) + cost <= limit
+            if allowed or force:
+                state.current += cost
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limit_windows "
+                    "(key, window, bucket, current, previous, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, window, state.bucket, state.current, state.previous, (state.bucket + 2) * window)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._record(allowed)
+        return _result(state, limit, now, allowed, cost)
+
+    def reset(self, key: str):
+        self._conn().execute("DELETE FROM rate_limit_windows WHERE key = ?", (key,))
+
+    def clear(self, prefix: Optional[str] = None) -> int:
+        if prefix is None:
+            cur = self._conn().execute("DELETE FROM rate_limit_windows")
+        else:
+            cur = self._conn().execute(
+                "DELETE FROM rate_limit_windows WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+        return cur.rowcount
+
+    def purge_expired(self) -> int:
+        self._last_cleanup = time.time()
+        try:
+            cur = self._conn().execute(
+                "DELETE FROM rate_limit_windows WHERE expires_at <= ?", (self._last_cleanup,)
+            )
+            return cur.rowcount
+        except Exception as e:
+            logger.warning(f"Error limpiando rate limits SQLite: {e}")
             return 0
-        
-        oldest_timestamp = min(timestamps)
-        remaining = window - (current_time - oldest_timestamp)
-        
-        return max(0, remaining)
 
+    def key_count(self) -> int:
+        (count,) = self._conn().execute("SELECT COUNT(*) FROM rate_limit_windows").fetchone()
+        return count
 
 
+class FallbackRateLimitStorage(RateLimitStorage):
+    """
+    Storage compartido con respaldo en memoria: si el backend compartido falla
+    (archivo bloqueado, disco lleno), la verificación sigue en memoria del
+    proceso en vez de bloquear o dejar pasar todo.
+    """
+
+    def __init__(self, primary: RateLimitStorage):
+        self.primary = primary
+        self.fallback = MemoryRateLimitStorage()
+        self.backend_name = primary.backend_name
+        self.errors = 0
 
+    def _call(self, method: str, *args, **kwargs):
+        try:
+            return getattr(self.primary, method)(*args, **kwargs)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error en rate limit {self.primary.backend_name} ({method}), usando memoria: {e}")
+            return getattr(self.fallback, method)(*args, **kwargs)
 
+    def _load(self, key: str, window: int, now: float) -> WindowState:
+        return self._call('_load', key, window, now)
 
+    def hit(self, key: str, window: int, limit: int, cost: int = 1, force: bool = False) -> RateLimitResult:
+        return self._call('hit', key, window, limit, cost=cost, force=force)
+
+    def reset(self, key: str):
+        self.fallback.reset(key)
+        return self._call('reset', key)
+
+    def clear(self, prefix: Optional[str] = None) -> int:
+        self.fallback.clear(prefix)
+        return self._call('clear', prefix)
+
+    def purge_expired(self) -> int:
+        self.fallback.purge_expired()
+        return self._call('purge_expired')
+
+    def key_count(self) -> int:
+        return self._call('key_count')
+
+    def get_stats(self) -> Dict[str, object]:
+        stats = self._call('get_stats')
+        fallback = self.fallback.get_stats()
+        return {
+            **stats,
+            'errors': self.errors,
+            'fallback_keys': fallback['keys'],
+            'fallback_rejected': fallback['rejected'],
+        }
+
+
+def build_rate_limit_storage(backend: str = 'memory', path: Optional[str] = None) -> RateLimitStorage:
+    """
+    Crea el storage según el backend configurado.
+
+    Args:
+        backend: 'memory' (por proceso) o 'sqlite' (compartido entre workers)
+        path: Ruta del archivo SQLite (solo backend 'sqlite')
+    """
+    if backend == 'sqlite':
+        if not path:
+            path = os.path.join(os.getcwd(), 'instance', 'rate_limits.sqlite3')
+        return FallbackRateLimitStorage(SQLiteRateLimitStorage(path))
+    return MemoryRateLimitStorage()
 
 
+# Instancia global (por proceso). El backend se elige por variables de entorno:
+#   RATE_LIMIT_BACKEND=memory|sqlite  (default: el de CACHE_BACKEND, o memory)
+#   RATE_LIMIT_SQLITE_PATH=/ruta/rate_limits.sqlite3
+_storage: Optional[RateLimitStorage] = None
+_storage_lock = threading.Lock()
 
 
+def _build_storage(backend: Optional[str] = None, path: Optional[str] = None) -> RateLimitStorage:
+    backend = (backend or os.environ.get('RATE_LIMIT_BACKEND')
+               or os.environ.get('CACHE_BACKEND', 'memory')).lower()
+    path = path or os.environ.get('RATE_LIMIT_SQLITE_PATH')
+    try:
+        return build_rate_limit_storage(backend, path)
+    except Exception as e:
+        logger.warning(f"No se pudo inicializar backend de rate limit '{backend}', usando memoria: {e}")
+        return MemoryRateLimitStorage()
 
 
+def configure_rate_limit_storage(backend: Optional[str] = None, path: Optional[str] = None) -> RateLimitStorage:
+    """(Re)configura el storage global de rate limits (los contadores empiezan vacíos)"""
+    global _storage
+    new_storage = _build_storage(backend, path)
+    with _storage_lock:
+        _storage = new_storage
+    return new_storage
 
 
+def get_rate_limit_storage() -> RateLimitStorage:
+    """Obtiene el storage global, creándolo con la configuración de entorno"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = _build_storage()
+    return _storage
@@ -2,7 +2,7 @@
 Repositorio SQL para guardarropía
 Implementación usando SQLAlchemy
 """
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime, date
 from flask import current_app
 from app.models import db
@@ -25,6 +25,35 @@ class SqlGuardarropiaRepository:
             db.session.rollback()
             return False
     
+    def save_deposit(self, item: GuardarropiaItem, shift_date: Optional[str] = None) -> Tuple[bool, List[int]]:
+        """
+        Guarda un depósito solo si sus clusters siguen libres en la BD.
+        
+        Args:
+            item: Item a depositar (cluster_numbers ya asignados)
+            shift_date: Turno en que se validan los clusters (None = todos los turnos)
+            
+        Returns:
+            (guardado, clusters en conflicto)
+        """
+        from app.helpers.guardarropia_cluster_map import find_db_conflicts, allocate_clusters, parse_cluster_numbers
+        try:
+            db.session.add(item)
+            db.session.flush()
+            clusters = parse_cluster_numbers(item.cluster_numbers)
+            conflicts = find_db_conflicts(item.id, clusters, shift_date)
+            if not conflicts:
+                conflicts = allocate_clusters(item.id, item.shift_date, clusters)
+            if conflicts:
+                db.session.rollback()
+                return False, conflicts
+            db.session.commit()
+            return True, []
+        except Exception as e:
+            current_app.logger.error(f"Error al guardar item de guardarropía: {e}")
+            db.session.rollback()
+            return False, []
+    
     def find_by_ticket_code(self, ticket_code: str) -> Optional[GuardarropiaItem]:
         """Busca un item por código de ticket"""
         try:
@@ -65,17 +94,11 @@ class SqlGuardarropiaRepository:
     def find_deposited(self, shift_date: Optional[str] = None) -> List[GuardarropiaItem]:
         """Obtiene todos los items depositados (no retirados y no eliminados)"""
         try:
-            from sqlalchemy import or_
             query = GuardarropiaItem.query.filter_by(status='deposited')
             if shift_date:
                 query = query.filter_by(shift_date=shift_date)
-            # Excluir items eliminados (soft delete: tienen [ELIMINADO] en notas)
-            query = query.filter(
-                or_(
-                    GuardarropiaItem.notes.is_(None),
-                    ~GuardarropiaItem.notes.like('%[ELIMINADO]%')
-                )
-            )
+            # Excluir items eliminados (soft delete)
+            query = query.filter(GuardarropiaItem.not_deleted())
             return query.order_by(GuardarropiaItem.deposited_at.desc()).all()
         except Exception as e:
             current_app.logger.error(f"Error al obtener items depositados: {e}")
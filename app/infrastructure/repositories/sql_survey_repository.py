@@ -2,11 +2,13 @@
 Repositorio de Encuestas SQL
 Implementación de SurveyRepository usando SQLAlchemy.
 """
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta, date, time
 from flask import current_app
 import json
 
+from sqlalchemy import select, func
+
 from app.models import db
 from app.models.survey_models import SurveyResponse, SurveySession
 from app.domain.survey import SurveyResponse as DomainSurveyResponse, SurveySession as DomainSurveySession
@@ -189,6 +191,29 @@ class SqlSurveyRepository(SurveyRepository):
                 logging.getLogger(__name__).error(error_msg, exc_info=True)
             return []
     
+    @staticmethod
+    def _session_totals_columns(fecha_sesion_date: date):
+        """
+        COUNT/AVG de las respuestas de la sesión como subconsultas: se evalúan
+        dentro del mismo INSERT/UPDATE, así dos workers guardando a la vez no
+        pisan el total con un conteo propio atrasado.
+        """
+        belongs = SurveyResponse.fecha_sesion == fecha_sesion_date
+        total = select(func.count(SurveyResponse.id)).where(belongs).scalar_subquery()
+        promedio = select(func.round(func.avg(SurveyResponse.rating), 2)).where(belongs).scalar_subquery()
+        return total, promedio
+
+    def get_session_totals(self, fecha_sesion: str) -> Tuple[int, float]:
+        """(total de respuestas, promedio de rating) de una sesión con COUNT/AVG en SQL"""
+        try:
+            fecha_sesion_date = datetime.strptime(fecha_sesion, '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            return 0, 0.0
+        total, promedio = db.session.query(
+            func.count(SurveyResponse.id), func.avg(SurveyResponse.rating)
+        ).filter(SurveyResponse.fecha_sesion == fecha_sesion_date).one()
+        return total or 0, round(float(promedio), 2) if promedio is not None else 0.0
+
     def save_session(self, session: DomainSurveySession) -> bool:
         """Guarda o actualiza una sesión de encuestas"""
         try:
@@ -220,6 +245,9 @@ class SqlSurveyRepository(SurveyRepository):
                     except:
                         pass
             
+            # Totales siempre desde las respuestas guardadas (no desde los agregados del proceso)
+            total_respuestas, promedio_rating = self._session_totals_columns(fecha_sesion_date)
+            
             # Buscar sesión existente
             db_session = SurveySession.query.filter_by(fecha_sesion=fecha_sesion_date).first()
             
@@ -230,8 +258,8 @@ class SqlSurveyRepository(SurveyRepository):
                 db_session.bartenders = session.bartenders or ''
                 db_session.hora_inicio = hora_inicio_time
                 db_session.hora_fin = hora_fin_time
-                db_session.total_respuestas = session.total_respuestas
-                db_session.promedio_rating = session.promedio_rating
+                db_session.total_respuestas = total_respuestas
+                db_session.promedio_rating = promedio_rating
                 db_session.estado = session.estado
                 db_session.updated_at = datetime.utcnow()
             else:
@@ -243,8 +271,8 @@ class SqlSurveyRepository(SurveyRepository):
                     bartenders=session.bartenders or '',
                     hora_inicio=hora_inicio_time,
                     hora_fin=hora_fin_time,
-                    total_respuestas=session.total_respuestas,
-                    promedio_rating=session.promedio_rating,
+                    total_respuestas=total_respuestas,
+                    promedio_rating=promedio_rating,
                     estado=session.estado
                 )
                 db.session.add(db_session)
@@ -5,7 +5,7 @@ Interfaz e implementación CSV.
 from abc import ABC, abstractmethod
 import os
 import csv
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from datetime import datetime, timedelta
 from flask import current_app
 
@@ -45,6 +45,13 @@ class SurveyRepository(ABC):
         """Obtiene todas las sesiones"""
         pass
 
+    def get_session_totals(self, fecha_sesion: str) -> Tuple[int, float]:
+        """(total de respuestas, promedio de rating) de una sesión, desde las respuestas guardadas"""
+        ratings = [r.rating for r in self.find_responses_by_session_date(fecha_sesion)]
+        if not ratings:
+            return 0, 0.0
+        return len(ratings), round(sum(ratings) / len(ratings), 2)
+
 
 class CsvSurveyRepository(SurveyRepository):
     """
@@ -0,0 +1,178 @@
+"""
+Motor de layout para tickets térmicos (80mm)
+
+- Fuentes TrueType cargadas una vez por proceso (por ruta y tamaño).
+- Encabezados estáticos ("BIMBA", "CIERRE DE CAJA", ...) prerenderizados como
+  bitmaps y reutilizados; en cada impresión solo se dibujan las líneas dinámicas.
+- QR y códigos de barras cacheados por contenido (reimpresiones).
+- Conversión directa a raster ESC/POS (GS v 0) para enviar bytes RAW a la
+  impresora sin archivo temporal.
+"""
+from typing import Optional, Tuple, List, Union
+from functools import lru_cache
+import io
+import logging
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+TICKET_WIDTH = 384  # Ancho estándar para impresoras térmicas 80mm
+
+FONT_REGULAR = "/System/Library/Fonts/Helvetica.ttc"
+FONT_BOLD = "/System/Library/Fonts/Helvetica-Bold.ttc"
+
+# Línea de un bloque estático: (texto, tamaño de fuente, negrita, avance en px)
+StaticLine = Tuple[str, int, bool, int]
+
+
+@lru_cache(maxsize=32)
+def get_font(size: int, bold: bool = False):
+    """Fuente del ticket (cacheada); fuente por defecto de PIL si no existe la TrueType"""
+    try:
+        return ImageFont.truetype(FONT_BOLD if bold else FONT_REGULAR, size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=16)
+def render_static_block(lines: Tuple[StaticLine, ...], width: int = TICKET_WIDTH, top: int = 0) -> Image.Image:
+    """
+    Bitmap de un bloque estático de líneas centradas (encabezados).
+    La imagen es compartida: no modificarla (solo pegarla).
+    """
+    height = top + sum(advance for _, _, _, advance in lines)
+    block = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(block)
+    y = top
+    for text, size, bold, advance in lines:
+        draw.text((width // 2, y), text, fill='black', font=get_font(size, bold), anchor='mm')
+        y += advance
+    return block
+
+
+@lru_cache(maxsize=256)
+def render_qr(payload: str, box_size: int, size: int) -> Image.Image:
+    """QR cuadrado de `size` px (corrección alta). Imagen compartida: solo pegar."""
+    import qrcode
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=box_size,
+        border=2
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+    return qr_img.resize((size, size), Image.Resampling.LANCZOS)
+
+
+@lru_cache(maxsize=256)
+def render_barcode_png(numeric_id: str) -> bytes:
+    """PNG Code128 de un id numérico (cacheado por contenido)"""
+    import barcode
+    from barcode.writer import ImageWriter
+    code128 = barcode.get_barcode_class('code128')
+    img_buffer = io.BytesIO()
+    code128(numeric_id, writer=ImageWriter()).write(img_buffer)
+    return img_buffer.getvalue()
+
+
+class TicketLayout:
+    """
+    Composición de un ticket: bloques estáticos prerenderizados + líneas dinámicas.
+
+    Las operaciones se acumulan con un cursor vertical y se dibujan en render(),
+    cuando ya se conoce la altura real del ticket.
+    """
+
+    def __init__(self, width: int = TICKET_WIDTH, margin: int = 15, top: Optional[int] = None):
+        self.width = width
+        self.margin = margin
+        self.y = margin if top is None else top
+        self._ops: List[tuple] = []
+
+    def block(self, image: Image.Image, y: Optional[int] = None) -> 'TicketLayout':
+        """Pega un bitmap estático (ancho completo) y avanza el cursor"""
+        self._ops.append(('paste', image, (0, self.y if y is None else y)))
+        self.y = (self.y if y is None else y) + image.height
+        return self
+
+    def text(self, text: str, font, x: Union[int, str, None] = None, fill: str = 'black',
+             advance: int = 0) -> 'TicketLayout':
+        """Texto en x (por defecto el margen) o centrado con x='center'"""
+        if x == 'center':
+            self._ops.append(('text', (self.width // 2, self.y), text, font, fill, 'mm'))
+        else:
+            self._ops.append(('text', (self.margin if x is None else x, self.y), text, font, fill, None))
+        self.y += advance
+        return self
+
+    def rule(self, advance: int = 0) -> 'TicketLayout':
+        """Línea separadora horizontal"""
+        self._ops.append(('line', [(self.margin, self.y), (self.width - self.margin, self.y)]))
+        self.y += advance
+        return self
+
+    def image(self, image: Image.Image, advance: int = 0) -> 'TicketLayout':
+        """Imagen centrada horizontalmente (QR, código de barras)"""
+        self._ops.append(('paste', image, ((self.width - image.width) // 2, self.y)))
+        self.y += image.height + advance
+        return self
+
+    def space(self, pixels: int) -> 'TicketLayout':
+        self.y += pixels
+        return self
+
+    def render(self, min_height: int = 0) -> Image.Image:
+        """Dibuja el ticket; la altura nunca es menor al contenido (no recorta)"""
+        height = max(min_height, self.y + self.margin)
+        img = Image.new('RGB', (self.width, height), 'white')
+        draw = ImageDraw.Draw(img)
+        for op in self._ops:
+            if op[0] == 'paste':
+                img.paste(op[1], op[2])
+            elif op[0] == 'text':
+                _, xy, text, font, fill, anchor = op
+                draw.text(xy, text, fill=fill, font=font, anchor=anchor)
+            elif op[0] == 'line':
+                draw.line(op[1], fill='black', width=1)
+        return img
+
+
+# ----------------------------------------------------------------------
+# ESC/POS
+# ----------------------------------------------------------------------
+ESC_INIT = b'\x1B\x40'                    # ESC @ - Reset
+ESC_FEED_AND_CUT = b'\x1B\x64\x03' + b'\x1D\x56\x00'  # ESC d 3 + GS V 0 (corte completo)
+RASTER_BAND_HEIGHT = 256                  # Filas por comando GS v 0 (buffer de impresoras baratas)
+
+
+def image_to_escpos_raster(img: Image.Image, threshold: int = 160) -> bytes:
+    """
+    Convierte una imagen a comandos raster ESC/POS (GS v 0), en bandas.
+    Cualquier color más oscuro que `threshold` se imprime como negro.
+    """
+    gray = img.convert('L')
+    width, height = gray.size
+    width_bytes = (width + 7) // 8
+    # '1' con point(): negro (tinta) = bit 1 al invertir
+    mono = gray.point(lambda v: 255 if v < threshold else 0, mode='1')
+    if width_bytes * 8 != width:
+        padded = Image.new('1', (width_bytes * 8, height), 0)
+        padded.paste(mono, (0, 0))
+        mono = padded
+    data = mono.tobytes()
+
+    out = bytearray()
+    for start in range(0, height, RASTER_BAND_HEIGHT):
+        rows = min(RASTER_BAND_HEIGHT, height - start)
+        out += b'\x1D\x76\x30\x00'
+        out += bytes((width_bytes & 0xFF, width_bytes >> 8, rows & 0xFF, rows >> 8))
+        out += data[start * width_bytes:(start + rows) * width_bytes]
+    return bytes(out)
+
+
+def build_escpos_job(img: Image.Image, cut: bool = True) -> bytes:
+    """Trabajo RAW completo: reset + raster + avance y corte"""
+    return ESC_INIT + image_to_escpos_raster(img) + (ESC_FEED_AND_CUT + ESC_INIT if cut else b'')
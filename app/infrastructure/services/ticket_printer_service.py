@@ -4,35 +4,75 @@ Genera e imprime tickets con código de barras cuando se completa una venta
 """
 import os
 import io
+import shutil
 import subprocess
 import platform
+import threading
+import time
 from typing import Optional, Dict, Any
 from datetime import datetime
 from flask import current_app
-import barcode
-from barcode.writer import ImageWriter
-from PIL import Image, ImageDraw, ImageFont
-import qrcode
+from PIL import Image
 import logging
 
+from app.infrastructure.services.ticket_layout import (
+    TicketLayout,
+    get_font,
+    render_static_block,
+    render_qr,
+    render_barcode_png,
+    build_escpos_job,
+)
+
 logger = logging.getLogger(__name__)
 
+OUTPUT_MODE_IMAGE = 'image'    # PNG temporal + lp/lpr/mspaint (comportamiento histórico)
+OUTPUT_MODE_ESCPOS = 'escpos'  # Raster ESC/POS en bytes RAW, con corte en el mismo trabajo
+
+DEFAULT_PRINTER_TTL = 300  # La impresora predeterminada se consulta (lpstat/wmic) cada 5 min, no por ticket
+
+_default_printer_cache: Dict[str, Any] = {'name': None, 'expires': 0.0}
+_default_printer_lock = threading.Lock()
+
+# Encabezados estáticos: (texto, tamaño, negrita, avance)
+SALE_HEADER = (("BIMBA", 16, True, 40),)
+CLOSE_SUMMARY_HEADER = (("BIMBA", 13, True, 23), ("CIERRE DE CAJA", 13, True, 28))
+GUARDARROPIA_HEADER = (("BIMBA", 17, True, 27), ("GUARDARROPÍA", 17, True, 37))
+
 
 class TicketPrinterService:
     """Servicio para generar e imprimir tickets con código de barras"""
     
-    def __init__(self, printer_name: Optional[str] = None):
+    def __init__(self, printer_name: Optional[str] = None, output_mode: Optional[str] = None):
         """
         Inicializa el servicio de impresión
         
         Args:
             printer_name: Nombre de la impresora (opcional, usa la predeterminada si no se especifica)
+            output_mode: 'image' o 'escpos' (por defecto TICKET_OUTPUT_MODE de la config, o 'image')
         """
         self.system = platform.system()
         self.printer_name = printer_name or self._get_default_printer()
+        if output_mode is None:
+            try:
+                output_mode = current_app.config.get('TICKET_OUTPUT_MODE', OUTPUT_MODE_IMAGE)
+            except RuntimeError:
+                output_mode = OUTPUT_MODE_IMAGE
+        self.output_mode = (output_mode or OUTPUT_MODE_IMAGE).lower()
     
     def _get_default_printer(self) -> Optional[str]:
-        """Obtiene la impresora predeterminada del sistema"""
+        """Obtiene la impresora predeterminada del sistema (cacheada DEFAULT_PRINTER_TTL)"""
+        now = time.time()
+        if now < _default_printer_cache['expires']:
+            return _default_printer_cache['name']
+        with _default_printer_lock:
+            if now >= _default_printer_cache['expires']:
+                _default_printer_cache['name'] = self._query_default_printer()
+                _default_printer_cache['expires'] = now + DEFAULT_PRINTER_TTL
+            return _default_printer_cache['name']
+    
+    def _query_default_printer(self) -> Optional[str]:
+        """Consulta la impresora predeterminada al sistema operativo"""
         try:
             if self.system == "Windows":
                 # Windows: usar wmic
@@ -90,15 +130,8 @@ class TicketPrinterService:
         
         # Crear código de barras Code128 con SOLO el número
         # El scanner del bartender lee este número y busca la venta en PHP POS
-        code128 = barcode.get_barcode_class('code128')
-        barcode_instance = code128(numeric_id, writer=ImageWriter())
-        
-        # Generar imagen
-        img_buffer = io.BytesIO()
-        barcode_instance.write(img_buffer)
-        img_buffer.seek(0)
-        
-        return img_buffer
+        # (PNG cacheado por contenido: las reimpresiones no vuelven a renderizar)
+        return io.BytesIO(render_barcode_png(numeric_id))
     
     def generate_ticket_image(
         self,
@@ -124,124 +157,65 @@ class TicketPrinterService:
         # Configuración para impresora RPT006 (80mm térmica)
         # Según especificaciones: 72mm ancho útil, 8 dots/mm = 576 dots
         # Para PIL Image usamos 384px (equivalente a ~96 DPI estándar)
-        width = 384  # Ancho estándar para impresoras térmicas 80mm
         margin = 15
         line_height = 22
-        font_size = 13
-        
-        # Calcular altura total (incluyendo código QR)
-        header_height = 45
-        items_height = len(items) * 27
-        qr_height = 150  # Altura para código QR (cuadrado)
-        footer_height = 50   # Para números del ID
-        total_height = header_height + items_height + qr_height + footer_height + (margin * 2) + 20
-        
-        # Crear imagen en modo portrait normal (texto horizontal)
-        img = Image.new('RGB', (width, total_height), 'white')
-        draw = ImageDraw.Draw(img)
-        
-        try:
-            # Intentar cargar fuente
-            try:
-                font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size)
-                font_bold = ImageFont.truetype("/System/Library/Fonts/Helvetica-Bold.ttc", font_size + 3)
-            except:
-                font = ImageFont.load_default()
-                font_bold = ImageFont.load_default()
-        except:
-            font = ImageFont.load_default()
-            font_bold = ImageFont.load_default()
+        font = get_font(13)
+        font_bold = get_font(16, bold=True)
         
-        y = margin
+        # Altura histórica del ticket (incluye código QR); render() la amplía si el contenido no cabe
+        total_height = 45 + len(items) * 27 + 150 + 50 + (margin * 2) + 20
         
-        # Encabezado - "BIMBA" centrado
-        draw.text((width // 2, y), "BIMBA", fill='black', font=font_bold, anchor='mm')
-        y += line_height + 18
+        # Encabezado "BIMBA" prerenderizado + líneas dinámicas
+        layout = TicketLayout(margin=margin, top=0)
+        layout.block(render_static_block(SALE_HEADER, top=margin))
         
         # Items - Lista de productos
         for item in items:
             item_name = item.get('name', 'Producto')[:28]
             quantity = item.get('quantity', 0)
-            item_text = f"{quantity}x {item_name}"
-            draw.text((margin, y), item_text, fill='black', font=font)
-            y += line_height + 5
+            layout.text(f"{quantity}x {item_name}", font, advance=line_height + 5)
         
-        y += 15
+        layout.space(15)
+        
+        numeric_sale_id = ''.join(filter(str.isdigit, str(sale_id)))
         
         # Código QR
         # Preferir qr_token del TicketEntrega (si existe); fallback a sale_id numérico.
         try:
-            qr_payload = None
-            try:
-                qr_payload = (sale_data or {}).get('qr_token')
-            except Exception:
-                qr_payload = None
+            sale_data = sale_data or {}
+            qr_payload = sale_data.get('qr_token')
             qr_payload = str(qr_payload).strip() if qr_payload else ''
-
-            display_code = None
-            try:
-                display_code = (sale_data or {}).get('ticket_display_code')
-            except Exception:
-                display_code = None
+            display_code = sale_data.get('ticket_display_code')
             display_code = str(display_code).strip() if display_code else ''
-
-            numeric_sale_id = ''.join(filter(str.isdigit, str(sale_id)))
-            if not numeric_sale_id:
-                numeric_sale_id = str(sale_id)
-
+            
             # Si no hay token, usar sale_id numérico
             if not qr_payload:
-                qr_payload = numeric_sale_id
+                qr_payload = numeric_sale_id or str(sale_id)
             
-            # Generar código QR
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_H,  # Alta corrección de errores
-                box_size=3,  # Tamaño adecuado para ticket térmico
-                border=2
-            )
-            qr.add_data(qr_payload)
-            qr.make(fit=True)
-            
-            # Crear imagen del QR
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Redimensionar QR para que quepa bien en el ticket (cuadrado de ~150x150px)
-            qr_size = min(150, width - (margin * 2))
-            qr_img = qr_img.resize((qr_size, qr_size), Image.Resampling.LANCZOS)
-            
-            # Centrar horizontalmente en el ticket
-            x_pos = (width - qr_size) // 2
-            
-            # Pegar código QR centrado
-            img.paste(qr_img, (x_pos, y))
-            y += qr_size + 10
+            # QR cuadrado de ~150x150px centrado (cacheado por contenido)
+            qr_size = min(150, layout.width - (margin * 2))
+            layout.image(render_qr(qr_payload, 3, qr_size), advance=10)
             
             # Código visible debajo del QR:
             # - Si hay display_code del TicketEntrega, mostrarlo
             # - Si no, mostrar sale_id numérico como antes
-            visible_code = display_code or numeric_sale_id
-
+            visible_code = display_code or numeric_sale_id or str(sale_id)
+            
             # Texto "espaciado" para legibilidad si es corto
             if len(visible_code) <= 16:
-                spaced = ' '.join(list(visible_code))
-                draw.text((width // 2, y), spaced, fill='black', font=font_bold, anchor='mm')
-                y += line_height + 5
-                draw.text((width // 2, y), visible_code, fill='black', font=font, anchor='mm')
+                layout.text(' '.join(visible_code), font_bold, x='center', advance=line_height + 5)
+                layout.text(visible_code, font, x='center')
             else:
-                draw.text((width // 2, y), visible_code, fill='black', font=font_bold, anchor='mm')
+                layout.text(visible_code, font_bold, x='center')
             
         except Exception as e:
-            logger.error(f"Error al generar código de barras: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.error(f"Error al generar código QR: {e}", exc_info=True)
             # Si falla, solo mostrar el número
-            numeric_sale_id = ''.join(filter(str.isdigit, str(sale_id)))
             if numeric_sale_id:
-                draw.text((width // 2, y), numeric_sale_id, fill='black', font=font_bold, anchor='mm')
+                layout.text(numeric_sale_id, font_bold, x='center')
         
         # La impresora RPT006 imprime normal (portrait), no necesitamos rotar
-        return img
+        return layout.render(min_height=total_height)
     
     def open_cash_drawer(self) -> bool:
         """
@@ -440,31 +414,7 @@ class TicketPrinterService:
                 employee_name=employee_name
             )
             
-            # Guardar imagen sin rotar - como estaba funcionando
-            temp_file = f"/tmp/ticket_{sale_id}_{datetime.now().timestamp()}.png"
-            ticket_img.save(temp_file, 'PNG')
-            
-            # Imprimir según el sistema operativo
-            success = False
-            if self.system == "Windows":
-                success = self._print_windows(temp_file)
-            elif self.system == "Darwin":  # macOS
-                success = self._print_macos(temp_file)
-            elif self.system == "Linux":
-                success = self._print_linux(temp_file)
-            
-            # Enviar comando de corte de papel después de imprimir
-            # Agregar un pequeño delay antes del corte para asegurar que la impresión terminó
-            if success:
-                import time
-                time.sleep(0.3)  # Esperar 300ms para que termine la impresión
-                self._send_cut_command()
-            
-            # Limpiar archivo temporal
-            try:
-                os.remove(temp_file)
-            except:
-                pass
+            success = self.print_image(ticket_img, f"ticket_{sale_id}", cut=True)
             
             if success:
                 logger.info(f"Ticket {sale_id} impreso correctamente")
@@ -527,24 +477,7 @@ class TicketPrinterService:
                 notes=notes
             )
             
-            # Guardar temporalmente
-            temp_file = f"/tmp/close_summary_{datetime.now().timestamp()}.png"
-            summary_img.save(temp_file, 'PNG')
-            
-            # Imprimir según el sistema operativo
-            success = False
-            if self.system == "Windows":
-                success = self._print_windows(temp_file)
-            elif self.system == "Darwin":  # macOS
-                success = self._print_macos(temp_file)
-            elif self.system == "Linux":
-                success = self._print_linux(temp_file)
-            
-            # Limpiar archivo temporal
-            try:
-                os.remove(temp_file)
-            except:
-                pass
+            success = self.print_image(summary_img, "close_summary", cut=False)
             
             if success:
                 logger.info(f"Resumen de cierre de caja impreso correctamente")
@@ -581,115 +514,139 @@ class TicketPrinterService:
         """
         Genera imagen del resumen de cierre de caja
         """
-        width = 384  # Ancho del ticket
         margin = 10
         line_height = 18
-        font_size = 11
+        font = get_font(11)
+        font_bold = get_font(13, bold=True)
         
-        # Calcular altura total
+        # Altura histórica (aproximada); render() la amplía si el contenido no cabe
         lines_count = 25  # Aproximadamente
         if notes:
             lines_count += len(notes.split('\n')) + 2
         total_height = (lines_count * line_height) + (margin * 2) + 40
         
-        img = Image.new('RGB', (width, total_height), 'white')
-        draw = ImageDraw.Draw(img)
+        def diff_fill(value: float) -> str:
+            return 'black' if value == 0 else ('green' if value > 0 else 'red')
         
-        try:
-            font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size)
-            font_bold = ImageFont.truetype("/System/Library/Fonts/Helvetica-Bold.ttc", font_size + 2)
-        except:
-            font = ImageFont.load_default()
-            font_bold = ImageFont.load_default()
-        
-        y = margin
-        
-        # Encabezado
-        draw.text((width // 2, y), "BIMBA", fill='black', font=font_bold, anchor='mm')
-        y += line_height + 5
-        draw.text((width // 2, y), "CIERRE DE CAJA", fill='black', font=font_bold, anchor='mm')
-        y += line_height + 10
+        # Encabezado prerenderizado
+        layout = TicketLayout(margin=margin, top=0)
+        layout.block(render_static_block(CLOSE_SUMMARY_HEADER, top=margin))
         
         # Información básica
-        draw.text((margin, y), f"Caja: {register_name}", fill='black', font=font)
-        y += line_height
-        draw.text((margin, y), f"Cajero: {employee_name}", fill='black', font=font)
-        y += line_height
-        draw.text((margin, y), f"Fecha: {shift_date}", fill='black', font=font)
-        y += line_height + 5
+        layout.text(f"Caja: {register_name}", font, advance=line_height)
+        layout.text(f"Cajero: {employee_name}", font, advance=line_height)
+        layout.text(f"Fecha: {shift_date}", font, advance=line_height + 5)
         
         # Línea separadora
-        draw.line([(margin, y), (width - margin, y)], fill='black', width=1)
-        y += line_height + 5
+        layout.rule(advance=line_height + 5)
         
         # Resumen de ventas
-        draw.text((margin, y), f"Total Ventas: {total_sales}", fill='black', font=font_bold)
-        y += line_height + 5
-        
-        # Efectivo
-        draw.text((margin, y), "EFECTIVO", fill='black', font=font_bold)
-        y += line_height
-        draw.text((margin + 10, y), f"Esperado: ${expected_cash:,.0f}", fill='black', font=font)
-        y += line_height
-        draw.text((margin + 10, y), f"Ingresado: ${actual_cash:,.0f}", fill='black', font=font)
-        y += line_height
-        diff_color = 'black' if diff_cash == 0 else ('green' if diff_cash > 0 else 'red')
-        draw.text((margin + 10, y), f"Diferencia: ${diff_cash:,.0f}", fill=diff_color, font=font)
-        y += line_height + 5
-        
-        # Débito
-        draw.text((margin, y), "DÉBITO", fill='black', font=font_bold)
-        y += line_height
-        draw.text((margin + 10, y), f"Esperado: ${expected_debit:,.0f}", fill='black', font=font)
-        y += line_height
-        draw.text((margin + 10, y), f"Ingresado: ${actual_debit:,.0f}", fill='black', font=font)
-        y += line_height
-        diff_color = 'black' if diff_debit == 0 else ('green' if diff_debit > 0 else 'red')
-        draw.text((margin + 10, y), f"Diferencia: ${diff_debit:,.0f}", fill=diff_color, font=font)
-        y += line_height + 5
-        
-        # Crédito
-        draw.text((margin, y), "CRÉDITO", fill='black', font=font_bold)
-        y += line_height
-        draw.text((margin + 10, y), f"Esperado: ${expected_credit:,.0f}", fill='black', font=font)
-        y += line_height
-        draw.text((margin + 10, y), f"Ingresado: ${actual_credit:,.0f}", fill='black', font=font)
-        y += line_height
-        diff_color = 'black' if diff_credit == 0 else ('green' if diff_credit > 0 else 'red')
-        draw.text((margin + 10, y), f"Diferencia: ${diff_credit:,.0f}", fill=diff_color, font=font)
-        y += line_height + 5
+        layout.text(f"Total Ventas: {total_sales}", font_bold, advance=line_height + 5)
+        
+        # Efectivo / Débito / Crédito
+        for title, expected, actual, diff in (
+            ("EFECTIVO", expected_cash, actual_cash, diff_cash),
+            ("DÉBITO", expected_debit, actual_debit, diff_debit),
+            ("CRÉDITO", expected_credit, actual_credit, diff_credit),
+        ):
+            layout.text(title, font_bold, advance=line_height)
+            layout.text(f"Esperado: ${expected:,.0f}", font, x=margin + 10, advance=line_height)
+            layout.text(f"Ingresado: ${actual:,.0f}", font, x=margin + 10, advance=line_height)
+            layout.text(f"Diferencia: ${diff:,.0f}", font, x=margin + 10, fill=diff_fill(diff), advance=line_height + 5)
         
         # Línea separadora
-        draw.line([(margin, y), (width - margin, y)], fill='black', width=1)
-        y += line_height + 5
+        layout.rule(advance=line_height + 5)
         
         # Diferencia total
-        total_color = 'black' if difference_total == 0 else ('green' if difference_total > 0 else 'red')
-        draw.text((margin, y), f"DIFERENCIA TOTAL: ${difference_total:,.0f}", fill=total_color, font=font_bold)
-        y += line_height + 5
+        layout.text(f"DIFERENCIA TOTAL: ${difference_total:,.0f}", font_bold,
+                    fill=diff_fill(difference_total), advance=line_height + 5)
         
         # Estado
         status_text = "CAJA CUADRADA" if is_balanced else "CAJA DESCUADRADA"
-        status_color = 'green' if is_balanced else 'red'
-        draw.text((width // 2, y), status_text, fill=status_color, font=font_bold, anchor='mm')
-        y += line_height + 5
+        layout.text(status_text, font_bold, x='center', fill='green' if is_balanced else 'red', advance=line_height + 5)
         
         # Notas
         if notes:
-            draw.line([(margin, y), (width - margin, y)], fill='black', width=1)
-            y += line_height + 5
-            draw.text((margin, y), "NOTAS:", fill='black', font=font_bold)
-            y += line_height
+            layout.rule(advance=line_height + 5)
+            layout.text("NOTAS:", font_bold, advance=line_height)
             for note_line in notes.split('\n'):
                 if note_line.strip():
-                    draw.text((margin + 10, y), note_line[:40], fill='black', font=font)
-                    y += line_height
+                    layout.text(note_line[:40], font, x=margin + 10, advance=line_height)
         
         # Fecha y hora de cierre
-        y += line_height
-        draw.text((width // 2, y), f"Cerrado: {closed_at[:19]}", fill='black', font=font, anchor='mm')
+        layout.space(line_height)
+        layout.text(f"Cerrado: {closed_at[:19]}", font, x='center')
         
-        return img
+        return layout.render(min_height=total_height)
+    
+    def print_image(self, img: Image.Image, label: str = "ticket", cut: bool = True) -> bool:
+        """
+        Envía una imagen a la impresora según output_mode.
+        
+        - escpos: raster ESC/POS en un solo trabajo RAW (con corte), sin archivo temporal
+        - image: PNG temporal + comando del sistema y corte aparte (comportamiento histórico)
+        """
+        if self.output_mode == OUTPUT_MODE_ESCPOS:
+            return self._send_raw(build_escpos_job(img, cut=cut), label)
+        
+        temp_file = f"/tmp/{label}_{datetime.now().timestamp()}.png"
+        img.save(temp_file, 'PNG')
+        try:
+            success = False
+            if self.system == "Windows":
+                success = self._print_windows(temp_file)
+            elif self.system == "Darwin":  # macOS
+                success = self._print_macos(temp_file)
+            elif self.system == "Linux":
+                success = self._print_linux(temp_file)
+            
+            # Enviar comando de corte de papel después de imprimir
+            # Agregar un pequeño delay antes del corte para asegurar que la impresión terminó
+            if success and cut:
+                time.sleep(0.3)  # Esperar 300ms para que termine la impresión
+                self._send_cut_command()
+            return success
+        finally:
+            # Limpiar archivo temporal
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+    
+    def _send_raw(self, data: bytes, label: str = "ticket") -> bool:
+        """Envía bytes RAW (ESC/POS) a la impresora en un solo trabajo"""
+        try:
+            if self.system == "Windows":
+                if not self.printer_name:
+                    logger.warning("No se especificó nombre de impresora")
+                    return False
+                import win32print
+                printer_handle = win32print.OpenPrinter(self.printer_name)
+                try:
+                    win32print.StartDocPrinter(printer_handle, 1, (label, None, "RAW"))
+                    win32print.StartPagePrinter(printer_handle)
+                    win32print.WritePrinter(printer_handle, data)
+                    win32print.EndPagePrinter(printer_handle)
+                    win32print.EndDocPrinter(printer_handle)
+                    return True
+                finally:
+                    win32print.ClosePrinter(printer_handle)
+            
+            # macOS / Linux: lpr -o raw leyendo desde stdin (sin archivo temporal)
+            if not shutil.which('lpr'):
+                logger.warning("lpr no está disponible. No se puede imprimir en modo ESC/POS.")
+                return False
+            cmd = ['lpr', '-o', 'raw']
+            if self.printer_name:
+                cmd.extend(['-P', self.printer_name])
+            result = subprocess.run(cmd, input=data, capture_output=True, timeout=10, check=False)
+            if result.returncode != 0:
+                logger.error(f"Error al imprimir ESC/POS: {result.stderr.decode(errors='ignore')}")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"Error al enviar trabajo RAW a la impresora: {e}")
+            return False
     
     def _print_windows(self, file_path: str) -> bool:
         """Imprime en Windows"""
@@ -726,9 +683,7 @@ class TicketPrinterService:
         """Imprime en Linux usando lp"""
         try:
             # Verificar si lp está disponible
-            try:
-                subprocess.run(['which', 'lp'], capture_output=True, check=True, timeout=2)
-            except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
+            if not shutil.which('lp'):
                 logger.warning("CUPS no está instalado en este sistema Linux. La impresión se deshabilitará automáticamente.")
                 logger.info(f"Imagen del ticket guardada en: {file_path} (se puede imprimir manualmente o desde el cliente)")
                 return False
@@ -754,8 +709,6 @@ class TicketPrinterService:
         Incluye: feed de papel, corte, y reset para que la impresora no quede esperando
         """
         try:
-            import time
-            
             # Secuencia de comandos para finalizar correctamente:
             # 1. Feed de papel (avanzar líneas antes de cortar)
             # 2. Corte completo
@@ -899,108 +852,76 @@ class TicketPrinterService:
             PIL Image del ticket
         """
         # Configuración para impresora térmica 80mm
-        width = 384
         margin = 15
         line_height = 22
-        font_size = 13
-        
-        # Calcular altura
-        header_height = 50
-        info_height = 120
-        qr_height = 180
-        footer_height = 40
-        total_height = header_height + info_height + qr_height + footer_height + (margin * 2) + 20
+        font = get_font(13)
+        font_bold = get_font(17, bold=True)
+        font_small = get_font(11)
         
-        img = Image.new('RGB', (width, total_height), 'white')
-        draw = ImageDraw.Draw(img)
-        
-        try:
-            font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size)
-            font_bold = ImageFont.truetype("/System/Library/Fonts/Helvetica-Bold.ttc", font_size + 4)
-            font_small = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size - 2)
-        except:
-            font = ImageFont.load_default()
-            font_bold = ImageFont.load_default()
-            font_small = ImageFont.load_default()
+        # Altura histórica; render() la amplía si el contenido no cabe
+        total_height = 50 + 120 + 180 + 40 + (margin * 2) + 20
         
-        y = margin
-        
-        # Encabezado
-        draw.text((width // 2, y), "BIMBA", fill='black', font=font_bold, anchor='mm')
-        y += line_height + 5
-        draw.text((width // 2, y), "GUARDARROPÍA", fill='black', font=font_bold, anchor='mm')
-        y += line_height + 15
+        # Encabezado prerenderizado
+        layout = TicketLayout(margin=margin, top=0)
+        layout.block(render_static_block(GUARDARROPIA_HEADER, top=margin))
         
         # Información del cliente
-        draw.text((margin, y), f"Cliente: {customer_name[:30]}", fill='black', font=font)
-        y += line_height
-        draw.text((margin, y), f"Teléfono: {customer_phone[:30]}", fill='black', font=font)
-        y += line_height
+        layout.text(f"Cliente: {customer_name[:30]}", font, advance=line_height)
+        layout.text(f"Teléfono: {customer_phone[:30]}", font, advance=line_height)
         
         if description:
-            draw.text((margin, y), f"Prenda: {description[:30]}", fill='black', font=font)
-            y += line_height
+            layout.text(f"Prenda: {description[:30]}", font, advance=line_height)
         
         # Línea separadora
-        y += 5
-        draw.line([(margin, y), (width - margin, y)], fill='black', width=1)
-        y += line_height + 5
+        layout.space(5)
+        layout.rule(advance=line_height + 5)
         
         # Precio y pago
-        draw.text((margin, y), f"Precio: ${price:,.0f}", fill='black', font=font_bold)
-        y += line_height
+        layout.text(f"Precio: ${price:,.0f}", font_bold, advance=line_height)
         payment_text = {
             'cash': 'Efectivo',
             'debit': 'Débito',
             'credit': 'Crédito'
         }.get(payment_type, payment_type)
-        draw.text((margin, y), f"Pago: {payment_text}", fill='black', font=font)
-        y += line_height + 10
+        layout.text(f"Pago: {payment_text}", font, advance=line_height + 10)
         
-        # Código QR
+        # Código QR (cacheado por contenido)
         try:
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_H,
-                box_size=4,
-                border=2
-            )
-            qr.add_data(ticket_code)
-            qr.make(fit=True)
-            
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            qr_size = min(160, width - (margin * 2))
-            qr_img = qr_img.resize((qr_size, qr_size), Image.Resampling.LANCZOS)
-            
-            x_pos = (width - qr_size) // 2
-            img.paste(qr_img, (x_pos, y))
-            y += qr_size + 10
+            qr_size = min(160, layout.width - (margin * 2))
+            layout.image(render_qr(ticket_code, 4, qr_size), advance=10)
             
             # Código de ticket en grande
-            draw.text((width // 2, y), ticket_code, fill='black', font=font_bold, anchor='mm')
-            y += line_height + 5
+            layout.text(ticket_code, font_bold, x='center', advance=line_height + 5)
             
             # Instrucciones
-            draw.text((width // 2, y), "Presente este código QR", fill='black', font=font_small, anchor='mm')
-            y += line_height - 5
-            draw.text((width // 2, y), "para retirar su prenda", fill='black', font=font_small, anchor='mm')
+            layout.text("Presente este código QR", font_small, x='center', advance=line_height - 5)
+            layout.text("para retirar su prenda", font_small, x='center')
             
         except Exception as e:
             logger.error(f"Error al generar QR: {e}")
             # Si falla, solo mostrar el código
-            draw.text((width // 2, y), ticket_code, fill='black', font=font_bold, anchor='mm')
+            layout.text(ticket_code, font_bold, x='center')
         
         # Fecha
         if deposited_at:
             try:
-                from datetime import datetime
                 dt = datetime.fromisoformat(deposited_at.replace('Z', '+00:00'))
                 date_str = dt.strftime('%d/%m/%Y %H:%M')
-            except:
+            except ValueError:
                 date_str = deposited_at[:16]
-            draw.text((width // 2, y + line_height + 10), date_str, fill='black', font=font_small, anchor='mm')
+            layout.space(line_height + 10)
+            layout.text(date_str, font_small, x='center')
         
-        return img
+        return layout.render(min_height=total_height)
+    
+    def print_guardarropia_ticket(self, **ticket_data) -> bool:
+        """Genera e imprime el ticket de guardarropía (mismos argumentos que generate_guardarropia_ticket)"""
+        try:
+            ticket_img = self.generate_guardarropia_ticket(**ticket_data)
+            return self.print_image(ticket_img, f"guardarropia_{ticket_data.get('ticket_code', '')}", cut=False)
+        except Exception as e:
+            logger.error(f"Error al imprimir ticket de guardarropía: {e}")
+            return False
     
     def _send_cut_linux(self, command: bytes) -> bool:
         """Envía comando de corte en Linux"""
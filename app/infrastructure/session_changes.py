@@ -0,0 +1,140 @@
+"""
+Despachador único de cambios ORM confirmados
+
+Los índices y caches por proceso (catálogos, grafo de recetas, mapa de
+clusters, contexto de venta, ...) necesitan enterarse de los cambios de
+ciertos modelos cuando la transacción confirma. En vez de que cada módulo
+registre sus propios listeners after_flush/after_commit/after_rollback sobre
+Session y guarde su estado en session.info, se suscriben aquí con watch():
+
+- after_flush: por cada objeto nuevo, modificado o eliminado de un modelo
+  observado se llama collect(obj, kind, changed), con kind 'new', 'dirty' o
+  'deleted' y changed = atributos modificados (vacío salvo en 'dirty'). Lo
+  que retorne (si no es None) se acumula para la suscripción. Un objeto
+  modificado solo llega si cambió alguno de `attrs` (None = cualquiera).
+- after_commit: apply(items) por cada suscripción con items acumulados.
+- after_rollback: se descarta lo acumulado.
+"""
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+from dataclasses import dataclass
+import logging
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+SESSION_INFO_KEY = 'session_changes'
+
+KIND_NEW = 'new'
+KIND_DIRTY = 'dirty'
+KIND_DELETED = 'deleted'
+ALL_KINDS = (KIND_NEW, KIND_DIRTY, KIND_DELETED)
+
+
+@dataclass
+class Subscription:
+    """Suscripción a cambios confirmados de uno o más modelos"""
+    name: str
+    models_loader: Callable[[], Tuple[type, ...]]  # Import diferido: evita imports circulares con app.models
+    apply: Callable[[List[Any]], None]
+    collect: Callable[[Any, str, FrozenSet[str]], Any]
+    attrs: Optional[FrozenSet[str]] = None
+    kinds: Tuple[str, ...] = ALL_KINDS
+    _models: Optional[Tuple[type, ...]] = None
+
+    @property
+    def models(self) -> Tuple[type, ...]:
+        if self._models is None:
+            self._models = tuple(self.models_loader())
+        return self._models
+
+    def wants(self, obj, kind: str, changed: FrozenSet[str]) -> bool:
+        if kind not in self.kinds or not isinstance(obj, self.models):
+            return False
+        if kind != KIND_DIRTY:
+            return True
+        return bool(changed & self.attrs) if self.attrs is not None else bool(changed)
+
+
+_subscriptions: List[Subscription] = []
+
+
+def _always(obj, kind: str, changed: FrozenSet[str]) -> bool:
+    return True
+
+
+def watch(name: str, models: Callable[[], Tuple[type, ...]], apply: Callable[[List[Any]], None],
+          collect: Optional[Callable[[Any, str, FrozenSet[str]], Any]] = None,
+          attrs: Optional[Tuple[str, ...]] = None, kinds: Tuple[str, ...] = ALL_KINDS) -> Subscription:
+    """
+    Suscribe `apply` a los cambios confirmados de `models`.
+
+    Args:
+        name: Nombre de la suscripción (logs y clave en session.info)
+        models: Función que retorna las clases observadas
+        apply: Recibe la lista de lo que retornó `collect` en la transacción
+        collect: (obj, kind, changed) -> item o None; por defecto True (solo "hubo cambios")
+        attrs: Atributos relevantes para objetos modificados (None = cualquiera)
+        kinds: Tipos de cambio observados
+    """
+    subscription = Subscription(
+        name=name,
+        models_loader=models,
+        apply=apply,
+        collect=collect or _always,
+        attrs=frozenset(attrs) if attrs is not None else None,
+        kinds=tuple(kinds)
+    )
+    _subscriptions.append(subscription)
+    return subscription
+
+
+def _changed_attrs(obj) -> FrozenSet[str]:
+    return frozenset(attr.key for attr in inspect(obj).attrs if attr.history.has_changes())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    if not _subscriptions:
+        return
+    pending: Optional[Dict[str, List[Any]]] = session.info.get(SESSION_INFO_KEY)
+    changes = [(obj, KIND_NEW) for obj in session.new]
+    changes += [(obj, KIND_DIRTY) for obj in session.dirty]
+    changes += [(obj, KIND_DELETED) for obj in session.deleted]
+    for obj, kind in changes:
+        changed = None
+        for subscription in _subscriptions:
+            if kind not in subscription.kinds or not isinstance(obj, subscription.models):
+                continue
+            if changed is None:
+                # Una sola inspección por objeto, compartida por todas las suscripciones
+                changed = _changed_attrs(obj) if kind == KIND_DIRTY else frozenset()
+            if not subscription.wants(obj, kind, changed):
+                continue
+            item = subscription.collect(obj, kind, changed)
+            if item is None:
+                continue
+            if pending is None:
+                pending = session.info.setdefault(SESSION_INFO_KEY, {})
+            pending.setdefault(subscription.name, []).append(item)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    pending = session.info.pop(SESSION_INFO_KEY, None)
+    if not pending:
+        return
+    for subscription in _subscriptions:
+        items = pending.get(subscription.name)
+        if not items:
+            continue
+        try:
+            subscription.apply(items)
+        except Exception as e:
+            logger.warning(f"No se pudieron aplicar los cambios confirmados en '{subscription.name}': {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(SESSION_INFO_KEY, None)
@@ -56,7 +56,7 @@ from .inventory_stock_models import (
 )
 
 # Importar modelos de guardarropía
-from .guardarropia_models import GuardarropiaItem
+from .guardarropia_models import GuardarropiaItem, GuardarropiaClusterAllocation
 
 # Importar modelos de entregas y tracking de tickets
 from .delivery_models import Delivery, FraudAttempt, TicketScan
@@ -89,6 +89,21 @@ from .ecommerce_models import Entrada, CheckoutSession
 # Importar modelos de configuración del sistema
 from .system_config_models import SystemConfig
 
+# Importar outbox de webhooks salientes (n8n)
+from .webhook_outbox_models import WebhookOutbox
+
+# Importar cola de aplicación de inventario por venta
+from .sale_inventory_job_models import SaleInventoryJob
+
+# Importar resúmenes materializados de turnos cerrados
+from .shift_stats_summary_models import ShiftStatsSummary
+
+# Importar resúmenes congelados de sesiones de encuestas cerradas
+from .survey_summary_models import SurveySessionSummary
+
+# Importar resúmenes mensuales de rendimiento por empleado (ficha personal)
+from .employee_stats_models import EmployeeMonthlyStats
+
 
 __all__ = [
     'db', 
@@ -111,7 +126,7 @@ __all__ = [
     'IngredientCategory', 'StockIngredient', 'IngredientStock',
     'Recipe', 'RecipeIngredient', 'InventoryMovement',
     # Modelos de guardarropía
-    'GuardarropiaItem',
+    'GuardarropiaItem', 'GuardarropiaClusterAllocation',
     # Modelos de entregas y tracking
     'Delivery', 'FraudAttempt', 'TicketScan',
     'SaleDeliveryStatus', 'DeliveryItem',
@@ -132,5 +147,15 @@ __all__ = [
     'Entrada', 'CheckoutSession',
     # Modelos de configuración del sistema
     'SystemConfig',
+    # Outbox de webhooks salientes
+    'WebhookOutbox',
+    # Cola de inventario por venta
+    'SaleInventoryJob',
+    # Resúmenes de estadísticas por turno
+    'ShiftStatsSummary',
+    # Resúmenes de sesiones de encuestas cerradas
+    'SurveySessionSummary',
+    # Resúmenes mensuales por empleado
+    'EmployeeMonthlyStats',
 ]
 
@@ -0,0 +1,95 @@
+"""
+Resumen mensual de rendimiento por empleado
+La ficha personal suma estas filas (una por mes trabajado) en vez de recorrer
+todas las entregas, encuestas, jornadas e inventarios del empleado
+"""
+from datetime import datetime
+import json
+from . import db
+from sqlalchemy import Text
+
+
+class EmployeeMonthlyStats(db.Model):
+    """Entregas, encuestas, puntualidad y eficiencia de un empleado en un mes"""
+    __tablename__ = 'employee_monthly_stats'
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'mes', name='uq_employee_monthly_stats_employee_mes'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.String(50), nullable=False, index=True)
+    mes = db.Column(db.String(7), nullable=False)  # YYYY-MM como string
+    employee_name = db.Column(db.String(200), nullable=True)  # Nombre con el que se buscaron entregas/encuestas
+
+    # Entregas
+    tragos = db.Column(db.Integer, nullable=False, default=0)
+    entregas = db.Column(db.Integer, nullable=False, default=0)
+    noches = db.Column(db.Integer, nullable=False, default=0)
+    ritmo_sum = db.Column(db.Float, nullable=False, default=0.0)
+    ritmo_noches = db.Column(db.Integer, nullable=False, default=0)
+    mejor_noche = db.Column(Text, nullable=True)  # JSON
+
+    # Encuestas
+    encuestas = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    ratings_count = db.Column(Text, nullable=True)  # JSON
+
+    # Puntualidad
+    jornadas = db.Column(db.Integer, nullable=False, default=0)
+    jornadas_puntuales = db.Column(db.Integer, nullable=False, default=0)
+    jornadas_tardes = db.Column(db.Integer, nullable=False, default=0)
+    retraso_apertura_sum = db.Column(db.Float, nullable=False, default=0.0)
+    retraso_apertura_n = db.Column(db.Integer, nullable=False, default=0)
+    retraso_cierre_sum = db.Column(db.Float, nullable=False, default=0.0)
+    retraso_cierre_n = db.Column(db.Integer, nullable=False, default=0)
+
+    # Eficiencia (inventarios de las barras y noches trabajadas)
+    inventarios = db.Column(db.Integer, nullable=False, default=0)
+    inventarios_sin_merma = db.Column(db.Integer, nullable=False, default=0)
+    inventarios_con_merma = db.Column(db.Integer, nullable=False, default=0)
+    merma_total = db.Column(db.Float, nullable=False, default=0.0)
+    eficiencia_sum = db.Column(db.Float, nullable=False, default=0.0)
+    mejor_inventario = db.Column(Text, nullable=True)  # JSON
+    peor_inventario = db.Column(Text, nullable=True)  # JSON
+
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    COUNTERS = (
+        'tragos', 'entregas', 'noches', 'ritmo_sum', 'ritmo_noches',
+        'encuestas', 'rating_sum',
+        'jornadas', 'jornadas_puntuales', 'jornadas_tardes',
+        'retraso_apertura_sum', 'retraso_apertura_n', 'retraso_cierre_sum', 'retraso_cierre_n',
+        'inventarios', 'inventarios_sin_merma', 'inventarios_con_merma', 'merma_total', 'eficiencia_sum',
+    )
+    DOCUMENTS = ('mejor_noche', 'ratings_count', 'mejor_inventario', 'peor_inventario')
+
+    @staticmethod
+    def _load(value, default):
+        try:
+            return json.loads(value) if value else default
+        except (ValueError, TypeError):
+            return default
+
+    def update_from(self, activity):
+        """Copia los agregados de un mes (estructura de employee_profile_stats.compute_month_activity)"""
+        for field in self.COUNTERS:
+            setattr(self, field, activity.get(field) or 0)
+        for field in self.DOCUMENTS:
+            value = activity.get(field)
+            setattr(self, field, json.dumps(value) if value else None)
+        self.computed_at = datetime.utcnow()
+
+    def to_activity(self):
+        """Agregados del mes con la misma estructura que compute_month_activity()"""
+        activity = {'mes': self.mes}
+        for field in self.COUNTERS:
+            activity[field] = getattr(self, field) or 0
+        activity['mejor_noche'] = self._load(self.mejor_noche, None)
+        # JSON convierte las claves de ratings a string
+        activity['ratings_count'] = {int(k): v for k, v in self._load(self.ratings_count, {}).items()}
+        activity['mejor_inventario'] = self._load(self.mejor_inventario, None)
+        activity['peor_inventario'] = self._load(self.peor_inventario, None)
+        return activity
+
+    def __repr__(self):
+        return f'<EmployeeMonthlyStats {self.employee_id} {self.mes}: {self.tragos}>'
@@ -41,6 +41,9 @@ class GuardarropiaItem(db.Model):
     # Notas adicionales
     notes = db.Column(db.Text, nullable=True)
     
+    # Soft delete (el item se conserva en la BD; NULL = activo)
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
+    
     # Campos para prendas no retiradas (fotos y seguimiento)
     photo_path = db.Column(db.String(500), nullable=True)  # Ruta de la foto
     marked_unretrieved_at = db.Column(db.DateTime, nullable=True)  # Fecha cuando se marcó como no retirado
@@ -56,6 +59,7 @@ class GuardarropiaItem(db.Model):
     __table_args__ = (
         Index('idx_guardarropia_status_date', 'status', 'shift_date'),
         Index('idx_guardarropia_ticket_status', 'ticket_code', 'status'),
+        Index('idx_guardarropia_active', 'status', 'deleted_at', 'shift_date'),
     )
     
     def to_dict(self):
@@ -78,6 +82,7 @@ class GuardarropiaItem(db.Model):
             'payment_type': self.payment_type,
             'sale_id': self.sale_id,
             'notes': self.notes,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None,
             'photo_path': self.photo_path,
             'marked_unretrieved_at': self.marked_unretrieved_at.isoformat() if self.marked_unretrieved_at else None,
             'marked_unretrieved_by': self.marked_unretrieved_by,
@@ -99,6 +104,15 @@ class GuardarropiaItem(db.Model):
         """Verifica si el item está marcado como perdido"""
         return self.status == 'lost'
     
+    def is_deleted(self) -> bool:
+        """Verifica si el item fue eliminado (soft delete)"""
+        return self.deleted_at is not None
+    
+    @classmethod
+    def not_deleted(cls):
+        """Filtro de items activos (excluye soft delete)"""
+        return cls.deleted_at.is_(None)
+    
     def is_unretrieved(self) -> bool:
         """Verifica si el item está marcado como no retirado (tiene fecha de marcado)"""
         return self.marked_unretrieved_at is not None
@@ -120,3 +134,27 @@ class GuardarropiaItem(db.Model):
     def __repr__(self):
         return f'<GuardarropiaItem {self.id}: {self.ticket_code} - {self.status}>'
 
+
+
+class GuardarropiaClusterAllocation(db.Model):
+    """
+    Asignación de un cluster a un depósito dentro de un turno.
+
+    La restricción única (shift_date, cluster) impide que dos depósitos
+    concurrentes confirmen el mismo cluster. No se borra al retirar: una
+    asignación cuyo item ya no ocupa el cluster la toma el siguiente depósito.
+    """
+    __tablename__ = 'guardarropia_cluster_allocations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    shift_date = db.Column(db.String(10), nullable=False, default='')  # YYYY-MM-DD ('' = sin turno)
+    cluster = db.Column(db.Integer, nullable=False)
+    item_id = db.Column(db.Integer, nullable=False, index=True)  # GuardarropiaItem que ocupa el cluster
+    allocated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('shift_date', 'cluster', name='uq_guardarropia_allocation_shift_cluster'),
+    )
+
+    def __repr__(self):
+        return f'<GuardarropiaClusterAllocation {self.shift_date or "-"}#{self.cluster}: item {self.item_id}>'
@@ -0,0 +1,45 @@
+"""
+Cola persistente de aplicación de inventario por venta
+Se inserta en la misma transacción que la venta; un worker la procesa después del commit
+"""
+from datetime import datetime
+from . import db
+from sqlalchemy import Index, Text
+
+
+class SaleInventoryJob(db.Model):
+    """
+    Trabajo pendiente de descuento de inventario para una venta.
+
+    Estados:
+    - pending: esperando al worker
+    - processing: reclamado por un worker (locked_by); vuelve a pending si vence locked_until
+    - done: inventario aplicado (o la venta ya lo tenía aplicado)
+    - failed: reintentos agotados (revisar last_error)
+    """
+    __tablename__ = 'sale_inventory_jobs'
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sale_id = db.Column(db.Integer, db.ForeignKey('pos_sales.id'), nullable=False, unique=True, index=True)
+    location = db.Column(db.String(100), nullable=True)  # Si es None se infiere del register_id
+
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(Text, nullable=True)
+    locked_by = db.Column(db.String(64), nullable=True)  # Token del worker que reclamó el trabajo
+    locked_until = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('idx_sale_inventory_jobs_status_id', 'status', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<SaleInventoryJob sale={self.sale_id} {self.status}>'
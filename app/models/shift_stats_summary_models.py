@@ -0,0 +1,55 @@
+"""
+Resumen materializado de estadísticas por turno
+Los turnos cerrados no cambian: se calculan una vez y el historial lee estas filas
+"""
+from datetime import datetime
+import json
+from . import db
+from sqlalchemy import Text
+
+
+class ShiftStatsSummary(db.Model):
+    """Estadísticas precalculadas (entregas + encuestas) de un turno cerrado"""
+    __tablename__ = 'shift_stats_summaries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    shift_date = db.Column(db.String(10), nullable=False, unique=True, index=True)  # YYYY-MM-DD como string
+
+    total_entregas = db.Column(db.Integer, nullable=False, default=0)
+    total_cantidad = db.Column(db.Integer, nullable=False, default=0)
+
+    # Rankings y encuestas (JSON)
+    top_items = db.Column(Text, nullable=True)
+    top_bartenders = db.Column(Text, nullable=True)
+    top_barras = db.Column(Text, nullable=True)
+    top_categorias = db.Column(Text, nullable=True)
+    survey_stats = db.Column(Text, nullable=True)
+
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @staticmethod
+    def _load(value, default):
+        try:
+            return json.loads(value) if value else default
+        except (ValueError, TypeError):
+            return default
+
+    def to_stats(self):
+        """Estructura compatible con StatsService.get_shift_stats()"""
+        survey_stats = self._load(self.survey_stats, {})
+        # JSON convierte las claves de ratings a string
+        if survey_stats.get('ratings_count'):
+            survey_stats['ratings_count'] = {int(k): v for k, v in survey_stats['ratings_count'].items()}
+        return {
+            'shift_date': self.shift_date,
+            'total_entregas': self.total_entregas,
+            'total_cantidad': self.total_cantidad,
+            'top_items': [tuple(x) for x in self._load(self.top_items, [])],
+            'top_bartenders': [tuple(x) for x in self._load(self.top_bartenders, [])],
+            'top_barras': [tuple(x) for x in self._load(self.top_barras, [])],
+            'top_categorias': [tuple(x) for x in self._load(self.top_categorias, [])],
+            'survey_stats': survey_stats,
+        }
+
+    def __repr__(self):
+        return f'<ShiftStatsSummary {self.shift_date}: {self.total_cantidad}>'
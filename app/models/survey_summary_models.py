@@ -0,0 +1,49 @@
+"""
+Resumen congelado de una sesión de encuestas cerrada
+Al cerrar la sesión se guardan sus agregados; las consultas posteriores leen esta fila
+"""
+from datetime import datetime
+import json
+from . import db
+from sqlalchemy import Text
+
+
+class SurveySessionSummary(db.Model):
+    """Agregados finales de una sesión de encuestas (se escriben en close_session)"""
+    __tablename__ = 'survey_session_summaries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha_sesion = db.Column(db.String(10), nullable=False, unique=True, index=True)  # YYYY-MM-DD como string
+
+    total = db.Column(db.Integer, nullable=False, default=0)
+    average_rating = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Distribuciones (JSON)
+    ratings_count = db.Column(Text, nullable=True)
+    by_barra = db.Column(Text, nullable=True)
+    by_hour = db.Column(Text, nullable=True)
+    barra_stats = db.Column(Text, nullable=True)
+
+    closed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @staticmethod
+    def _load(value, default):
+        try:
+            return json.loads(value) if value else default
+        except (ValueError, TypeError):
+            return default
+
+    def to_stats(self):
+        """Estructura compatible con SurveyService.get_survey_results() (sin respuestas recientes)"""
+        return {
+            'total': self.total,
+            'average_rating': self.average_rating,
+            # JSON convierte las claves numéricas a string
+            'ratings_count': {int(k): v for k, v in self._load(self.ratings_count, {}).items()},
+            'by_barra': self._load(self.by_barra, {}),
+            'by_hour': {int(k): v for k, v in self._load(self.by_hour, {}).items()},
+            'barra_stats': self._load(self.barra_stats, {}),
+        }
+
+    def __repr__(self):
+        return f'<SurveySessionSummary {self.fecha_sesion}: {self.total}>'
@@ -0,0 +1,49 @@
+"""
+Outbox persistente de webhooks salientes (n8n)
+Los eventos se guardan aquí antes de enviarse, así sobreviven a reinicios del proceso
+"""
+from datetime import datetime
+from . import db
+from sqlalchemy import Index, Text
+
+
+class WebhookOutbox(db.Model):
+    """
+    Evento pendiente de envío a un webhook externo.
+
+    Estados:
+    - pending: esperando envío (o reintento, según next_attempt_at)
+    - sending: reclamado por un dispatcher (locked_by / locked_until)
+    - sent: enviado correctamente
+    - dead: descartado (error 4xx o reintentos agotados)
+    """
+    __tablename__ = 'webhook_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Evento
+    event_type = db.Column(db.String(100), nullable=False)
+    workflow_id = db.Column(db.String(200), nullable=True)
+    payload = db.Column(Text, nullable=False)  # JSON del evento (event_type, timestamp, data)
+
+    # Estado de envío
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String(500), nullable=True)
+
+    # Reclamo atómico por un dispatcher
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('idx_webhook_outbox_status_next', 'status', 'next_attempt_at'),
+        Index('idx_webhook_outbox_created_at', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<WebhookOutbox {self.id} {self.event_type} {self.status}>'
@@ -106,14 +106,10 @@ def api_clear_all_registers():
         count = unlock_all_registers()
         
         if count > 0:
-            # Emitir actualización de métricas
+            # Marcar cajas para el próximo delta del dashboard
             try:
-                from app import socketio
-                from app.helpers.dashboard_metrics_service import get_metrics_service
-                
-                metrics_service = get_metrics_service()
-                metrics = metrics_service.get_all_metrics(use_cache=False)
-                socketio.emit('metrics_update', {'metrics': metrics}, namespace='/admin_stats')
+                from app.helpers.metrics_publisher import get_metrics_publisher
+                get_metrics_publisher().mark_dirty('cajas')
             except Exception as e:
                 current_app.logger.warning(f"No se pudo emitir actualización: {e}")
         
@@ -1498,6 +1494,13 @@ def cerrar_jornada():
         
         db.session.commit()
         
+        from app.helpers.register_sales_aggregator import invalidate_register_sales_scope
+        invalidate_register_sales_scope()
+        
+        # Recalcular el mes de la jornada en la ficha de su planilla (no falla el cierre)
+        from app.helpers.employee_profile_stats import refresh_jornada_rollups
+        refresh_jornada_rollups(jornada)
+        
         # Enviar evento a n8n (después de commit exitoso)
         try:
             from app.helpers.n8n_client import send_shift_closed
@@ -1530,13 +1533,10 @@ def cerrar_jornada():
         except Exception as e:
             current_app.logger.warning(f"Error enviando evento de cierre de turno a n8n: {e}")
         
-        # Emitir actualización de métricas del dashboard
+        # Cierre de jornada: todas las secciones en vivo + estado del turno en el próximo delta
         try:
-            from app import socketio
-            from app.helpers.dashboard_metrics_service import get_metrics_service
-            metrics_service = get_metrics_service()
-            metrics = metrics_service.get_all_metrics(use_cache=False)
-            socketio.emit('metrics_update', {'metrics': metrics}, namespace='/admin_stats')
+            from app.helpers.metrics_publisher import get_metrics_publisher, LIVE_SECTIONS
+            get_metrics_publisher().mark_dirty(*LIVE_SECTIONS, 'turno_actual', 'system_status')
         except Exception as e:
             current_app.logger.warning(f"Error al emitir actualización de métricas: {e}")
         
@@ -1697,12 +1697,12 @@ def fraud_config():
     
     # GET - Mostrar configuración
     try:
-        from app.helpers.fraud_detection import load_fraud_config, load_fraud_attempts
+        from app.helpers.fraud_detection import load_fraud_config, get_fraud_attempt_counts
         config = load_fraud_config()
-        attempts = load_fraud_attempts()
-        total_fraud_attempts = len(attempts)
-        authorized_count = sum(1 for a in attempts if len(a) > 7 and a[7] == '1')
-        unauthorized_count = total_fraud_attempts - authorized_count
+        counts = get_fraud_attempt_counts()
+        total_fraud_attempts = counts['total']
+        authorized_count = counts['authorized']
+        unauthorized_count = counts['unauthorized']
     except Exception as e:
         config = {'max_hours_old_ticket': 24, 'max_attempts_per_hour': 10}
         total_fraud_attempts = 0
@@ -1723,12 +1723,17 @@ def fraud_history():
         return redirect(url_for('auth.login_admin'))
     
     try:
-        from app.helpers.fraud_detection import load_fraud_attempts
-        attempts = load_fraud_attempts()
+        from app.helpers.fraud_detection import load_fraud_attempts_page
+        page = load_fraud_attempts_page(
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', 200, type=int)
+        )
     except Exception:
-        attempts = []
+        page = {'fraud_attempts': [], 'next_cursor': None}
     
-    return render_template('admin_fraud_history.html', fraud_attempts=attempts)
+    return render_template('admin_fraud_history.html',
+                         fraud_attempts=page['fraud_attempts'],
+                         next_cursor=page['next_cursor'])
 
 
 @bp.route('/admin/apertura')
@@ -2409,7 +2414,7 @@ def api_dashboard_metrics():
     try:
         from app.helpers.dashboard_metrics_service import get_metrics_service
         metrics_service = get_metrics_service()
-        metrics = metrics_service.get_all_metrics(use_cache=False)  # Sin caché para API
+        metrics = metrics_service.get_all_metrics(use_cache=True)  # Cada sección respeta su propio TTL
         
         return jsonify({
             'success': True,
@@ -2838,6 +2843,9 @@ def admin_api_n8n_config_set():
         current_app.config['N8N_WEBHOOK_SECRET'] = SystemConfig.get('n8n_webhook_secret') or os.environ.get('N8N_WEBHOOK_SECRET')
         current_app.config['N8N_API_KEY'] = SystemConfig.get('n8n_api_key') or os.environ.get('N8N_API_KEY')
         
+        from app.helpers.n8n_client import invalidate_n8n_config
+        invalidate_n8n_config()
+        
         current_app.logger.info(f"Configuración de n8n actualizada por {username}")
         
         return jsonify({
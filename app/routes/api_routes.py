@@ -10,6 +10,7 @@ from app.helpers.logger import get_logger
 from app.infrastructure.rate_limiter.decorators import rate_limit
 from app.application.exceptions.app_exceptions import ServiceUnavailableError, InternalServerError
 from app.infrastructure.circuit_breaker import _breakers
+from app.infrastructure.external.http_client import get_http_client
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 logger = get_logger(__name__)
@@ -47,7 +48,7 @@ def health_check():
             "x-api-key": api_key,
             "accept": "application/json"
         }
-        resp = requests.get(url, headers=headers, timeout=5)
+        resp = get_http_client().get(url, headers=headers, timeout=5, retries=0)
         resp.raise_for_status()
         
         return jsonify({
@@ -102,6 +103,38 @@ def cache_stats():
         }), 500
 
 
+@api_bp.route('/system/dashboard/sections', methods=['GET'])
+def dashboard_section_stats():
+    """Timing y política de refresco por sección del dashboard"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    try:
+        from app.helpers.dashboard_metrics_service import get_metrics_service
+        return jsonify({'sections': get_metrics_service().get_section_stats()}), 200
+    except Exception as e:
+        logger.error(f"Error al obtener stats de secciones del dashboard: {e}", exc_info=True)
+        return jsonify({
+            'error': f'Error al obtener estadísticas: {str(e)}'
+        }), 500
+
+
+@api_bp.route('/system/sales/inventory-pipeline', methods=['GET'])
+def sale_inventory_pipeline_stats():
+    """Backlog y contadores del pipeline de inventario por venta"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    try:
+        from app.helpers.sale_inventory_pipeline import get_sale_inventory_worker
+        return jsonify(get_sale_inventory_worker().get_stats()), 200
+    except Exception as e:
+        logger.error(f"Error al obtener stats del pipeline de inventario: {e}", exc_info=True)
+        return jsonify({
+            'error': f'Error al obtener estadísticas: {str(e)}'
+        }), 500
+
+
 @api_bp.route('/system/performance/stats', methods=['GET'])
 def performance_stats():
     """Estadísticas de rendimiento de funciones"""
@@ -172,18 +205,49 @@ def system_info():
         }), 500
 
 
+LOG_FILTER_ARGS = ('shift_date', 'barra', 'bartender', 'sale_id', 'start', 'end')
+FRAUD_FILTER_ARGS = ('sale_id', 'fraud_type', 'bartender', 'barra', 'start', 'end')
+FRAUD_HEADER = ['sale_id', 'timestamp', 'bartender', 'barra', 'item_name', 'qty', 'fraud_type', 'authorized']
+
+
+def _filters_from_args(names):
+    """Filtros no vacíos desde query string"""
+    return {name: request.args.get(name) for name in names if request.args.get(name)}
+
+
+@api_bp.route('/system/logs', methods=['GET'])
+def logs_page():
+    """Página de logs con paginación por cursor (?cursor=...&limit=...&barra=...)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    try:
+        from app.helpers.logs import load_logs_page
+        page = load_logs_page(
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', 100, type=int),
+            **_filters_from_args(LOG_FILTER_ARGS)
+        )
+        return jsonify(page), 200
+    except Exception as e:
+        logger.error(f"Error al obtener página de logs: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
 @api_bp.route('/system/export/logs', methods=['GET'])
 def export_logs():
-    """Exporta logs en CSV"""
+    """Exporta logs en CSV o JSON (?format=json) en streaming, con los mismos filtros que /system/logs"""
     if not session.get('admin_logged_in'):
         return jsonify({'error': 'No autorizado'}), 401
     
     try:
-        from app.helpers.logs import load_logs
+        from app.helpers.logs import iter_logs, EXPECTED_LOG_HEADER
         from app.helpers.export_utils import DataExporter
         
-        logs = load_logs()
-        return DataExporter.export_logs_csv(logs, "logs")
+        rows = iter_logs(**_filters_from_args(LOG_FILTER_ARGS))
+        if request.args.get('format', 'csv').lower() == 'json':
+            return DataExporter.stream_json((dict(zip(EXPECTED_LOG_HEADER, row)) for row in rows), "logs")
+        return DataExporter.stream_csv(rows, EXPECTED_LOG_HEADER, "logs")
     except Exception as e:
         logger.error(f"Error al exportar logs: {e}", exc_info=True)
         return jsonify({
@@ -191,6 +255,27 @@ def export_logs():
         }), 500
 
 
+@api_bp.route('/system/export/fraud-attempts', methods=['GET'])
+def export_fraud_attempts():
+    """Exporta intentos de fraude en CSV o JSON (?format=json) en streaming"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    try:
+        from app.helpers.fraud_detection import iter_fraud_attempts
+        from app.helpers.export_utils import DataExporter
+        
+        rows = iter_fraud_attempts(**_filters_from_args(FRAUD_FILTER_ARGS))
+        if request.args.get('format', 'csv').lower() == 'json':
+            return DataExporter.stream_json((dict(zip(FRAUD_HEADER, row)) for row in rows), "fraud_attempts")
+        return DataExporter.stream_csv(rows, FRAUD_HEADER, "fraud_attempts")
+    except Exception as e:
+        logger.error(f"Error al exportar intentos de fraude: {e}", exc_info=True)
+        return jsonify({
+            'error': f'Error al exportar: {str(e)}'
+        }), 500
+
+
 @api_bp.route('/system/circuit-breakers', methods=['GET'])
 def circuit_breaker_status():
     """Estado de los circuit breakers (admin only)"""
@@ -213,6 +298,69 @@ def circuit_breaker_status():
         }), 500
 
 
+@api_bp.route('/system/http-clients', methods=['GET'])
+def http_clients_stats():
+    """Pools, latencia, errores y circuito por host del cliente HTTP compartido (admin only)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    try:
+        return jsonify(get_http_client().get_stats()), 200
+    except Exception as e:
+        logger.error(f"Error al obtener métricas del cliente HTTP: {e}", exc_info=True)
+        return jsonify({
+            'error': f'Error al obtener métricas: {str(e)}'
+        }), 500
+
+
+@api_bp.route('/system/scanner/stats', methods=['GET'])
+def scanner_stats():
+    """Latencia de escaneo de tickets QR, índice de tickets y escritor de logs (admin only)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    try:
+        from app.helpers.ticket_scan_index import get_scan_stats
+        return jsonify(get_scan_stats()), 200
+    except Exception as e:
+        logger.error(f"Error al obtener métricas del escáner: {e}", exc_info=True)
+        return jsonify({
+            'error': f'Error al obtener métricas: {str(e)}'
+        }), 500
+
+
+@api_bp.route('/system/sale-context/stats', methods=['GET'])
+def sale_context_stats():
+    """Aciertos, recargas e invalidaciones del contexto de venta por caja (admin only)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'No autorizado'}), 401
+
+    try:
+        from app.helpers.register_sale_context import get_sale_context_cache
+        return jsonify(get_sale_context_cache().get_stats()), 200
+    except Exception as e:
+        logger.error(f"Error al obtener métricas del contexto de venta: {e}", exc_info=True)
+        return jsonify({
+            'error': f'Error al obtener métricas: {str(e)}'
+        }), 500
+
+
+@api_bp.route('/system/rate-limits/stats', methods=['GET'])
+def rate_limit_stats():
+    """Backend, claves activas y rechazos del rate limiting (admin only)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'No autorizado'}), 401
+
+    try:
+        from app.infrastructure.rate_limiter import get_rate_limit_storage
+        return jsonify(get_rate_limit_storage().get_stats()), 200
+    except Exception as e:
+        logger.error(f"Error al obtener métricas de rate limiting: {e}", exc_info=True)
+        return jsonify({
+            'error': f'Error al obtener métricas: {str(e)}'
+        }), 500
+
+
 @api_bp.route('/services/status')
 def services_status():
     """API endpoint para obtener el estado de los servicios"""
@@ -362,7 +510,6 @@ def dashboard_stats():
 def sale_details(sale_id):
     """Obtiene detalles de una venta"""
     from app.helpers.pos_api import get_entity_details
-    import requests
     
     api_key = current_app.config['API_KEY']
     base = current_app.config['BASE_API_URL']
@@ -374,7 +521,7 @@ def sale_details(sale_id):
         # Extraer ID numérico si tiene prefijo
         numeric_id = sale_id.replace('BMB ', '').replace('B ', '').strip()
         
-        resp = requests.get(
+        resp = get_http_client().get(
             f"{base}/sales/{numeric_id}",
             headers={"x-api-key": api_key, "accept": "application/json"},
             timeout=10
@@ -2,18 +2,34 @@
 Rutas para monitoreo y métricas de rendimiento
 """
 
-from flask import Blueprint, jsonify
+import hmac
+import os
+from flask import Blueprint, Response, jsonify, request, session
 from datetime import datetime
-from app.helpers.monitoring import get_performance_stats, check_performance_thresholds, reset_metrics
+from app.helpers.monitoring import (
+    get_performance_stats, check_performance_thresholds, reset_metrics, render_prometheus
+)
 
 monitoring_bp = Blueprint('monitoring', __name__)
 
 
+def _authorized():
+    """Admin logueado, o token de METRICS_TOKEN (Authorization: Bearer) para el scraper"""
+    if session.get('admin_logged_in'):
+        return True
+    token = os.environ.get('METRICS_TOKEN')
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header, f"Bearer {token}")
+
+
 @monitoring_bp.route('/api/monitoring/stats', methods=['GET'])
 def api_monitoring_stats():
-    """API: Obtener estadísticas de rendimiento"""
+    """API: Obtener estadísticas de rendimiento (?window=1m|5m)"""
+    if not _authorized():
+        return jsonify({'success': False, 'error': 'No autorizado'}), 401
+    
     try:
-        stats = get_performance_stats()
+        stats = get_performance_stats(request.args.get('window', '5m'))
         alerts = check_performance_thresholds()
         
         return jsonify({
@@ -32,6 +48,9 @@ def api_monitoring_stats():
 @monitoring_bp.route('/api/monitoring/alerts', methods=['GET'])
 def api_monitoring_alerts():
     """API: Obtener alertas de rendimiento"""
+    if not _authorized():
+        return jsonify({'success': False, 'error': 'No autorizado'}), 401
+    
     try:
         alerts = check_performance_thresholds()
         return jsonify({
@@ -49,6 +68,9 @@ def api_monitoring_alerts():
 @monitoring_bp.route('/api/monitoring/reset', methods=['POST'])
 def api_monitoring_reset():
     """API: Resetear métricas (solo para desarrollo/testing)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'success': False, 'error': 'No autorizado'}), 401
+    
     try:
         reset_metrics()
         return jsonify({
@@ -61,3 +83,14 @@ def api_monitoring_reset():
             'error': str(e)
         }), 500
 
+
+@monitoring_bp.route('/api/monitoring/metrics', methods=['GET'])
+def api_monitoring_prometheus():
+    """Exportación en formato Prometheus (histogramas por endpoint, consultas SQL)"""
+    if not _authorized():
+        return Response('No autorizado\n', status=401, mimetype='text/plain')
+    
+    try:
+        return Response(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        return Response(f'# Error al generar métricas: {e}\n', status=500, mimetype='text/plain')
@@ -381,7 +381,7 @@ def entregar():
         # CORRECCI?N: Mejorar manejo de errores al cargar intentos de fraude
         is_authorized = False
         try:
-            fraud_attempts = load_fraud_attempts()
+            fraud_attempts = load_fraud_attempts(sale_id=sale_id, fraud_type=fraud_check['fraud_type'])
         except Exception as e:
             current_app.logger.error(f"Error al cargar intentos de fraude para {sale_id}: {e}", exc_info=True)
             fraud_attempts = []
@@ -482,13 +482,10 @@ def entregar():
                 ])
                 flash(f"📦 Inventario consumido: {consumo_detalle}", "info")
             
-            # Emitir actualización de métricas del dashboard
+            # Marcar entregas para el próximo delta del dashboard
             try:
-                from app import socketio
-                from app.helpers.dashboard_metrics_service import get_metrics_service
-                metrics_service = get_metrics_service()
-                metrics = metrics_service.get_all_metrics(use_cache=False)
-                socketio.emit('metrics_update', {'metrics': metrics}, namespace='/admin_stats')
+                from app.helpers.metrics_publisher import get_metrics_publisher
+                get_metrics_publisher().mark_dirty('entregas')
             except Exception as e:
                 current_app.logger.warning(f"Error al emitir actualización de métricas: {e}")
         else:
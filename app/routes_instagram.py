@@ -156,6 +156,7 @@ def send_instagram_message(recipient_id, message_text):
     """
     try:
         import requests
+        from app.infrastructure.external.http_client import get_http_client
         
         page_access_token = current_app.config.get('INSTAGRAM_PAGE_ACCESS_TOKEN')
         if not page_access_token:
@@ -180,7 +181,7 @@ def send_instagram_message(recipient_id, message_text):
             'access_token': page_access_token
         }
         
-        response = requests.post(url, json=payload, params=params, timeout=10)
+        response = get_http_client().post(url, json=payload, params=params, timeout=10)
         response.raise_for_status()
         
         return True
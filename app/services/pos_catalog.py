@@ -0,0 +1,227 @@
+"""
+Snapshot versionado del catálogo de productos del POS
+
+Un snapshot inmutable por worker (productos indexados por id y por categoría)
+que reemplaza las consultas a Product en cada carga de la caja, cada
+agregado al carrito y cada validación de precios. Se reconstruye cuando
+cambia la versión compartida del catálogo (eventos del ORM sobre Product) o,
+como respaldo, cada MAX_AGE (stock y cambios hechos fuera del ORM).
+
+La versión solo es compartida entre workers con CACHE_BACKEND=sqlite. Con el
+backend en memoria (por proceso) un cambio de precio hecho en otro worker no
+se ve hasta MAX_AGE, así que resolve_products (validación de precios de la
+venta) lee los productos del carrito desde la base de datos.
+"""
+from typing import Dict, Optional, Tuple, Any, List
+import hashlib
+import json
+import threading
+import time
+import logging
+
+from app.infrastructure.cache import get_cache_manager
+from app.application.services.product_catalog import on_product_changes
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = 'pos_catalog'
+VERSION_KEY = 'version'
+SHARED_BACKENDS = ('sqlite',)  # Backends de cache visibles para todos los workers
+
+get_cache_manager().register_namespace(CACHE_NAMESPACE, 7 * 24 * 3600, max_entries=4)
+
+
+def _product_detail(p) -> Dict[str, Any]:
+    """Formato de PosService.get_product()"""
+    return {
+        'item_id': str(p.id),
+        'name': p.name,
+        'category': p.category,
+        'price': float(p.price) if p.price else 0.0,
+        'cost_price': float(p.cost_price) if p.cost_price else 0.0,
+        'quantity': p.stock_quantity,
+        'active': bool(p.is_active)
+    }
+
+
+def _product_listing(p) -> Dict[str, Any]:
+    """Formato de PosService.get_products() (compatible con el frontend existente)"""
+    return {
+        'item_id': str(p.id),
+        'name': p.name,
+        'category': p.category,
+        'category_normalized': p.category,
+        'category_display': p.category.upper() if p.category else 'GENERAL',
+        'price': float(p.price) if p.price else 0.0,
+        'cost_price': float(p.cost_price) if p.cost_price else 0.0,
+        'quantity': p.stock_quantity,
+        'is_kit': False,  # Por ahora todo es producto simple
+        'description': '',
+        'image_id': None
+    }
+
+
+class CatalogSnapshot:
+    """
+    Catálogo inmutable. Los métodos de lectura entregan copias, por lo que
+    los llamadores pueden modificar los diccionarios sin afectar al snapshot.
+    """
+
+    def __init__(self, products: List[Any], version: int):
+        self.version = version
+        self.built_at = time.time()
+        self.by_id: Dict[int, Dict[str, Any]] = {p.id: _product_detail(p) for p in products}
+        active = sorted(
+            (_product_listing(p) for p in products if p.is_active),
+            key=lambda x: (x.get('category_display') or '').lower()
+        )
+        self.active: Tuple[Dict[str, Any], ...] = tuple(active)
+        by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for product in active:
+            by_category.setdefault(product['category_display'], []).append(product)
+        self.by_category: Dict[str, Tuple[Dict[str, Any], ...]] = {
+            category: tuple(items) for category, items in by_category.items()
+        }
+        # ETag por contenido: igual en todos los workers para el mismo catálogo
+        payload = json.dumps(active, sort_keys=True, default=str)
+        self.etag = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+    def get(self, product_id: Any) -> Optional[Dict[str, Any]]:
+        try:
+            product = self.by_id.get(int(product_id))
+        except (ValueError, TypeError):
+            return None
+        return dict(product) if product else None
+
+    def list_active(self, category: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        products = self.active
+        if category:
+            # Búsqueda case-insensitive parcial (mismo criterio que el LIKE anterior)
+            needle = category.lower()
+            products = [p for p in products if p['category'] and needle in p['category'].lower()]
+        if limit:
+            products = products[:limit]
+        return [dict(p) for p in products]
+
+    @classmethod
+    def build(cls, version: int) -> 'CatalogSnapshot':
+        from app.models.product_models import Product
+        products = Product.query.all()
+        snapshot = cls(products, version)
+        logger.info(f"Catálogo POS cargado: {len(snapshot.active)} activos de {len(snapshot.by_id)} (v{version})")
+        return snapshot
+
+
+class CatalogSnapshotProvider:
+    """Entrega el snapshot vigente y lo reconstruye cuando cambia la versión"""
+
+    MAX_AGE = 60  # Respaldo: stock_quantity y cambios que no pasan por el ORM
+
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self._stats = {'builds': 0, 'hits': 0}
+
+    @staticmethod
+    def _current_version() -> int:
+        return get_cache_manager().get(CACHE_NAMESPACE, VERSION_KEY, 0)
+
+    def _is_fresh(self, snapshot: Optional[CatalogSnapshot], version: int) -> bool:
+        return (snapshot is not None and snapshot.version == version
+                and time.time() - snapshot.built_at < self.MAX_AGE)
+
+    def get(self) -> CatalogSnapshot:
+        version = self._current_version()
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, version):
+            self._stats['hits'] += 1
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if not self._is_fresh(snapshot, version):
+                snapshot = CatalogSnapshot.build(version)
+                self._snapshot = snapshot
+                self._stats['builds'] += 1
+            return snapshot
+
+    def invalidate(self) -> None:
+        """Fuerza la reconstrucción en todos los workers (incrementa la versión compartida)"""
+        manager = get_cache_manager()
+        manager.set(CACHE_NAMESPACE, VERSION_KEY, manager.get(CACHE_NAMESPACE, VERSION_KEY, 0) + 1)
+        self._snapshot = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            **self._stats,
+            'version': snapshot.version if snapshot else None,
+            'etag': snapshot.etag if snapshot else None,
+            'products': len(snapshot.by_id) if snapshot else 0,
+            'active': len(snapshot.active) if snapshot else 0,
+            'age_seconds': round(time.time() - snapshot.built_at, 1) if snapshot else None
+        }
+
+
+_provider = CatalogSnapshotProvider()
+
+
+def get_catalog_snapshot() -> CatalogSnapshot:
+    """Snapshot vigente del catálogo POS (uno por proceso)"""
+    return _provider.get()
+
+
+def invalidate_catalog_snapshot() -> None:
+    """Invalida el catálogo (todos los workers lo reconstruyen en su próxima lectura)"""
+    _provider.invalidate()
+
+
+def get_catalog_snapshot_stats() -> Dict[str, Any]:
+    return _provider.get_stats()
+
+
+def is_version_shared() -> bool:
+    """True si la versión del catálogo se comparte entre workers (backend de cache compartido)"""
+    return get_cache_manager().backend_name in SHARED_BACKENDS
+
+
+def resolve_products(item_ids: List[str], active_only: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    item_id -> producto (formato PosService.get_product) para varios ids.
+    Usa el snapshot; los ids que no estén (productos recién creados fuera del
+    ORM) se buscan con una sola consulta. Si la versión no es compartida entre
+    workers el snapshot puede tener precios viejos: se consultan todos.
+    Con active_only los productos inactivos quedan sin resolver.
+    """
+    from app.models.product_models import Product
+
+    snapshot = get_catalog_snapshot() if is_version_shared() else None
+    resolved = {}
+    missing = set()
+    for item_id in item_ids:
+        product = snapshot.get(item_id) if snapshot else None
+        if product:
+            if product['active'] or not active_only:
+                resolved[item_id] = product
+        elif str(item_id).isdigit():
+            missing.add(int(item_id))
+    if missing:
+        query = Product.query.filter(Product.id.in_(missing))
+        if active_only:
+            query = query.filter(Product.is_active.is_(True))
+        for product in query.all():
+            resolved[str(product.id)] = _product_detail(product)
+    return resolved
+
+
+# ----------------------------------------------------------------------
+# Invalidación automática: feed de cambios de productos del catálogo
+# ----------------------------------------------------------------------
+# Atributos visibles en el catálogo (stock_quantity cambia con las ventas y se refresca por MAX_AGE)
+_WATCHED_ATTRS = ('name', 'category', 'price', 'cost_price', 'is_active')
+
+
+def _invalidate_on_product_changes(changes) -> None:
+    invalidate_catalog_snapshot()
+
+
+on_product_changes(_invalidate_on_product_changes, attrs=_WATCHED_ATTRS)
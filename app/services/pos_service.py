@@ -5,9 +5,9 @@ Gestiona ventas usando la API de PHP Point of Sale
 import logging
 from typing import Dict, List, Optional, Any
 from flask import current_app, session
-from sqlalchemy import func
 from app.infrastructure.external.phppos_kiosk_client import PHPPosKioskClient
 from app.helpers.cache import cached
+from app.services.pos_catalog import get_catalog_snapshot, invalidate_catalog_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -20,63 +20,20 @@ class PosService:
     
     def get_products(self, category: Optional[str] = None, limit: int = 1000, use_cache: bool = True) -> List[Dict[str, Any]]:
         """
-        Obtiene productos desde la base de datos LOCAL
+        Obtiene productos activos desde el catálogo local (snapshot en memoria)
         """
         try:
-            from app.models.product_models import Product
-            
-            query = Product.query.filter_by(is_active=True)
-            
-            if category:
-                # Búsqueda case-insensitive parcial (compatible MySQL)
-                query = query.filter(func.lower(Product.category).like(func.lower(f"%{category}%")))
-            
-            products_db = query.limit(limit).all()
-            
-            products_list = []
-            for p in products_db:
-                # Formato compatible con el frontend existente
-                products_list.append({
-                    'item_id': str(p.id),
-                    'name': p.name,
-                    'category': p.category,
-                    'category_normalized': p.category,
-                    'category_display': p.category.upper() if p.category else 'GENERAL',
-                    'price': float(p.price) if p.price else 0.0,
-                    'cost_price': float(p.cost_price) if p.cost_price else 0.0,
-                    'quantity': p.stock_quantity,
-                    'is_kit': False, # Por ahora todo es producto simple
-                    'description': '',
-                    'image_id': None
-                })
-            
-            # Ordenar por categoría
-            products_list.sort(key=lambda x: (x.get('category_display') or '').lower())
-            
-            logger.info(f"✅ Obtenidos {len(products_list)} productos desde BD Local")
-            return products_list
-            
+            if not use_cache:
+                invalidate_catalog_snapshot()
+            return get_catalog_snapshot().list_active(category=category, limit=limit)
         except Exception as e:
             logger.error(f"Error al obtener productos locales: {e}")
             return []
     
     def get_product(self, item_id: str) -> Optional[Dict[str, Any]]:
-        """Obtiene un producto específico desde BD Local"""
+        """Obtiene un producto específico desde el catálogo local (snapshot en memoria)"""
         try:
-            from app.models.product_models import Product
-            p = Product.query.get(int(item_id))
-            
-            if not p:
-                return None
-                
-            return {
-                'item_id': str(p.id),
-                'name': p.name,
-                'category': p.category,
-                'price': float(p.price) if p.price else 0.0,
-                'cost_price': float(p.cost_price) if p.cost_price else 0.0,
-                'quantity': p.stock_quantity
-            }
+            return get_catalog_snapshot().get(item_id)
         except Exception as e:
             logger.error(f"Error al obtener producto local {item_id}: {e}")
             return None
@@ -228,7 +228,12 @@ class SaleDeliveryService:
             # CORRECCIÓN CRÍTICA: Verificar si el inventario ya fue aplicado para esta venta
             from app.models.pos_models import PosSale
             sale = PosSale.query.filter_by(id=int(sale_id) if sale_id.isdigit() else None).first()
-            if sale and sale.inventory_applied:
+            inventory_by_pipeline = False
+            if sale and not sale.inventory_applied:
+                # Inventario al vender: el pipeline post-commit se encarga de esta venta
+                from app.helpers.sale_inventory_pipeline import has_pending_inventory_job
+                inventory_by_pipeline = has_pending_inventory_job(sale.id)
+            if sale and (sale.inventory_applied or inventory_by_pipeline):
                 current_app.logger.warning(
                     f"⚠️ Inventario ya aplicado para venta #{sale_id} - evitando doble descuento en entrega"
                 )
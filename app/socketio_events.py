@@ -1,7 +1,6 @@
+import hmac
 from flask import session, request, current_app
 from flask_socketio import emit
-from threading import Thread
-import time
 
 
 def register_socketio_events(socketio):
@@ -36,6 +35,11 @@ def register_socketio_events(socketio):
         with current_app.app_context():
             if session.get('admin_logged_in'):
                 current_app.logger.info('Admin Stats WebSocket conectado')
+                from app.helpers.metrics_publisher import get_metrics_publisher
+                publisher = get_metrics_publisher()
+                publisher.ensure_started(socketio, current_app._get_current_object())
+                publisher.client_connected()
+                request.environ['admin_stats_counted'] = True
                 emit('status', {'msg': 'Conectado al stream de estadísticas.'})
             else:
                 current_app.logger.warning('Intento NO autorizado de conexión WS stats → desconectando.')
@@ -44,6 +48,9 @@ def register_socketio_events(socketio):
     @socketio.on('disconnect', namespace='/admin_stats')
     def admin_stats_disconnect():
         with current_app.app_context():
+            if request.environ.pop('admin_stats_counted', False):
+                from app.helpers.metrics_publisher import get_metrics_publisher
+                get_metrics_publisher().client_disconnected()
             current_app.logger.info('Admin Stats WebSocket desconectado')
     
     # FASE 8: Visor de Cajas en Tiempo Real
@@ -65,47 +72,25 @@ def register_socketio_events(socketio):
     
     @socketio.on('request_metrics', namespace='/admin_stats')
     def handle_request_metrics():
-        """Enviar métricas cuando el cliente las solicite"""
+        """Enviar snapshot completo (versionado) cuando el cliente lo solicite (ej: al reconectar)"""
         with current_app.app_context():
             if session.get('admin_logged_in'):
                 try:
-                    from app.helpers.dashboard_metrics_service import get_metrics_service
-                    metrics_service = get_metrics_service()
-                    metrics = metrics_service.get_all_metrics(use_cache=False)
-                    emit('metrics_update', {'metrics': metrics}, namespace='/admin_stats')
+                    from app.helpers.metrics_publisher import get_metrics_publisher
+                    snapshot = get_metrics_publisher().snapshot()
+                    emit('metrics_update', snapshot, namespace='/admin_stats')
                 except Exception as e:
                     current_app.logger.error(f"Error enviando métricas: {e}")
                     emit('error', {'message': 'Error al obtener métricas'}, namespace='/admin_stats')
     
-    # Función para emitir métricas periódicamente (se inicializa después de crear la app)
+    # Publicación periódica de métricas: solo deltas de secciones que cambiaron
     def start_metrics_thread(app_instance):
-        """Iniciar thread para emitir métricas periódicamente"""
-        def emit_periodic_metrics():
-            """Emitir métricas cada 10 segundos a todos los clientes conectados para tiempo real"""
-            while True:
-                try:
-                    time.sleep(10)  # Esperar 10 segundos para actualización en tiempo real
-                    
-                    with app_instance.app_context():
-                        try:
-                            from app.helpers.dashboard_metrics_service import get_metrics_service
-                            metrics_service = get_metrics_service()
-                            metrics = metrics_service.get_all_metrics(use_cache=True)
-                            
-                            # Emitir a todos los clientes en /admin_stats
-                            socketio.emit('metrics_update', {'metrics': metrics}, namespace='/admin_stats')
-                        except Exception as e:
-                            app_instance.logger.error(f"Error en emisión periódica de métricas: {e}")
-                except Exception as e:
-                    app_instance.logger.error(f"Error en thread de métricas periódicas: {e}")
-                    time.sleep(60)  # Esperar más tiempo si hay error
-        
+        """Iniciar el publicador de métricas por deltas"""
         try:
-            metrics_thread = Thread(target=emit_periodic_metrics, daemon=True)
-            metrics_thread.start()
-            app_instance.logger.info("✅ Thread de métricas periódicas iniciado")
+            from app.helpers.metrics_publisher import get_metrics_publisher
+            get_metrics_publisher().ensure_started(socketio, app_instance)
         except Exception as e:
-            app_instance.logger.error(f"Error iniciando thread de métricas: {e}")
+            app_instance.logger.error(f"Error iniciando publicador de métricas: {e}")
     
     # Guardar función para inicializar después
     socketio._start_metrics_thread = start_metrics_thread
@@ -135,4 +120,26 @@ def register_socketio_events(socketio):
     @socketio.on('disconnect', namespace='/admin')
     def admin_disconnect():
         with current_app.app_context():
-            current_app.logger.info('Admin visor de cajas desconectado')
\ No newline at end of file
+            current_app.logger.info('Admin visor de cajas desconectado')
+
+    # Agentes de pago: push por caja (el agente reclama luego vía /api/payment/agent/pending)
+    @socketio.on('connect', namespace='/payment_agent')
+    def payment_agent_connect(auth=None):
+        from flask_socketio import join_room
+        from app.helpers.payment_agent_channel import socketio_room
+        with current_app.app_context():
+            auth = auth or {}
+            agent_key = auth.get('agent_key') or request.args.get('agent_key', '')
+            register_id = auth.get('register_id') or request.args.get('register_id')
+            expected_key = current_app.config.get('AGENT_API_KEY')
+            if not expected_key or not hmac.compare_digest(str(agent_key), str(expected_key)) or not register_id:
+                current_app.logger.warning('❌ Intento NO autorizado de conexión WS /payment_agent')
+                return False
+            join_room(socketio_room(str(register_id)))
+            current_app.logger.info(f'✅ Agente de pago conectado (caja {register_id})')
+            emit('status', {'msg': f'Suscrito a intents de la caja {register_id}.'})
+
+    @socketio.on('disconnect', namespace='/payment_agent')
+    def payment_agent_disconnect():
+        with current_app.app_context():
+            current_app.logger.info('Agente de pago desconectado')
@@ -0,0 +1,43 @@
+"""
+Migración: Agregar columna deleted_at (soft delete indexado) a guardarropia_items
+"""
+from app import create_app
+from app.models import db
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        try:
+            # Verificar si la columna ya existe
+            from sqlalchemy import inspect, text
+            inspector = inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('guardarropia_items')]
+            
+            if 'deleted_at' not in columns:
+                print("📝 Agregando columna 'deleted_at' a guardarropia_items...")
+                with db.engine.connect() as conn:
+                    conn.execute(text("ALTER TABLE guardarropia_items ADD COLUMN deleted_at DATETIME"))
+                    conn.commit()
+                print("✅ Columna 'deleted_at' agregada correctamente")
+            else:
+                print("ℹ️  La columna 'deleted_at' ya existe")
+            
+            with db.engine.connect() as conn:
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_guardarropia_items_deleted_at ON guardarropia_items(deleted_at)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_guardarropia_active ON guardarropia_items(status, deleted_at, shift_date)"))
+                # Items eliminados antes de la migración (marcados solo en notas)
+                result = conn.execute(text(
+                    "UPDATE guardarropia_items SET deleted_at = updated_at "
+                    "WHERE deleted_at IS NULL AND notes LIKE '%[ELIMINADO]%'"
+                ))
+                conn.commit()
+            print(f"✅ Migración completada ({result.rowcount} items eliminados marcados)")
+            
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,40 @@
+-- ============================================================================
+-- MIGRACIÓN: WebhookOutbox - Cola persistente de eventos salientes a n8n
+-- Fecha: 2025-12-20
+-- Descripción: Los eventos a n8n se encolan en esta tabla y un pool fijo de
+--              dispatchers los envía en lotes (sobreviven a reinicios)
+-- Compatibilidad: PostgreSQL (idempotente, seguro para producción)
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS webhook_outbox (
+    id SERIAL PRIMARY KEY,
+    
+    -- Evento
+    event_type VARCHAR(100) NOT NULL,
+    workflow_id VARCHAR(200) NULL,
+    payload TEXT NOT NULL,
+    
+    -- Estado de envío: pending, sending, sent, dead
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error VARCHAR(500) NULL,
+    
+    -- Reclamo atómico por un dispatcher
+    locked_by VARCHAR(100) NULL,
+    locked_until TIMESTAMP NULL,
+    
+    -- Timestamps
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_webhook_outbox_status_next ON webhook_outbox(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_webhook_outbox_created_at ON webhook_outbox(created_at);
+
+COMMENT ON TABLE webhook_outbox IS 'Cola persistente de eventos salientes a n8n';
+COMMENT ON COLUMN webhook_outbox.status IS 'pending, sending, sent, dead';
+
+COMMIT;
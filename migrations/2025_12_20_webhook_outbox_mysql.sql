@@ -0,0 +1,38 @@
+-- ============================================================================
+-- MIGRACIÓN: WebhookOutbox - Cola persistente de eventos salientes a n8n
+-- Fecha: 2025-12-20
+-- Versión: MySQL
+-- Descripción: Los eventos a n8n se encolan en esta tabla y un pool fijo de
+--              dispatchers los envía en lotes (sobreviven a reinicios)
+-- Compatibilidad: MySQL 8.0+ (idempotente, seguro para producción)
+-- ============================================================================
+
+START TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS webhook_outbox (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    
+    -- Evento
+    event_type VARCHAR(100) NOT NULL,
+    workflow_id VARCHAR(200) NULL,
+    payload TEXT NOT NULL,
+    
+    -- Estado de envío
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' COMMENT 'pending, sending, sent, dead',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error VARCHAR(500) NULL,
+    
+    -- Reclamo atómico por un dispatcher
+    locked_by VARCHAR(100) NULL,
+    locked_until DATETIME NULL,
+    
+    -- Timestamps
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME NULL,
+    
+    INDEX idx_webhook_outbox_status_next (status, next_attempt_at),
+    INDEX idx_webhook_outbox_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Cola persistente de eventos salientes a n8n';
+
+COMMIT;
@@ -0,0 +1,32 @@
+-- ============================================================================
+-- MIGRACIÓN: SaleInventoryJob - Cola de aplicación de inventario por venta
+-- Fecha: 2025-12-21
+-- Descripción: Trabajos de descuento de inventario insertados junto con la
+--              venta y procesados en lote por un worker después del commit
+-- Compatibilidad: PostgreSQL (idempotente, seguro para producción)
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS sale_inventory_jobs (
+    id SERIAL PRIMARY KEY,
+    sale_id INTEGER NOT NULL UNIQUE REFERENCES pos_sales(id),
+    location VARCHAR(100) NULL,
+    
+    -- Estado: pending, processing, done, failed
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT NULL,
+    locked_by VARCHAR(64) NULL,
+    locked_until TIMESTAMP NULL,
+    
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_sale_inventory_jobs_sale_id ON sale_inventory_jobs(sale_id);
+CREATE INDEX IF NOT EXISTS idx_sale_inventory_jobs_status_id ON sale_inventory_jobs(status, id);
+
+COMMENT ON TABLE sale_inventory_jobs IS 'Cola de descuento de inventario por venta (procesada después del commit)';
+
+COMMIT;
@@ -0,0 +1,31 @@
+-- ============================================================================
+-- MIGRACIÓN: SaleInventoryJob - Cola de aplicación de inventario por venta
+-- Fecha: 2025-12-21
+-- Versión: MySQL
+-- Descripción: Trabajos de descuento de inventario insertados junto con la
+--              venta y procesados en lote por un worker después del commit
+-- Compatibilidad: MySQL 8.0+ (idempotente, seguro para producción)
+-- ============================================================================
+
+START TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS sale_inventory_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    sale_id INT NOT NULL,
+    location VARCHAR(100) NULL,
+    
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' COMMENT 'pending, processing, done, failed',
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT NULL,
+    locked_by VARCHAR(64) NULL,
+    locked_until DATETIME NULL,
+    
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    processed_at DATETIME NULL,
+    
+    UNIQUE KEY uq_sale_inventory_jobs_sale_id (sale_id),
+    INDEX idx_sale_inventory_jobs_status_id (status, id),
+    CONSTRAINT fk_sale_inventory_jobs_sale FOREIGN KEY (sale_id) REFERENCES pos_sales(id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Cola de descuento de inventario por venta';
+
+COMMIT;
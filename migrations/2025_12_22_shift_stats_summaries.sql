@@ -0,0 +1,32 @@
+-- ============================================================================
+-- MIGRACIÓN: ShiftStatsSummary - Resumen materializado de turnos cerrados
+-- Fecha: 2025-12-22
+-- Descripción: Estadísticas de entregas y encuestas por turno, calculadas una
+--              vez al consultar el historial (los turnos cerrados no cambian)
+-- Compatibilidad: PostgreSQL (idempotente, seguro para producción)
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS shift_stats_summaries (
+    id SERIAL PRIMARY KEY,
+    shift_date VARCHAR(10) NOT NULL UNIQUE,
+    
+    total_entregas INTEGER NOT NULL DEFAULT 0,
+    total_cantidad INTEGER NOT NULL DEFAULT 0,
+    
+    -- Rankings y encuestas (JSON)
+    top_items TEXT NULL,
+    top_bartenders TEXT NULL,
+    top_barras TEXT NULL,
+    top_categorias TEXT NULL,
+    survey_stats TEXT NULL,
+    
+    computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_shift_stats_summaries_shift_date ON shift_stats_summaries(shift_date);
+
+COMMENT ON TABLE shift_stats_summaries IS 'Estadísticas precalculadas de turnos cerrados (historial)';
+
+COMMIT;
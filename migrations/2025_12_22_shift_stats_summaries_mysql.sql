@@ -0,0 +1,30 @@
+-- ============================================================================
+-- MIGRACIÓN: ShiftStatsSummary - Resumen materializado de turnos cerrados
+-- Fecha: 2025-12-22
+-- Versión: MySQL
+-- Descripción: Estadísticas de entregas y encuestas por turno, calculadas una
+--              vez al consultar el historial (los turnos cerrados no cambian)
+-- Compatibilidad: MySQL 8.0+ (idempotente, seguro para producción)
+-- ============================================================================
+
+START TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS shift_stats_summaries (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    shift_date VARCHAR(10) NOT NULL,
+    
+    total_entregas INT NOT NULL DEFAULT 0,
+    total_cantidad INT NOT NULL DEFAULT 0,
+    
+    top_items TEXT NULL COMMENT 'JSON',
+    top_bartenders TEXT NULL COMMENT 'JSON',
+    top_barras TEXT NULL COMMENT 'JSON',
+    top_categorias TEXT NULL COMMENT 'JSON',
+    survey_stats TEXT NULL COMMENT 'JSON',
+    
+    computed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    
+    UNIQUE KEY uq_shift_stats_summaries_shift_date (shift_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Estadísticas precalculadas de turnos cerrados';
+
+COMMIT;
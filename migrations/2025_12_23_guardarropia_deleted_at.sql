@@ -0,0 +1,33 @@
+-- ============================================================================
+-- MIGRACIÓN: Soft delete indexado en guardarropia_items
+-- Fecha: 2025-12-23
+-- Descripción: Columna deleted_at (NULL = activo) en lugar de buscar
+--              '[ELIMINADO]' en notas con LIKE; se completa desde las notas
+-- Compatibilidad: PostgreSQL (idempotente, seguro para ejecutar múltiples veces)
+-- ============================================================================
+
+BEGIN;
+
+ALTER TABLE guardarropia_items
+ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP NULL;
+
+-- Items eliminados antes de esta migración (marcados solo en notas)
+UPDATE guardarropia_items
+SET deleted_at = updated_at
+WHERE deleted_at IS NULL
+  AND notes LIKE '%[ELIMINADO]%';
+
+CREATE INDEX IF NOT EXISTS ix_guardarropia_items_deleted_at ON guardarropia_items(deleted_at);
+CREATE INDEX IF NOT EXISTS idx_guardarropia_active ON guardarropia_items(status, deleted_at, shift_date);
+
+COMMENT ON COLUMN guardarropia_items.deleted_at IS 'Fecha de eliminación (soft delete); NULL = activo';
+
+COMMIT;
+
+-- ============================================================================
+-- VERIFICACIÓN
+-- ============================================================================
+
+SELECT COUNT(*) AS items_eliminados
+FROM guardarropia_items
+WHERE deleted_at IS NOT NULL;
@@ -0,0 +1,48 @@
+-- ============================================================================
+-- MIGRACIÓN: Soft delete indexado en guardarropia_items
+-- Fecha: 2025-12-23
+-- Versión: MySQL
+-- Descripción: Columna deleted_at (NULL = activo) en lugar de buscar
+--              '[ELIMINADO]' en notas con LIKE; se completa desde las notas
+-- Compatibilidad: MySQL 8.0+ (idempotente, seguro para ejecutar múltiples veces)
+-- ============================================================================
+
+START TRANSACTION;
+
+-- Agregar columna deleted_at (MySQL no soporta IF NOT EXISTS en ALTER TABLE)
+SET @col_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.columns
+    WHERE table_schema = DATABASE()
+      AND table_name = 'guardarropia_items'
+      AND column_name = 'deleted_at'
+);
+
+SET @sql = IF(
+    @col_exists = 0,
+    'ALTER TABLE guardarropia_items ADD COLUMN deleted_at DATETIME NULL',
+    'SELECT "Columna deleted_at ya existe" as message'
+);
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Items eliminados antes de esta migración (marcados solo en notas)
+UPDATE guardarropia_items
+SET deleted_at = updated_at
+WHERE deleted_at IS NULL
+  AND notes LIKE '%[ELIMINADO]%';
+
+CREATE INDEX IF NOT EXISTS ix_guardarropia_items_deleted_at ON guardarropia_items(deleted_at);
+CREATE INDEX IF NOT EXISTS idx_guardarropia_active ON guardarropia_items(status, deleted_at, shift_date);
+
+COMMIT;
+
+-- ============================================================================
+-- VERIFICACIÓN
+-- ============================================================================
+
+SELECT COUNT(*) AS items_eliminados
+FROM guardarropia_items
+WHERE deleted_at IS NOT NULL;
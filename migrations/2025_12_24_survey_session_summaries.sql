@@ -0,0 +1,31 @@
+-- ============================================================================
+-- MIGRACIÓN: SurveySessionSummary - Resumen congelado de sesiones de encuestas
+-- Fecha: 2025-12-24
+-- Descripción: Agregados finales (total, promedio, distribuciones por rating,
+--              barra y hora) guardados al cerrar la sesión de encuestas
+-- Compatibilidad: PostgreSQL (idempotente, seguro para producción)
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS survey_session_summaries (
+    id SERIAL PRIMARY KEY,
+    fecha_sesion VARCHAR(10) NOT NULL UNIQUE,
+    
+    total INTEGER NOT NULL DEFAULT 0,
+    average_rating DOUBLE PRECISION NOT NULL DEFAULT 0,
+    
+    -- Distribuciones (JSON)
+    ratings_count TEXT NULL,
+    by_barra TEXT NULL,
+    by_hour TEXT NULL,
+    barra_stats TEXT NULL,
+    
+    closed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_survey_session_summaries_fecha ON survey_session_summaries(fecha_sesion);
+
+COMMENT ON TABLE survey_session_summaries IS 'Agregados congelados de sesiones de encuestas cerradas';
+
+COMMIT;
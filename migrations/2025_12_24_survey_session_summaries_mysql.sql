@@ -0,0 +1,29 @@
+-- ============================================================================
+-- MIGRACIÓN: SurveySessionSummary - Resumen congelado de sesiones de encuestas
+-- Fecha: 2025-12-24
+-- Versión: MySQL
+-- Descripción: Agregados finales (total, promedio, distribuciones por rating,
+--              barra y hora) guardados al cerrar la sesión de encuestas
+-- Compatibilidad: MySQL 8.0+ (idempotente, seguro para producción)
+-- ============================================================================
+
+START TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS survey_session_summaries (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    fecha_sesion VARCHAR(10) NOT NULL,
+    
+    total INT NOT NULL DEFAULT 0,
+    average_rating DOUBLE NOT NULL DEFAULT 0,
+    
+    ratings_count TEXT NULL COMMENT 'JSON',
+    by_barra TEXT NULL COMMENT 'JSON',
+    by_hour TEXT NULL COMMENT 'JSON',
+    barra_stats TEXT NULL COMMENT 'JSON',
+    
+    closed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    
+    UNIQUE KEY uq_survey_session_summaries_fecha (fecha_sesion)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Agregados congelados de sesiones de encuestas cerradas';
+
+COMMIT;
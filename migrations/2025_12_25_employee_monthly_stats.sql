@@ -0,0 +1,58 @@
+-- ============================================================================
+-- MIGRACIÓN: EmployeeMonthlyStats - Resumen mensual de rendimiento por empleado
+-- Fecha: 2025-12-25
+-- Descripción: Entregas, encuestas, puntualidad y eficiencia por empleado y mes.
+--              La ficha personal suma estas filas; el cierre de jornada
+--              recalcula el mes de la jornada para su planilla
+-- Compatibilidad: PostgreSQL (idempotente, seguro para producción)
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS employee_monthly_stats (
+    id SERIAL PRIMARY KEY,
+    employee_id VARCHAR(50) NOT NULL,
+    mes VARCHAR(7) NOT NULL,
+    employee_name VARCHAR(200) NULL,
+    
+    -- Entregas
+    tragos INTEGER NOT NULL DEFAULT 0,
+    entregas INTEGER NOT NULL DEFAULT 0,
+    noches INTEGER NOT NULL DEFAULT 0,
+    ritmo_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ritmo_noches INTEGER NOT NULL DEFAULT 0,
+    mejor_noche TEXT NULL,
+    
+    -- Encuestas
+    encuestas INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    ratings_count TEXT NULL,
+    
+    -- Puntualidad
+    jornadas INTEGER NOT NULL DEFAULT 0,
+    jornadas_puntuales INTEGER NOT NULL DEFAULT 0,
+    jornadas_tardes INTEGER NOT NULL DEFAULT 0,
+    retraso_apertura_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    retraso_apertura_n INTEGER NOT NULL DEFAULT 0,
+    retraso_cierre_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    retraso_cierre_n INTEGER NOT NULL DEFAULT 0,
+    
+    -- Eficiencia (JSON en mejor/peor inventario)
+    inventarios INTEGER NOT NULL DEFAULT 0,
+    inventarios_sin_merma INTEGER NOT NULL DEFAULT 0,
+    inventarios_con_merma INTEGER NOT NULL DEFAULT 0,
+    merma_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+    eficiencia_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    mejor_inventario TEXT NULL,
+    peor_inventario TEXT NULL,
+    
+    computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    
+    CONSTRAINT uq_employee_monthly_stats_employee_mes UNIQUE (employee_id, mes)
+);
+
+CREATE INDEX IF NOT EXISTS idx_employee_monthly_stats_employee_id ON employee_monthly_stats(employee_id);
+
+COMMENT ON TABLE employee_monthly_stats IS 'Rendimiento mensual por empleado (ficha personal)';
+
+COMMIT;
@@ -0,0 +1,52 @@
+-- ============================================================================
+-- MIGRACIÓN: EmployeeMonthlyStats - Resumen mensual de rendimiento por empleado
+-- Fecha: 2025-12-25
+-- Versión: MySQL
+-- Descripción: Entregas, encuestas, puntualidad y eficiencia por empleado y mes.
+--              La ficha personal suma estas filas; el cierre de jornada
+--              recalcula el mes de la jornada para su planilla
+-- Compatibilidad: MySQL 8.0+ (idempotente, seguro para producción)
+-- ============================================================================
+
+START TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS employee_monthly_stats (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    employee_id VARCHAR(50) NOT NULL,
+    mes VARCHAR(7) NOT NULL,
+    employee_name VARCHAR(200) NULL,
+    
+    tragos INT NOT NULL DEFAULT 0,
+    entregas INT NOT NULL DEFAULT 0,
+    noches INT NOT NULL DEFAULT 0,
+    ritmo_sum DOUBLE NOT NULL DEFAULT 0,
+    ritmo_noches INT NOT NULL DEFAULT 0,
+    mejor_noche TEXT NULL COMMENT 'JSON',
+    
+    encuestas INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    ratings_count TEXT NULL COMMENT 'JSON',
+    
+    jornadas INT NOT NULL DEFAULT 0,
+    jornadas_puntuales INT NOT NULL DEFAULT 0,
+    jornadas_tardes INT NOT NULL DEFAULT 0,
+    retraso_apertura_sum DOUBLE NOT NULL DEFAULT 0,
+    retraso_apertura_n INT NOT NULL DEFAULT 0,
+    retraso_cierre_sum DOUBLE NOT NULL DEFAULT 0,
+    retraso_cierre_n INT NOT NULL DEFAULT 0,
+    
+    inventarios INT NOT NULL DEFAULT 0,
+    inventarios_sin_merma INT NOT NULL DEFAULT 0,
+    inventarios_con_merma INT NOT NULL DEFAULT 0,
+    merma_total DOUBLE NOT NULL DEFAULT 0,
+    eficiencia_sum DOUBLE NOT NULL DEFAULT 0,
+    mejor_inventario TEXT NULL COMMENT 'JSON',
+    peor_inventario TEXT NULL COMMENT 'JSON',
+    
+    computed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    
+    UNIQUE KEY uq_employee_monthly_stats_employee_mes (employee_id, mes),
+    KEY idx_employee_monthly_stats_employee_id (employee_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Rendimiento mensual por empleado';
+
+COMMIT;
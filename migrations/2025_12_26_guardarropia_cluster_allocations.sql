@@ -0,0 +1,26 @@
+-- ============================================================================
+-- MIGRACIÓN: GuardarropiaClusterAllocation - Clusters asignados por turno
+-- Fecha: 2025-12-26
+-- Descripción: Una fila por (turno, cluster) ocupado; la restricción única
+--              impide que dos depósitos concurrentes (en distintos workers)
+--              confirmen el mismo cluster. Los depósitos anteriores a esta
+--              migración se siguen validando contra guardarropia_items.
+-- Compatibilidad: PostgreSQL (idempotente, seguro para producción)
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS guardarropia_cluster_allocations (
+    id SERIAL PRIMARY KEY,
+    shift_date VARCHAR(10) NOT NULL DEFAULT '',
+    cluster INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    allocated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_guardarropia_allocation_shift_cluster UNIQUE (shift_date, cluster)
+);
+
+CREATE INDEX IF NOT EXISTS ix_guardarropia_cluster_allocations_item_id ON guardarropia_cluster_allocations(item_id);
+
+COMMENT ON TABLE guardarropia_cluster_allocations IS 'Clusters de guardarropía asignados por turno (unicidad entre depósitos concurrentes)';
+
+COMMIT;
@@ -0,0 +1,25 @@
+-- ============================================================================
+-- MIGRACIÓN: GuardarropiaClusterAllocation - Clusters asignados por turno
+-- Fecha: 2025-12-26
+-- Versión: MySQL
+-- Descripción: Una fila por (turno, cluster) ocupado; la restricción única
+--              impide que dos depósitos concurrentes (en distintos workers)
+--              confirmen el mismo cluster. Los depósitos anteriores a esta
+--              migración se siguen validando contra guardarropia_items.
+-- Compatibilidad: MySQL 8.0+ (idempotente, seguro para producción)
+-- ============================================================================
+
+START TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS guardarropia_cluster_allocations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    shift_date VARCHAR(10) NOT NULL DEFAULT '',
+    cluster INT NOT NULL,
+    item_id INT NOT NULL,
+    allocated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE KEY uq_guardarropia_allocation_shift_cluster (shift_date, cluster),
+    INDEX ix_guardarropia_cluster_allocations_item_id (item_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Clusters de guardarropía asignados por turno';
+
+COMMIT;
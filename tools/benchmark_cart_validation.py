@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark de validación de carritos: camino anterior (por línea) vs validate_cart (en lote)
+
+Mide tiempo y número de consultas SQL para carritos de 1, 10 y 50 líneas
+usando los productos activos de la BD local (se repiten si hay menos).
+
+Uso:
+    python tools/benchmark_cart_validation.py [--location barra_principal] [--runs 20]
+"""
+
+import sys
+import os
+import time
+import argparse
+import statistics
+import warnings
+
+# Agregar raíz del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Cuenta las consultas SQL ejecutadas en el engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def legacy_validate(items, location):
+    """Réplica del camino anterior: get_product por línea (x2), receta por línea y stock por ingrediente"""
+    from app.models.product_models import Product
+    from app.models.inventory_stock_models import IngredientStock, Recipe, RecipeIngredient
+    from app.helpers.product_validation_helper import can_sell_product
+
+    def get_product(item_id):
+        p = Product.query.get(int(item_id))
+        return {'price': float(p.price) if p.price else 0.0, 'name': p.name} if p else None
+
+    # validate_inventory_availability
+    for item in items:
+        if not get_product(item['item_id']):
+            return False
+        product_db = Product.query.get(int(item['item_id']))
+        if product_db:
+            can_sell_product(product_db)
+    # validate_prices_match_api
+    for item in items:
+        product = get_product(item['item_id'])
+        if abs(float(item['price']) - product['price']) > 0.01:
+            return False
+    # validate_stock_availability
+    for item in items:
+        product = Product.query.get(int(item['item_id']))
+        if not product or not product.is_kit:
+            continue
+        recipe = Recipe.query.filter_by(product_id=product.id, is_active=True).first()
+        if not recipe:
+            continue
+        for ri in RecipeIngredient.query.filter_by(recipe_id=recipe.id).all():
+            IngredientStock.query.filter_by(ingredient_id=ri.ingredient_id, location=location).first()
+    return True
+
+
+def batched_validate(items, location):
+    from app.helpers.cart_validator import validate_cart
+    return validate_cart(items, location=location).ok
+
+
+def build_cart(products, size):
+    return [
+        {
+            'item_id': str(products[i % len(products)].id),
+            'name': products[i % len(products)].name,
+            'quantity': 1 + i % 3,
+            'price': float(products[i % len(products)].price or 0)
+        }
+        for i in range(size)
+    ]
+
+
+def measure(func, items, location, runs, engine):
+    from app.models import db
+    timings = []
+    queries = 0
+    for _ in range(runs):
+        # Sesión nueva por corrida (como un request): sin identity map de la corrida anterior
+        db.session.remove()
+        with QueryCounter(engine) as counter:
+            start = time.perf_counter()
+            func(items, location)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = counter.count
+    return statistics.median(timings), queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de validación de carritos')
+    parser.add_argument('--location', default='barra_principal')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='.*Query.get.*')
+
+    from app import create_app
+    app = create_app()
+
+    with app.app_context():
+        from app.models import db
+        from app.models.product_models import Product
+
+        products = Product.query.filter_by(is_active=True).order_by(Product.id).limit(50).all()
+        if not products:
+            print("❌ No hay productos activos en la BD local")
+            return 1
+
+        engine = db.engine
+        # Calentar snapshot del catálogo y grafo de recetas (estado normal de un worker)
+        batched_validate(build_cart(products, 1), args.location)
+
+        print(f"Productos distintos: {len(products)} | ubicación: {args.location} | corridas: {args.runs}")
+        print(f"{'líneas':>7} | {'anterior ms':>12} {'consultas':>10} | {'lote ms':>9} {'consultas':>10}")
+        for size in (1, 10, 50):
+            items = build_cart(products, size)
+            legacy_ms, legacy_q = measure(legacy_validate, items, args.location, args.runs, engine)
+            batch_ms, batch_q = measure(batched_validate, items, args.location, args.runs, engine)
+            print(f"{size:>7} | {legacy_ms:>12.2f} {legacy_q:>10} | {batch_ms:>9.2f} {batch_q:>10}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark del cliente HTTP compartido contra un servidor HTTP local (stub)
+
+Compara requests.get suelto (una conexión nueva por llamada, como hacían las
+integraciones) con HttpClient (pool keep-alive por host): llamadas/s y
+conexiones TCP abiertas, en secuencia y con varios threads. Luego comprueba
+las políticas: reintento de un 503, POST que no se repite tras enviarse y
+circuito que se abre ante un host caído y falla de inmediato.
+
+Sobre HTTPS la diferencia es mayor: cada conexión nueva también paga el
+handshake TLS.
+
+Uso:
+    python tools/benchmark_http_client.py [--calls 500] [--threads 8]
+"""
+
+import sys
+import os
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Agregar raíz del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from app.infrastructure.external.http_client import HttpClient, HostUnavailableError
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Responde JSON con keep-alive; /flaky devuelve 503 en las primeras llamadas, /error siempre 500"""
+    protocol_version = 'HTTP/1.1'
+    wbufsize = 64 * 1024  # Cabeceras y cuerpo en un solo envío (evita Nagle + ACK retrasado)
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = hits = server.hits.get(self.path, 0) + 1
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        status = 200
+        if self.path == '/flaky' and hits <= 2:
+            status = 503
+        elif self.path == '/error':
+            status = 500
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.hits = {}
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def run(server, get, calls, threads):
+    """(llamadas/s, conexiones abiertas) para `calls` GET repartidos en `threads`"""
+    before = server.connections
+    url = f"{server.url}/ok"
+    start = time.perf_counter()
+    if threads == 1:
+        for _ in range(calls):
+            get(url).raise_for_status()
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            for response in pool.map(lambda _: get(url), range(calls)):
+                response.raise_for_status()
+    return calls / (time.perf_counter() - start), server.connections - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del cliente HTTP compartido')
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = HttpClient(backoff_base=0.05, recovery_timeout=5.0)
+
+    print(f"Servidor stub en {server.url} | llamadas por medición: {args.calls}")
+    print(f"{'cliente':>22} | {'1 thread/s':>10} {'conex.':>6} | {f'{args.threads} threads/s':>12} {'conex.':>6}")
+    for name, get in (('requests.get suelto', lambda url: requests.get(url, timeout=5)),
+                      ('HttpClient (pool)', lambda url: client.get(url, timeout=5))):
+        seq_rate, seq_conns = run(server, get, args.calls, 1)
+        par_rate, par_conns = run(server, get, args.calls, args.threads)
+        print(f"{name:>22} | {seq_rate:>10.0f} {seq_conns:>6} | {par_rate:>12.0f} {par_conns:>6}")
+
+    print("\nPolíticas:")
+    response = client.get(f"{server.url}/flaky")
+    print(f"  GET /flaky (503, 503, 200): status final {response.status_code} "
+          f"tras {server.hits['/flaky']} intentos")
+    response = client.post(f"{server.url}/error")
+    print(f"  POST /error (500): status {response.status_code}, enviado {server.hits['/error']} vez "
+          f"(no se repite un POST ya enviado)")
+
+    down = 'http://127.0.0.1:9'  # Puerto sin servicio: conexión rechazada
+    attempts = 0
+    start = time.perf_counter()
+    while True:
+        attempts += 1
+        try:
+            client.get(down, timeout=1, retries=0)
+        except HostUnavailableError:
+            break
+        except requests.exceptions.ConnectionError:
+            continue
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(100):
+        try:
+            client.get(down, timeout=1)
+        except HostUnavailableError:
+            pass
+    rejected = (time.perf_counter() - start) / 100
+    print(f"  Host caído: circuito abierto tras {attempts - 1} fallos ({opened * 1000:.1f} ms); "
+          f"luego cada llamada falla en {rejected * 1e6:.0f} µs sin conectar")
+
+    print("\nMétricas por host:")
+    for host, data in client.get_stats()['hosts'].items():
+        print(f"  {host}: {data['requests']} solicitudes, {data['errors']} errores {data['errors_by_kind']}, "
+              f"{data['retries']} reintentos, {data['circuit_rejections']} rechazos, circuito {data['circuit']}, "
+              f"p50 {data['latency_ms']['p50']} ms / p95 {data['latency_ms']['p95']} ms")
+
+    client.close()
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
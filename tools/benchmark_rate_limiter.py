@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark del rate limiting: lista de timestamps por clave (storage anterior)
+vs contadores de ventana deslizante en memoria y en SQLite compartido
+
+Mide verificaciones por segundo con el patrón de los agentes de pago
+(120 solicitudes/min por caja) y la memoria por clave, y comprueba que con
+el backend SQLite varios procesos comparten un único límite.
+
+Uso:
+    python tools/benchmark_rate_limiter.py [--checks 20000] [--processes 4]
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing as mp
+from collections import defaultdict
+
+# Agregar raíz del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.infrastructure.rate_limiter.storage import MemoryRateLimitStorage, SQLiteRateLimitStorage
+
+LIMIT = 120
+WINDOW = 60
+
+
+class LegacyListStorage:
+    """Réplica del MemoryRateLimitStorage anterior (lista de timestamps por clave)"""
+
+    def __init__(self):
+        self._storage = defaultdict(list)
+
+    def hit(self, key, window, limit):
+        current_time = time.time()
+        self._storage[key].append(current_time)
+        cutoff = current_time - window
+        self._storage[key] = [ts for ts in self._storage[key] if ts > cutoff]
+        return len(self._storage[key]) <= limit
+
+
+def throughput(storage, checks, registers):
+    """Verificaciones/s repartidas entre `registers` cajas"""
+    keys = [f"agent:{n}" for n in range(registers)]
+    start = time.perf_counter()
+    for i in range(checks):
+        storage.hit(keys[i % registers], WINDOW, LIMIT)
+    return checks / (time.perf_counter() - start)
+
+
+def memory_per_key(factory, keys=2000, hits_per_key=LIMIT):
+    """Bytes por clave con la ventana llena"""
+    tracemalloc.start()
+    storage = factory()
+    baseline = tracemalloc.take_snapshot()
+    for n in range(keys):
+        for _ in range(hits_per_key):
+            storage.hit(f"agent:{n}", WINDOW, LIMIT * 10)
+    used = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(baseline, 'filename'))
+    tracemalloc.stop()
+    return used / keys
+
+
+def _worker(path, checks, queue):
+    storage = SQLiteRateLimitStorage(path)
+    start = time.perf_counter()
+    allowed = sum(storage.hit('agent:shared', WINDOW, LIMIT).allowed for _ in range(checks))
+    queue.put((allowed, time.perf_counter() - start))
+
+
+def shared_processes(path, processes, checks):
+    """Varios procesos golpeando la misma clave sobre el mismo archivo SQLite"""
+    queue = mp.Queue()
+    workers = [mp.Process(target=_worker, args=(path, checks, queue)) for _ in range(processes)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    results = [queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return sum(r[0] for r in results), processes * checks / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del rate limiting')
+    parser.add_argument('--checks', type=int, default=20000)
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_path = os.path.join(tmp, 'rate_limits.sqlite3')
+        backends = [
+            ('lista (anterior)', LegacyListStorage),
+            ('contador memoria', MemoryRateLimitStorage),
+            ('contador sqlite', lambda: SQLiteRateLimitStorage(sqlite_path)),
+        ]
+
+        print(f"Límite {LIMIT}/{WINDOW}s | verificaciones por medición: {args.checks}")
+        print(f"{'backend':>18} | {'1 caja/s':>10} {'8 cajas/s':>10} {'64 cajas/s':>10} | {'bytes/clave':>11}")
+        for name, factory in backends:
+            rates = [throughput(factory(), args.checks, registers) for registers in (1, 8, 64)]
+            # En sqlite la memoria está en el archivo, no en el proceso
+            per_key = f"{memory_per_key(factory):.0f}" if name != 'contador sqlite' else '-'
+            print(f"{name:>18} | {rates[0]:>10.0f} {rates[1]:>10.0f} {rates[2]:>10.0f} | {per_key:>11}")
+
+        shared_path = os.path.join(tmp, 'shared.sqlite3')
+        SQLiteRateLimitStorage(shared_path)
+        allowed, rate = shared_processes(shared_path, args.processes, args.checks // args.processes)
+        print(f"\nSQLite compartido: {args.processes} procesos, {rate:.0f} verificaciones/s en total, "
+              f"{allowed} permitidas (límite {LIMIT})")
+        print(f"Memoria por proceso permitiría {args.processes * LIMIT} ({args.processes}×)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
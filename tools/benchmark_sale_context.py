@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark del contexto de venta por caja: validaciones de api_create_sale
+antes (consultas por venta) vs SaleContextCache (una búsqueda en cache)
+
+Mide, para 1, 4 y 8 cajas, el tiempo por venta, las ventas por segundo por
+caja y las consultas SQL de la parte de la venta que depende de la caja:
+sesión OPEN, jornada, bloqueo (validate_register_lock y verificación previa
+a crear la venta), último cierre y PosRegister. Crea cajas de prueba
+(is_test) con sesión y bloqueo en la jornada abierta y las elimina al final.
+
+Uso:
+    python tools/benchmark_sale_context.py [--sales 200]
+"""
+
+import sys
+import os
+import time
+import argparse
+import statistics
+import warnings
+from datetime import datetime, timedelta
+
+# Agregar raíz del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+EMPLOYEE_ID = 'bench-employee'
+
+
+class QueryCounter:
+    """Cuenta las consultas SQL ejecutadas en el engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def legacy_checks(register_id, employee_id):
+    """Réplica del camino anterior de api_create_sale (consultas por venta)"""
+    from app.models import RegisterClose
+    from app.models.pos_models import PosRegister
+    from app.models.jornada_models import Jornada
+    from app.helpers.register_session_service import RegisterSessionService
+    from app.helpers.register_lock_db import is_register_locked, get_register_lock
+    from app.helpers.timezone_utils import CHILE_TZ
+
+    can_sell, _ = RegisterSessionService.can_sell_in_register(register_id)
+    active_session = RegisterSessionService.get_active_session(register_id)
+    jornada = Jornada.query.get(active_session.jornada_id)
+    assert can_sell and jornada.estado_apertura == 'abierto'
+    # validate_register_lock
+    assert is_register_locked(register_id)
+    assert get_register_lock(register_id)['employee_id'] == employee_id
+    RegisterClose.query.filter(
+        RegisterClose.register_id == register_id,
+        RegisterClose.closed_at >= datetime.now(CHILE_TZ) - timedelta(hours=2)
+    ).order_by(RegisterClose.closed_at.desc()).first()
+    assert PosRegister.query.filter(
+        (PosRegister.id == register_id) | (PosRegister.code == str(register_id))
+    ).first()
+    # Verificación del bloqueo antes de crear la venta
+    assert is_register_locked(register_id)
+    assert get_register_lock(register_id)['employee_id'] == employee_id
+
+
+def cached_checks(register_id, employee_id):
+    """Camino nuevo: contexto de venta de la caja"""
+    from app.helpers.register_sale_context import get_sale_context_cache
+    cache = get_sale_context_cache()
+    context, error_msg = cache.check_sale(register_id)
+    assert error_msg is None
+    assert cache.lock_held_by(register_id, employee_id)   # validate_register_lock
+    context.recent_close()
+    assert context.register
+    assert cache.lock_held_by(register_id, employee_id)   # antes de crear la venta
+
+
+def create_registers(count, jornada_id, shift_date):
+    from app.models import db, RegisterLock
+    from app.models.pos_models import PosRegister, RegisterSession
+    from app.helpers.timezone_utils import CHILE_TZ
+
+    now = datetime.now(CHILE_TZ).replace(tzinfo=None)
+    register_ids = []
+    for n in range(count):
+        register = PosRegister(name=f'Benchmark {n + 1}', code=f'BENCH-{n + 1}', is_test=True)
+        db.session.add(register)
+        db.session.flush()
+        register_id = str(register.id)
+        db.session.add(RegisterSession(
+            register_id=register_id,
+            opened_by_employee_id=EMPLOYEE_ID,
+            opened_by_employee_name='Benchmark',
+            opened_at=now,
+            status='OPEN',
+            shift_date=shift_date,
+            jornada_id=jornada_id
+        ))
+        db.session.add(RegisterLock(
+            register_id=register_id,
+            employee_id=EMPLOYEE_ID,
+            employee_name='Benchmark',
+            expires_at=now + timedelta(hours=1)
+        ))
+        register_ids.append(register_id)
+    db.session.commit()
+    return register_ids
+
+
+def delete_registers(register_ids):
+    from app.models import db, RegisterLock
+    from app.models.pos_models import PosRegister, RegisterSession
+
+    db.session.rollback()
+    RegisterLock.query.filter(RegisterLock.register_id.in_(register_ids)).delete(synchronize_session=False)
+    RegisterSession.query.filter(RegisterSession.register_id.in_(register_ids)).delete(synchronize_session=False)
+    PosRegister.query.filter(PosRegister.id.in_([int(r) for r in register_ids])).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def measure(func, register_ids, sales, engine):
+    """Ventas repartidas entre las cajas; sesión nueva por venta (como un request)"""
+    from app.models import db
+    timings = []
+    queries = 0
+    for i in range(sales):
+        register_id = register_ids[i % len(register_ids)]
+        db.session.remove()
+        with QueryCounter(engine) as counter:
+            start = time.perf_counter()
+            func(register_id, EMPLOYEE_ID)
+            timings.append(time.perf_counter() - start)
+        queries += counter.count
+    per_sale_ms = statistics.median(timings) * 1000
+    per_register = (sales / sum(timings)) / len(register_ids)
+    return per_sale_ms, per_register, queries / sales
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del contexto de venta por caja')
+    parser.add_argument('--sales', type=int, default=200)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='.*Query.get.*')
+
+    from app import create_app
+    app = create_app()
+
+    with app.app_context():
+        from app.models import db
+        from app.models.jornada_models import Jornada
+
+        jornada = Jornada.query.filter_by(estado_apertura='abierto').order_by(Jornada.id.desc()).first()
+        if not jornada:
+            print("❌ No hay jornada abierta en la BD local")
+            return 1
+
+        jornada_id, shift_date = jornada.id, jornada.fecha_jornada
+        engine = db.engine
+        print(f"Jornada {jornada_id} ({shift_date}) | ventas por medición: {args.sales}")
+        print(f"{'cajas':>6} | {'anterior ms':>11} {'ventas/s/caja':>14} {'consultas':>10} | "
+              f"{'contexto ms':>11} {'ventas/s/caja':>14} {'consultas':>10}")
+        for count in (1, 4, 8):
+            register_ids = create_registers(count, jornada_id, shift_date)
+            try:
+                legacy = measure(legacy_checks, register_ids, args.sales, engine)
+                cached = measure(cached_checks, register_ids, args.sales, engine)
+            finally:
+                delete_registers(register_ids)
+            print(f"{count:>6} | {legacy[0]:>11.3f} {legacy[1]:>14.0f} {legacy[2]:>10.1f} | "
+                  f"{cached[0]:>11.3f} {cached[1]:>14.0f} {cached[2]:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())